@@ -0,0 +1,138 @@
+import json
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Separates the product from its components in a --product argument, e.g. ppg-17:percona-postgresql-17
+COMPONENTS_SEPARATOR = ":"
+
+class ProductSelection:
+    """
+    One product of an install.
+
+    Attributes:
+        product (str): The product argument as given, e.g. "ppg-17".
+        distribution (str): The distribution, e.g. "Percona Distribution for PostgreSQL".
+        version (str): The resolved version, e.g. "17.5".
+        repo_type (str): "release", "testing" or "experimental".
+        components (list): The components to install from the product.
+        solution (str): The solution to run once everything is installed, or None.
+    """
+
+    def __init__(self, product, distribution, version, repo_type, components=None, solution=None):
+        self.product = product
+        self.distribution = distribution
+        self.version = version
+        self.repo_type = repo_type
+        self.components = list(components or [])
+        self.solution = solution
+
+    @property
+    def repository(self):
+        """The repository of the product, e.g. "ppg-17.5"."""
+        from shared import SUPPORTED_DISTROS
+        return f"{SUPPORTED_DISTROS[self.distribution]}{self.version}"
+
+    def journal_inputs(self):
+        """The inputs that identify the product in the journal of an install."""
+        return {
+            "product": self.repository,
+            "repository": self.repo_type,
+            "components": self.components,
+            "solution": self.solution,
+        }
+
+    def __repr__(self):
+        return f"ProductSelection({self.repository!r}, {self.repo_type!r}, components={self.components!r})"
+
+def _components(value):
+    """Components given as a comma-separated string or a list."""
+    if isinstance(value, str):
+        value = value.split(",")
+    return [component.strip() for component in value or [] if component.strip()]
+
+def load_manifest(path):
+    """
+    Load a batch manifest and return its product entries.
+
+    The manifest is a JSON document:
+
+        {
+          "repository": "release",
+          "products": [
+            {"product": "ppg-17", "components": ["percona-postgresql-17", "percona-pg-stat-monitor17"], "solution": "pg_tde_demo"},
+            {"product": "pdps-8.0", "repository": "testing", "components": "percona-server-server"},
+            "pdmdb-8.0"
+          ]
+        }
+
+    The repository type of a product overrides that of the manifest, which overrides -r.
+    The solution of a product runs once everything is installed.
+
+    Returns:
+        list: A dict per product with its product, repository, components and solution.
+
+    Raises:
+        ValueError: If the manifest cannot be read, is malformed or lists no products.
+    """
+    try:
+        with open(path, "r", encoding="utf-8") as file:
+            manifest = json.load(file)
+    except json.JSONDecodeError as e:
+        raise ValueError(f"Error: Invalid manifest {path}: {str(e)}")
+    except OSError as e:
+        raise ValueError(f"Error: Unable to read manifest {path}: {e.strerror or str(e)}")
+    if not isinstance(manifest, dict):
+        raise ValueError(f"Error: Invalid manifest {path}: expected a JSON object with a products list.")
+
+    base = {"repository": manifest["repository"]} if manifest.get("repository") else {}
+    entries = []
+    for entry in manifest.get("products", []):
+        if isinstance(entry, str):
+            entry = {"product": entry}
+        if not isinstance(entry, dict) or not entry.get("product"):
+            raise ValueError(f"Error: Manifest entry without a product: {entry}")
+        settings = dict(base)
+        settings.update(entry)
+        settings["components"] = _components(settings.get("components"))
+        entries.append(settings)
+
+    if not entries:
+        raise ValueError(f"Error: No products found in manifest {path}.")
+    return entries
+
+def product_entries(args):
+    """
+    Return the products of the command line: those of --manifest followed by every
+    --product, with the components given as -p PRODUCT:COMPONENTS, or with -c for a
+    single product. -s is not part of the entries, it applies to every product the
+    solution supports.
+
+    Returns:
+        list: A dict per product with its product, repository, components and, from a
+            manifest, solution.
+
+    Raises:
+        ValueError: If -c is given for several products, or the manifest is invalid.
+    """
+    products = args.get("product") or []
+    if isinstance(products, str):
+        products = [products]
+
+    entries = load_manifest(args["manifest"]) if args.get("manifest") else []
+    for product in products:
+        product, _, components = product.partition(COMPONENTS_SEPARATOR)
+        entries.append({"product": product.strip(), "components": _components(components)})
+
+    if args.get("components"):
+        if len(entries) != 1:
+            raise ValueError(
+                f"Error: -c is ambiguous with several products, give the components of each as "
+                f"-p PRODUCT{COMPONENTS_SEPARATOR}COMPONENTS or in a manifest."
+            )
+        entries[0]["components"] = entries[0]["components"] + _components(args["components"])
+
+    for entry in entries:
+        if not entry.get("repository"):
+            entry["repository"] = args.get("repository")
+    return entries
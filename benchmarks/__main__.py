@@ -0,0 +1,94 @@
+"""
+Run the benchmarks, save the results and compare them with a baseline.
+
+    python3 -m benchmarks                                   # run and save benchmarks/results/latest.json
+    python3 -m benchmarks --save-baseline                   # also make them the baseline
+    python3 -m benchmarks --baseline benchmarks/results/baseline.json --threshold 0.2
+
+The exit status is 1 if a benchmark regressed compared to the baseline. A regression is only
+reported for medians of at least harness.MIN_RUNS runs that stay slower when measured again.
+"""
+import argparse
+import importlib
+import os
+import sys
+
+from benchmarks import harness
+from benchmarks.fixtures import REPO_ROOT, Workspace
+
+BENCHMARK_MODULES = ("bench_versions", "bench_components", "bench_solutions", "bench_host_facts", "bench_repo_probe", "bench_repo_catalog", "bench_bundle", "bench_logging", "bench_startup")
+
+RESULTS_DIR = os.path.join(REPO_ROOT, "benchmarks", "results")
+DEFAULT_OUTPUT = os.path.join(RESULTS_DIR, "latest.json")
+DEFAULT_BASELINE = os.path.join(RESULTS_DIR, "baseline.json")
+
+def parse_arguments(args=None):
+    parser = argparse.ArgumentParser(description="Percona Installer benchmarks")
+    parser.add_argument("-k", "--filter", type=str, help="Only run benchmarks whose name contains this text")
+    parser.add_argument("--repeat", type=int, help="Measured runs per benchmark, overrides the defaults")
+    parser.add_argument("--output", type=str, default=DEFAULT_OUTPUT, help="File the results are written to")
+    parser.add_argument("--baseline", type=str, default=DEFAULT_BASELINE, help="Results to compare with")
+    parser.add_argument("--save-baseline", action="store_true", help="Also write the results to the baseline file")
+    parser.add_argument("--threshold", type=float, default=harness.DEFAULT_THRESHOLD,
+                        help="Relative slowdown of the median reported as a regression (default 0.25)")
+    parser.add_argument("--confirm", type=int, default=harness.CONFIRM_ROUNDS,
+                        help="Times a suspected regression is measured again before it is reported (default 2)")
+    parser.add_argument("--list", action="store_true", help="List the benchmarks and exit")
+    return parser.parse_args(args)
+
+def main(args=None):
+    args = parse_arguments(args)
+    if REPO_ROOT not in sys.path:
+        sys.path.insert(0, REPO_ROOT)
+
+    output = os.path.abspath(args.output)
+    baseline = os.path.abspath(args.baseline)
+
+    with Workspace():
+        for module in BENCHMARK_MODULES:
+            importlib.import_module(f"benchmarks.{module}")
+
+        benchmarks = [bench for bench in harness.BENCHMARKS if not args.filter or args.filter in bench.name]
+        if args.list:
+            for bench in benchmarks:
+                print(bench.name)
+            return 0
+
+        print(f"Running {len(benchmarks)} benchmarks (median per call)...")
+        results = harness.run_benchmarks(benchmarks, args.repeat)
+
+        os.makedirs(os.path.dirname(output), exist_ok=True)
+        harness.save_results(output, results)
+        print(f"Results written to {output}")
+
+        if args.save_baseline:
+            os.makedirs(os.path.dirname(baseline), exist_ok=True)
+            harness.save_results(baseline, results)
+            print(f"Baseline written to {baseline}")
+            return 0
+
+        if not os.path.exists(baseline):
+            print(f"No baseline at {baseline}, run with --save-baseline to create one.")
+            return 0
+
+        baseline_results = harness.load_results(baseline)
+        lines, regressions = harness.compare(results, baseline_results, args.threshold)
+        print(f"Compared with {baseline}:")
+        print("\n".join(lines))
+        if regressions and args.confirm > 0:
+            # Still in the workspace, the benchmarks reuse their fixtures
+            confirmed = harness.confirm_regressions(
+                benchmarks, regressions, baseline_results, args.repeat, args.threshold, args.confirm
+            )
+            noise = [name for name in regressions if name not in confirmed]
+            if noise:
+                print(f"Not slower when measured again: {', '.join(noise)}")
+            regressions = confirmed
+
+    if regressions:
+        print(f"{len(regressions)} benchmark(s) regressed by more than {args.threshold:.0%}: {', '.join(regressions)}")
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
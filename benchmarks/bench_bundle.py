@@ -0,0 +1,47 @@
+"""Offline bundle import: extracting and verifying a bundle, and the whole import plan."""
+import contextlib
+import io
+import os
+
+from benchmarks.fixtures import StubBackend, installed_host_facts, make_bundle
+from benchmarks.harness import add_benchmark
+
+PACKAGE_COUNT = 200
+PACKAGE_SIZE = 256 * 1024
+
+_state = {}
+
+def _bundle_path():
+    if "path" not in _state:
+        _state["path"] = os.path.abspath("bench.bundle")
+        make_bundle(_state["path"], PACKAGE_COUNT, PACKAGE_SIZE)
+    return _state["path"]
+
+def open_bundle():
+    import bundle
+    manifest, _ = bundle.open_bundle(_bundle_path(), os.path.abspath("bench-bundle"))
+    return len(manifest["files"])
+
+def import_plan():
+    # Every package manager command is answered by the stub, nothing leaves the host
+    import bundle
+    from host_facts import set_host_facts
+    from runner import CommandRunner, get_runner, set_runner
+
+    saved_runner = get_runner()
+    set_runner(CommandRunner(StubBackend()))
+    set_host_facts(installed_host_facts())
+    try:
+        # The steps report their progress with print
+        with contextlib.redirect_stdout(io.StringIO()):
+            plan = bundle.build_import_plan(_bundle_path())
+            plan.execute(lambda line: None)
+    finally:
+        set_runner(saved_runner)
+        set_host_facts(None)
+
+def _prepare():
+    _bundle_path()
+
+add_benchmark(f"bundle.open[{PACKAGE_COUNT}x{PACKAGE_SIZE // 1024}KiB]", open_bundle, setup=_prepare)
+add_benchmark(f"bundle.import_plan[{PACKAGE_COUNT}x{PACKAGE_SIZE // 1024}KiB]", import_plan, setup=_prepare)
@@ -0,0 +1,88 @@
+"""Loading the components of a distribution: the catalog itself, and its use in the CLI and the GUI."""
+import contextlib
+import io
+import os
+
+from benchmarks.fixtures import make_components
+from benchmarks.harness import add_benchmark
+
+DISTRIBUTION = "Percona Distribution for PostgreSQL"
+VERSION = "17.1"
+
+# Synthetic components added per distribution, 0 is the components.json of the repository
+CATALOG_SIZES = (0, 2000)
+
+_installed = {"extra": None}
+
+def use_components(extra):
+    """Write the components file unless it already has the given size."""
+    if _installed["extra"] != extra:
+        # The installer prefers components.json in the working directory, the benchmark workspace
+        make_components("components.json", extra_per_distribution=extra)
+        _installed["extra"] = extra
+
+def reset_catalog(disk=False):
+    import catalog
+    from shared import get_cache_dir
+
+    catalog._catalog = None
+    cache_path = os.path.join(get_cache_dir(), catalog.CACHE_FILE)
+    if disk and os.path.exists(cache_path):
+        os.unlink(cache_path)
+
+def catalog_names():
+    from catalog import get_catalog
+    return get_catalog().names(DISTRIBUTION, VERSION)
+
+def list_components():
+    from cli import list_components
+    with contextlib.redirect_stdout(io.StringIO()):
+        return list_components(DISTRIBUTION, VERSION)
+
+class _Widget:
+    def __init__(self, value=None):
+        self.values = []
+        self.value = value if value is not None else []
+
+def _form_stub():
+    """Stands in for the npyscreen form, only the loading of the components is measured."""
+    from gui import ComponentSelectionForm
+
+    class FormStub:
+        show_components = ComponentSelectionForm.show_components
+        _remember_selection = ComponentSelectionForm._remember_selection
+
+        def __init__(self):
+            self.components = _Widget()
+            self.search = _Widget("")
+
+        def display(self):
+            pass
+
+    return FormStub()
+
+def gui_setup():
+    from gui import ComponentSelectionForm
+    ComponentSelectionForm.setup(_form_stub(), DISTRIBUTION, VERSION)
+
+def _register(extra):
+    def compile_setup():
+        use_components(extra)
+        reset_catalog(disk=True)
+
+    def disk_setup():
+        use_components(extra)
+        catalog_names()
+        reset_catalog()
+
+    def warm_setup():
+        use_components(extra)
+        catalog_names()
+
+    add_benchmark(f"components.catalog.compile[+{extra}]", catalog_names, setup=compile_setup)
+    add_benchmark(f"components.catalog.disk_cache[+{extra}]", catalog_names, setup=disk_setup)
+    add_benchmark(f"components.cli.list_components[+{extra}]", list_components, setup=warm_setup, number=10)
+    add_benchmark(f"components.gui.setup[+{extra}]", gui_setup, setup=warm_setup, number=10)
+
+for _extra in CATALOG_SIZES:
+    _register(_extra)
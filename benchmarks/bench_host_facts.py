@@ -0,0 +1,19 @@
+"""Host platform probe: parsing os-release and looking up the tools, and loading the cached facts."""
+from benchmarks.harness import add_benchmark
+
+def probe():
+    from host_facts import probe_host
+    return probe_host().package_manager
+
+def cached():
+    # A new process: the in-memory facts are gone, the disk cache is used
+    from host_facts import get_host_facts, set_host_facts
+    set_host_facts(None)
+    return get_host_facts().package_manager
+
+def _warm():
+    from host_facts import get_host_facts
+    get_host_facts(refresh=True)
+
+add_benchmark("host_facts.probe", probe, number=10)
+add_benchmark("host_facts.disk_cache", cached, setup=_warm, number=10)
@@ -0,0 +1,46 @@
+"""Logging of chatty command output: the cost in the thread running the command."""
+import logging
+import logging.handlers
+import os
+
+from benchmarks.fixtures import StubBackend
+from benchmarks.harness import add_benchmark
+
+# Output lines of one command, an apt-get install of a few dozen packages prints thousands
+LINE_COUNT = 10000
+
+def _backend():
+    lines = [f"Unpacking percona-synthetic-{index} (17.{index % 10}-1.jammy) ..." for index in range(LINE_COUNT)]
+    return StubBackend({"apt-get install": (0, lines)})
+
+def _run_command():
+    from runner import CommandRunner
+    CommandRunner(_backend()).run(["sudo", "apt-get", "install", "-y", "percona-synthetic"])
+
+def _reset_root():
+    import logs
+    logs.stop_logging()
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+        handler.close()
+
+def queued_setup():
+    # Writing the records of the previous run is not measured
+    import logs
+    _reset_root()
+    logs.configure_logging("debug")
+
+def synchronous_setup():
+    # The records are formatted and written by the thread running the command
+    import logs
+    _reset_root()
+    handler = logging.handlers.RotatingFileHandler(
+        os.path.join(logs.get_log_dir(), "sync.log"), maxBytes=logs.LOG_MAX_BYTES, backupCount=logs.LOG_BACKUPS, encoding="utf-8"
+    )
+    handler.setFormatter(logs.JsonFormatter())
+    logging.getLogger().addHandler(handler)
+    logging.getLogger().setLevel(logging.DEBUG)
+
+add_benchmark(f"logging.command_output.queued[{LINE_COUNT}]", _run_command, setup=queued_setup)
+add_benchmark(f"logging.command_output.synchronous[{LINE_COUNT}]", _run_command, setup=synchronous_setup)
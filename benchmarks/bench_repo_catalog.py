@@ -0,0 +1,32 @@
+"""Repository catalog: streaming a Packages.gz from a local HTTP server into SQLite, and searching it."""
+import os
+
+from benchmarks.fixtures import installed_host_facts, make_repo_tree, serve_directory
+from benchmarks.harness import add_benchmark
+
+# Packages in the list, the largest Percona repositories ship a few thousand
+PACKAGE_COUNT = 20000
+REPOSITORY = "ppg-17.0"
+
+_state = {}
+
+def _sources():
+    from repo_catalog import product_sources
+
+    if "sources" not in _state:
+        root = os.path.abspath("catalog-repo")
+        make_repo_tree(root, [REPOSITORY], packages=PACKAGE_COUNT)
+        _state["server"], url = serve_directory(root)
+        _state["sources"] = product_sources(REPOSITORY, "release", installed_host_facts(), url)
+    return _state["sources"]
+
+def index():
+    from repo_catalog import get_repo_catalog
+    return get_repo_catalog().update(_sources(), refresh=True)
+
+def search():
+    from repo_catalog import get_repo_catalog
+    return len(get_repo_catalog().names([REPOSITORY], "synthetic-123"))
+
+add_benchmark(f"repo_catalog.index[{PACKAGE_COUNT}]", index)
+add_benchmark(f"repo_catalog.search[{PACKAGE_COUNT}]", search, setup=index, number=10)
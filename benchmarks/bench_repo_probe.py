@@ -0,0 +1,34 @@
+"""Pre-flight repository probes against a local HTTP stand-in for repo.percona.com."""
+import os
+
+from benchmarks.fixtures import installed_host_facts, make_repo_tree, serve_directory
+from benchmarks.harness import add_benchmark
+
+# Half of the probed repositories exist, like a batch of products with some typos
+REPOSITORY_COUNT = 20
+
+_state = {}
+
+def _targets():
+    if "url" not in _state:
+        root = os.path.abspath("probe-repo")
+        make_repo_tree(root, [f"ppg-{index}.0" for index in range(0, REPOSITORY_COUNT, 2)])
+        _state["server"], _state["url"] = serve_directory(root)
+    return [(f"ppg-{index}.0", "release") for index in range(REPOSITORY_COUNT)]
+
+def _probe(refresh):
+    from host_facts import set_host_facts
+    from repo_probe import probe_repositories
+
+    set_host_facts(installed_host_facts())
+    results = probe_repositories(_targets(), base_url=_state.get("url"), refresh=refresh)
+    return sum(1 for result in results if result.available)
+
+def cold():
+    return _probe(refresh=True)
+
+def cached():
+    return _probe(refresh=False)
+
+add_benchmark(f"repo_probe.network[{REPOSITORY_COUNT}]", cold, number=5)
+add_benchmark(f"repo_probe.cache[{REPOSITORY_COUNT}]", cached, setup=cold, number=10)
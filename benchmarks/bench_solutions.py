@@ -0,0 +1,42 @@
+"""Solution discovery, without and with the discovery cache."""
+import os
+
+from benchmarks.fixtures import make_solution_dir
+from benchmarks.harness import add_benchmark
+
+SOLUTION_COUNT = 50
+
+_state = {}
+
+def _solution_dir():
+    if "directory" not in _state:
+        _state["directory"] = make_solution_dir(os.path.abspath("bench_solutions"), SOLUTION_COUNT)
+    return _state["directory"]
+
+def _cache_path():
+    return os.path.abspath("bench_solutions.json")
+
+def _cold():
+    _solution_dir()
+    if os.path.exists(_cache_path()):
+        os.unlink(_cache_path())
+
+def _warm():
+    discover()
+
+def discover():
+    from solution_registry import SolutionRegistry
+    return SolutionRegistry(_solution_dir(), _cache_path()).names()
+
+def _reset_registry():
+    import solution_registry
+    solution_registry._registry = None
+
+def load_solutions_functions():
+    from shared import load_solutions_functions
+    solutions = load_solutions_functions()
+    return "pg_tde_demo" in solutions
+
+add_benchmark(f"solutions.discover.cold[{SOLUTION_COUNT}]", discover, setup=_cold)
+add_benchmark(f"solutions.discover.cached[{SOLUTION_COUNT}]", discover, setup=_warm)
+add_benchmark("solutions.load_solutions_functions", load_solutions_functions, setup=_reset_registry, number=10)
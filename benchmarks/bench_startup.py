@@ -0,0 +1,23 @@
+"""End-to-end startup of the installer in CLI mode, in a fresh interpreter."""
+import os
+import subprocess
+import sys
+
+from benchmarks.harness import add_benchmark
+
+CLI_STARTUP = os.path.join(os.path.dirname(os.path.abspath(__file__)), "cli_startup.py")
+
+CLI_ARGS = ["-r", "release", "-p", "ppg-17.0", "-c", "percona-postgresql-17", "--offline"]
+
+def _run(argv):
+    subprocess.run(argv, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=True)
+
+def python_startup():
+    _run([sys.executable, "-c", "pass"])
+
+def cli_startup():
+    _run([sys.executable, CLI_STARTUP, *CLI_ARGS])
+
+# The bare interpreter tells how much of the startup is the installer's own
+add_benchmark("startup.python", python_startup)
+add_benchmark("startup.main.cli_mode", cli_startup)
@@ -0,0 +1,82 @@
+"""Version discovery: parsing the repository index page and looking up versions."""
+from benchmarks.fixtures import install_index, make_index_html, reset_version_index
+from benchmarks.harness import add_benchmark
+
+# Number of directories on the synthetic index pages, repo.percona.com has about a thousand
+INDEX_SIZES = (1000, 10000, 50000)
+
+_pages = {}
+_installed = {"size": None}
+
+def use_index(size):
+    """Install the index page of the given size unless it is already the cached one."""
+    if _installed["size"] != size:
+        if size not in _pages:
+            _pages[size] = make_index_html(size, seed=size)
+        install_index(_pages[size])
+        _installed["size"] = size
+
+def fetch_ppg():
+    from fetch_versions import fetch_all_versions
+    return fetch_all_versions("ppg-")
+
+def _register(size):
+    def cold():
+        use_index(size)
+        reset_version_index(disk=True)
+
+    def from_disk():
+        use_index(size)
+        reset_version_index()
+        # Make sure the persisted version index exists
+        from fetch_versions import get_version_index
+        get_version_index()
+        reset_version_index()
+
+    def in_memory():
+        use_index(size)
+        fetch_ppg()
+
+    add_benchmark(f"versions.fetch_all_versions.parse[{size}]", fetch_ppg, setup=cold)
+    add_benchmark(f"versions.fetch_all_versions.disk_cache[{size}]", fetch_ppg, setup=from_disk)
+    add_benchmark(f"versions.fetch_all_versions.memory[{size}]", fetch_ppg, setup=in_memory, number=100)
+
+for _size in INDEX_SIZES:
+    _register(_size)
+
+def _directory_names():
+    import re
+    html = make_index_html(1000, seed=1)
+    return re.findall(r'<a href="([^"/]+)/">', html)
+
+_names = []
+
+def _extract_setup():
+    if not _names:
+        _names.extend(_directory_names())
+
+def extract_all():
+    from fetch_versions import extract_version
+    for name in _names:
+        extract_version(name, "ppg-")
+
+add_benchmark("versions.extract_version[1000 names]", extract_all, setup=_extract_setup, number=10)
+
+# Specs resolved against the version list of a distribution, like --product does
+SPECS = ("latest", "17", "16.2", "~8.0.36", ">=16,<17", ">=10,!=29,<30")
+
+def _register_resolve(size):
+    def setup():
+        use_index(size)
+        from fetch_versions import get_version_index
+        get_version_index().version_list("ppg-")
+
+    def resolve_all():
+        from versions import resolve_version
+        for spec in SPECS:
+            resolve_version("ppg-", spec)
+
+    add_benchmark(f"versions.resolve[{size}]", resolve_all, setup=setup, number=100)
+
+for _size in INDEX_SIZES:
+    _register_resolve(_size)
@@ -0,0 +1,19 @@
+"""
+Runs main.main() with a stubbed command runner, so the CLI goes through a whole
+install without executing anything. Used by the startup benchmark.
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.fixtures import StubBackend, installed_host_facts  # noqa: E402
+from host_facts import set_host_facts  # noqa: E402
+from runner import CommandRunner, set_runner  # noqa: E402
+
+if __name__ == "__main__":
+    set_runner(CommandRunner(StubBackend()))
+    set_host_facts(installed_host_facts())
+    import main
+    sys.argv = ["percona_installer", *sys.argv[1:]]
+    main.main()
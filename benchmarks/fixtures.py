@@ -0,0 +1,323 @@
+"""
+Synthetic data for the benchmarks. Everything is generated deterministically into
+a temporary workspace, so the benchmarks run offline and never touch the real caches.
+"""
+import json
+import os
+import random
+import shutil
+import tempfile
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Directories of repo.percona.com that are not distributions, mixed into the index pages
+OTHER_PREFIXES = ["apt", "yum", "percona", "pmm2-client", "tools", "pbm", "psmdb-", "pxb-", "prel", "proxysql"]
+
+class Workspace:
+    """
+    A temporary directory used as the installer cache, log directory and working
+    directory. PERCONA_INSTALLER_CACHE_DIR, PERCONA_INSTALLER_LOG_DIR and
+    PERCONA_INSTALLER_LOCK_FILE point into it while it is active.
+    """
+
+    ENVIRONMENT = ("PERCONA_INSTALLER_CACHE_DIR", "PERCONA_INSTALLER_LOG_DIR", "PERCONA_INSTALLER_LOCK_FILE")
+
+    def __init__(self):
+        self.path = tempfile.mkdtemp(prefix="percona-installer-bench-")
+        self.cache_dir = os.path.join(self.path, "cache")
+        self.log_dir = os.path.join(self.path, "logs")
+        os.makedirs(self.cache_dir)
+        self._saved_env = None
+        self._saved_cwd = None
+
+    def __enter__(self):
+        self._saved_env = {name: os.environ.get(name) for name in self.ENVIRONMENT}
+        self._saved_cwd = os.getcwd()
+        os.environ["PERCONA_INSTALLER_CACHE_DIR"] = self.cache_dir
+        os.environ["PERCONA_INSTALLER_LOG_DIR"] = self.log_dir
+        os.environ["PERCONA_INSTALLER_LOCK_FILE"] = os.path.join(self.path, "installer.lock")
+        os.chdir(self.path)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        os.chdir(self._saved_cwd)
+        for name, value in self._saved_env.items():
+            if value is None:
+                os.environ.pop(name, None)
+            else:
+                os.environ[name] = value
+        shutil.rmtree(self.path, ignore_errors=True)
+
+def make_index_html(directories, seed=0):
+    """
+    Return an Apache style directory listing like the one of repo.percona.com with
+    about `directories` entries, a quarter of them distribution versions.
+    """
+    from shared import SUPPORTED_DISTROS
+
+    rng = random.Random(seed)
+    names = set()
+    prefixes = list(SUPPORTED_DISTROS.values())
+    while len(names) < directories:
+        if rng.random() < 0.25:
+            prefix = rng.choice(prefixes)
+            version = ".".join(str(rng.randint(0, 30)) for _ in range(rng.randint(1, 3)))
+            names.add(f"{prefix}{version}")
+        else:
+            names.add(f"{rng.choice(OTHER_PREFIXES)}{rng.randint(0, 10 ** 6)}")
+
+    rows = [
+        f'<tr><td valign="top"><img src="/icons/folder.gif" alt="[DIR]"></td>'
+        f'<td><a href="{name}/">{name}/</a></td><td align="right">2024-11-21 10:{index % 60:02d}  </td>'
+        f'<td align="right">  - </td><td>&nbsp;</td></tr>'
+        for index, name in enumerate(sorted(names))
+    ]
+    return (
+        "<!DOCTYPE HTML PUBLIC \"-//W3C//DTD HTML 3.2 Final//EN\">\n<html>\n<head><title>Index of /</title></head>\n"
+        "<body>\n<h1>Index of /</h1>\n<table>\n"
+        "<tr><th>Name</th><th>Last modified</th><th>Size</th><th>Description</th></tr>\n"
+        + "\n".join(rows)
+        + "\n</table>\n</body></html>\n"
+    )
+
+def install_index(html):
+    """
+    Make html the cached repository index, fresh and used offline, and drop the
+    version index built from a previous page.
+    """
+    import fetch_versions
+
+    index_path = fetch_versions.get_index_path()
+    with open(index_path, "w", encoding="utf-8") as file:
+        file.write(html)
+    with open(os.path.join(os.path.dirname(index_path), fetch_versions.INDEX_META_FILE), "w", encoding="utf-8") as file:
+        json.dump({"fetched_at": time.time()}, file)
+    fetch_versions.configure_index_cache(offline=True)
+    reset_version_index(disk=True)
+
+def reset_version_index(disk=False):
+    """Forget the in-memory version index, and its persisted copy if disk is True."""
+    import fetch_versions
+
+    fetch_versions._version_index = None
+    if disk:
+        versions_path = os.path.join(os.path.dirname(fetch_versions.get_index_path()), fetch_versions.VERSIONS_FILE)
+        if os.path.exists(versions_path):
+            os.unlink(versions_path)
+
+def make_components(path, extra_per_distribution=0, seed=0):
+    """
+    Write the components.json of the repository to path, with extra synthetic
+    components per distribution to simulate a larger catalog.
+    """
+    with open(os.path.join(REPO_ROOT, "components.json"), "r", encoding="utf-8") as file:
+        components = json.load(file)
+
+    rng = random.Random(seed)
+    for distribution, entry in components.items():
+        entry["components"] = list(entry.get("components", [])) + [
+            f"percona-synthetic-{rng.randint(0, 10 ** 6)}-{{major}}" if index % 2 else f"percona-synthetic-{index}"
+            for index in range(extra_per_distribution)
+        ]
+    with open(path, "w", encoding="utf-8") as file:
+        json.dump(components, file, indent=2)
+    return components
+
+def make_solution_dir(path, count):
+    """Create a solution directory with `count` solutions, half of them listed in a manifest."""
+    os.makedirs(path, exist_ok=True)
+    manifest = {}
+    for index in range(count):
+        name = f"bench_solution_{index}"
+        with open(os.path.join(path, f"{name}.py"), "w", encoding="utf-8") as file:
+            file.write(
+                f'"""Synthetic solution {index} for the benchmarks."""\n'
+                "import json\n\n"
+                f"def {name}(pkg_manager, output_callback=print):\n"
+                f'    """Run synthetic solution {index}."""\n'
+                f'    output_callback("{name} on " + pkg_manager)\n'
+            )
+        if index % 2 == 0:
+            manifest[name] = {"description": f"Synthetic solution {index}", "entry_point": f"{name}:{name}"}
+    with open(os.path.join(path, "manifest.json"), "w", encoding="utf-8") as file:
+        json.dump(manifest, file, indent=2)
+    return path
+
+class StubBackend:
+    """
+    Command runner backend that answers commands from a table instead of running them.
+    Unknown commands succeed without output.
+
+    Args:
+        responses (dict): Maps a command label (see runner.command_name) to a
+            (returncode, stdout lines) tuple.
+    """
+
+    def __init__(self, responses=None):
+        self.responses = responses or {}
+        self.calls = []
+
+    def execute(self, result, emit, **kwargs):
+        self.calls.append(result.argv)
+        returncode, lines = self.responses.get(result.name, (0, []))
+        for line in lines:
+            emit("stdout", line)
+        result.returncode = returncode
+        result.cpu_time = 0.0
+
+def installed_host_facts():
+    """Facts of an Ubuntu 22.04 host where percona-release is already installed."""
+    from host_facts import HostFacts
+    return HostFacts(
+        "Linux", distro_id="ubuntu", id_like=["debian"], name="Ubuntu", version_id="22.04", codename="jammy",
+        package_manager="apt-get", arch="x86_64",
+        tools={"percona-release": "/usr/bin/percona-release", "sudo": "/usr/bin/sudo", "apt-get": "/usr/bin/apt-get"},
+    )
+
+def make_bundle(path, package_count, package_size, seed=0):
+    """
+    Write an offline bundle of Percona Distribution for PostgreSQL 17.0 with
+    `package_count` fixture .deb files of `package_size` random bytes and their
+    apt index, built without dpkg or network access.
+    """
+    import bundle
+    from shared import SUPPORTED_DISTROS
+
+    rng = random.Random(seed)
+    staging_dir = tempfile.mkdtemp(prefix="bundle-fixture-")
+    try:
+        packages_dir = os.path.join(staging_dir, bundle.PACKAGES_DIR)
+        os.makedirs(packages_dir)
+        names = [f"percona-fixture-{index}" for index in range(package_count)]
+        stanzas = []
+        for name in ["percona-release"] + names:
+            filename = f"{name}_1.0-1_all.deb"
+            with open(os.path.join(packages_dir, filename), "wb") as file:
+                file.write(bytes(rng.getrandbits(8) for _ in range(64)) * (package_size // 64))
+            stanzas.append(f"Package: {name}\nVersion: 1.0-1\nArchitecture: all\nFilename: ./{filename}\n")
+        with open(os.path.join(packages_dir, "Packages"), "w", encoding="utf-8") as file:
+            file.write("\n".join(stanzas))
+        with open(os.path.join(staging_dir, bundle.INDEX_FILE), "w", encoding="utf-8") as file:
+            file.write(make_index_html(200, seed))
+
+        distribution = "Percona Distribution for PostgreSQL"
+        return bundle.write_bundle(path, staging_dir, {
+            "created_at": time.time(),
+            "product": f"{SUPPORTED_DISTROS[distribution]}17.0",
+            "distribution": distribution,
+            "version": "17.0",
+            "repository": "release",
+            "components": names,
+            "packages": names,
+            "package_format": "deb",
+            "platform": bundle._host_platform(),
+            "bootstrap": os.path.join(bundle.PACKAGES_DIR, "percona-release_1.0-1_all.deb"),
+        })
+    finally:
+        shutil.rmtree(staging_dir, ignore_errors=True)
+
+def make_packages_stanzas(count, seed=0):
+    """Return the stanzas of an apt Packages file with `count` synthetic packages."""
+    rng = random.Random(seed)
+    return "".join(
+        f"Package: percona-synthetic-{index}\n"
+        f"Version: {rng.randint(1, 17)}.{rng.randint(0, 9)}-1.jammy\n"
+        "Architecture: amd64\n"
+        "Maintainer: Percona Development Team <info@percona.com>\n"
+        f"Installed-Size: {rng.randint(10, 100000)}\n"
+        f"Depends: libc6 (>= 2.34), percona-synthetic-{rng.randint(0, count)}\n"
+        f"Filename: pool/main/p/percona-synthetic-{index}.deb\n"
+        f"Size: {rng.randint(1000, 10 ** 7)}\n"
+        f"SHA256: {rng.getrandbits(256):064x}\n"
+        f"Description: Synthetic package {index}\n"
+        " A longer description that spans\n"
+        " several lines.\n\n"
+        for index in range(count)
+    )
+
+def make_repo_tree(path, repositories, codename="jammy", components=("main", "testing"), architectures=("amd64",), packages=0):
+    """
+    Write the apt metadata of repositories (e.g. "ppg-17.0") the way repo.percona.com
+    lays them out, a Release file per codename and, if packages is not 0, a Packages.gz
+    of that many packages per component and architecture, for serve_directory.
+    """
+    import gzip
+    import hashlib
+
+    for repository in repositories:
+        dists_dir = os.path.join(path, repository, "apt", "dists", codename)
+        os.makedirs(dists_dir, exist_ok=True)
+        checksums = []
+        if packages:
+            content = gzip.compress(make_packages_stanzas(packages, seed=len(repository)).encode("utf-8"))
+            for component in components:
+                for architecture in architectures:
+                    list_path = f"{component}/binary-{architecture}/Packages.gz"
+                    os.makedirs(os.path.dirname(os.path.join(dists_dir, list_path)), exist_ok=True)
+                    with open(os.path.join(dists_dir, list_path), "wb") as file:
+                        file.write(content)
+                    checksums.append(f" {hashlib.sha256(content).hexdigest()} {len(content)} {list_path}\n")
+        with open(os.path.join(dists_dir, "Release"), "w", encoding="utf-8") as file:
+            file.write(
+                f"Origin: Percona Development Team\nSuite: {codename}\nCodename: {codename}\n"
+                f"Architectures: {' '.join(architectures)}\nComponents: {' '.join(components)}\n"
+                + ("SHA256:\n" + "".join(checksums) if checksums else "")
+            )
+    return path
+
+def make_yum_repo(path, repository, packages, repo_type="release", major="9", arch="x86_64"):
+    """
+    Write the repodata of a yum repository of repo.percona.com with a primary.xml.gz of
+    `packages` synthetic packages, for serve_directory.
+    """
+    import gzip
+    import hashlib
+
+    rng = random.Random(packages)
+    rows = "".join(
+        f'<package type="rpm"><name>percona-synthetic-{index}</name><arch>{arch}</arch>'
+        f'<version epoch="0" ver="{rng.randint(1, 17)}.{rng.randint(0, 9)}" rel="1.el{major}"/>'
+        f"<summary>Synthetic package {index}</summary><description>A synthetic package.</description>"
+        f'<size package="{rng.randint(1000, 10 ** 7)}" installed="{rng.randint(1000, 10 ** 8)}" archive="0"/>'
+        f'<format><rpm:requires><rpm:entry name="glibc"/><rpm:entry name="/bin/sh"/>'
+        f'<rpm:entry name="rpmlib(CompressedFileNames)"/></rpm:requires></format></package>\n'
+        for index in range(packages)
+    )
+    primary = gzip.compress((
+        '<?xml version="1.0" encoding="UTF-8"?>\n'
+        '<metadata xmlns="http://linux.duke.edu/metadata/common" xmlns:rpm="http://linux.duke.edu/metadata/rpm" '
+        f'packages="{packages}">\n{rows}</metadata>\n'
+    ).encode("utf-8"))
+    checksum = hashlib.sha256(primary).hexdigest()
+    repodata_dir = os.path.join(path, repository, "yum", repo_type, major, "RPMS", arch, "repodata")
+    os.makedirs(repodata_dir, exist_ok=True)
+    with open(os.path.join(repodata_dir, f"{checksum}-primary.xml.gz"), "wb") as file:
+        file.write(primary)
+    with open(os.path.join(repodata_dir, "repomd.xml"), "w", encoding="utf-8") as file:
+        file.write(
+            '<?xml version="1.0" encoding="UTF-8"?>\n<repomd xmlns="http://linux.duke.edu/metadata/repo">\n'
+            f'<data type="primary"><checksum type="sha256">{checksum}</checksum>'
+            f'<location href="repodata/{checksum}-primary.xml.gz"/></data>\n</repomd>\n'
+        )
+    return path
+
+def serve_directory(path):
+    """
+    Serve a directory over HTTP/1.1 with keep-alive on a free local port, as a stand-in
+    for repo.percona.com. Returns the server, stop it with shutdown(), and its URL.
+    """
+    import functools
+    import threading
+    from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+
+    class QuietHandler(SimpleHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), functools.partial(QuietHandler, directory=path))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
@@ -0,0 +1,158 @@
+import gc
+import json
+import platform
+import statistics
+import sys
+import time
+
+# Registered benchmarks, in definition order
+BENCHMARKS = []
+
+# A benchmark is a regression when its median is this much slower than the baseline
+DEFAULT_THRESHOLD = 0.25
+
+# Differences below this many seconds are noise, whatever the ratio
+MIN_REGRESSION = 0.0005
+
+# Measured runs a median needs on both sides before it can be reported as a regression
+MIN_RUNS = 3
+
+# Suspected regressions are measured again this many times and only reported if every round regresses
+CONFIRM_ROUNDS = 2
+
+class Benchmark:
+    """
+    A timed operation.
+
+    Attributes:
+        name (str): Unique name, results are compared with the baseline by name.
+        func (callable): The measured operation.
+        setup (callable): Called before every run, not measured.
+        repeat (int): Number of measured runs.
+        number (int): Calls of func per run, the run time is divided by it.
+    """
+
+    def __init__(self, name, func, setup=None, repeat=5, number=1):
+        self.name = name
+        self.func = func
+        self.setup = setup
+        self.repeat = repeat
+        self.number = number
+
+    def run(self, repeat=None):
+        """Measure the benchmark and return its statistics in seconds per call."""
+        times = []
+        for _ in range(repeat or self.repeat):
+            if self.setup:
+                self.setup()
+            gc.collect()
+            gc_enabled = gc.isenabled()
+            gc.disable()
+            try:
+                start = time.perf_counter()
+                for _ in range(self.number):
+                    self.func()
+                times.append((time.perf_counter() - start) / self.number)
+            finally:
+                if gc_enabled:
+                    gc.enable()
+        return {
+            "min": min(times),
+            "median": statistics.median(times),
+            "mean": statistics.mean(times),
+            "max": max(times),
+            "runs": len(times),
+        }
+
+def benchmark(name, setup=None, repeat=5, number=1):
+    """Decorator registering a function as a benchmark."""
+    def decorator(func):
+        BENCHMARKS.append(Benchmark(name, func, setup, repeat, number))
+        return func
+    return decorator
+
+def add_benchmark(name, func, setup=None, repeat=5, number=1):
+    BENCHMARKS.append(Benchmark(name, func, setup, repeat, number))
+
+def run_benchmarks(benchmarks, repeat=None, output_callback=print):
+    """Run the benchmarks and return their statistics keyed by name."""
+    results = {}
+    for bench in benchmarks:
+        try:
+            results[bench.name] = bench.run(repeat)
+        except Exception as e:
+            output_callback(f"  {bench.name:<48} FAILED: {e}")
+            results[bench.name] = {"error": str(e)}
+            continue
+        stats = results[bench.name]
+        output_callback(f"  {bench.name:<48} {format_time(stats['median'])} (min {format_time(stats['min'])})")
+    return results
+
+def format_time(seconds):
+    if seconds < 1e-3:
+        return f"{seconds * 1e6:8.1f} us"
+    if seconds < 1:
+        return f"{seconds * 1e3:8.2f} ms"
+    return f"{seconds:8.3f} s "
+
+def environment():
+    return {
+        "python": sys.version.split()[0],
+        "implementation": platform.python_implementation(),
+        "machine": platform.machine(),
+        "platform": platform.platform(),
+    }
+
+def save_results(path, results):
+    with open(path, "w", encoding="utf-8") as file:
+        json.dump({"created_at": time.time(), "environment": environment(), "results": results}, file, indent=2)
+
+def load_results(path):
+    with open(path, "r", encoding="utf-8") as file:
+        return json.load(file)["results"]
+
+def compare(results, baseline, threshold=DEFAULT_THRESHOLD):
+    """
+    Compare the medians of the results with the baseline. Medians of fewer than MIN_RUNS
+    runs are shown but never reported as a regression.
+
+    Returns:
+        tuple: (report lines, names of the regressed benchmarks)
+    """
+    lines, regressions = [], []
+    for name, stats in results.items():
+        base = baseline.get(name)
+        if "error" in stats or not base or "error" in base:
+            lines.append(f"  {name:<48} {'no baseline' if not base else 'not comparable'}")
+            continue
+        if min(stats["runs"], base.get("runs", 0)) < MIN_RUNS:
+            lines.append(
+                f"  {name:<48} {format_time(base['median'])} -> {format_time(stats['median'])}  "
+                f"too few runs to compare, need {MIN_RUNS}"
+            )
+            continue
+
+        ratio = stats["median"] / base["median"] if base["median"] else float("inf")
+        regressed = ratio > 1 + threshold and stats["median"] - base["median"] > MIN_REGRESSION
+        marker = "REGRESSION" if regressed else ("faster" if ratio < 1 - threshold else "")
+        lines.append(
+            f"  {name:<48} {format_time(base['median'])} -> {format_time(stats['median'])}  {ratio:5.2f}x  {marker}".rstrip()
+        )
+        if regressed:
+            regressions.append(name)
+    return lines, regressions
+
+def confirm_regressions(benchmarks, names, baseline, repeat=None, threshold=DEFAULT_THRESHOLD,
+                        rounds=CONFIRM_ROUNDS, output_callback=print):
+    """
+    Measure the benchmarks suspected of a regression again and return the names of those
+    that regressed in every round, so that one noisy measurement is not reported.
+    """
+    by_name = {bench.name: bench for bench in benchmarks}
+    for index in range(rounds):
+        if not names:
+            break
+        output_callback(f"Measuring {len(names)} suspected regression(s) again ({index + 1}/{rounds})...")
+        results = run_benchmarks([by_name[name] for name in names], repeat, output_callback)
+        _, names = compare(results, baseline, threshold)
+    return names
@@ -0,0 +1,425 @@
+import hashlib
+import json
+import logging
+import os
+import shlex
+import shutil
+import tarfile
+import tempfile
+import time
+
+from catalog import PACKAGE_FORMATS
+from package_manager import installer_lock, run_package_manager
+from runner import run_command
+from shared import get_cache_dir
+from tracing import span
+
+logger = logging.getLogger(__name__)
+
+# Bump when the bundle layout changes, older installers then refuse the bundle
+BUNDLE_FORMAT = 1
+MANIFEST_FILE = "manifest.json"
+PACKAGES_DIR = "packages"
+INDEX_FILE = "index.html"
+BUNDLE_REPO = "percona-bundle"
+CHUNK_SIZE = 256 * 1024
+
+class BundleError(Exception):
+    """Raised when a bundle cannot be created, or is invalid or corrupted."""
+
+def _host_platform():
+    """Return the distribution id, version, codename and architecture of the host."""
+    from host_facts import get_host_facts
+    facts = get_host_facts()
+    return {"id": facts.distro_id, "version_id": facts.version_id, "codename": facts.codename, "arch": facts.arch}
+
+def _file_entry(path, md5=False):
+    """Return the size and SHA-256 (and MD5 for apt indexes) of a file, read in chunks."""
+    digests = {"sha256": hashlib.sha256()}
+    if md5:
+        digests["md5"] = hashlib.md5()
+    with open(path, "rb") as file:
+        for chunk in iter(lambda: file.read(CHUNK_SIZE), b""):
+            for digest in digests.values():
+                digest.update(chunk)
+    entry = {name: digest.hexdigest() for name, digest in digests.items()}
+    entry["size"] = os.path.getsize(path)
+    return entry
+
+# Export
+
+def package_closure(packages):
+    """
+    Return the packages and all their dependencies, recursively, as apt resolves them
+    on this host. Installed dependencies are included, the target host may lack them.
+    """
+    result = run_command([
+        "apt-cache", "depends", "--recurse", "--no-recommends", "--no-suggests",
+        "--no-conflicts", "--no-breaks", "--no-replaces", "--no-enhances", *packages
+    ])
+    # Dependencies are indented, virtual packages are shown as <name>
+    names = [line for line in result.stdout_lines if line and not line[0].isspace() and not line.startswith("<")]
+    return list(dict.fromkeys(names))
+
+def download_packages(packages, package_manager, directory, output_callback=print):
+    """Download the packages and their dependencies into directory."""
+    if package_manager == "apt-get":
+        names = package_closure(packages)
+        output_callback(f"Downloading {len(names)} packages with their dependencies...")
+        run_package_manager(["apt-get", "download", *names], output_callback, cwd=directory)
+    elif package_manager == "dnf":
+        run_package_manager(["dnf", "download", "--resolve", "--alldeps", "--destdir", directory, *packages], output_callback)
+    elif package_manager == "yum":
+        run_package_manager(["yumdownloader", "--resolve", "--destdir", directory, *packages], output_callback)
+    else:
+        raise BundleError(f"Unsupported package manager: {package_manager}")
+
+def build_deb_index(directory):
+    """Write the Packages and Release files of a flat apt repository of the .deb files in directory."""
+    stanzas = []
+    for filename in sorted(os.listdir(directory)):
+        if not filename.endswith(".deb"):
+            continue
+        path = os.path.join(directory, filename)
+        control = run_command(["dpkg-deb", "--field", path]).stdout.rstrip("\n")
+        entry = _file_entry(path, md5=True)
+        stanzas.append(
+            f"{control}\nFilename: ./{filename}\nSize: {entry['size']}\nMD5sum: {entry['md5']}\nSHA256: {entry['sha256']}\n"
+        )
+
+    packages_path = os.path.join(directory, "Packages")
+    with open(packages_path, "w", encoding="utf-8") as file:
+        file.write("\n".join(stanzas))
+
+    entry = _file_entry(packages_path)
+    with open(os.path.join(directory, "Release"), "w", encoding="utf-8") as file:
+        file.write(
+            f"Origin: {BUNDLE_REPO}\nLabel: {BUNDLE_REPO}\n"
+            f"Date: {time.strftime('%a, %d %b %Y %H:%M:%S UTC', time.gmtime())}\n"
+            f"SHA256:\n {entry['sha256']} {entry['size']} Packages\n"
+        )
+
+def build_rpm_index(directory, output_callback=print):
+    """Write the repodata of a yum repository of the .rpm files in directory."""
+    tool = shutil.which("createrepo_c") or shutil.which("createrepo")
+    if not tool:
+        raise BundleError("createrepo_c is required to create rpm bundles, install it first.")
+    run_command([tool, directory], output_callback)
+
+def write_bundle(output, staging_dir, manifest):
+    """
+    Archive staging_dir as a bundle. The manifest gets the size and SHA-256 of every
+    file and is written first, so the bundle can be verified while it is extracted.
+    """
+    files = {}
+    for root, _, filenames in os.walk(staging_dir):
+        for filename in sorted(filenames):
+            path = os.path.join(root, filename)
+            files[os.path.relpath(path, staging_dir)] = _file_entry(path)
+    manifest = dict(manifest, format=BUNDLE_FORMAT, files=files)
+
+    manifest_path = os.path.join(staging_dir, MANIFEST_FILE)
+    with open(manifest_path, "w", encoding="utf-8") as file:
+        json.dump(manifest, file, indent=2, sort_keys=True)
+
+    tmp_path = output + ".tmp"
+    with tarfile.open(tmp_path, "w") as archive:
+        archive.add(manifest_path, MANIFEST_FILE)
+        for name in sorted(files):
+            archive.add(os.path.join(staging_dir, name), name)
+    os.replace(tmp_path, output)
+    return manifest
+
+def export_bundle(output, distribution, version, repo_type, components, output_callback=print):
+    """
+    Create a bundle of a product for hosts without network access: the percona-release
+    package, the packages of the components with all their dependencies as a local
+    repository, and the repository index for version lookups.
+
+    The bundle is built with the package manager of this host, it installs on hosts
+    with the same distribution release and architecture.
+
+    Returns:
+        dict: The manifest of the bundle.
+    """
+    from catalog import CatalogError, get_catalog
+    from fetch_versions import ensure_repo_index
+    from repo_metadata import get_tracker
+    from shared import (
+        SUPPORTED_DISTROS, build_repo_command, detect_os, download_percona_release,
+        install_percona_release, percona_release_installed
+    )
+
+    pkg_manager = detect_os()
+    if pkg_manager not in PACKAGE_FORMATS:
+        raise BundleError(f"Unsupported package manager: {pkg_manager}")
+
+    with span("bundle:export", product=f"{SUPPORTED_DISTROS[distribution]}{version}"):
+        bootstrap_path = download_percona_release(pkg_manager, output_callback)
+        if not percona_release_installed():
+            install_percona_release(pkg_manager, bootstrap_path, output_callback)
+
+        repo_command = build_repo_command(distribution, version, repo_type)
+        run_package_manager(shlex.split(repo_command), output_callback)
+        get_tracker(pkg_manager).refresh(output_callback)
+
+        try:
+            packages, _ = get_catalog().resolve(distribution, version, components, pkg_manager)
+        except CatalogError as e:
+            logger.warning(f"Using the component names as package names: {str(e)}")
+            packages = list(components)
+
+        staging_dir = tempfile.mkdtemp(prefix="bundle-", dir=get_cache_dir())
+        try:
+            packages_dir = os.path.join(staging_dir, PACKAGES_DIR)
+            os.makedirs(packages_dir)
+            bootstrap = os.path.join(PACKAGES_DIR, os.path.basename(bootstrap_path))
+            shutil.copyfile(bootstrap_path, os.path.join(staging_dir, bootstrap))
+
+            with span("bundle:download", packages=len(packages)):
+                download_packages(packages, pkg_manager, packages_dir, output_callback)
+            with span("bundle:index"):
+                if PACKAGE_FORMATS[pkg_manager] == "deb":
+                    build_deb_index(packages_dir)
+                else:
+                    build_rpm_index(packages_dir, output_callback)
+            shutil.copyfile(ensure_repo_index(), os.path.join(staging_dir, INDEX_FILE))
+
+            manifest = write_bundle(output, staging_dir, {
+                "created_at": time.time(),
+                "product": f"{SUPPORTED_DISTROS[distribution]}{version}",
+                "distribution": distribution,
+                "version": version,
+                "repository": repo_type,
+                "components": list(components),
+                "packages": packages,
+                "package_format": PACKAGE_FORMATS[pkg_manager],
+                "platform": _host_platform(),
+                "bootstrap": bootstrap,
+            })
+        finally:
+            shutil.rmtree(staging_dir, ignore_errors=True)
+
+    output_callback(f"Bundle written to {output}: {len(manifest['files'])} files, {sum(entry['size'] for entry in manifest['files'].values()) // (1024 * 1024)} MiB.")
+    return manifest
+
+# Import
+
+def _safe_member(member):
+    name = os.path.normpath(member.name)
+    if os.path.isabs(name) or name.startswith(".."):
+        raise BundleError(f"Bundle contains a file outside of the bundle: {member.name}")
+    if not (member.isfile() or member.isdir()):
+        raise BundleError(f"Bundle contains an unsupported entry: {member.name}")
+    return name
+
+def open_bundle(path, directory=None):
+    """
+    Extract a bundle and verify the size and SHA-256 of every file against its manifest,
+    in a single streaming pass.
+
+    Returns:
+        tuple: (manifest, directory) with the directory the bundle was extracted to.
+
+    Raises:
+        BundleError: If the bundle is not a valid bundle or a file is missing or corrupted.
+    """
+    try:
+        archive = tarfile.open(path, "r|*")
+    except (OSError, tarfile.TarError) as e:
+        raise BundleError(f"Unable to open bundle {path}: {str(e)}")
+
+    with archive:
+        members = iter(archive)
+        first = next(members, None)
+        if first is None or first.name != MANIFEST_FILE:
+            raise BundleError(f"{path} is not a bundle: it does not start with {MANIFEST_FILE}")
+        manifest_data = archive.extractfile(first).read()
+        try:
+            manifest = json.loads(manifest_data.decode("utf-8"))
+        except ValueError as e:
+            raise BundleError(f"Invalid bundle manifest: {str(e)}")
+        if manifest.get("format") != BUNDLE_FORMAT:
+            raise BundleError(f"Unsupported bundle format {manifest.get('format')}, expected {BUNDLE_FORMAT}.")
+
+        if directory is None:
+            directory = get_cache_dir("bundles", hashlib.sha256(manifest_data).hexdigest()[:16])
+        files = manifest.get("files", {})
+        seen = set()
+        for member in members:
+            name = _safe_member(member)
+            if member.isdir():
+                continue
+            expected = files.get(name)
+            if expected is None:
+                raise BundleError(f"Bundle file {name} is not listed in the manifest.")
+
+            target = os.path.join(directory, name)
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            digest = hashlib.sha256()
+            with archive.extractfile(member) as source, open(target, "wb") as file:
+                for chunk in iter(lambda: source.read(CHUNK_SIZE), b""):
+                    digest.update(chunk)
+                    file.write(chunk)
+            if member.size != expected["size"] or digest.hexdigest() != expected["sha256"]:
+                raise BundleError(f"Bundle file {name} is corrupted: checksum mismatch.")
+            seen.add(name)
+
+    missing = sorted(set(files) - seen)
+    if missing:
+        raise BundleError(f"Bundle is incomplete, missing: {', '.join(missing)}")
+
+    with open(os.path.join(directory, MANIFEST_FILE), "wb") as file:
+        file.write(manifest_data)
+    return manifest, directory
+
+def repository_options(package_manager, directory):
+    """
+    Write the definition of the local repository of an extracted bundle and return the
+    package manager options that make it the only repository, so nothing is fetched
+    from the network.
+    """
+    packages_dir = os.path.join(directory, PACKAGES_DIR)
+    if package_manager == "apt-get":
+        sources_path = os.path.join(directory, f"{BUNDLE_REPO}.list")
+        with open(sources_path, "w", encoding="utf-8") as file:
+            file.write(f"deb [trusted=yes] file:{packages_dir} ./\n")
+        return [
+            "-o", f"Dir::Etc::sourcelist={sources_path}",
+            "-o", "Dir::Etc::sourceparts=-",
+            "-o", "APT::Get::List-Cleanup=0",
+        ]
+    if package_manager in ["yum", "dnf"]:
+        repos_dir = os.path.join(directory, "repos.d")
+        os.makedirs(repos_dir, exist_ok=True)
+        with open(os.path.join(repos_dir, f"{BUNDLE_REPO}.repo"), "w", encoding="utf-8") as file:
+            file.write(f"[{BUNDLE_REPO}]\nname=Percona installer bundle\nbaseurl=file://{packages_dir}\nenabled=1\ngpgcheck=0\n")
+        return [f"--setopt=reposdir={repos_dir}"]
+    raise BundleError(f"Unsupported package manager: {package_manager}")
+
+def seed_repo_index(manifest, directory):
+    """Use the repository index of the bundle for version lookups, without network access."""
+    from fetch_versions import configure_index_cache, import_repo_index
+
+    import_repo_index(os.path.join(directory, INDEX_FILE), manifest["created_at"])
+    configure_index_cache(offline=True)
+
+def build_import_plan(bundle_path, solution=None):
+    """
+    Build the plan of an install from a bundle: extract and verify it, install the
+    percona-release package and the components from its local repository, then run
+    the solution. The package manager never accesses the network.
+
+    Returns:
+        Plan: The install plan.
+    """
+    from plan import Plan, PACKAGE_MANAGER
+    from packages import packages_to_install
+    from shared import detect_os, percona_release_installed
+
+    pkg_manager = detect_os()
+    if pkg_manager not in PACKAGE_FORMATS:
+        raise BundleError(f"Unsupported package manager: {pkg_manager}")
+    plan = Plan()
+
+    def extract(context):
+        manifest, directory = open_bundle(bundle_path)
+        if manifest["package_format"] != PACKAGE_FORMATS[pkg_manager]:
+            raise BundleError(f"The bundle contains {manifest['package_format']} packages, this host uses {pkg_manager}.")
+        host = _host_platform()
+        built_for = manifest.get("platform", {})
+        if (built_for.get("id"), built_for.get("version_id"), built_for.get("arch")) != (host["id"], host["version_id"], host["arch"]):
+            print(f"Warning: The bundle was built on {built_for.get('id')} {built_for.get('version_id')} ({built_for.get('arch')}), "
+                  f"this host is {host['id']} {host['version_id']} ({host['arch']}).")
+        print(f"Bundle of {manifest['product']} ({manifest['repository']}) verified: {len(manifest['files'])} files.")
+        return {"manifest": manifest, "directory": directory, "options": repository_options(pkg_manager, directory)}
+
+    plan.add("extract_bundle", extract, description=f"Extract {bundle_path} and verify its checksums")
+    plan.add(
+        "seed_repo_index",
+        lambda context: seed_repo_index(context["extract_bundle"]["manifest"], context["extract_bundle"]["directory"]),
+        deps=["extract_bundle"],
+        description="Use the repository index of the bundle for version lookups",
+    )
+
+    install_deps = ["extract_bundle"]
+    if pkg_manager == "apt-get":
+        plan.add(
+            "refresh_bundle_repo",
+            lambda context: run_package_manager(["sudo", "apt-get", *context["extract_bundle"]["options"], "update"], print),
+            deps=["extract_bundle"],
+            description="sudo apt-get update, of the bundle repository only",
+            resources=[PACKAGE_MANAGER],
+        )
+        install_deps = ["refresh_bundle_repo"]
+
+    def package_manager_install(context, packages):
+        options = context["extract_bundle"]["options"]
+        run_package_manager(["sudo", pkg_manager, *options, "install", "-y", *packages], print)
+
+    if not percona_release_installed():
+        plan.add(
+            "install_percona_release",
+            lambda context: package_manager_install(context, [os.path.join(
+                context["extract_bundle"]["directory"], context["extract_bundle"]["manifest"]["bootstrap"]
+            )]),
+            deps=install_deps,
+            description=f"sudo {pkg_manager} install -y <percona-release package of the bundle>",
+            resources=[PACKAGE_MANAGER],
+        )
+        install_deps = ["install_percona_release"]
+
+    def install(context):
+        packages = context["extract_bundle"]["manifest"]["packages"]
+        to_install = packages_to_install(packages, pkg_manager, print, context["extract_bundle"]["options"])
+        if not to_install:
+            print("All components are already installed and up to date.")
+            return []
+        package_manager_install(context, to_install)
+        return to_install
+
+    plan.add(
+        "install_components",
+        install,
+        deps=install_deps,
+        description=f"sudo {pkg_manager} install -y <missing or upgradable packages of the bundle>",
+        resources=[PACKAGE_MANAGER],
+    )
+
+    if solution:
+        from cli import run_solution
+        plan.add(
+            f"solution:{solution}",
+            lambda context: run_solution(solution, pkg_manager),
+            deps=["install_components"],
+            description=f"Run the {solution} solution",
+        )
+    return plan
+
+def run_bundle(args):
+    """Run the bundle mode of the command line: --bundle exports, --from-bundle imports."""
+    if args.get("bundle"):
+        from batch import product_entries
+        from cli import resolve_product
+        from shared import REPO_TYPES
+
+        entries = product_entries(args)
+        if len(entries) != 1 or entries[0]["repository"] not in REPO_TYPES:
+            raise ValueError(f"--bundle requires one product (-p) and a repository type (-r), one of {REPO_TYPES}.")
+        distribution, version = resolve_product(entries[0]["product"])
+        components = entries[0]["components"]
+        with installer_lock(print):
+            export_bundle(args["bundle"], distribution, version, entries[0]["repository"], components)
+        return
+
+    plan = build_import_plan(args["from_bundle"], args.get("solution"))
+    if args.get("plan"):
+        print("Install plan:")
+        print(plan.format())
+        return
+    with installer_lock(print):
+        try:
+            plan.execute(print)
+        finally:
+            print("Install steps:")
+            print(plan.summary())
@@ -0,0 +1,303 @@
+import json
+import logging
+import os
+import re
+import threading
+
+from shared import get_cache_dir
+
+logger = logging.getLogger(__name__)
+
+CATALOG_FILE = "components.json"
+DEFAULT_CATALOG_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), CATALOG_FILE)
+CACHE_FILE = "catalog.json"
+
+# Bump when the compiled form changes, so older cache files are ignored
+COMPILED_FORMAT = 1
+
+# Package format of each package manager, per-platform names are keyed by it
+PACKAGE_FORMATS = {"apt-get": "deb", "yum": "rpm", "dnf": "rpm"}
+
+COMPONENT_KEYS = {"name", "description", "deb", "rpm", "depends"}
+PLACEHOLDERS = {"major"}
+_PLACEHOLDER_PATTERN = re.compile(r"\{([^{}]*)\}")
+
+class CatalogError(Exception):
+    """Raised when the component catalog is invalid."""
+
+class Component:
+    """
+    A component of a distribution as listed in the catalog.
+
+    Attributes:
+        name (str): Name shown to the user, may contain {major}.
+        description (str): Optional description.
+        packages (dict): Package name per package format ("deb", "rpm") where it differs from name.
+        depends (list): Names of components this one is usually installed with.
+    """
+
+    __slots__ = ("name", "description", "packages", "depends")
+
+    def __init__(self, name, description="", packages=None, depends=None):
+        self.name = name
+        self.description = description
+        self.packages = packages or {}
+        self.depends = depends or []
+
+    def to_dict(self):
+        return {"name": self.name, "description": self.description, "packages": self.packages, "depends": self.depends}
+
+class ResolvedComponent:
+    """A component expanded for a major version and a package manager."""
+
+    __slots__ = ("name", "package", "description", "depends")
+
+    def __init__(self, name, package, description, depends):
+        self.name = name
+        self.package = package
+        self.description = description
+        self.depends = depends
+
+    def __repr__(self):
+        return f"ResolvedComponent({self.name!r}, package={self.package!r})"
+
+def _check_placeholders(value, where, errors):
+    for placeholder in _PLACEHOLDER_PATTERN.findall(value):
+        if placeholder not in PLACEHOLDERS:
+            errors.append(f"{where}: unknown placeholder {{{placeholder}}}, supported: {{major}}")
+
+def _compile_component(entry, where, errors):
+    if isinstance(entry, str):
+        entry = {"name": entry}
+    if not isinstance(entry, dict):
+        errors.append(f"{where}: expected a package name or an object, got {type(entry).__name__}")
+        return None
+
+    unknown = set(entry) - COMPONENT_KEYS
+    if unknown:
+        errors.append(f"{where}: unknown keys {', '.join(sorted(unknown))}, supported: {', '.join(sorted(COMPONENT_KEYS))}")
+    name = entry.get("name")
+    if not isinstance(name, str) or not name.strip():
+        errors.append(f"{where}: 'name' must be a non-empty string")
+        return None
+    where = f"{where} ({name})"
+    _check_placeholders(name, where, errors)
+
+    packages = {}
+    for package_format in ("deb", "rpm"):
+        if package_format in entry:
+            package = entry[package_format]
+            if not isinstance(package, str) or not package.strip():
+                errors.append(f"{where}: '{package_format}' must be a non-empty string")
+                continue
+            _check_placeholders(package, where, errors)
+            packages[package_format] = package
+
+    description = entry.get("description", "")
+    if not isinstance(description, str):
+        errors.append(f"{where}: 'description' must be a string")
+        description = ""
+
+    depends = entry.get("depends", [])
+    if not isinstance(depends, list) or not all(isinstance(dep, str) for dep in depends):
+        errors.append(f"{where}: 'depends' must be a list of component names")
+        depends = []
+
+    return Component(name, description, packages, depends)
+
+def compile_catalog(data, source="components.json"):
+    """
+    Validate the parsed components file and return the components per distribution.
+
+    Raises:
+        CatalogError: With every problem found in the file.
+    """
+    errors = []
+    if not isinstance(data, dict):
+        raise CatalogError(f"{source}: expected an object keyed by distribution")
+
+    distributions = {}
+    for distribution, entry in data.items():
+        where = f"{source}: {distribution}"
+        if not isinstance(entry, dict) or not isinstance(entry.get("components", []), list):
+            errors.append(f"{where}: expected an object with a 'components' list")
+            continue
+
+        components = []
+        for index, component_entry in enumerate(entry.get("components", [])):
+            component = _compile_component(component_entry, f"{where}: component {index + 1}", errors)
+            if component is not None:
+                components.append(component)
+
+        names = {component.name for component in components}
+        for component in components:
+            for dep in component.depends:
+                if dep not in names:
+                    errors.append(f"{where}: {component.name} depends on unknown component {dep}")
+        distributions[distribution] = components
+
+    if errors:
+        raise CatalogError("Invalid component catalog:\n  " + "\n  ".join(errors))
+    return distributions
+
+class ComponentCatalog:
+    """
+    The components of every distribution, validated once, with the names expanded
+    per (distribution, major version, package manager) on first use.
+    """
+
+    def __init__(self, distributions, path=None, source_key=None):
+        self.distributions = distributions
+        self.path = path
+        self.source_key = source_key
+        self._expanded = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_dict(cls, data, path=None, source_key=None):
+        distributions = {
+            distribution: [Component(**component) for component in components]
+            for distribution, components in data.items()
+        }
+        return cls(distributions, path, source_key)
+
+    def to_dict(self):
+        return {
+            distribution: [component.to_dict() for component in components]
+            for distribution, components in self.distributions.items()
+        }
+
+    def components(self, distribution, version, package_manager=None):
+        """
+        Return the components of a distribution expanded for the major version of
+        `version` and the package names of the package manager (the generic names if None).
+
+        Returns:
+            list: ResolvedComponent instances, in catalog order.
+        """
+        major = str(version).split(".")[0]
+        key = (distribution, major, PACKAGE_FORMATS.get(package_manager))
+        expanded = self._expanded.get(key)
+        if expanded is None:
+            with self._lock:
+                expanded = self._expanded.get(key)
+                if expanded is None:
+                    expanded = self._expanded[key] = self._expand(*key)
+        return list(expanded)
+
+    def _expand(self, distribution, major, package_format):
+        resolved = []
+        for component in self.distributions.get(distribution, []):
+            package = component.packages.get(package_format, component.name)
+            resolved.append(ResolvedComponent(
+                component.name.replace("{major}", major),
+                package.replace("{major}", major),
+                component.description,
+                [dep.replace("{major}", major) for dep in component.depends],
+            ))
+        return tuple(resolved)
+
+    def names(self, distribution, version):
+        """Return the component names to show for a distribution version."""
+        return [component.name for component in self.components(distribution, version)]
+
+    def resolve(self, distribution, version, names, package_manager):
+        """
+        Map selected component names to the packages to install with the package manager.
+        Names that are not in the catalog are passed through as package names.
+
+        Returns:
+            tuple: (packages, hints) where hints maps a selected component to the
+            components it is usually installed with that were not selected.
+        """
+        by_name = {component.name: component for component in self.components(distribution, version, package_manager)}
+        selected = set(names)
+        packages, hints = [], {}
+        for name in names:
+            component = by_name.get(name)
+            if component is None:
+                packages.append(name)
+                continue
+            packages.append(component.package)
+            missing = [dep for dep in component.depends if dep not in selected]
+            if missing:
+                hints[name] = missing
+        return packages, hints
+
+def get_catalog_path():
+    """
+    Return the components file: components.json in the working directory if there is
+    one, so a customized copy still takes precedence, else the one of the installer.
+    """
+    if os.path.exists(CATALOG_FILE):
+        return os.path.abspath(CATALOG_FILE)
+    return DEFAULT_CATALOG_PATH
+
+def _load_compiled(cache_path, path, source_key):
+    try:
+        with open(cache_path, "r", encoding="utf-8") as file:
+            cache = json.load(file)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+    if cache.get("format") != COMPILED_FORMAT or cache.get("path") != path or cache.get("source_key") != source_key:
+        return None
+    return ComponentCatalog.from_dict(cache["distributions"], path, source_key)
+
+def _save_compiled(cache_path, catalog):
+    tmp_path = cache_path + ".tmp"
+    try:
+        with open(tmp_path, "w", encoding="utf-8") as file:
+            json.dump({
+                "format": COMPILED_FORMAT,
+                "path": catalog.path,
+                "source_key": catalog.source_key,
+                "distributions": catalog.to_dict(),
+            }, file, separators=(",", ":"))
+        os.replace(tmp_path, cache_path)
+    except OSError as e:
+        logger.warning(f"Unable to cache the component catalog: {str(e)}")
+
+def load_catalog(path):
+    """
+    Load and validate a components file, reusing the compiled copy in the cache
+    directory while the file's modification time and size are unchanged.
+
+    Raises:
+        FileNotFoundError: If the file does not exist.
+        CatalogError: If the file is not valid.
+    """
+    stat = os.stat(path)
+    source_key = f"{stat.st_mtime_ns}:{stat.st_size}"
+    cache_path = os.path.join(get_cache_dir(), CACHE_FILE)
+
+    catalog = _load_compiled(cache_path, path, source_key)
+    if catalog is not None:
+        return catalog
+
+    with open(path, "r", encoding="utf-8") as file:
+        try:
+            data = json.load(file)
+        except json.JSONDecodeError as e:
+            raise CatalogError(f"Error parsing {path}: {str(e)}")
+
+    catalog = ComponentCatalog(compile_catalog(data, path), path, source_key)
+    _save_compiled(cache_path, catalog)
+    logger.info(f"Compiled component catalog from {path}.")
+    return catalog
+
+_catalog = None
+_catalog_lock = threading.Lock()
+
+def get_catalog():
+    """
+    Return the component catalog of the process. It is loaded once and only
+    reloaded if the components file changed.
+    """
+    global _catalog
+    path = get_catalog_path()
+    stat = os.stat(path)
+    source_key = f"{stat.st_mtime_ns}:{stat.st_size}"
+    with _catalog_lock:
+        if _catalog is None or _catalog.path != path or _catalog.source_key != source_key:
+            _catalog = load_catalog(path)
+        return _catalog
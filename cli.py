@@ -1,8 +1,15 @@
 import logging
+import shlex
 import subprocess
-import json
-from shared import SUPPORTED_DISTROS, REPO_TYPES, build_repo_command, ensure_percona_release, detect_os, get_available_solutions, load_solutions_functions
-from fetch_versions import fetch_all_versions
+from shared import (
+    SUPPORTED_DISTROS, REPO_TYPES, build_repo_command, ensure_percona_release, detect_os, get_available_solutions,
+    percona_release_installed, download_percona_release, install_percona_release
+)
+from fetch_versions import fetch_all_versions, index_notice
+from catalog import CatalogError, get_catalog
+from packages import packages_to_install
+from package_manager import installer_lock, run_package_manager
+from tracing import span
 
 logger = logging.getLogger(__name__)
 
@@ -14,6 +21,15 @@ def list_distributions():
     for i, distro in enumerate(SUPPORTED_DISTROS.keys(), start=1):
         print(f"{i}. {distro}")
 
+_shown_notices = set()
+
+def warn_index_age():
+    """Tell the user, once, that the versions come from a cached index that was not revalidated."""
+    notice = index_notice()
+    if notice and notice not in _shown_notices:
+        _shown_notices.add(notice)
+        print(f"Warning: {notice}")
+
 def select_version(distribution):
     """
     Fetch and display available versions for a selected distribution, and allow user selection.
@@ -21,6 +37,7 @@ def select_version(distribution):
     prefix = SUPPORTED_DISTROS[distribution]
     try:
         all_versions = fetch_all_versions(prefix)
+        warn_index_age()
         if not all_versions:
             print("No versions available for the selected distribution.")
             return None
@@ -40,18 +57,23 @@ def select_version(distribution):
         print(f"Error fetching versions: {str(e)}")
         return None
 
-def enable_repository(distribution, version, repo_type):
+def enable_repository(distribution, version, repo_type, repo_mirror=None):
     """
     Enable the repository for the selected distribution, version, and type.
+    If repo_mirror is given, the enabled repositories are pointed at that package proxy.
     """
     try:
-        # Ensure percona-release is installed
-        ensure_percona_release(print)  # Pass print as the callback
+        with installer_lock(print), span("enable_repository", distribution=distribution, version=version, repo_type=repo_type):
+            # Ensure percona-release is installed
+            ensure_percona_release(print)  # Pass print as the callback
 
-        # Build and execute the repository enable command
-        command = build_repo_command(distribution, version, repo_type)
-        logger.info(f"Enabling repository with command: {command}")
-        subprocess.run(command, shell=True, check=True)
+            # Build and execute the repository enable command
+            command = build_repo_command(distribution, version, repo_type)
+            logger.info(f"Enabling repository with command: {command}")
+            run_package_manager(shlex.split(command), print)
+            if repo_mirror:
+                from package_proxy import point_repos_at_mirror
+                point_repos_at_mirror(repo_mirror, detect_os())
         print("Repository enabled successfully!")
     except subprocess.CalledProcessError as e:
         logger.error(f"Error enabling repository: {str(e)}")
@@ -75,39 +97,63 @@ def select_repo_type():
         print("Invalid selection.")
         return None
 
-def list_components(distribution, version):
+def list_components(distribution, version, repo_type=None, search=None):
     """
     Load and display components for the selected distribution and version.
+
+    The components of the catalog come first, followed by the other packages the
+    repository ships according to the repository catalog if repo_type is given.
+    Only names containing search are shown, if given.
     """
     try:
-        with open("components.json", "r") as file:
-            components_data = json.load(file)
-            components = components_data.get(distribution, {}).get("components", [])
-
-            # Replace {major} placeholder with major version
-            major_version = version.split(".")[0]
-            components = [
-                component.replace("{major}", major_version) if "{major}" in component else component
-                for component in components
-            ]
-
-            if not components:
-                print("No components available for the selected distribution.")
-                return None
+        components = get_catalog().names(distribution, version)
+        if search:
+            components = [component for component in components if search.lower() in component.lower()]
+
+        if repo_type:
+            from repo_catalog import repository_packages
+            try:
+                packages = repository_packages(f"{SUPPORTED_DISTROS[distribution]}{version}", repo_type, search, print)
+                known = set(components)
+                components = components + [package for package in packages if package not in known]
+            except Exception as e:
+                logger.warning(f"Unable to list the packages of the repository: {str(e)}")
+
+        if not components:
+            print("No components available for the selected distribution.")
+            return None
 
-            print("Available Components:")
-            for i, component in enumerate(components, start=1):
-                print(f"{i}. {component}")
-            return components
+        print("Available Components:")
+        for i, component in enumerate(components, start=1):
+            print(f"{i}. {component}")
+        return components
     except FileNotFoundError:
         logger.error("components.json file is missing!")
         print("Error: components.json not found.")
         return None
-    except json.JSONDecodeError as e:
-        logger.error(f"Error parsing components.json: {str(e)}")
-        print("Error: Failed to parse components.json.")
+    except CatalogError as e:
+        logger.error(str(e))
+        print(f"Error: {str(e)}")
         return None
 
+def resolve_packages(distribution, version, components, pkg_manager):
+    """
+    Return the package names of the selected components for the package manager,
+    and point out components that are usually installed together with them.
+    """
+    try:
+        packages, hints = get_catalog().resolve(distribution, version, components, pkg_manager)
+    except (FileNotFoundError, CatalogError) as e:
+        logger.warning(f"Unable to resolve package names from the component catalog: {str(e)}")
+        return list(components)
+
+    for component, missing in hints.items():
+        print(f"Hint: {component} is usually installed together with {', '.join(missing)}.")
+    renamed = [f"{component} -> {package}" for component, package in zip(components, packages) if component != package]
+    if renamed:
+        logger.info(f"Package names for {pkg_manager}: {', '.join(renamed)}")
+    return packages
+
 def select_components(components):
     """
     Allow the user to select components for installation.
@@ -118,23 +164,40 @@ def select_components(components):
     selected_components = [components[i] for i in selected_indices if 0 <= i < len(components)]
     return selected_components
 
-def install_components(selected_components):
+def install_components(selected_components, distribution=None, version=None):
     """
     Build and execute the install command for the selected components.
+    If the distribution and version are given, the components are mapped to the
+    package names of the host's package manager through the component catalog.
     """
     if not selected_components:
         print("No components selected for installation.")
         return
 
     try:
-        ensure_percona_release(print)  # Ensure percona-release is installed before installation
-        pkg_manager = detect_os()
-        if not pkg_manager:
-            raise Exception("Unable to determine the package manager for your OS.")
-
-        command = f"sudo {pkg_manager} install -y " + " ".join(selected_components)
-        logger.info(f"Installing components with command: {command}")
-        subprocess.run(command, shell=True, check=True)
+        with installer_lock(print), span("install_components", components=list(selected_components)):
+            ensure_percona_release(print)  # Ensure percona-release is installed before installation
+            pkg_manager = detect_os()
+            if not pkg_manager:
+                raise Exception("Unable to determine the package manager for your OS.")
+
+            # Refresh the metadata of the repositories enabled during this run, once
+            from repo_metadata import get_tracker
+            get_tracker(pkg_manager).refresh(print)
+
+            packages = list(selected_components)
+            if distribution and version:
+                packages = resolve_packages(distribution, version, packages, pkg_manager)
+
+            # Only the missing and upgradable packages are handed to the package manager
+            packages = packages_to_install(packages, pkg_manager, print)
+            if not packages:
+                print("All components are already installed and up to date.")
+                return
+
+            command = ["sudo", pkg_manager, "install", "-y", *packages]
+            logger.info(f"Installing components with command: {' '.join(command)}")
+            run_package_manager(command, print)
         print("Components installed successfully!")
     except subprocess.CalledProcessError as e:
         logger.error(f"Error installing components: {str(e)}")
@@ -143,68 +206,361 @@ def install_components(selected_components):
         logger.error(f"Error: {str(e)}")
         print(f"Error: {str(e)}")
 
+def run_solution(solution, pkg_manager):
+    """Run a solution, raising an exception if it failed."""
+    from solution_registry import get_registry
+    # Solutions report their errors themselves and return False when they failed
+    if get_registry().load(solution)(pkg_manager) is False:
+        raise Exception(f"Solution {solution} failed.")
+
+def build_install_plan(distribution, version, repo_type, components=None, solution=None, repo_mirror=None):
+    """
+    Build the plan of an argument-driven install of one product.
+
+    Returns:
+        Plan: The install plan, its context holds the result of each step.
+    """
+    from batch import ProductSelection
+    selection = ProductSelection(f"{SUPPORTED_DISTROS[distribution]}{version}", distribution, version, repo_type, components, solution)
+    return build_batch_plan([selection], repo_mirror)
+
+def build_batch_plan(selections, repo_mirror=None):
+    """
+    Build the plan of an argument-driven install of one or more products.
+
+    Every prerequisite is planned once. Checking the versions, downloading percona-release
+    and refreshing stale package lists do not depend on each other and run concurrently,
+    while the steps that run the package manager hold its lock and never overlap. The
+    repositories of all products are enabled first, their metadata is refreshed once and
+    the components of every product are installed in a single package manager transaction,
+    so dependencies are resolved and downloaded once. The solutions run last, one after
+    the other.
+
+    Args:
+        selections (list): The ProductSelection of each product.
+        repo_mirror (str): URL of a package proxy the repositories are pointed at, or None.
+
+    Returns:
+        Plan: The install plan, its context holds the result of each step.
+    """
+    from plan import Plan, PACKAGE_MANAGER
+    from repo_metadata import get_tracker
+
+    pkg_manager = detect_os()
+    tracker = get_tracker(pkg_manager)
+    plan = Plan()
+
+    def step_name(name, selection):
+        # The steps of a single product keep their names, so journals of earlier runs still resume
+        return name if len(selections) == 1 else f"{name}:{selection.repository}"
+
+    def check_version(selection):
+        prefix, version = SUPPORTED_DISTROS[selection.distribution], selection.version
+
+        def check(context):
+            # Only a warning: the index may be unreachable, and not every build is listed on it
+            try:
+                versions = fetch_all_versions(prefix)
+            except Exception as e:
+                logger.warning(f"Unable to check version {version}: {str(e)}")
+                return None
+            warn_index_age()
+            if versions and version not in versions:
+                print(f"Warning: {prefix}{version} is not listed on the repository index, available versions: {', '.join(versions[:5])}...")
+            return versions
+
+        return check
+
+    for selection in selections:
+        plan.add(
+            step_name("check_version", selection),
+            check_version(selection),
+            description=f"Check that {selection.repository} is listed on the repository index",
+        )
+
+    enable_deps = []
+    if not percona_release_installed():
+        bootstrap_deps = ["download_percona_release"]
+        plan.add(
+            "download_percona_release",
+            lambda context: download_percona_release(pkg_manager, print),
+            description="Download the percona-release package into the download cache",
+        )
+        if pkg_manager == "apt-get" and tracker.system_lists_stale():
+            bootstrap_deps.append("refresh_system_lists")
+            plan.add(
+                "refresh_system_lists",
+                lambda context: tracker.refresh(print, full=True),
+                description=" ".join(tracker.full_refresh_command()),
+                resources=[PACKAGE_MANAGER],
+            )
+        plan.add(
+            "install_percona_release",
+            lambda context: install_percona_release(pkg_manager, context["download_percona_release"], print),
+            deps=bootstrap_deps,
+            description=f"sudo {pkg_manager} install -y <percona-release package>",
+            resources=[PACKAGE_MANAGER],
+        )
+        enable_deps.append("install_percona_release")
+
+    enabled = []
+    repo_commands = set()
+    for selection in selections:
+        repo_command = build_repo_command(selection.distribution, selection.version, selection.repo_type)
+        if repo_command in repo_commands:
+            continue
+        repo_commands.add(repo_command)
+        name = step_name("enable_repository", selection)
+        if name in plan:
+            # The same repository of another repository type
+            name = f"{name}:{selection.repo_type}"
+        plan.add(
+            name,
+            lambda context, command=repo_command: run_package_manager(shlex.split(command), print),
+            deps=enable_deps,
+            description=repo_command,
+            resources=[PACKAGE_MANAGER],
+        )
+        enabled.append(name)
+    last_steps = enabled
+
+    if repo_mirror:
+        def point_at_mirror(context):
+            from package_proxy import point_repos_at_mirror
+            point_repos_at_mirror(repo_mirror, pkg_manager, print)
+
+        plan.add("point_repos_at_mirror", point_at_mirror, deps=last_steps, description=f"Use the package proxy {repo_mirror}")
+        last_steps = ["point_repos_at_mirror"]
+
+    packages = []
+    for selection in selections:
+        if selection.components:
+            packages.extend(resolve_packages(selection.distribution, selection.version, selection.components, pkg_manager))
+    packages = list(dict.fromkeys(packages))
+
+    if packages:
+        plan.add(
+            "refresh_metadata",
+            lambda context: tracker.refresh(print),
+            deps=last_steps,
+            description="Refresh the metadata of the repositories that changed",
+            resources=[PACKAGE_MANAGER],
+        )
+
+        def install(context):
+            # Queried after the refresh, so upgradable packages are measured against fresh metadata
+            to_install = packages_to_install(packages, pkg_manager, print)
+            if not to_install:
+                print("All components are already installed and up to date.")
+                return []
+            run_package_manager(["sudo", pkg_manager, "install", "-y", *to_install], print)
+            return to_install
+
+        plan.add(
+            "install_components",
+            install,
+            deps=["refresh_metadata"],
+            description=f"sudo {pkg_manager} install -y <missing or upgradable of: {' '.join(packages)}>",
+            resources=[PACKAGE_MANAGER],
+        )
+        last_steps = ["install_components"]
+
+    # Solutions may run the package manager and start services, so they run one at a time
+    for solution in dict.fromkeys(selection.solution for selection in selections if selection.solution):
+        plan.add(
+            f"solution:{solution}",
+            lambda context, solution=solution: run_solution(solution, pkg_manager),
+            deps=last_steps,
+            description=f"Run the {solution} solution",
+        )
+        last_steps = [f"solution:{solution}"]
+
+    return plan
+
+PREFIX_TO_DISTRO = {
+    "pdps": "Percona Server for MySQL",
+    "pdpxc": "Percona Distribution for MySQL (PXC)",
+    "pdmdb": "Percona Distribution for MongoDB",
+    "ppg": "Percona Distribution for PostgreSQL"  # Ensure ppg is mapped
+}
+
+def parse_product(product):
+    """
+    Split a product argument such as ppg-17.0 into its distribution and version.
+
+    Raises:
+        ValueError: If the product is malformed or its prefix is unknown.
+    """
+    try:
+        prefix, version = product.split("-", 1)
+    except ValueError:
+        raise ValueError(f"Error: Invalid product format '{product}'. Expected format: <prefix>-<version> (e.g., ppg-17.0).")
+
+    distribution = PREFIX_TO_DISTRO.get(prefix)
+    if not distribution:
+        raise ValueError(f"Error: Unknown product '{prefix}'. Expected one of: {', '.join(PREFIX_TO_DISTRO)}.")
+    return distribution, version
+
+def resolve_product(product):
+    """
+    Resolve a product argument to its distribution and the version to install. The version
+    may be a spec that is resolved against the repository index: a listed version such as
+    pdps-8.0 is used as is, an unlisted one such as ppg-17 is the newest 17.x, ppg-latest
+    the newest release, pdps-~8.0.36 the newest 8.0.x from 8.0.36 on, and ppg->=16,<17
+    the newest version matching every clause.
+
+    A plain version that is not on the index, or cannot be checked, is used as given:
+    not every build is listed there.
+
+    Returns:
+        tuple: The distribution and the resolved version.
+
+    Raises:
+        ValueError: If the product or spec is malformed, or no listed version matches the spec.
+    """
+    from versions import VersionSpec, resolve_version
+
+    distribution, spec_text = parse_product(product)
+    prefix = SUPPORTED_DISTROS[distribution]
+    spec = VersionSpec.parse(spec_text)
+    try:
+        version = resolve_version(prefix, spec)
+    except Exception as e:
+        if not spec.literal:
+            raise ValueError(f"Error: Unable to resolve {product} without the repository index: {str(e)}")
+        logger.warning(f"Unable to resolve {product}, using it as given: {str(e)}")
+        return distribution, spec_text
+
+    if version is None:
+        if spec.literal:
+            return distribution, spec_text
+        raise ValueError(f"Error: No {distribution} version on the repository index matches '{spec_text}'.")
+    if version != spec_text:
+        print(f"Resolved {product} to {prefix}{version}")
+    return distribution, version
+
+def check_solution(solution, distributions):
+    """
+    Check that a solution exists and supports one of the distributions, it is only
+    imported when it runs.
+
+    Raises:
+        ValueError: If the solution is unknown or supports none of the distributions.
+    """
+    from solution_registry import get_registry
+    solution_info = get_registry().get(solution)
+    if solution_info is None:
+        print(f"Solution '{solution}' is not available. Available solutions are:")
+        raise ValueError(", ".join(get_available_solutions()))
+    supported = [distribution for distribution in distributions if solution_info.supports(distribution)]
+    if not supported:
+        raise ValueError(f"Solution '{solution}' does not support {', '.join(distributions)}. Supported: {', '.join(solution_info.distributions)}")
+    return supported
+
+def select_products(entries, solution=None):
+    """
+    Resolve and check the products of an argument-driven install.
+
+    Args:
+        entries (list): The products of the command line, see batch.product_entries.
+        solution (str): The solution given with -s, it runs for the products it supports.
+
+    Returns:
+        list: A ProductSelection per product.
+
+    Raises:
+        ValueError: If a product, repository type or solution is invalid.
+    """
+    from batch import ProductSelection
+
+    selections = []
+    for entry in entries:
+        distribution, version = resolve_product(entry["product"])
+
+        repo_type = entry.get("repository")
+        if not repo_type or repo_type not in REPO_TYPES:
+            raise ValueError(f"Error: Repository type is required and must be one of {REPO_TYPES}.")
+
+        if entry.get("solution"):
+            check_solution(entry["solution"], [distribution])
+        selections.append(ProductSelection(entry["product"], distribution, version, repo_type, entry["components"], entry.get("solution")))
+
+    if solution:
+        supported = check_solution(solution, [selection.distribution for selection in selections])
+        for selection in selections:
+            if selection.distribution in supported and not selection.solution:
+                selection.solution = solution
+    return selections
+
 def run_cli(args=None):
     """
     Run the CLI installer, optionally using provided arguments.
     """
     if args:
-        # Argument-driven CLI mode
-        product = args.get("product")
-        if not product:
+        # Argument-driven CLI mode, of one product or a batch of them
+        from batch import product_entries
+        entries = product_entries(args)
+        if not entries:
             raise ValueError("Error: Product is required (e.g., ppg-17.0, ps-80).")
             return
 
-        try:
-            prefix, version = product.split("-", 1)
-        except ValueError:
-            raise ValueError(f"Error: Invalid product format '{product}'. Expected format: <prefix>-<version> (e.g., ppg-17.0).")
-            return
+        selections = select_products(entries, args.get("solution"))
+        batch = len(selections) > 1
 
-        PREFIX_TO_DISTRO = {
-            "pdps": "Percona Server for MySQL",
-            "pdpxc": "Percona Distribution for MySQL (PXC)",
-            "pdmdb": "Percona Distribution for MongoDB",
-            "ppg": "Percona Distribution for PostgreSQL"  # Ensure ppg is mapped
-        }
+        if args.get("verbose"):
+            print("Verbose mode enabled.")
 
-        distribution = PREFIX_TO_DISTRO.get(prefix)
+        if batch:
+            print(f"Selected Products: {len(selections)}")
+            for selection in selections:
+                print(
+                    f"  {selection.repository} ({selection.repo_type}): "
+                    f"{', '.join(selection.components) if selection.components else 'no components'}"
+                    f"{f', solution {selection.solution}' if selection.solution else ''}"
+                )
+        else:
+            selection = selections[0]
+            print(f"Selected Distribution: {selection.distribution}")
+            print(f"Selected Version: {selection.version}")
+            print(f"Selected Repository Type: {selection.repo_type}")
+            print(f"Selected Components: {', '.join(selection.components) if selection.components else 'None'}")
+            print(f"Selected Solution: {selection.solution}")
 
-        repo_type = args.get("repository")
-        if not repo_type or repo_type not in REPO_TYPES:
-            raise ValueError(f"Error: Repository type is required and must be one of {REPO_TYPES}.")
+        plan = build_batch_plan(selections, args.get("repo_mirror"))
+        if args.get("plan"):
+            print("Install plan:")
+            print(plan.format())
             return
 
-        components = args.get("components", "").split(",") if args.get("components") else []
-        
-        solution = args.get("solution")
-        if solution:
-            # Get the list of available solutions
-            available_solutions = get_available_solutions()
-
-            # Check if the parsed solution exists
-            if solution not in available_solutions:
-                print(f"Solution '{solution}' is not available. Available solutions are:")
-                raise ValueError(", ".join(available_solutions))
-                return
-            else:
-                solution_functions = load_solutions_functions('solution')
+        # Fail before bootstrapping percona-release if a repository has no packages for this host
+        if not args.get("offline") and not args.get("no_repo_check"):
+            from repo_probe import check_repositories
+            check_repositories([(selection.repository, selection.repo_type) for selection in selections], args.get("repo_mirror"))
 
-        if args.get("verbose"):
-            logger.setLevel(logging.DEBUG)
-            print("Verbose mode enabled.")
-        
-        print(f"Selected Distribution: {distribution}")
-        print(f"Selected Version: {version}")
-        print(f"Selected Repository Type: {repo_type}")
-        print(f"Selected Components: {', '.join(components) if components else 'None'}")
-        print(f"Selected Solution: {solution}")
+        # One installer at a time on the host, the journal is only read and written under the lock
+        with installer_lock(print):
+            # Checkpoint every finished step, so a rerun after a failure resumes where this one stopped
+            from journal import Journal, set_journal
+            if batch:
+                inputs = {"products": [selection.journal_inputs() for selection in selections]}
+            else:
+                inputs = selections[0].journal_inputs()
+            inputs["repo_mirror"] = args.get("repo_mirror")
+            journal = Journal.open(inputs, restart=args.get("restart"))
+            if journal.steps:
+                print(f"Resuming the interrupted install, {len(journal.steps)} steps already completed (use --restart to start over).")
+            elif args.get("resume"):
+                products = ", ".join(selection.product for selection in selections)
+                raise ValueError(f"Error: There is no interrupted install of {products} to resume.")
 
-        enable_repository(distribution, version, repo_type)
-        if components:
-            install_components(components)
-        if solution:
-            pkg_manager = detect_os()
-            solution_functions[solution](pkg_manager)
+            set_journal(journal)
+            try:
+                plan.execute(print, journal=journal)
+            finally:
+                set_journal(None)
+                print("Install steps:")
+                print(plan.summary())
+            journal.finish()
     else:
         # Interactive mode
         print("Welcome to the Percona Installer (CLI Mode)")
@@ -214,7 +570,8 @@ def run_cli(args=None):
         version = select_version(distribution)
         repo_type = select_repo_type()
         enable_repository(distribution, version, repo_type)
-        components = list_components(distribution, version)
+        search = input("Search components (press Enter to list all): ").strip()
+        components = list_components(distribution, version, repo_type, search or None)
         selected_components = select_components(components)
         if components:
-            install_components(selected_components)
+            install_components(selected_components, distribution, version)
@@ -0,0 +1,214 @@
+import fcntl
+import hashlib
+import json
+import logging
+import os
+import time
+
+from shared import get_cache_dir
+from tracing import traced
+
+logger = logging.getLogger(__name__)
+
+# Shared by all users when writable (e.g. when running with sudo), per-user cache otherwise
+SHARED_DOWNLOAD_DIR = "/var/cache/percona_installer/downloads"
+
+# A cached artifact younger than this is reused without asking the server
+DOWNLOAD_MAX_AGE = 24 * 3600
+
+DOWNLOAD_ATTEMPTS = 4
+DOWNLOAD_BACKOFF = 1.0
+CHUNK_SIZE = 256 * 1024
+
+_session = None
+
+def get_http_session():
+    """
+    Return the HTTP session shared by the installer, keeping connections alive between requests.
+    """
+    global _session
+    if _session is None:
+        import requests  # Imported on first use, it is the slowest import of the installer
+
+        _session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_connections=4, pool_maxsize=16)
+        _session.mount("http://", adapter)
+        _session.mount("https://", adapter)
+        _session.headers["User-Agent"] = "percona-installer"
+    return _session
+
+def get_download_dir():
+    """Return the download cache directory, preferring the one shared by all users."""
+    directory = os.environ.get("PERCONA_INSTALLER_DOWNLOAD_DIR") or SHARED_DOWNLOAD_DIR
+    try:
+        os.makedirs(directory, mode=0o755, exist_ok=True)
+        if os.access(directory, os.W_OK):
+            return directory
+    except OSError:
+        pass
+    return get_cache_dir("downloads")
+
+def sha256sum(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as file:
+        for chunk in iter(lambda: file.read(CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def _load_meta(meta_path):
+    try:
+        with open(meta_path, "r", encoding="utf-8") as file:
+            return json.load(file)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+def _save_meta(meta_path, meta):
+    tmp_path = meta_path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as file:
+        json.dump(meta, file, indent=2)
+    os.chmod(tmp_path, 0o644)
+    os.replace(tmp_path, meta_path)
+
+def _cached_copy_valid(path, meta, sha256):
+    """
+    Check that the cached file is complete and unchanged since it was downloaded, and
+    that it has the expected SHA-256 if one is given.
+    """
+    if not os.path.exists(path) or not meta.get("sha256"):
+        return False
+    if sha256 and meta["sha256"] != sha256:
+        return False
+    if os.path.getsize(path) != meta.get("size"):
+        return False
+    return sha256sum(path) == meta["sha256"]
+
+def _fetch(url, path, meta, sha256, output_callback):
+    """
+    Download url into path, resuming a partial download and revalidating a cached copy.
+    Returns the new metadata of the file.
+    """
+    import requests
+
+    session = get_http_session()
+    part_path = path + ".part"
+    # Range offsets count the bytes of the file as stored, ask for it without a Content-Encoding
+    headers = {"Accept-Encoding": "identity"}
+
+    have_cached = _cached_copy_valid(path, meta, sha256)
+    if have_cached:
+        if meta.get("etag"):
+            headers["If-None-Match"] = meta["etag"]
+        if meta.get("last_modified"):
+            headers["If-Modified-Since"] = meta["last_modified"]
+
+    offset = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+    if offset and meta.get("partial_etag"):
+        headers["Range"] = f"bytes={offset}-"
+        headers["If-Range"] = meta["partial_etag"]
+    else:
+        offset = 0
+
+    with session.get(url, headers=headers, stream=True, timeout=30) as response:
+        if response.status_code == 304 and have_cached:
+            meta["fetched_at"] = time.time()
+            return meta
+        if response.status_code == 416:
+            # The partial file is stale or already complete, start over
+            os.unlink(part_path)
+            raise requests.exceptions.RetryError(f"Range not satisfiable for {url}")
+        response.raise_for_status()
+
+        if response.status_code == 206:
+            output_callback(f"Resuming download at {offset} bytes...\n")
+            mode = "ab"
+        else:
+            offset = 0
+            mode = "wb"
+
+        # Servers may encode the file anyway, it is then decoded and downloaded in one piece
+        encoded = response.headers.get("Content-Encoding", "identity") != "identity"
+        if encoded and response.status_code == 206:
+            os.unlink(part_path)
+            raise requests.exceptions.RetryError(f"Encoded partial content for {url}")
+
+        etag = response.headers.get("ETag")
+        # Remember the validator of the partial file so an interrupted download can be resumed
+        _save_meta(path + ".json", dict(meta, url=url, partial_etag=etag))
+
+        with open(part_path, mode) as file:
+            chunks = response.iter_content(CHUNK_SIZE) if encoded else response.raw.stream(CHUNK_SIZE, decode_content=False)
+            for chunk in chunks:
+                file.write(chunk)
+
+        # Content-Length counts the bytes on the wire, before a Content-Encoding is decoded
+        expected_size = response.headers.get("Content-Length")
+        if expected_size is not None and response.raw.tell() != int(expected_size):
+            raise requests.exceptions.ConnectionError(f"Incomplete download of {url}")
+
+    digest = sha256sum(part_path)
+    if sha256 and digest != sha256:
+        os.unlink(part_path)
+        raise Exception(f"Checksum mismatch for {url}: expected {sha256}, got {digest}")
+
+    os.chmod(part_path, 0o644)
+    os.replace(part_path, path)
+    return {
+        "url": url,
+        "sha256": digest,
+        "size": os.path.getsize(path),
+        "etag": etag,
+        "last_modified": response.headers.get("Last-Modified"),
+        "fetched_at": time.time(),
+    }
+
+@traced()
+def download_file(url, sha256=None, max_age=DOWNLOAD_MAX_AGE, output_callback=print):
+    """
+    Download a file into the shared download cache and return its local path.
+
+    A cached copy is checked against the SHA-256 recorded when it was downloaded, which
+    catches truncated or corrupted files, and reused while younger than max_age, then
+    revalidated with a conditional request. Only `sha256` verifies the file against its
+    source, e.g. a published or pinned checksum. Interrupted downloads are resumed with
+    Range requests, and transient errors are retried with exponential backoff.
+    Concurrent downloads of the same file, even from other processes, wait for each other.
+
+    Args:
+        url (str): The file to download.
+        sha256 (str): Expected SHA-256 of the file, if known. The download fails if it differs.
+        max_age (int): Seconds a cached copy is reused without revalidation.
+        output_callback (callable): Receives progress messages.
+
+    Returns:
+        str: The path of the file in the download cache.
+    """
+    import requests
+
+    path = os.path.join(get_download_dir(), os.path.basename(url.split("?", 1)[0]))
+    meta_path = path + ".json"
+
+    with open(path + ".lock", "a") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+
+        meta = _load_meta(meta_path)
+        if meta.get("url") == url and time.time() - meta.get("fetched_at", 0) < max_age \
+                and _cached_copy_valid(path, meta, sha256):
+            output_callback(f"Using cached {os.path.basename(path)}.\n")
+            return path
+
+        for attempt in range(1, DOWNLOAD_ATTEMPTS + 1):
+            try:
+                output_callback(f"Downloading {url}...\n")
+                meta = _fetch(url, path, meta if meta.get("url") == url else {}, sha256, output_callback)
+                _save_meta(meta_path, meta)
+                logger.info(f"Downloaded {url} to {path} (sha256 {meta['sha256']}).")
+                return path
+            except requests.exceptions.RequestException as e:
+                status = getattr(getattr(e, "response", None), "status_code", None)
+                if attempt == DOWNLOAD_ATTEMPTS or (status is not None and status < 500):
+                    raise Exception(f"Error downloading {url}: {str(e)}")
+                delay = DOWNLOAD_BACKOFF * 2 ** (attempt - 1)
+                logger.warning(f"Download of {url} failed ({str(e)}), retrying in {delay:.0f}s...")
+                output_callback(f"Download failed, retrying in {delay:.0f}s...\n")
+                time.sleep(delay)
+                meta = _load_meta(meta_path)
@@ -1,28 +1,205 @@
-from shared import logger
+from shared import logger, get_cache_dir, SUPPORTED_DISTROS
 
+import os
 import re
-import requests
-from bs4 import BeautifulSoup
-import logging
+import json
+import shutil
+import time
+import functools
+import threading
+from html.parser import HTMLParser
+
+from tracing import span
+from versions import VersionList, version_key
 
 INDEX_URL = "https://repo.percona.com/"
 INDEX_FILE = "index.html"
+INDEX_META_FILE = "index.meta.json"
+VERSIONS_FILE = "index.versions.json"
+PARSE_CHUNK_SIZE = 64 * 1024
+
+# How long a cached index is used without revalidation, and how old it may get
+# before a failed revalidation becomes an error instead of a warning.
+INDEX_TTL = int(os.environ.get("PERCONA_INSTALLER_INDEX_TTL", 3600))
+INDEX_MAX_STALE = int(os.environ.get("PERCONA_INSTALLER_INDEX_MAX_STALE", 7 * 24 * 3600))
+
+_cache_options = {"refresh": False, "offline": False, "ttl": INDEX_TTL}
+
+# Describes where the last index came from: "cache", "revalidated", "network", "stale" or "offline".
+index_status = {"source": None, "age": None}
+
+def configure_index_cache(refresh=False, offline=False, ttl=None):
+    """
+    Configure how the repository index cache behaves for this process.
+
+    Args:
+        refresh (bool): Revalidate the cached index even if it is within its TTL.
+        offline (bool): Never touch the network, use the cached index as is.
+        ttl (int): Seconds a cached index is considered fresh.
+    """
+    if refresh and offline:
+        raise ValueError("--refresh-index and --offline cannot be used together.")
+
+    _cache_options["refresh"] = bool(refresh)
+    _cache_options["offline"] = bool(offline)
+    if ttl is not None:
+        _cache_options["ttl"] = int(ttl)
+
+def get_index_path():
+    """Return the location of the cached index page."""
+    return os.path.join(get_cache_dir(), INDEX_FILE)
+
+def _get_meta_path():
+    return os.path.join(get_cache_dir(), INDEX_META_FILE)
+
+def load_index_meta():
+    """Load the validators (ETag/Last-Modified) and fetch time of the cached index."""
+    try:
+        with open(_get_meta_path(), "r", encoding="utf-8") as file:
+            return json.load(file)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+def _save_index_meta(meta):
+    tmp_path = _get_meta_path() + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as file:
+        json.dump(meta, file)
+    os.replace(tmp_path, _get_meta_path())
+
+def import_repo_index(path, fetched_at):
+    """
+    Use a copy of the index page, e.g. from an offline bundle, if no index is cached yet.
+
+    Returns:
+        bool: True if the copy was imported, False if a cached index was kept.
+    """
+    if os.path.exists(get_index_path()):
+        logger.info(f"Keeping the cached repository index {get_index_path()}.")
+        return False
+
+    tmp_path = get_index_path() + ".tmp"
+    shutil.copyfile(path, tmp_path)
+    os.replace(tmp_path, get_index_path())
+    _save_index_meta({"url": path, "fetched_at": fetched_at})
+    logger.info(f"Imported repository index from {path}.")
+    return True
+
+def download_repo_index(meta=None):
+    """
+    Download and save the index page of repo.percona.com.
+
+    When validators of a cached copy are passed in `meta`, a conditional request is
+    made and a 304 answer only refreshes the fetch time of the cached copy.
+
+    Returns:
+        bool: True if new content was downloaded, False if the cached copy was still valid.
+    """
+    import requests
+    from downloads import get_http_session
+
+    meta = meta or {}
+    headers = {}
+    if os.path.exists(get_index_path()):
+        if meta.get("etag"):
+            headers["If-None-Match"] = meta["etag"]
+        if meta.get("last_modified"):
+            headers["If-Modified-Since"] = meta["last_modified"]
 
-def download_repo_index():
-    """Download and save the index page of repo.percona.com."""
     try:
         logger.info(f"Downloading {INDEX_URL}...")
-        response = requests.get(INDEX_URL, timeout=10)
+        response = get_http_session().get(INDEX_URL, headers=headers, timeout=10)
+
+        if response.status_code == 304:
+            meta["fetched_at"] = time.time()
+            _save_index_meta(meta)
+            logger.info(f"{INDEX_URL} not modified, cached copy revalidated.")
+            return False
+
         response.raise_for_status()
 
-        with open(INDEX_FILE, "w", encoding="utf-8") as file:
+        tmp_path = get_index_path() + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as file:
             file.write(response.text)
+        os.replace(tmp_path, get_index_path())
 
+        _save_index_meta({
+            "url": INDEX_URL,
+            "etag": response.headers.get("ETag"),
+            "last_modified": response.headers.get("Last-Modified"),
+            "fetched_at": time.time(),
+        })
         logger.info(f"Successfully downloaded {INDEX_URL}.")
+        return True
     except requests.exceptions.RequestException as e:
         logger.error(f"Failed to download {INDEX_URL}: {str(e)}")
         raise Exception(f"Error downloading {INDEX_URL}: {str(e)}")
 
+def ensure_repo_index():
+    """
+    Return the path of an index page that is fresh according to the cache options.
+
+    A cached copy younger than the TTL is used as is; an older one is revalidated with
+    a conditional request. If the network is unavailable, a cached copy younger than
+    INDEX_MAX_STALE is used with a warning, anything older is an error. In offline mode
+    a cached copy of any age is used, see index_notice.
+    """
+    with span("ensure_repo_index") as current:
+        index_path = _ensure_repo_index()
+        current.set(**index_status)
+    return index_path
+
+def _ensure_repo_index():
+    index_path = get_index_path()
+    meta = load_index_meta()
+    have_cache = os.path.exists(index_path)
+    age = time.time() - meta.get("fetched_at", 0) if have_cache else None
+
+    if _cache_options["offline"]:
+        if not have_cache:
+            raise Exception("Offline mode requested but no cached repository index is available.")
+        logger.warning(f"Using repository index cached {int(age)}s ago in offline mode.")
+        index_status.update(source="offline", age=age)
+        return index_path
+
+    if have_cache and not _cache_options["refresh"] and age < _cache_options["ttl"]:
+        index_status.update(source="cache", age=age)
+        return index_path
+
+    try:
+        changed = download_repo_index(meta if have_cache else None)
+        index_status.update(source="network" if changed else "revalidated", age=0)
+    except Exception as e:
+        if not have_cache or age > INDEX_MAX_STALE:
+            raise
+        logger.warning(f"Using stale repository index ({int(age)}s old): {str(e)}")
+        index_status.update(source="stale", age=age)
+
+    return index_path
+
+def _format_age(seconds):
+    if seconds >= 2 * 24 * 3600:
+        return f"{int(seconds // (24 * 3600))} days"
+    if seconds >= 3600:
+        return f"{int(seconds // 3600)}h"
+    return f"{int(seconds // 60)} min"
+
+def index_notice():
+    """
+    Return a notice for the user if the last index is a cached copy that was not
+    revalidated because the repository is unreachable or in offline mode, else None.
+    """
+    age = index_status["age"]
+    if index_status["source"] == "stale":
+        return f"repository is unreachable, using a version list cached {_format_age(age)} ago."
+    if index_status["source"] == "offline":
+        outdated = ", it may be outdated" if age > INDEX_MAX_STALE else ""
+        return f"offline mode, using a version list cached {_format_age(age)} ago{outdated}."
+    return None
+
+@functools.lru_cache(maxsize=None)
+def _version_pattern(prefix):
+    return re.compile(rf"{re.escape(prefix)}([\d.]+)")  # Match versions after the prefix
+
 def extract_version(directory, prefix):
     """
     Extract the version number from a directory name.
@@ -30,41 +207,151 @@ def extract_version(directory, prefix):
     Example:
     For `pdpxc-8.0.26`, it extracts `8.0.26` if the prefix is `pdpxc-`.
     """
-    pattern = rf"{re.escape(prefix)}([\d.]+)"  # Match versions after the prefix
-    match = re.search(pattern, directory)
+    match = _version_pattern(prefix).search(directory)
     return match.group(1) if match else None
 
+def _sort_versions(versions):
+    """Sort versions numerically, newest first."""
+    return sorted(versions, key=version_key, reverse=True)
+
+class _DirectoryLinkParser(HTMLParser):
+    """
+    Streaming parser that buckets the directory links of the index page by prefix.
+
+    Only the versions of matching directories are kept, so memory does not grow with
+    the size of the page beyond the number of distinct versions.
+    """
+
+    def __init__(self, prefixes):
+        super().__init__(convert_charrefs=True)
+        self.buckets = {prefix: set() for prefix in prefixes}
+        self._link_text = None
+
+    def handle_starttag(self, tag, attrs):
+        if tag == "a" and any(name == "href" and value is not None for name, value in attrs):
+            self._link_text = []
+
+    def handle_data(self, data):
+        if self._link_text is not None:
+            self._link_text.append(data)
+
+    def handle_endtag(self, tag):
+        if tag != "a" or self._link_text is None:
+            return
+
+        directory = "".join(self._link_text).strip("/")
+        self._link_text = None
+        for prefix, versions in self.buckets.items():
+            if directory.startswith(prefix):
+                version = extract_version(directory, prefix)
+                if version:
+                    versions.add(version)
+
+class VersionIndex:
+    """
+    Versions of every distribution found on the index page, keyed by directory prefix.
+    """
+
+    def __init__(self, versions_by_prefix, source_key=None):
+        self.versions_by_prefix = versions_by_prefix
+        self.source_key = source_key
+        self._version_lists = {}
+
+    @classmethod
+    def build(cls, index_path, prefixes, source_key=None):
+        """Parse the index page in a single streaming pass."""
+        parser = _DirectoryLinkParser(prefixes)
+        with open(index_path, "r", encoding="utf-8") as file:
+            for chunk in iter(lambda: file.read(PARSE_CHUNK_SIZE), ""):
+                parser.feed(chunk)
+        parser.close()
+
+        versions_by_prefix = {
+            prefix: _sort_versions(versions) for prefix, versions in parser.buckets.items()
+        }
+        return cls(versions_by_prefix, source_key)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, "r", encoding="utf-8") as file:
+            data = json.load(file)
+        return cls(data["versions"], data["source_key"])
+
+    def save(self, path):
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as file:
+            json.dump({"source_key": self.source_key, "versions": self.versions_by_prefix}, file, separators=(",", ":"))
+        os.replace(tmp_path, path)
+
+    def __contains__(self, prefix):
+        return prefix in self.versions_by_prefix
+
+    def get(self, prefix):
+        return list(self.versions_by_prefix.get(prefix, []))
+
+    def version_list(self, prefix):
+        """Return the versions of a prefix as a VersionList, built on first use."""
+        version_list = self._version_lists.get(prefix)
+        if version_list is None:
+            version_list = self._version_lists[prefix] = VersionList(self.versions_by_prefix.get(prefix, []))
+        return version_list
+
+_version_index = None
+# The GUI builds the index from background threads
+_version_index_lock = threading.Lock()
+
+def get_version_index(prefixes=None):
+    """
+    Return the version index for the current repository index page.
+
+    The index is built once per process and persisted next to the cached HTML, keyed
+    by the size and modification time of the page, so it is only re-parsed after the
+    page was actually re-downloaded.
+    """
+    with _version_index_lock:
+        return _get_version_index(prefixes)
+
+def _get_version_index(prefixes):
+    global _version_index
+
+    index_path = ensure_repo_index()
+    stat = os.stat(index_path)
+    source_key = f"{stat.st_mtime_ns}:{stat.st_size}"
+    prefixes = sorted(set(SUPPORTED_DISTROS.values()) | set(prefixes or []))
+
+    if _version_index is not None and _version_index.source_key == source_key \
+            and all(prefix in _version_index for prefix in prefixes):
+        return _version_index
+
+    versions_path = os.path.join(os.path.dirname(index_path), VERSIONS_FILE)
+    try:
+        index = VersionIndex.load(versions_path)
+        if index.source_key == source_key and all(prefix in index for prefix in prefixes):
+            _version_index = index
+            return _version_index
+    except (FileNotFoundError, ValueError, KeyError):
+        pass
+
+    logger.info(f"Building version index from {index_path}...")
+    with span("build_version_index", prefixes=len(prefixes)):
+        _version_index = VersionIndex.build(index_path, prefixes, source_key)
+    try:
+        _version_index.save(versions_path)
+    except OSError as e:
+        logger.warning(f"Failed to save version index to {versions_path}: {str(e)}")
+    return _version_index
+
+def get_cached_versions(prefix):
+    """Return the versions of a prefix if the index is already loaded in memory, or None."""
+    index = _version_index
+    if index is not None and prefix in index:
+        return index.get(prefix)
+    return None
+
 def fetch_all_versions(prefix):
     """Fetch all versions for a Percona distribution."""
-    try:
-        with open(INDEX_FILE, "r", encoding="utf-8") as file:
-            html_content = file.read()
-    except FileNotFoundError:
-        logger.info(f"{INDEX_FILE} not found. Downloading it now...")
-        download_repo_index()
-        with open(INDEX_FILE, "r", encoding="utf-8") as file:
-            html_content = file.read()
-
-    soup = BeautifulSoup(html_content, "html.parser")
-    links = [link.text.strip("/") for link in soup.find_all("a", href=True)]
-
-    # Filter directories matching the prefix
-    relevant_dirs = [link for link in links if link.startswith(prefix)]
-    logger.info(f"Found directories for prefix '{prefix}': {relevant_dirs}")
-
-    # Extract versions and group by major version
-    versions = []
-    for directory in relevant_dirs:
-        version = extract_version(directory, prefix)
-        if version:
-            versions.append(version)
-
-    # Sort all versions numerically
-    sorted_versions = sorted(
-        versions,
-        key=lambda v: [int(part) if part.isdigit() else 0 for part in v.split(".")],
-        reverse=True,
-    )
+    with span("fetch_all_versions", prefix=prefix) as current:
+        sorted_versions = get_version_index([prefix]).get(prefix)
+        current.set(versions=len(sorted_versions))
     logger.info(f"Fetched versions for prefix '{prefix}': {sorted_versions}")
     return sorted_versions
-
@@ -0,0 +1,253 @@
+import importlib
+import json
+import logging
+import os
+import shlex
+import subprocess
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from runner import run_command
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_WORKERS = 10
+DEFAULT_LOG_DIR = "fleet-logs"
+DEFAULT_INSTALLER_COMMAND = ["sudo", "percona_installer"]
+
+# Per-host settings that are passed to the installer on the host
+HOST_SETTINGS = ("repository", "product", "components", "solution", "repo_mirror", "verbose", "restart", "no_repo_check")
+
+class Transport:
+    """
+    Executes a command on a host and streams its output into a log file.
+    Subclasses implement `build_command` to wrap the installer command for their transport.
+    """
+
+    def __init__(self, options=None, timeout=None):
+        self.options = options or []
+        self.timeout = timeout
+
+    def build_command(self, host, command):
+        raise NotImplementedError
+
+    def run(self, host, command, log_file):
+        """
+        Run the command for the host, writing stdout and stderr to log_file.
+
+        Returns:
+            int: The exit status of the command.
+        """
+        argv = self.build_command(host, command)
+        log_file.write(f"$ {' '.join(shlex.quote(arg) for arg in argv)}\n")
+        log_file.flush()
+        result = run_command(
+            argv, lambda line: log_file.write(line + "\n"),
+            check=False, timeout=self.timeout, stdin=subprocess.DEVNULL, name=f"fleet:{host['host']}"
+        )
+        if result.timed_out:
+            log_file.write(f"Timed out after {self.timeout} seconds\n")
+        return result.returncode
+
+class SSHTransport(Transport):
+    """Runs the command over ssh, non-interactively."""
+
+    def build_command(self, host, command):
+        return ["ssh", "-o", "BatchMode=yes", *self.options, host["host"], "--",
+                " ".join(shlex.quote(arg) for arg in command)]
+
+class DockerTransport(Transport):
+    """Runs the command inside a local container named after the host, useful for testing."""
+
+    def build_command(self, host, command):
+        return ["docker", "exec", *self.options, host["host"], *command]
+
+class LocalTransport(Transport):
+    """Runs the command on this machine, ignoring the host name. Meant as a stand-in for ssh."""
+
+    def build_command(self, host, command):
+        return list(command)
+
+TRANSPORTS = {
+    "ssh": SSHTransport,
+    "docker": DockerTransport,
+    "local": LocalTransport,
+}
+
+def get_transport(name, options=None):
+    """
+    Return a transport instance by name, or by "module:Class" for a custom transport.
+    """
+    if name in TRANSPORTS:
+        return TRANSPORTS[name](options)
+
+    module_name, _, class_name = name.partition(":")
+    if not class_name:
+        raise ValueError(f"Unknown transport '{name}'. Available transports: {', '.join(TRANSPORTS)}")
+    return getattr(importlib.import_module(module_name), class_name)(options)
+
+def load_inventory(path, defaults=None):
+    """
+    Load an inventory file and return the list of hosts with their effective settings.
+
+    The inventory is a JSON document:
+
+        {
+          "defaults": {"repository": "release", "product": "ppg-17.0", "components": ["percona-postgresql-17"]},
+          "hosts": ["db1.example.com", {"host": "db2.example.com", "product": "ppg-16.8"}]
+        }
+
+    Settings of a host override the inventory defaults, which override the given defaults.
+    The product may be a list, e.g. ["ppg-17:percona-postgresql-17", "pdps-8.0:percona-server-server"],
+    to install several products in one batch.
+
+    Results and logs are kept per host name, so a host may only be listed once.
+
+    Raises:
+        ValueError: If a host is listed twice or has no product or repository type.
+    """
+    with open(path, "r", encoding="utf-8") as file:
+        inventory = json.load(file)
+
+    base = {key: value for key, value in (defaults or {}).items() if value}
+    base.update(inventory.get("defaults", {}))
+
+    hosts = []
+    names = set()
+    for entry in inventory.get("hosts", []):
+        if isinstance(entry, str):
+            entry = {"host": entry}
+        if not entry.get("host"):
+            raise ValueError(f"Inventory entry without a host: {entry}")
+        if entry["host"] in names:
+            raise ValueError(f"Host {entry['host']} is listed more than once in inventory {path}.")
+        names.add(entry["host"])
+
+        host = dict(base)
+        host.update(entry)
+        if isinstance(host.get("components"), list):
+            host["components"] = ",".join(host["components"])
+        if not host.get("product") or not host.get("repository"):
+            raise ValueError(f"Host {host['host']} has no product or repository type.")
+        hosts.append(host)
+
+    if not hosts:
+        raise ValueError(f"No hosts found in inventory {path}.")
+    return hosts
+
+def build_installer_command(host):
+    """Build the argument-driven installer command for a host."""
+    command = list(host.get("installer_command", DEFAULT_INSTALLER_COMMAND))
+    command += ["-r", host["repository"]]
+    # Several products are installed in one batch on the host
+    products = host["product"] if isinstance(host["product"], list) else [host["product"]]
+    for product in products:
+        command += ["-p", product]
+    if host.get("components"):
+        command += ["-c", host["components"]]
+    if host.get("solution"):
+        command += ["-s", host["solution"]]
+    if host.get("repo_mirror"):
+        command += ["--repo-mirror", host["repo_mirror"]]
+    if host.get("verbose"):
+        command.append("--verbose")
+    if host.get("restart"):
+        command.append("--restart")
+    if host.get("no_repo_check"):
+        command.append("--no-repo-check")
+    return command
+
+class FleetRun:
+    """
+    Runs the installer on every host of an inventory with a bounded worker pool,
+    keeping a log per host and reporting aggregate progress.
+    """
+
+    def __init__(self, hosts, transport, workers=DEFAULT_WORKERS, log_dir=DEFAULT_LOG_DIR, output_callback=print):
+        self.hosts = hosts
+        self.transport = transport
+        self.workers = max(1, workers)
+        self.log_dir = log_dir
+        self.output_callback = output_callback
+        self.results = {}
+        self._lock = threading.Lock()
+        self._running = 0
+
+    def _run_host(self, host):
+        name = host["host"]
+        log_path = os.path.join(self.log_dir, f"{name}.log")
+        with self._lock:
+            self._running += 1
+
+        start = time.monotonic()
+        try:
+            with open(log_path, "w", encoding="utf-8") as log_file:
+                returncode = self.transport.run(host, build_installer_command(host), log_file)
+            status = "ok" if returncode == 0 else "failed"
+            error = None if returncode == 0 else f"exit status {returncode}"
+        except Exception as e:
+            logger.error(f"Error running installer on {name}: {str(e)}")
+            status, error = "failed", str(e)
+
+        with self._lock:
+            self._running -= 1
+        return {"host": name, "status": status, "error": error, "duration": time.monotonic() - start, "log": log_path}
+
+    def _report_progress(self):
+        done = len(self.results)
+        ok = sum(1 for result in self.results.values() if result["status"] == "ok")
+        self.output_callback(
+            f"[{done}/{len(self.hosts)}] ok: {ok}, failed: {done - ok}, running: {self._running}, "
+            f"pending: {len(self.hosts) - done - self._running}"
+        )
+
+    def run(self):
+        """Run all hosts and return the per-host results in inventory order."""
+        os.makedirs(self.log_dir, exist_ok=True)
+        self.output_callback(f"Running installer on {len(self.hosts)} hosts with {self.workers} workers...")
+
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            futures = {executor.submit(self._run_host, host): host["host"] for host in self.hosts}
+            for future in as_completed(futures):
+                result = future.result()
+                with self._lock:
+                    self.results[result["host"]] = result
+                    self._report_progress()
+
+        return [self.results[host["host"]] for host in self.hosts]
+
+def format_results(results):
+    """Format the per-host results as a text table."""
+    width = max([len("HOST")] + [len(result["host"]) for result in results])
+    lines = [f"{'HOST':<{width}}  {'STATUS':<7} {'TIME':>8}  DETAILS"]
+    for result in results:
+        details = result["error"] or ""
+        if result["status"] != "ok":
+            details = f"{details} (see {result['log']})".strip()
+        lines.append(f"{result['host']:<{width}}  {result['status']:<7} {result['duration']:>7.1f}s  {details}".rstrip())
+    return "\n".join(lines)
+
+def run_fleet(args):
+    """
+    Run the installer on every host of the inventory given in args["fleet"].
+
+    Returns:
+        bool: True if the installer succeeded on every host.
+    """
+    if args.get("manifest"):
+        raise ValueError("--manifest is not supported in fleet mode, list the products of a host in the inventory instead.")
+    hosts = load_inventory(args["fleet"], {key: args.get(key) for key in HOST_SETTINGS})
+    transport_options = shlex.split(args.get("fleet_transport_options") or "")
+    transport = get_transport(args.get("fleet_transport") or "ssh", transport_options)
+    transport.timeout = args.get("fleet_timeout")
+
+    fleet_run = FleetRun(
+        hosts,
+        transport,
+        workers=args.get("fleet_workers") or DEFAULT_WORKERS,
+        log_dir=args.get("fleet_log_dir") or DEFAULT_LOG_DIR,
+    )
+    results = fleet_run.run()
+    print(format_results(results))
+    return all(result["status"] == "ok" for result in results)
@@ -1,19 +1,83 @@
 
 import npyscreen
 from shared import SUPPORTED_DISTROS, REPO_TYPES, detect_os, build_repo_command, ensure_percona_release
+from gui_tasks import TaskExecutor
+import collections
 import logging
-import json
-import subprocess
+from catalog import CatalogError, get_catalog
+from package_manager import run_package_manager
+import shlex
 
 logger = logging.getLogger(__name__)
 
+LOG_PANE_LINES = 500
+
 class InstallerApp(npyscreen.NPSAppManaged):
+    # Poll background tasks every 0.1s while waiting for keys
+    keypress_timeout_default = 1
+
     def onStart(self):
+        self.tasks = TaskExecutor()
+        self.log_lines = collections.deque(maxlen=LOG_PANE_LINES)
+        self.prefetch_versions()
+
         self.addForm("MAIN", MainForm, name="Percona Installer")
         self.addForm("REPO_SETUP", RepoSetupForm, name="Setup Repository")
         self.addForm("COMPONENTS", ComponentSelectionForm, name="Select Components")
 
-class MainForm(npyscreen.Form):
+    def onCleanExit(self):
+        self.tasks.shutdown()
+
+    def prefetch_versions(self):
+        """Download the repository index and build the version index of every distribution."""
+        def prefetch(task):
+            from fetch_versions import get_version_index, index_notice
+            task.output("Fetching available versions...")
+            get_version_index()
+            notice = index_notice()
+            if notice:
+                task.output(f"Warning: {notice}")
+            task.output("Versions of all distributions loaded.")
+
+        self.tasks.submit(
+            "Fetching versions", prefetch,
+            on_error=lambda e: self.log_lines.append(f"Error fetching versions: {str(e)}")
+        )
+
+class BackgroundTasksMixin:
+    """
+    Adds a status line with a spinner, a scrolling log pane and a cancel button to a
+    form, and keeps them updated from the background tasks while the form waits for keys.
+    """
+
+    def add_task_widgets(self):
+        self.cancel_button = self.add(npyscreen.ButtonPress, name="Cancel running tasks")
+        self.cancel_button.whenPressed = self.cancel_tasks
+        self.status = self.add(npyscreen.FixedText, value="Idle", editable=False)
+        self.log_pane = self.add(npyscreen.BufferPager, max_height=3, editable=False)
+
+    def while_waiting(self):
+        app = self.parentApp
+        app.log_lines.extend(app.tasks.poll())
+        self.refresh_task_widgets()
+
+    def refresh_task_widgets(self):
+        app = self.parentApp
+        status = app.tasks.status()
+        changed = status != self.status.value or len(self.log_pane.values) != len(app.log_lines) \
+            or (app.log_lines and self.log_pane.values and self.log_pane.values[-1] != app.log_lines[-1])
+        if not changed:
+            return
+
+        self.status.value = status
+        self.log_pane.clearBuffer()
+        self.log_pane.buffer(list(app.log_lines))
+        self.display()
+
+    def cancel_tasks(self):
+        self.parentApp.tasks.cancel_all()
+
+class MainForm(BackgroundTasksMixin, npyscreen.Form):
     def create(self):
         self.add(npyscreen.TitleText, name="Welcome to Percona Installer!")
 
@@ -28,11 +92,16 @@ class MainForm(npyscreen.Form):
 
         self.version = self.add(
             npyscreen.TitleSelectOne,
-            max_height=8,
+            max_height=6,
             name="Select Version",
             values=["Select a distribution first"],
             scroll_exit=True
         )
+        self.version_list = None
+
+        # Selects the newest version matching a spec such as 17, latest or >=16,<17
+        self.version_spec = self.add(npyscreen.TitleText, name="Version Spec:", value="")
+        self.version_spec.when_value_edited = self.on_spec_change
 
         self.next_button = self.add(npyscreen.ButtonPress, name="Next")
         self.next_button.whenPressed = self.next_screen
@@ -40,6 +109,8 @@ class MainForm(npyscreen.Form):
         self.exit_button = self.add(npyscreen.ButtonPress, name="Exit")
         self.exit_button.whenPressed = self.exit_program
 
+        self.add_task_widgets()
+
     def afterEditing(self):
         pass  # Suppress default OK behavior
 
@@ -53,23 +124,62 @@ class MainForm(npyscreen.Form):
             self.display()
             return
 
-        prefix = SUPPORTED_DISTROS[selected_distro[0]]
-        try:
-            from fetch_versions import fetch_all_versions
-            all_versions = fetch_all_versions(prefix)
-            self.version.values = all_versions if all_versions else ["No versions available"]
-            self.version.value = 0 if all_versions else None
-        except Exception as e:
+        distribution = selected_distro[0]
+        prefix = SUPPORTED_DISTROS[distribution]
+
+        from fetch_versions import get_cached_versions, fetch_all_versions
+        all_versions = get_cached_versions(prefix)
+        if all_versions is not None:
+            self.show_versions(all_versions)
+            return
+
+        # Not prefetched yet, fetch in the background and show the result if the
+        # distribution is still selected by then
+        self.version.values = ["Loading versions..."]
+        self.version.value = None
+        self.version_list = None
+        self.display()
+
+        def on_done(versions):
+            if self.distro.get_selected_objects() == [distribution]:
+                self.show_versions(versions)
+
+        def on_error(e):
             self.version.values = [f"Error fetching versions: {str(e)}"]
             self.version.value = None
+            self.display()
+
+        self.parentApp.tasks.submit(
+            f"Fetching {distribution} versions", lambda task: fetch_all_versions(prefix),
+            on_done=on_done, on_error=on_error
+        )
 
+    def show_versions(self, all_versions):
+        from versions import VersionList
+        self.version_list = VersionList(all_versions) if all_versions else None
+        self.version.values = all_versions if all_versions else ["No versions available"]
+        self.version.value = 0 if all_versions else None
+        self.on_spec_change()
         self.display()
 
+    def on_spec_change(self):
+        from versions import VersionSpecError
+        spec = self.version_spec.value.strip()
+        if not spec or self.version_list is None:
+            return
+        try:
+            version = self.version_list.resolve(spec)
+        except VersionSpecError:
+            return  # Still being typed
+        if version is not None and version in self.version.values:
+            self.version.value = self.version.values.index(version)
+            self.version.display()
+
     def next_screen(self):
         selected_distro = self.distro.get_selected_objects()
         selected_version = self.version.get_selected_objects()
 
-        if not selected_distro or not selected_version:
+        if not selected_distro or not selected_version or self.version.value is None:
             npyscreen.notify_confirm("Please select a distribution and version first.", title="Error")
             return
 
@@ -82,7 +192,7 @@ class MainForm(npyscreen.Form):
         self.parentApp.setNextForm(None)
         self.parentApp.switchFormNow()
 
-class RepoSetupForm(npyscreen.Form):
+class RepoSetupForm(BackgroundTasksMixin, npyscreen.Form):
     def create(self):
         self.add(npyscreen.TitleText, name="Setup Repository:")
 
@@ -109,19 +219,21 @@ class RepoSetupForm(npyscreen.Form):
         self.exit_button = self.add(npyscreen.ButtonPress, name="Exit")
         self.exit_button.whenPressed = self.exit_program
 
+        self.add_task_widgets()
+
     def install_percona_release(self):
         """
-        Install the percona-release package using shared.ensure_percona_release.
+        Install the percona-release package using shared.ensure_percona_release in the background.
         """
-        def gui_output_callback(message):
-            npyscreen.notify_wait(message.strip())
-
-        try:
-            ensure_percona_release(gui_output_callback)
-        except Exception as e:
+        def on_error(e):
             npyscreen.notify_confirm(f"Failed to install percona-release: {str(e)}", title="Error")
             logger.error(f"Error installing percona-release: {str(e)}")
 
+        self.parentApp.tasks.submit(
+            "Installing percona-release", lambda task: ensure_percona_release(task.output, **task.command_options),
+            on_error=on_error
+        )
+
     def enable_repository(self):
         """
         Enable the selected repository using percona-release.
@@ -132,13 +244,24 @@ class RepoSetupForm(npyscreen.Form):
             npyscreen.notify_confirm("Please select a repository type first.", title="Error")
             return
 
-        try:
-            repo_command = build_repo_command(self.selected_distro, self.selected_version, selected_repo_type[0])
-            subprocess.run(repo_command, shell=True, check=True)
-            npyscreen.notify_confirm("Repository enabled successfully!", title="Success")
-        except subprocess.CalledProcessError as e:
+        repo_command = build_repo_command(self.selected_distro, self.selected_version, selected_repo_type[0])
+
+        def on_error(e):
             npyscreen.notify_confirm(f"Failed to enable repository: {str(e)}", title="Error")
             logger.error(f"Error enabling repository: {str(e)}")
+
+        def enable(task):
+            # percona-release refreshes the package lists, waiting for and retrying the package manager
+            task.output(f"$ {repo_command}")
+            run_package_manager(shlex.split(repo_command), task.output, **task.command_options)
+            task.check_cancelled()
+
+        self.parentApp.tasks.submit(
+            "Enabling repository", enable,
+            on_done=lambda result: npyscreen.notify_confirm("Repository enabled successfully!", title="Success"),
+            on_error=on_error
+        )
+
     def setup(self, distribution, version):
         self.selected_distro = distribution
         self.selected_version = version
@@ -146,7 +269,8 @@ class RepoSetupForm(npyscreen.Form):
 
     def next_screen(self):
         components_form = self.parentApp.getForm("COMPONENTS")
-        components_form.setup(self.selected_distro, self.selected_version)
+        selected_repo_type = self.repo_type.get_selected_objects()
+        components_form.setup(self.selected_distro, self.selected_version, selected_repo_type[0] if selected_repo_type else None)
         self.parentApp.switchForm("COMPONENTS")
 
     def back_to_main(self):
@@ -157,10 +281,17 @@ class RepoSetupForm(npyscreen.Form):
         self.parentApp.setNextForm(None)
         self.parentApp.switchFormNow()
 
-class ComponentSelectionForm(npyscreen.Form):
+class ComponentSelectionForm(BackgroundTasksMixin, npyscreen.Form):
     def create(self):
         self.add(npyscreen.TitleText, name="Select Components for Installation:")
 
+        # Filters the list by name, the selection of hidden components is kept
+        self.search = self.add(npyscreen.TitleText, name="Search:", value="")
+        self.search.when_value_edited = self.show_components
+        self.all_components = []
+        self.selected = set()
+        self.empty_message = "No components available"
+
         self.components = self.add(
             npyscreen.MultiSelect,
             max_height=10,
@@ -177,41 +308,93 @@ class ComponentSelectionForm(npyscreen.Form):
         self.exit_button = self.add(npyscreen.ButtonPress, name="Exit")
         self.exit_button.whenPressed = self.exit_program
 
-    def setup(self, distribution, version):
+        # Polls the background tasks, so the packages of the indexed repository show up
+        self.add_task_widgets()
+
+    def setup(self, distribution, version, repo_type=None):
         self.selected_distro = distribution
         self.selected_version = version
-        major_version = version.split(".")[0]
+        self.all_components = []
+        self.selected = set()
+        self.components.values = []
+        self.components.value = []
         try:
-            with open("components.json", "r") as file:
-                components_data = json.load(file)
-                components = components_data.get(distribution, {}).get("components", [])
-                components = [
-                    component.replace("{major}", major_version) if "{major}" in component else component
-                    for component in components
-                ]
-                self.components.values = components if components else ["No components available"]
+            self.all_components = get_catalog().names(distribution, version)
+            self.empty_message = "No components available"
         except FileNotFoundError:
-            self.components.values = ["Error: components.json not found"]
-        except json.JSONDecodeError as e:
-            self.components.values = ["Error: Failed to parse components.json"]
+            self.empty_message = "Error: components.json not found"
+        except CatalogError as e:
+            logger.error(str(e))
+            self.empty_message = "Error: Invalid components.json, see the installer log"
+        self.show_components()
+
+        if repo_type:
+            self.index_repository(distribution, version, repo_type)
+
+    def index_repository(self, distribution, version, repo_type):
+        """Add the other packages of the repository from the repository catalog, indexed in the background."""
+        from repo_catalog import repository_packages
+        repository = f"{SUPPORTED_DISTROS[distribution]}{version}"
+
+        def on_done(packages):
+            if (self.selected_distro, self.selected_version) != (distribution, version):
+                return
+            known = set(self.all_components)
+            self.all_components += [package for package in packages if package not in known]
+            self.show_components()
+
+        self.parentApp.tasks.submit(
+            f"Indexing {repository}", lambda task: repository_packages(repository, repo_type, output_callback=task.output),
+            on_done=on_done,
+            on_error=lambda e: logger.warning(f"Unable to list the packages of {repository}: {str(e)}")
+        )
+
+    def _remember_selection(self):
+        if not self.components.value:
+            if self.selected:
+                self.selected -= set(self.components.values)
+            return
+        known = set(self.all_components)
+        shown = set(self.components.values)
+        self.selected = {name for name in self.selected if name not in shown}
+        self.selected.update(
+            self.components.values[i] for i in self.components.value
+            if i < len(self.components.values) and self.components.values[i] in known
+        )
 
+    def show_components(self):
+        """Show the components matching the search."""
+        self._remember_selection()
+        search = (self.search.value or "").strip().lower()
+        shown = [name for name in self.all_components if search in name.lower()] if search else list(self.all_components)
+        if shown:
+            self.components.values = shown
+            self.components.value = [i for i, name in enumerate(shown) if name in self.selected] if self.selected else []
+        else:
+            self.components.values = ["No matching components" if self.all_components else self.empty_message]
+            self.components.value = []
         self.display()
 
     def install_components(self):
-        selected_components = [self.components.values[i] for i in self.components.value]
+        self._remember_selection()
+        selected_components = [name for name in self.all_components if name in self.selected]
         if not selected_components:
             npyscreen.notify_confirm("No components selected for installation.", title="Error")
             return
 
         try:
-            install_command = self.build_install_command(selected_components)
-            npyscreen.notify_confirm(f"Installation command: {install_command}", title="Installation")
+            install_command, hints = self.build_install_command(selected_components)
+            message = f"Installation command: {install_command}"
+            for component, missing in hints.items():
+                message += f"\n\nHint: {component} is usually installed together with {', '.join(missing)}."
+            npyscreen.notify_confirm(message, title="Installation")
         except Exception as e:
             npyscreen.notify_confirm(f"Error: {str(e)}", title="Installation Error")
 
     def build_install_command(self, selected_components):
         pkg_manager = detect_os()
-        return f"sudo {pkg_manager} install -y " + " ".join(selected_components)
+        packages, hints = get_catalog().resolve(self.selected_distro, self.selected_version, selected_components, pkg_manager)
+        return f"sudo {pkg_manager} install -y " + " ".join(packages), hints
 
     def back_to_repo_setup(self):
         self.parentApp.switchForm("REPO_SETUP")
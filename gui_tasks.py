@@ -0,0 +1,147 @@
+import logging
+import queue
+import subprocess
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from runner import CommandError, run_command
+
+logger = logging.getLogger(__name__)
+
+SPINNER_FRAMES = "|/-\\"
+
+class TaskCancelled(Exception):
+    """Raised inside a task that was cancelled."""
+
+class Task:
+    """
+    A unit of background work. The task function receives the task itself to report
+    output with `output()`, run commands with `run_command()` and check `cancelled`.
+    Commands run by other modules on behalf of the task take `command_options`.
+    """
+
+    def __init__(self, name, executor, on_done=None, on_error=None):
+        self.name = name
+        self.executor = executor
+        self.on_done = on_done
+        self.on_error = on_error
+        self.future = None
+        self._cancel_event = threading.Event()
+
+    @property
+    def cancelled(self):
+        return self._cancel_event.is_set()
+
+    def cancel(self):
+        """Request cancellation, the command the task is running is terminated."""
+        self._cancel_event.set()
+
+    @property
+    def command_options(self):
+        """
+        Arguments of runner.run_command for commands run on behalf of the task: in their
+        own process group without a terminal, and terminated if the task is cancelled.
+        """
+        return {"stdin": subprocess.DEVNULL, "new_session": True, "cancel_event": self._cancel_event}
+
+    def check_cancelled(self):
+        if self.cancelled:
+            raise TaskCancelled(f"{self.name} cancelled")
+
+    def output(self, message):
+        """Send a message to the log pane, can be used as an output_callback."""
+        for line in str(message).rstrip("\n").splitlines():
+            self.executor.messages.put(line)
+
+    def run_command(self, command, check=True):
+        """
+        Run a command, streaming its output line by line to the log pane.
+        The command runs with `command_options`.
+        """
+        self.check_cancelled()
+        self.output(f"$ {' '.join(command)}")
+        result = run_command(command, self.output, check=False, **self.command_options)
+        self.check_cancelled()
+        if check and not result.ok:
+            raise CommandError(result)
+        return result.returncode
+
+class TaskExecutor:
+    """
+    Runs tasks off the UI thread. The UI polls it periodically: `poll()` returns the
+    output produced since the last call and runs completion callbacks on the UI thread.
+    """
+
+    def __init__(self, max_workers=4):
+        self.pool = ThreadPoolExecutor(max_workers=max_workers)
+        self.messages = queue.Queue()
+        self.tasks = []
+        self._tick = 0
+
+    def submit(self, name, func, *args, on_done=None, on_error=None):
+        """Run func(task, *args) in the background and return the task."""
+        task = Task(name, self, on_done, on_error)
+        task.future = self.pool.submit(func, task, *args)
+        self.tasks.append(task)
+        logger.debug(f"Started background task: {name}")
+        return task
+
+    def running(self):
+        return [task for task in self.tasks if not task.future.done()]
+
+    def cancel_all(self):
+        for task in self.running():
+            task.output(f"Cancelling {task.name}...")
+            task.cancel()
+
+    def poll(self):
+        """
+        Collect finished tasks and pending output. Must be called from the UI thread.
+
+        Returns:
+            list: Output lines produced since the last call.
+        """
+        lines = self._drain()
+        for task in [task for task in self.tasks if task.future.done()]:
+            self.tasks.remove(task)
+            try:
+                result = task.future.result()
+            except TaskCancelled:
+                self.messages.put(f"{task.name} cancelled.")
+                continue
+            except Exception as e:
+                logger.error(f"Background task {task.name} failed: {str(e)}")
+                if task.cancelled:
+                    self.messages.put(f"{task.name} cancelled.")
+                elif task.on_error:
+                    task.on_error(e)
+                else:
+                    self.messages.put(f"{task.name} failed: {str(e)}")
+                continue
+            if task.cancelled:
+                self.messages.put(f"{task.name} cancelled.")
+            elif task.on_done:
+                task.on_done(result)
+
+        return lines + self._drain()
+
+    def _drain(self):
+        lines = []
+        while True:
+            try:
+                lines.append(self.messages.get_nowait())
+            except queue.Empty:
+                return lines
+
+    def status(self):
+        """Spinner and names of the running tasks, for a status line."""
+        running = self.running()
+        if not running:
+            return "Idle"
+        self._tick += 1
+        frame = SPINNER_FRAMES[self._tick % len(SPINNER_FRAMES)]
+        return f"{frame} {', '.join(task.name for task in running)}"
+
+    def shutdown(self):
+        self.cancel_all()
+        self.pool.shutdown(wait=False)
@@ -0,0 +1,227 @@
+import json
+import logging
+import os
+import platform
+import shlex
+import shutil
+import threading
+
+logger = logging.getLogger(__name__)
+
+OS_RELEASE_PATHS = ("/etc/os-release", "/usr/lib/os-release")
+CACHE_FILE = "host_facts.json"
+
+# Bump when the facts change, so older cache files are ignored
+FACTS_FORMAT = 1
+
+# Tools looked up on the PATH when the host is probed
+TOOLS = ("percona-release", "sudo", "systemctl", "psql", "apt-get", "dpkg-query", "yum", "dnf", "rpm")
+
+# Package manager per distribution id, tried for the id and then for each ID_LIKE entry
+PACKAGE_MANAGERS = {
+    "debian": "apt-get",
+    "ubuntu": "apt-get",
+    "rhel": "yum",
+    "centos": "yum",
+    "rocky": "yum",
+    "almalinux": "yum",
+    "fedora": "dnf",
+    # Supported releases of Oracle Linux (8 and later) ship dnf, the installer used yum there before
+    "ol": "dnf",
+}
+
+class HostFacts:
+    """
+    What the installer needs to know about the host, probed once per process.
+
+    Attributes:
+        system (str): Operating system, e.g. "Linux".
+        distro_id (str): ID of os-release, e.g. "ubuntu", "rocky".
+        id_like (list): ID_LIKE of os-release, e.g. ["rhel", "centos", "fedora"].
+        name (str): NAME of os-release, e.g. "Rocky Linux".
+        version_id (str): VERSION_ID of os-release, e.g. "22.04", "9.4".
+        codename (str): Release codename, e.g. "jammy", None on rpm based distributions.
+        package_manager (str): "apt-get", "yum" or "dnf", None if unsupported.
+        arch (str): Machine architecture, e.g. "x86_64".
+        tools (dict): Path of each tool looked up so far (all of TOOLS after a probe),
+            None if it is not installed.
+    """
+
+    def __init__(self, system, distro_id=None, id_like=None, name=None, version_id=None, codename=None,
+                 package_manager=None, arch=None, tools=None):
+        self.system = system
+        self.distro_id = distro_id
+        self.id_like = id_like or []
+        self.name = name
+        self.version_id = version_id
+        self.codename = codename
+        self.package_manager = package_manager
+        self.arch = arch
+        self.tools = tools if tools is not None else {}
+        self._lock = threading.Lock()
+
+    @property
+    def major_version(self):
+        return (self.version_id or "").split(".")[0]
+
+    def has_tool(self, name):
+        """
+        Return whether a tool is on the PATH. Tools found are remembered, missing ones are
+        looked up again, as the installer itself installs some, e.g. percona-release.
+        """
+        with self._lock:
+            if self.tools.get(name):
+                return True
+            self.tools[name] = shutil.which(name)
+            return self.tools[name] is not None
+
+    def unsupported_reason(self):
+        """Return why the installer cannot run on this host, or None if it can."""
+        if self.package_manager:
+            return None
+        if self.system == "Linux":
+            if self.distro_id is None:
+                return "Minimal Linux distribution detected. Unable to determine package manager."
+            return "Unsupported Linux distribution detected."
+        if self.system == "Windows":
+            return "Windows is not supported."
+        if self.system == "Darwin":
+            return "MacOS is not supported."
+        return "Unsupported operating system."
+
+    def to_dict(self):
+        return {
+            "system": self.system,
+            "distro_id": self.distro_id,
+            "id_like": self.id_like,
+            "name": self.name,
+            "version_id": self.version_id,
+            "codename": self.codename,
+            "package_manager": self.package_manager,
+            "arch": self.arch,
+        }
+
+    def __repr__(self):
+        return f"HostFacts({self.distro_id!r} {self.version_id!r}, {self.package_manager!r}, {self.arch!r})"
+
+def parse_os_release(text):
+    """
+    Parse os-release content: KEY=value lines with shell quoting and escapes, comments
+    and blank lines ignored (see os-release(5)).
+    """
+    values = {}
+    for line in text.splitlines():
+        line = line.strip()
+        if not line or line.startswith("#") or "=" not in line:
+            continue
+        key, value = line.split("=", 1)
+        try:
+            words = shlex.split(value)
+        except ValueError:
+            logger.warning(f"Ignoring malformed os-release line: {line}")
+            continue
+        values[key.strip()] = " ".join(words)
+    return values
+
+def _codename(values):
+    codename = values.get("VERSION_CODENAME") or values.get("UBUNTU_CODENAME")
+    if not codename:
+        # Older Debian releases only name it in VERSION, e.g. "10 (buster)"
+        version = values.get("VERSION", "")
+        if "(" in version and version.endswith(")"):
+            codename = version[version.rindex("(") + 1:-1].split()[0].lower()
+    return codename or None
+
+def _package_manager(distro_id, id_like):
+    for candidate in [distro_id] + id_like:
+        if candidate in PACKAGE_MANAGERS:
+            return PACKAGE_MANAGERS[candidate]
+    return None
+
+def _os_release_path():
+    for path in OS_RELEASE_PATHS:
+        if os.path.exists(path):
+            return path
+    return None
+
+def probe_host():
+    """Probe the host: parse os-release and look up the tools. Does not use the cache."""
+    system = platform.system()
+    arch = platform.machine()
+    path = _os_release_path() if system == "Linux" else None
+    if path is None:
+        facts = HostFacts(system, arch=arch)
+    else:
+        with open(path, "r", encoding="utf-8") as file:
+            values = parse_os_release(file.read())
+        distro_id = values.get("ID", "linux").lower()
+        id_like = values.get("ID_LIKE", "").lower().split()
+        facts = HostFacts(
+            system,
+            distro_id=distro_id,
+            id_like=id_like,
+            name=values.get("NAME"),
+            version_id=values.get("VERSION_ID"),
+            codename=_codename(values),
+            package_manager=_package_manager(distro_id, id_like),
+            arch=arch,
+        )
+    facts.tools = {tool: shutil.which(tool) for tool in TOOLS}
+    return facts
+
+def _source_key():
+    """Identifies the os-release file the facts were parsed from, the cache is dropped when it changes."""
+    path = _os_release_path()
+    if path is None:
+        return f"{platform.system()}:{platform.machine()}"
+    stat = os.stat(path)
+    return f"{path}:{stat.st_mtime_ns}:{stat.st_size}:{platform.machine()}"
+
+def _load_cached(cache_path, source_key):
+    try:
+        with open(cache_path, "r", encoding="utf-8") as file:
+            cache = json.load(file)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+    if cache.get("format") != FACTS_FORMAT or cache.get("source_key") != source_key:
+        return None
+    # The tools change with the PATH and with what the installer installs, they are never
+    # cached and only looked up when asked for
+    return HostFacts(**cache["facts"])
+
+def _save_cached(cache_path, source_key, facts):
+    tmp_path = cache_path + ".tmp"
+    try:
+        with open(tmp_path, "w", encoding="utf-8") as file:
+            json.dump({"format": FACTS_FORMAT, "source_key": source_key, "facts": facts.to_dict()}, file)
+        os.replace(tmp_path, cache_path)
+    except OSError as e:
+        logger.warning(f"Unable to cache the host facts: {str(e)}")
+
+_facts = None
+_facts_lock = threading.Lock()
+
+def get_host_facts(refresh=False):
+    """
+    Return the facts of the host. They are probed once per process and cached on disk
+    until os-release changes, e.g. after a distribution upgrade.
+    """
+    global _facts
+    with _facts_lock:
+        if _facts is None or refresh:
+            from shared import get_cache_dir
+            cache_path = os.path.join(get_cache_dir(), CACHE_FILE)
+            source_key = _source_key()
+            facts = None if refresh else _load_cached(cache_path, source_key)
+            if facts is None:
+                facts = probe_host()
+                _save_cached(cache_path, source_key, facts)
+                logger.info(f"Probed host: {facts}")
+            _facts = facts
+        return _facts
+
+def set_host_facts(facts):
+    """Replace the facts of the process, e.g. to describe another host in benchmarks. None probes again."""
+    global _facts
+    with _facts_lock:
+        _facts = facts
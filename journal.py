@@ -0,0 +1,140 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+
+from shared import get_cache_dir
+
+logger = logging.getLogger(__name__)
+
+JOURNAL_FILE = "journal.json"
+
+# Bump when the journal layout changes, so older journals are ignored
+JOURNAL_FORMAT = 1
+
+def _digest(value):
+    return hashlib.sha256(json.dumps(value, sort_keys=True).encode("utf-8")).hexdigest()
+
+def _serializable(result):
+    """Results are kept so resumed steps can hand them on; those that are not JSON are dropped."""
+    try:
+        json.dumps(result)
+        return result
+    except (TypeError, ValueError):
+        return None
+
+class Journal:
+    """
+    Completed steps of an install, written to disk after every step so that a rerun
+    with the same inputs resumes at the first incomplete step.
+
+    Each step is recorded with the inputs that produced it (e.g. its command), and is
+    only skipped on resume while they are unchanged. A journal belongs to the inputs of
+    the run: it is discarded when a different install is started, and removed once the
+    install completed.
+    """
+
+    def __init__(self, inputs, path=None):
+        self.inputs = inputs
+        self.key = _digest(inputs)
+        self.path = path or os.path.join(get_cache_dir(), JOURNAL_FILE)
+        self.steps = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def open(cls, inputs, restart=False, path=None):
+        """
+        Return the journal of the run with these inputs, with the steps completed by an
+        interrupted earlier run unless restart is True.
+        """
+        journal = cls(inputs, path)
+        try:
+            with open(journal.path, "r", encoding="utf-8") as file:
+                data = json.load(file)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return journal
+
+        if restart:
+            logger.info(f"Discarding the journal of the earlier run: {journal.path}")
+        elif data.get("format") != JOURNAL_FORMAT or data.get("key") != journal.key:
+            logger.info("Discarding the journal of an install with different inputs.")
+        else:
+            journal.steps = data.get("steps", {})
+        return journal
+
+    def completed(self, name, inputs=None):
+        """Return the record of a step completed with the same inputs, or None."""
+        with self._lock:
+            entry = self.steps.get(name)
+        if entry is None or entry.get("inputs") != _digest(inputs):
+            return None
+        return entry
+
+    def record(self, name, result=None, inputs=None):
+        """Record a completed step and persist the journal."""
+        with self._lock:
+            self.steps[name] = {
+                "inputs": _digest(inputs),
+                "result": _serializable(result),
+                "completed_at": time.time(),
+            }
+            try:
+                self._save()
+            except OSError as e:
+                logger.warning(f"Unable to write the install journal {self.path}: {str(e)}")
+
+    def _save(self):
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as file:
+            json.dump({
+                "format": JOURNAL_FORMAT,
+                "key": self.key,
+                "inputs": self.inputs,
+                "steps": self.steps,
+            }, file, indent=2)
+        os.replace(tmp_path, self.path)
+
+    def finish(self):
+        """Remove the journal once the install completed."""
+        with self._lock:
+            self.steps = {}
+            try:
+                os.remove(self.path)
+            except FileNotFoundError:
+                pass
+
+_journal = None
+
+def set_journal(journal):
+    """Make journal the journal of the install in progress, None to stop journaling."""
+    global _journal
+    _journal = journal
+
+def get_journal():
+    """Return the journal of the install in progress, or None."""
+    return _journal
+
+def checkpoint(name, func, inputs=None, output_callback=None):
+    """
+    Run a step of a solution once per install: if the journal of the install in
+    progress has it completed with the same inputs, it is skipped and its recorded
+    result returned. Without a journal, e.g. in the GUI, func is simply called.
+
+    Usage:
+        checkpoint("pg_tde_demo:create_database", lambda: sql.run([...]), inputs=database)
+    """
+    journal = _journal
+    if journal is not None:
+        entry = journal.completed(name, inputs)
+        if entry is not None:
+            logger.info(f"Skipping {name}, completed by an earlier run.")
+            if output_callback:
+                output_callback(f"Skipping {name}, completed by an earlier run.\n")
+            return entry["result"]
+
+    result = func()
+    if journal is not None:
+        journal.record(name, result, inputs)
+    return result
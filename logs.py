@@ -0,0 +1,186 @@
+import atexit
+import contextlib
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import threading
+import time
+import uuid
+
+logger = logging.getLogger(__name__)
+
+# Shared by all users when writable (e.g. when running with sudo), per-user cache otherwise
+SHARED_LOG_DIR = "/var/log/percona_installer"
+# Every run writes its own file, concurrent installers never rotate a file another one writes
+LOG_FILE_PREFIX = "installer-"
+LOG_MAX_BYTES = 10 * 1024 ** 2
+LOG_BACKUPS = 5
+# Log files of older runs are deleted, keeping those of the last LOG_KEEP_RUNS runs
+LOG_KEEP_RUNS = 20
+
+LOG_LEVELS = ("debug", "info", "warning", "error")
+DEFAULT_LOG_LEVEL = "debug"
+CONSOLE_FORMAT = "%(asctime)s [%(levelname)s] %(message)s"
+
+# Identifies the records of one installer run in the shared log file
+RUN_ID = uuid.uuid4().hex[:12]
+
+_local = threading.local()
+_listener = None
+_log_path = None
+
+def get_phase():
+    """Return the phase of the current thread, e.g. the plan step it runs, or None."""
+    return getattr(_local, "phase", None)
+
+@contextlib.contextmanager
+def phase(name):
+    """Tag the log records of the current thread with a phase while the block runs."""
+    previous = get_phase()
+    _local.phase = name
+    try:
+        yield
+    finally:
+        _local.phase = previous
+
+class _QueueHandler(logging.handlers.QueueHandler):
+    """
+    Puts records on the queue of the background writer, tagged with the run id and the
+    phase of the thread that logs them.
+
+    Unlike the stock QueueHandler the record is neither formatted nor copied here: the
+    root logger has no other handler, so merging the message arguments is enough and
+    keeps the cost in the logging thread low when commands are chatty.
+    """
+
+    def prepare(self, record):
+        record.run_id = RUN_ID
+        record.phase = get_phase()
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            # Tracebacks hold frames that must not be read from another thread
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line: time, level, logger, message, run id, phase and extra fields."""
+
+    # Extra fields passed with extra={...} that are written when present
+    EXTRA_FIELDS = ("command", "stream")
+
+    def format(self, record):
+        entry = {
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(record.created)) + f".{int(record.msecs):03d}",
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            "run_id": getattr(record, "run_id", RUN_ID),
+            "phase": getattr(record, "phase", None),
+            "thread": record.threadName,
+        }
+        for field in self.EXTRA_FIELDS:
+            value = getattr(record, field, None)
+            if value is not None:
+                entry[field] = value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exception"] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False)
+
+def get_log_dir():
+    """Return the log directory, preferring the one shared by all users."""
+    directory = os.environ.get("PERCONA_INSTALLER_LOG_DIR") or SHARED_LOG_DIR
+    try:
+        os.makedirs(directory, mode=0o755, exist_ok=True)
+        if os.access(directory, os.W_OK):
+            return directory
+    except OSError:
+        pass
+    from shared import get_cache_dir
+    return get_cache_dir("logs")
+
+def get_log_path():
+    """Return the log file of this run, None before configure_logging."""
+    return _log_path
+
+def _prune_logs(directory, keep):
+    """Delete the log files of all but the last `keep` runs, those of other users only if permitted."""
+    runs = {}
+    for name in os.listdir(directory):
+        if name.startswith(LOG_FILE_PREFIX) and ".log" in name:
+            # Rotated files belong to the run of their base file
+            runs.setdefault(name.split(".log", 1)[0], []).append(name)
+    for run in sorted(runs)[:max(len(runs) - keep, 0)]:
+        for name in runs[run]:
+            try:
+                os.unlink(os.path.join(directory, name))
+            except OSError:
+                pass
+
+def configure_logging(level=DEFAULT_LOG_LEVEL, verbose=False):
+    """
+    Configure logging for the installer: records are put on a queue by the threads
+    that log them and written by a background thread, as JSON lines, to a log file of
+    the run, rotated by size. The files of runs older than the last LOG_KEEP_RUNS are
+    deleted. With verbose, records from INFO up are also shown on stderr.
+
+    Called by the entry point instead of at import time, so importing modules has no
+    side effects.
+
+    Args:
+        level (str): One of LOG_LEVELS, the lowest level written to the log file.
+        verbose (bool): Also show the records on stderr.
+
+    Returns:
+        str: The log file.
+    """
+    global _listener, _log_path
+
+    if level not in LOG_LEVELS:
+        raise ValueError(f"Invalid log level '{level}'. Expected one of: {', '.join(LOG_LEVELS)}.")
+    if _listener is not None:
+        stop_logging()
+
+    directory = get_log_dir()
+    # Named by start time, so the files sort by run
+    _log_path = os.path.join(directory, f"{LOG_FILE_PREFIX}{time.strftime('%Y%m%d-%H%M%S')}-{RUN_ID}.log")
+    _prune_logs(directory, LOG_KEEP_RUNS - 1)
+    file_handler = logging.handlers.RotatingFileHandler(
+        _log_path, maxBytes=LOG_MAX_BYTES, backupCount=LOG_BACKUPS, encoding="utf-8", delay=True
+    )
+    file_handler.setFormatter(JsonFormatter())
+    handlers = [file_handler]
+    if verbose:
+        console_handler = logging.StreamHandler()
+        console_handler.setLevel(logging.INFO)
+        console_handler.setFormatter(logging.Formatter(CONSOLE_FORMAT))
+        handlers.append(console_handler)
+
+    records = queue.Queue(-1)
+    queue_handler = _QueueHandler(records)
+
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(queue_handler)
+    root.setLevel(getattr(logging, level.upper()))
+
+    _listener = logging.handlers.QueueListener(records, *handlers, respect_handler_level=True)
+    _listener.start()
+    atexit.register(stop_logging)
+    logger.info(f"Logging run {RUN_ID} to {_log_path} at level {level}")
+    return _log_path
+
+def stop_logging():
+    """Write the queued records and stop the background writer, called at exit."""
+    global _listener
+    listener, _listener = _listener, None
+    if listener is not None:
+        listener.stop()
+        for handler in listener.handlers:
+            handler.close()
@@ -1,6 +1,60 @@
 import sys
-from cli import run_cli
-from gui import run_gui
+import time
+
+_START_TIME = time.perf_counter()
+
+# Startup phases and their durations in seconds, reported by --timings
+_timings = []
+
+# Arguments that select the argument-driven CLI mode
+CLI_MODE_ARGS = ("repository", "product", "components", "solution", "manifest")
+
+def _timed(label, func, *args, **kwargs):
+    """
+    Run func and record how long it took under the given label.
+    Imports of the heavy modules go through here so --timings can report them.
+    """
+    start = time.perf_counter()
+    try:
+        return func(*args, **kwargs)
+    finally:
+        _timings.append((label, time.perf_counter() - start))
+
+def _import_cli():
+    from cli import run_cli
+    return run_cli
+
+def _import_gui():
+    from gui import run_gui
+    return run_gui
+
+def print_timings():
+    """
+    Print the startup cost of each phase to stderr.
+    For a per-module breakdown use `python -X importtime main.py ...`.
+    """
+    print("Startup timings:", file=sys.stderr)
+    for label, duration in _timings:
+        print(f"  {label:<28} {duration * 1000:8.1f} ms", file=sys.stderr)
+    print(f"  {'total':<28} {(time.perf_counter() - _START_TIME) * 1000:8.1f} ms", file=sys.stderr)
+
+    runner = sys.modules.get("runner")
+    if runner and runner.get_runner().history:
+        print("Command timings (wall / cpu):", file=sys.stderr)
+        for result in runner.get_runner().history:
+            cpu_time = f"{result.cpu_time:7.2f} s" if result.cpu_time is not None else "      - s"
+            print(f"  {result.wall_time:7.2f} s {cpu_time}  [{result.returncode}] {result.command_line}", file=sys.stderr)
+
+def write_trace(tracer, root, path, trace_format):
+    """Close the root span and write the trace, called when the installer exits."""
+    if root.duration is None:
+        tracer.end_span(root)
+    root.set(startup_ms={label: round(duration * 1000, 1) for label, duration in _timings})
+    try:
+        tracer.write(path, trace_format)
+        print(f"Trace written to {path}", file=sys.stderr)
+    except OSError as e:
+        print(f"Unable to write trace to {path}: {e}", file=sys.stderr)
 
 def parse_arguments(args=None):
     """
@@ -13,10 +67,41 @@ def parse_arguments(args=None):
         import argparse
         parser = argparse.ArgumentParser(description="Percona Installer Argument Parser")
         parser.add_argument('-r', '--repository', type=str, help="release/testing/experimental")
-        parser.add_argument('-p', '--product', type=str, help="ppg-17.0/ps-80/pxc-80/psmdb-80")
+        parser.add_argument('-p', '--product', type=str, action='append',
+                            help="ppg-17.0/ps-80/pxc-80/psmdb-80, repeat it to install several products at once, "
+                                 "with their components as PRODUCT:COMPONENTS")
         parser.add_argument('-c', '--components', type=str, help="Comma-separated list of components")
+        parser.add_argument('--manifest', type=str, metavar="FILE", help="Install the products of a JSON manifest at once")
         parser.add_argument('-s', '--solution', type=str, help="pg_tde_demo")
-        parser.add_argument('--verbose', action='store_true', help="Enable verbose output")
+        parser.add_argument('--verbose', action='store_true', help="Enable verbose output, log records are also shown on stderr")
+        parser.add_argument('--log-level', type=str, choices=["debug", "info", "warning", "error"],
+                            help="Lowest level written to the log file (default debug)")
+        parser.add_argument('--plan', action='store_true', help="Print the install plan without executing it")
+        parser.add_argument('--refresh-index', action='store_true', help="Revalidate the cached repository index now")
+        parser.add_argument('--offline', action='store_true', help="Use the cached repository index without network access")
+        parser.add_argument('--index-ttl', type=int, help="Seconds the cached repository index is used without revalidation")
+        parser.add_argument('--fleet', type=str, metavar="INVENTORY", help="Run the installer on every host of a JSON inventory")
+        parser.add_argument('--fleet-workers', type=int, help="Number of hosts installed concurrently in fleet mode (default 10)")
+        parser.add_argument('--fleet-transport', type=str, help="ssh/docker/local or module:Class (default ssh)")
+        parser.add_argument('--fleet-transport-options', type=str, help="Extra options passed to the fleet transport command")
+        parser.add_argument('--fleet-timeout', type=int, help="Seconds after which the installer is stopped on a host in fleet mode")
+        parser.add_argument('--fleet-log-dir', type=str, help="Directory for per-host logs in fleet mode (default fleet-logs)")
+        parser.add_argument('--repo-mirror', type=str, help="URL of a package proxy to use instead of repo.percona.com")
+        parser.add_argument('--no-repo-check', action='store_true', help="Do not check that the repository has packages for this host before installing")
+        parser.add_argument('--serve-package-proxy', action='store_true', help="Run a caching package proxy for the Percona repositories")
+        parser.add_argument('--proxy-port', type=int, help="Port of the package proxy (default 8080)")
+        parser.add_argument('--proxy-cache-dir', type=str, help="Storage directory of the package proxy")
+        parser.add_argument('--proxy-max-size', type=str, help="Maximum size of the package proxy cache, e.g. 20G (default 20G)")
+        parser.add_argument('--proxy-upstream', type=str, help="Upstream repository of the package proxy (default https://repo.percona.com)")
+        parser.add_argument('--bundle', type=str, metavar="FILE", help="Write an offline bundle of the product (-r, -p, -c) to FILE")
+        parser.add_argument('--from-bundle', type=str, metavar="FILE", help="Install from an offline bundle without network access")
+        journal_group = parser.add_mutually_exclusive_group()
+        journal_group.add_argument('--resume', action='store_true', help="Resume the interrupted install of the same product, fail if there is none")
+        journal_group.add_argument('--restart', action='store_true', help="Discard the journal of an interrupted install and start from the beginning")
+        parser.add_argument('--timings', action='store_true', help="Print startup and import timings to stderr")
+        parser.add_argument('--trace', type=str, metavar="FILE", help="Write a trace of the install phases to FILE")
+        parser.add_argument('--trace-format', type=str, choices=["chrome", "summary"], default="chrome",
+                            help="chrome: trace for chrome://tracing or Perfetto (default), summary: JSON span tree with per-phase totals")
         parsed_args = parser.parse_args(args)
         return vars(parsed_args)
     except ImportError:
@@ -46,10 +131,72 @@ def main():
     """
     Main entry point for the installer.
     """
-    args = parse_arguments()
-    
+    args = _timed("parse arguments", parse_arguments)
+
+    from logs import configure_logging
+    try:
+        _timed(
+            "configure logging", configure_logging,
+            level=(args or {}).get("log_level") or "debug", verbose=bool(args and args.get("verbose"))
+        )
+    except (ValueError, OSError) as e:
+        print(f"Error: Unable to configure logging: {e}")
+        sys.exit(1)
+
+    if args and args.get("timings"):
+        import atexit
+        atexit.register(print_timings)
+
+    if args and args.get("trace"):
+        import atexit
+        from tracing import enable_tracing
+        tracer = enable_tracing()
+        root = tracer.start_span("percona_installer", argv=sys.argv[1:])
+        atexit.register(write_trace, tracer, root, args["trace"], args.get("trace_format") or "chrome")
+
+    if args and (args.get("refresh_index") or args.get("offline") or args.get("index_ttl") is not None):
+        from fetch_versions import configure_index_cache
+        try:
+            configure_index_cache(
+                refresh=args.get("refresh_index"),
+                offline=args.get("offline"),
+                ttl=args.get("index_ttl")
+            )
+        except ValueError as e:
+            print(f"Error: {e}")
+            sys.exit(1)
+
+    if args and args.get("serve_package_proxy"):
+        import package_proxy
+        package_proxy.serve_package_proxy(
+            port=args.get("proxy_port") or package_proxy.DEFAULT_PORT,
+            cache_dir=args.get("proxy_cache_dir"),
+            max_size=package_proxy.parse_size(args.get("proxy_max_size") or package_proxy.DEFAULT_MAX_SIZE),
+            upstream_url=args.get("proxy_upstream") or package_proxy.UPSTREAM_URL
+        )
+        return
+
+    if args and args.get("fleet"):
+        from fleet import run_fleet
+        try:
+            success = run_fleet(args)
+        except Exception as e:
+            print(f"Error in fleet mode: {e}")
+            sys.exit(1)
+        sys.exit(0 if success else 1)
+
+    if args and (args.get("bundle") or args.get("from_bundle")):
+        from bundle import run_bundle
+        try:
+            run_bundle(args)
+        except Exception as e:
+            print(f"Error in bundle mode: {e}")
+            sys.exit(1)
+        return
+
     # If arguments are parsed but empty or invalid, fallback to interactive mode
-    if args and any(args.values()):
+    if args and any(args.get(name) for name in CLI_MODE_ARGS):
+        run_cli = _timed("import cli", _import_cli)
         try:
             run_cli(args)
             display_percona_ascii_art()
@@ -64,9 +211,11 @@ def main():
         choice = input("Select a mode (1 or 2): ").strip()
 
         if choice == "1":
+            run_cli = _timed("import cli", _import_cli)
             run_cli()  # Interactive CLI mode
             display_percona_ascii_art()
         elif choice == "2":
+            run_gui = _timed("import gui", _import_gui)
             run_gui()
         else:
             print("Invalid choice. Exiting.")
@@ -0,0 +1,266 @@
+import contextlib
+import fcntl
+import logging
+import os
+import re
+import threading
+import time
+
+from runner import CommandError, run_command
+
+logger = logging.getLogger(__name__)
+
+# How long a package manager command waits in total for a lock held by another process
+LOCK_TIMEOUT = int(os.environ.get("PERCONA_INSTALLER_LOCK_TIMEOUT", 600))
+# Attempts of a package manager command failing with a network or mirror error
+NETWORK_ATTEMPTS = 3
+BACKOFF = 2.0
+MAX_BACKOFF = 60.0
+
+# Serializes installers of all users on the host, in the per-user cache only if no lock directory can be used
+INSTALLER_LOCK_FILE = "percona_installer.lock"
+INSTALLER_LOCK_DIRS = ("/run/lock", "/var/lock")
+
+LOCKED = "locked"
+TRANSIENT = "transient"
+
+# Messages of apt, dpkg, yum, dnf and rpm when another process holds their lock
+LOCK_PATTERNS = [re.compile(pattern) for pattern in (
+    r"Could not get lock /var/(lib|cache)/",
+    r"Unable to (acquire|lock) the (dpkg frontend|administration directory|download directory)",
+    r"dpkg status database is locked",
+    r"Another app is currently holding the yum lock",
+    r"Waiting for process with pid \d+ to finish",
+    r"can't create transaction lock on",
+)]
+
+# Messages of network and mirror errors that usually go away when retried
+TRANSIENT_PATTERNS = [re.compile(pattern, re.IGNORECASE) for pattern in (
+    r"Temporary failure (in name )?resolv",
+    r"Could not (connect|resolve)",
+    r"Connection (timed out|reset|refused)",
+    r"Failed to fetch .* (50\d|Hash Sum mismatch|Connection)",
+    r"Hash Sum mismatch",
+    r"Some index files failed to download",
+    r"Curl error \(\d+\)",
+    r"Cannot download repomd\.xml",
+    r"Failed to download (metadata|packages)",
+    r"All mirrors were tried",
+    r"Cannot retrieve repository metadata",
+    r"Operation too slow",
+)]
+
+# The process holding the lock, as named by apt ("held by process 1234 (unattended-upgr)") or dnf/yum
+_HOLDER_PATTERNS = [
+    re.compile(r"held by process (?P<pid>\d+) \((?P<name>[^)]+)\)"),
+    re.compile(r"Waiting for process with pid (?P<pid>\d+)"),
+    re.compile(r"The other application is: (?P<name>\S+)"),
+]
+
+class PackageManagerLockTimeout(Exception):
+    """Raised when the package manager lock stays held by another process for too long."""
+
+def classify_failure(result):
+    """Return LOCKED or TRANSIENT if a failed command is worth retrying, else None."""
+    output = "\n".join(result.stderr_lines + result.stdout_lines)
+    if any(pattern.search(output) for pattern in LOCK_PATTERNS):
+        return LOCKED
+    if any(pattern.search(output) for pattern in TRANSIENT_PATTERNS):
+        return TRANSIENT
+    return None
+
+def lock_holder(result):
+    """Describe the process holding the package manager lock from the command output, or None."""
+    output = "\n".join(result.stderr_lines + result.stdout_lines)
+    for pattern in _HOLDER_PATTERNS:
+        match = pattern.search(output)
+        if match:
+            groups = match.groupdict()
+            if groups.get("name") and groups.get("pid"):
+                return f"{groups['name']} (pid {groups['pid']})"
+            return groups.get("name") or f"pid {groups['pid']}"
+    return None
+
+def run_package_manager(argv, output_callback=None, lock_timeout=None, attempts=NETWORK_ATTEMPTS, **kwargs):
+    """
+    Run a package manager command, waiting with exponential backoff while another process
+    (unattended-upgrades, cloud-init, another installer) holds its lock, and retrying
+    network and mirror errors. Other failures are raised at once.
+
+    Args:
+        lock_timeout (float): Seconds to wait for the lock in total, LOCK_TIMEOUT if None.
+        attempts (int): Attempts for network and mirror errors.
+        **kwargs: Arguments of run_command, a cancel_event also ends the wait between attempts.
+
+    Returns:
+        CommandResult: The record of the successful execution.
+
+    Raises:
+        CommandError: If the command failed.
+        PackageManagerLockTimeout: If the lock was held for longer than lock_timeout.
+    """
+    lock_timeout = LOCK_TIMEOUT if lock_timeout is None else lock_timeout
+    # Installers of the host take turns, interactive and GUI installs included
+    with installer_lock(output_callback or logger.info, lock_timeout):
+        return _run_package_manager(argv, output_callback, lock_timeout, attempts, **kwargs)
+
+def _run_package_manager(argv, output_callback, lock_timeout, attempts, **kwargs):
+    deadline = time.monotonic() + lock_timeout
+    delay = BACKOFF
+    network_failures = 0
+    cancel_event = kwargs.get("cancel_event")
+
+    while True:
+        result = run_command(argv, output_callback, check=False, **kwargs)
+        if result.ok and not result.timed_out and not result.cancelled:
+            return result
+        if result.timed_out or result.cancelled:
+            raise CommandError(result)
+
+        failure = classify_failure(result)
+        if failure == LOCKED:
+            remaining = deadline - time.monotonic()
+            holder = lock_holder(result)
+            held_by = f" by {holder}" if holder else ""
+            if remaining <= 0:
+                raise PackageManagerLockTimeout(
+                    f"The package manager lock is still held{held_by} after {lock_timeout}s, giving up on: {result.command_line}"
+                )
+            wait = min(delay, remaining)
+            message = f"The package manager is locked{held_by}, retrying in {wait:.0f}s ({remaining:.0f}s left)..."
+        elif failure == TRANSIENT and network_failures + 1 < attempts:
+            network_failures += 1
+            wait = delay
+            message = f"Network or mirror error, retrying in {wait:.0f}s (attempt {network_failures + 1} of {attempts})..."
+        else:
+            raise CommandError(result)
+
+        logger.warning(f"{result.command_line}: {message}")
+        if output_callback:
+            output_callback(message)
+        if cancel_event is None:
+            time.sleep(wait)
+        elif cancel_event.wait(wait):
+            result.cancelled = True
+            raise CommandError(result)
+        delay = min(delay * 2, MAX_BACKOFF)
+
+def _open_lock_file(path):
+    """
+    Open a lock file shared by all users of the host: created writable for everyone, or
+    opened as it is.
+
+    Returns:
+        tuple: The file and whether it is writable.
+    """
+    try:
+        fd = os.open(path, os.O_RDWR | os.O_CREAT | os.O_EXCL, 0o666)
+        # Not narrowed by the umask, so installers of other users can open it as well
+        os.fchmod(fd, 0o666)
+        return os.fdopen(fd, "r+"), True
+    except FileExistsError:
+        pass
+    # Without O_CREAT: fs.protected_regular refuses it for files of other users in sticky directories
+    try:
+        return os.fdopen(os.open(path, os.O_RDWR), "r+"), True
+    except PermissionError:
+        # flock works on a read-only descriptor, only the pid of the holder cannot be written
+        return os.fdopen(os.open(path, os.O_RDONLY), "r"), False
+
+def _open_installer_lock():
+    """
+    Open the lock file shared by the installers of the host, or of the user if none of
+    the lock directories can be used.
+
+    Raises:
+        OSError: If PERCONA_INSTALLER_LOCK_FILE is set and cannot be opened.
+    """
+    path = os.environ.get("PERCONA_INSTALLER_LOCK_FILE")
+    if path:
+        return _open_lock_file(path) + (path,)
+
+    errors = []
+    for directory in INSTALLER_LOCK_DIRS:
+        candidate = os.path.join(directory, INSTALLER_LOCK_FILE)
+        try:
+            return _open_lock_file(candidate) + (candidate,)
+        except OSError as e:
+            errors.append(f"{candidate}: {e.strerror}")
+    from shared import get_cache_dir
+    path = os.path.join(get_cache_dir(), INSTALLER_LOCK_FILE)
+    logger.warning(
+        f"Unable to open the installer lock of the host ({'; '.join(errors)}), using {path}: "
+        f"installers of other users are not serialized with this one."
+    )
+    return _open_lock_file(path) + (path,)
+
+def _acquire_installer_lock(output_callback, timeout):
+    """Take the installer lock of the host, returning the file, whether it is writable and its path."""
+    file, writable, path = _open_installer_lock()
+    try:
+        deadline = time.monotonic() + timeout
+        delay = 1.0
+        while True:
+            try:
+                fcntl.flock(file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                break
+            except BlockingIOError:
+                file.seek(0)
+                holder = file.read().strip() or "unknown"
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise PackageManagerLockTimeout(f"Another installer (pid {holder}) is still running after {timeout}s.")
+                wait = min(delay, remaining)
+                output_callback(f"Waiting for another installer (pid {holder}) to finish, retrying in {wait:.0f}s...")
+                time.sleep(wait)
+                delay = min(delay * 2, MAX_BACKOFF)
+    except BaseException:
+        file.close()
+        raise
+
+    if writable:
+        file.seek(0)
+        file.truncate()
+        file.write(str(os.getpid()))
+        file.flush()
+    logger.info(f"Acquired the installer lock {path}")
+    return file, writable, path
+
+def _release_installer_lock(file, writable):
+    with file:
+        if writable:
+            file.seek(0)
+            file.truncate()
+        fcntl.flock(file, fcntl.LOCK_UN)
+
+# The installer lock held by this process and the number of holders; nested holders share it
+_held_lock = {"count": 0, "lock": None}
+_held_lock_guard = threading.Lock()
+
+@contextlib.contextmanager
+def installer_lock(output_callback=print, timeout=None):
+    """
+    Hold the installer lock of the host, so that concurrent installers run one after
+    the other instead of fighting over the package manager lock. Waits with exponential
+    backoff, reporting which installer holds it.
+
+    The lock is held by the process: it can be taken again while held, e.g. by
+    run_package_manager within an install, and is released with its outermost holder.
+
+    Raises:
+        PackageManagerLockTimeout: If another installer holds the lock for longer than timeout.
+    """
+    timeout = LOCK_TIMEOUT if timeout is None else timeout
+    with _held_lock_guard:
+        if not _held_lock["count"]:
+            _held_lock["lock"] = _acquire_installer_lock(output_callback, timeout)
+        _held_lock["count"] += 1
+    try:
+        yield _held_lock["lock"][2]
+    finally:
+        with _held_lock_guard:
+            _held_lock["count"] -= 1
+            if not _held_lock["count"]:
+                file, writable, _ = _held_lock["lock"]
+                _held_lock["lock"] = None
+                _release_installer_lock(file, writable)
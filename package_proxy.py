@@ -0,0 +1,395 @@
+import contextlib
+import hashlib
+import json
+import logging
+import os
+import shutil
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from shared import get_cache_dir
+
+logger = logging.getLogger(__name__)
+
+UPSTREAM_URL = "https://repo.percona.com"
+DEFAULT_PORT = 8080
+DEFAULT_MAX_SIZE = 20 * 1024 ** 3
+CHUNK_SIZE = 256 * 1024
+
+# Package files never change once published, so only they are cached.
+# Repository metadata (Release, Packages, repomd.xml, ...) is always fetched from upstream.
+CACHEABLE_SUFFIXES = (".deb", ".ddeb", ".rpm")
+
+STATS_PATH = "/_stats"
+
+# The index is written at most this often, and when the proxy stops
+INDEX_SAVE_INTERVAL = 5.0
+
+def parse_size(value):
+    """Parse a size such as 512M or 20G into bytes."""
+    value = str(value).strip().upper()
+    units = {"K": 1024, "M": 1024 ** 2, "G": 1024 ** 3, "T": 1024 ** 4}
+    if value and value[-1] in units:
+        return int(float(value[:-1]) * units[value[-1]])
+    return int(value)
+
+class PackageStore:
+    """
+    Content-addressed package storage with LRU eviction by total size.
+
+    Objects are stored once per SHA-256 digest under objects/; the index maps request
+    paths to digests in least-recently-used order and is persisted to index.json at most
+    every INDEX_SAVE_INTERVAL seconds and by flush(). The total size and the paths
+    referencing each object are tracked as entries come and go, so eviction does not
+    rescan the index.
+    """
+
+    def __init__(self, directory, max_size=DEFAULT_MAX_SIZE):
+        self.directory = directory
+        self.max_size = max_size
+        self.objects_dir = os.path.join(directory, "objects")
+        self.index_path = os.path.join(directory, "index.json")
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "passthrough": 0, "evictions": 0,
+                      "bytes_from_cache": 0, "bytes_from_upstream": 0}
+        os.makedirs(self.objects_dir, exist_ok=True)
+        self.entries = self._load_index()
+        # Digest -> [paths referencing it, size]
+        self._objects = {}
+        self._size = 0
+        for entry in self.entries.values():
+            self._reference(entry)
+        self._remove_orphans()
+        self._dirty = False
+        self._saved_at = 0.0
+
+    def _load_index(self):
+        try:
+            with open(self.index_path, "r", encoding="utf-8") as file:
+                entries = json.load(file)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return OrderedDict()
+
+        entries = sorted(entries.items(), key=lambda item: item[1]["last_access"])
+        return OrderedDict(
+            (path, entry) for path, entry in entries if os.path.exists(self.object_path(entry["digest"]))
+        )
+
+    def _save_index(self, force=False):
+        self._dirty = True
+        if not force and time.monotonic() - self._saved_at < INDEX_SAVE_INTERVAL:
+            return
+        tmp_path = self.index_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as file:
+            json.dump(self.entries, file)
+        os.replace(tmp_path, self.index_path)
+        self._dirty = False
+        self._saved_at = time.monotonic()
+
+    def flush(self):
+        """Write the index if it changed since it was last written."""
+        with self._lock:
+            if self._dirty:
+                self._save_index(force=True)
+
+    def _remove_orphans(self):
+        """Remove objects missing from the index, added after it was last written before an unclean exit."""
+        for prefix in os.scandir(self.objects_dir):
+            if not prefix.is_dir():
+                continue
+            for item in os.scandir(prefix.path):
+                if item.name not in self._objects:
+                    logger.info(f"Removing {item.name} from the package cache, it is not in the index.")
+                    os.unlink(item.path)
+
+    def _reference(self, entry):
+        references = self._objects.get(entry["digest"])
+        if references is None:
+            self._objects[entry["digest"]] = [1, entry["size"]]
+            self._size += entry["size"]
+        else:
+            references[0] += 1
+
+    def _release(self, entry):
+        """Drop a reference to an object, and the object with its last reference."""
+        references = self._objects[entry["digest"]]
+        references[0] -= 1
+        if references[0]:
+            return
+        del self._objects[entry["digest"]]
+        self._size -= references[1]
+        try:
+            os.unlink(self.object_path(entry["digest"]))
+        except FileNotFoundError:
+            pass
+
+    def object_path(self, digest):
+        return os.path.join(self.objects_dir, digest[:2], digest)
+
+    def total_size(self):
+        # Objects shared by several paths are only counted once
+        return self._size
+
+    def open_object(self, path):
+        """
+        Open the object of a path and mark it as recently used.
+
+        The file is opened under the store lock, so it stays readable while it is served
+        even if another request evicts it in the meantime.
+
+        Returns:
+            tuple: (file, size), or None if the path is not cached.
+        """
+        with self._lock:
+            entry = self.entries.get(path)
+            if entry is None:
+                return None
+            try:
+                file = open(self.object_path(entry["digest"]), "rb")
+            except FileNotFoundError:
+                # Removed behind the back of the proxy, fetched again
+                logger.warning(f"The cached object of {path} is missing, dropping it from the index.")
+                del self.entries[path]
+                self._release(entry)
+                self._save_index()
+                return None
+            entry["last_access"] = time.time()
+            self.entries.move_to_end(path)
+            return file, entry["size"]
+
+    def add(self, path, tmp_file, digest, size):
+        """
+        Move a downloaded temporary file into the store and evict old objects if needed.
+
+        Returns:
+            tuple: (file, size) with the object opened before it can be evicted.
+        """
+        object_path = self.object_path(digest)
+        with self._lock:
+            os.makedirs(os.path.dirname(object_path), exist_ok=True)
+            if os.path.exists(object_path):
+                os.unlink(tmp_file)
+            else:
+                os.replace(tmp_file, object_path)
+            entry = {"digest": digest, "size": size, "last_access": time.time()}
+            # Referenced before the replaced entry is released, so a shared object is kept
+            self._reference(entry)
+            previous = self.entries.pop(path, None)
+            if previous is not None:
+                self._release(previous)
+            self.entries[path] = entry
+            file = open(object_path, "rb")
+            self._evict()
+            self._save_index()
+        return file, size
+
+    def _evict(self):
+        while len(self.entries) > 1 and self._size > self.max_size:
+            path, entry = self.entries.popitem(last=False)
+            self.stats["evictions"] += 1
+            self._release(entry)
+            logger.info(f"Evicted {path} from the package cache.")
+
+    def count(self, stat, amount=1):
+        with self._lock:
+            self.stats[stat] += amount
+
+    def get_stats(self):
+        with self._lock:
+            stats = dict(self.stats)
+            stats.update(entries=len(self.entries), size=self.total_size(), max_size=self.max_size)
+        requests_total = stats["hits"] + stats["misses"]
+        stats["hit_ratio"] = round(stats["hits"] / requests_total, 3) if requests_total else None
+        return stats
+
+class PackageProxyHandler(BaseHTTPRequestHandler):
+    """Serves repository paths from the store, fetching and caching misses from upstream."""
+
+    server_version = "PerconaPackageProxy"
+
+    def do_HEAD(self):
+        self.handle_request(send_body=False)
+
+    def do_GET(self):
+        self.handle_request(send_body=True)
+
+    def log_message(self, format, *args):
+        logger.debug(f"{self.address_string()} {format % args}")
+
+    def handle_request(self, send_body):
+        path = self.path.split("?", 1)[0]
+        if path == STATS_PATH:
+            body = json.dumps(self.server.store.get_stats()).encode()
+            self._send_headers(200, len(body), "application/json")
+            if send_body:
+                self.wfile.write(body)
+            return
+
+        if ".." in path.split("/"):
+            self.send_error(400, "Invalid path")
+            return
+
+        try:
+            if path.endswith(CACHEABLE_SUFFIXES):
+                self._serve_cached(path, send_body)
+            else:
+                self._serve_passthrough(path, send_body)
+        except Exception as e:
+            logger.error(f"Error serving {path}: {str(e)}")
+            self.send_error(502, f"Upstream error: {str(e)}")
+
+    def _send_headers(self, status, length, content_type="application/octet-stream", extra=None):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(length))
+        for name, value in (extra or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+
+    def _serve_file(self, cached, send_body, cache_status):
+        file, size = cached
+        with file:
+            self._send_headers(200, size, extra={"X-Cache": cache_status})
+            if send_body:
+                shutil.copyfileobj(file, self.wfile, CHUNK_SIZE)
+
+    def _serve_cached(self, path, send_body):
+        store = self.server.store
+        cached = store.open_object(path)
+        if cached is None:
+            # Serialize concurrent misses of the same path so it is downloaded once
+            with self.server.path_lock(path):
+                cached = store.open_object(path)
+                if cached is None:
+                    store.count("misses")
+                    cached = self._fetch_into_store(path)
+                    if cached is not None:
+                        self._serve_file(cached, send_body, "MISS")
+                    return
+
+        store.count("hits")
+        store.count("bytes_from_cache", cached[1])
+        self._serve_file(cached, send_body, "HIT")
+
+    def _fetch_into_store(self, path):
+        """Download a path into the store and return it opened, see PackageStore.add, or None if upstream failed."""
+        store = self.server.store
+        with self.server.session.get(self.server.upstream_url + path, stream=True, timeout=30) as response:
+            if response.status_code != 200:
+                self.send_error(response.status_code, "Upstream request failed")
+                return None
+
+            digest = hashlib.sha256()
+            size = 0
+            fd, tmp_file = tempfile.mkstemp(dir=store.directory, suffix=".part")
+            try:
+                with os.fdopen(fd, "wb") as file:
+                    for chunk in response.iter_content(CHUNK_SIZE):
+                        file.write(chunk)
+                        digest.update(chunk)
+                        size += len(chunk)
+            except Exception:
+                os.unlink(tmp_file)
+                raise
+
+        store.count("bytes_from_upstream", size)
+        return store.add(path, tmp_file, digest.hexdigest(), size)
+
+    def _serve_passthrough(self, path, send_body):
+        store = self.server.store
+        store.count("passthrough")
+        method = "GET" if send_body else "HEAD"
+        with self.server.session.request(method, self.server.upstream_url + path, stream=True, timeout=30) as response:
+            content_type = response.headers.get("Content-Type", "application/octet-stream")
+            extra = {"X-Cache": "PASS"}
+            if response.headers.get("Last-Modified"):
+                extra["Last-Modified"] = response.headers["Last-Modified"]
+            length = response.headers.get("Content-Length")
+            if length is None:
+                body = response.content if send_body else b""
+                self._send_headers(response.status_code, len(body), content_type, extra)
+                self.wfile.write(body)
+                return
+
+            # Forward the body as received so Content-Length and Content-Encoding stay valid
+            if response.headers.get("Content-Encoding"):
+                extra["Content-Encoding"] = response.headers["Content-Encoding"]
+            self._send_headers(response.status_code, length, content_type, extra)
+            if send_body:
+                for chunk in response.raw.stream(CHUNK_SIZE, decode_content=False):
+                    self.wfile.write(chunk)
+                    store.count("bytes_from_upstream", len(chunk))
+
+class PackageProxyServer(ThreadingHTTPServer):
+    """Caching HTTP mirror of the Percona repositories."""
+
+    daemon_threads = True
+
+    def __init__(self, address, store, upstream_url=UPSTREAM_URL):
+        import requests  # Only needed when the proxy is actually started
+
+        super().__init__(address, PackageProxyHandler)
+        self.store = store
+        self.upstream_url = upstream_url.rstrip("/")
+        self.session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_connections=4, pool_maxsize=32)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self._path_locks = {}
+        self._path_locks_lock = threading.Lock()
+
+    @contextlib.contextmanager
+    def path_lock(self, path):
+        """Hold the lock of a path, removed again once no request waits for it."""
+        with self._path_locks_lock:
+            lock = self._path_locks.get(path)
+            if lock is None:
+                # The lock and the number of requests holding or waiting for it
+                lock = self._path_locks[path] = [threading.Lock(), 0]
+            lock[1] += 1
+        try:
+            with lock[0]:
+                yield
+        finally:
+            with self._path_locks_lock:
+                lock[1] -= 1
+                if not lock[1]:
+                    del self._path_locks[path]
+
+def serve_package_proxy(port=DEFAULT_PORT, cache_dir=None, max_size=DEFAULT_MAX_SIZE, upstream_url=UPSTREAM_URL, bind="0.0.0.0"):
+    """Run the caching package proxy until interrupted."""
+    store = PackageStore(cache_dir or get_cache_dir("packages"), max_size)
+    server = PackageProxyServer((bind, port), store, upstream_url)
+    print(f"Serving {upstream_url} on http://{bind}:{server.server_port}/ (cache: {store.directory}, max size: {max_size} bytes)")
+    print(f"Statistics are available at http://{bind}:{server.server_port}{STATS_PATH}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        store.flush()
+        print(f"Package proxy statistics: {json.dumps(store.get_stats())}")
+
+def point_repos_at_mirror(mirror_url, package_manager, output_callback=print):
+    """
+    Rewrite the repository definitions written by percona-release to use a package proxy.
+    """
+    import glob
+    from repo_metadata import APT_SOURCES_GLOB, YUM_REPOS_GLOB
+    from runner import run_command
+
+    pattern = APT_SOURCES_GLOB if package_manager == "apt-get" else YUM_REPOS_GLOB
+    files = sorted(glob.glob(pattern))
+    if not files:
+        return
+
+    mirror_url = mirror_url.rstrip("/")
+    output_callback(f"Pointing Percona repositories at {mirror_url}...\n")
+    run_command(
+        ["sudo", "sed", "-i", "-E", f"s#https?://repo\\.percona\\.com#{mirror_url}#g", *files],
+        output_callback
+    )
@@ -0,0 +1,267 @@
+import logging
+import re
+
+from runner import run_command
+from tracing import traced
+
+logger = logging.getLogger(__name__)
+
+INSTALLED = "installed"
+UPGRADABLE = "upgradable"
+MISSING = "missing"
+
+class PackageState:
+    """
+    Installation state of a package on this host.
+
+    Attributes:
+        name (str): Package name.
+        status (str): INSTALLED (up to date), UPGRADABLE or MISSING.
+        installed_version (str): Installed version, None if missing.
+        candidate_version (str): Newer version available from the repositories, if upgradable.
+    """
+
+    def __init__(self, name, status, installed_version=None, candidate_version=None):
+        self.name = name
+        self.status = status
+        self.installed_version = installed_version
+        self.candidate_version = candidate_version
+
+    def __repr__(self):
+        return f"PackageState({self.name!r}, {self.status}, installed={self.installed_version!r}, candidate={self.candidate_version!r})"
+
+def _deb_order(char):
+    # dpkg sorts ~ before everything, even the end of the string, and letters before other characters
+    if char == "~":
+        return -1
+    if char.isalpha():
+        return ord(char)
+    return ord(char) + 256
+
+def _compare_deb_part(a, b):
+    """Compare an upstream version or revision the way dpkg does."""
+    while a or b:
+        prefix_a = re.match(r"[^0-9]*", a).group()
+        prefix_b = re.match(r"[^0-9]*", b).group()
+        for index in range(max(len(prefix_a), len(prefix_b))):
+            order_a = _deb_order(prefix_a[index]) if index < len(prefix_a) else 0
+            order_b = _deb_order(prefix_b[index]) if index < len(prefix_b) else 0
+            if order_a != order_b:
+                return -1 if order_a < order_b else 1
+        a, b = a[len(prefix_a):], b[len(prefix_b):]
+        number_a = re.match(r"[0-9]*", a).group()
+        number_b = re.match(r"[0-9]*", b).group()
+        if int(number_a or 0) != int(number_b or 0):
+            return -1 if int(number_a or 0) < int(number_b or 0) else 1
+        a, b = a[len(number_a):], b[len(number_b):]
+    return 0
+
+def compare_deb_versions(a, b):
+    """
+    Compare two Debian versions, [epoch:]upstream[-revision], like `dpkg --compare-versions`.
+
+    Returns:
+        int: -1, 0 or 1 if a is older than, the same as or newer than b.
+    """
+    def split(version):
+        epoch, _, rest = version.rpartition(":") if ":" in version else ("0", "", version)
+        upstream, _, revision = rest.rpartition("-") if "-" in rest else (rest, "", "")
+        return int(epoch or 0), upstream, revision
+
+    epoch_a, upstream_a, revision_a = split(a)
+    epoch_b, upstream_b, revision_b = split(b)
+    if epoch_a != epoch_b:
+        return -1 if epoch_a < epoch_b else 1
+    return _compare_deb_part(upstream_a, upstream_b) or _compare_deb_part(revision_a, revision_b)
+
+def _compare_rpm_part(a, b):
+    """rpmvercmp: compare alphanumeric segments, ~ sorts before and ^ after the end of the string."""
+    while a or b:
+        a = re.sub(r"^[^A-Za-z0-9~^]+", "", a)
+        b = re.sub(r"^[^A-Za-z0-9~^]+", "", b)
+        if a.startswith("~") or b.startswith("~"):
+            if not a.startswith("~"):
+                return 1
+            if not b.startswith("~"):
+                return -1
+            a, b = a[1:], b[1:]
+            continue
+        if a.startswith("^") or b.startswith("^"):
+            if not a:
+                return -1
+            if not b:
+                return 1
+            if not a.startswith("^"):
+                return 1
+            if not b.startswith("^"):
+                return -1
+            a, b = a[1:], b[1:]
+            continue
+        if not a or not b:
+            break
+        numeric = a[0].isdigit()
+        segment_a = re.match(r"[0-9]+" if numeric else r"[A-Za-z]+", a).group()
+        segment_b = re.match(r"[0-9]+" if numeric else r"[A-Za-z]+", b)
+        if segment_b is None:
+            # A number is newer than letters
+            return 1 if numeric else -1
+        segment_b = segment_b.group()
+        key_a, key_b = (int(segment_a), int(segment_b)) if numeric else (segment_a, segment_b)
+        if key_a != key_b:
+            return -1 if key_a < key_b else 1
+        a, b = a[len(segment_a):], b[len(segment_b):]
+    if not a and not b:
+        return 0
+    return 1 if a else -1
+
+def compare_rpm_versions(a, b):
+    """
+    Compare two rpm versions, [epoch:]version-release, like rpm's rpmvercmp.
+
+    Returns:
+        int: -1, 0 or 1 if a is older than, the same as or newer than b.
+    """
+    def split(version):
+        epoch, _, rest = version.partition(":") if ":" in version else ("0", "", version)
+        version, _, release = rest.rpartition("-") if "-" in rest else (rest, "", "")
+        return int(epoch or 0), version, release
+
+    epoch_a, version_a, release_a = split(a)
+    epoch_b, version_b, release_b = split(b)
+    if epoch_a != epoch_b:
+        return -1 if epoch_a < epoch_b else 1
+    return _compare_rpm_part(version_a, version_b) or _compare_rpm_part(release_a, release_b)
+
+def compare_versions(a, b, package_manager):
+    """Compare two package versions with the rules of the package manager, see compare_deb_versions."""
+    if package_manager == "apt-get":
+        return compare_deb_versions(a, b)
+    return compare_rpm_versions(a, b)
+
+def _is_plain_name(package):
+    """Version pins, globs and file paths are always handed to the package manager."""
+    return not any(char in package for char in "=<>*?/")
+
+def _installed_deb(packages):
+    # One dpkg-query call for the whole list, it exits with 1 if any package is unknown
+    result = run_command(
+        ["dpkg-query", "-W", "-f", "${Package}\\t${Status}\\t${Version}\\n", *packages],
+        check=False
+    )
+    installed = {}
+    for line in result.stdout_lines:
+        fields = line.split("\t")
+        if len(fields) == 3 and fields[1].endswith(" installed") and fields[2]:
+            installed[fields[0]] = fields[2]
+    return installed
+
+def _candidates_deb(packages, options=()):
+    """Return the candidate version of each package from the local package lists."""
+    result = run_command(["apt-cache", *options, "policy", *packages], check=False)
+    candidates, current = {}, None
+    for line in result.stdout_lines:
+        if line and not line.startswith(" ") and line.endswith(":"):
+            current = line[:-1].split(":")[0]
+        elif current and line.strip().startswith("Candidate:"):
+            candidate = line.split(":", 1)[1].strip()
+            if candidate != "(none)":
+                candidates[current] = candidate
+    return candidates
+
+def _installed_rpm(packages):
+    # One rpm call for the whole list, missing packages are reported as "package X is not installed"
+    result = run_command(
+        ["rpm", "-q", "--qf", "%{NAME}\\t%{EPOCHNUM}:%{VERSION}-%{RELEASE}\\n", *packages],
+        check=False
+    )
+    installed = {}
+    for line in result.stdout_lines:
+        fields = line.split("\t")
+        if len(fields) == 2:
+            installed[fields[0]] = fields[1]
+    return installed
+
+def _upgrades_rpm(packages, package_manager, options=()):
+    """Return the available upgrades of the packages from the cached repository metadata."""
+    if package_manager == "dnf":
+        command = ["dnf", "-q", "-C", *options, "list", "--upgrades", *packages]
+    else:
+        command = ["yum", "-q", "-C", *options, "list", "updates", *packages]
+    result = run_command(command, check=False)
+
+    wanted = set(packages)
+    upgrades = {}
+    pending = []
+    for line in result.stdout_lines:
+        # yum wraps long names: the version and the repository follow on the next line
+        fields = pending + line.split()
+        pending = []
+        if len(fields) == 1 and "." in fields[0]:
+            pending = fields
+            continue
+        if len(fields) >= 3:
+            name = fields[0].rsplit(".", 1)[0]  # Strip the architecture
+            if name in wanted:
+                upgrades[name] = fields[1]
+    return upgrades
+
+@traced()
+def query_packages(packages, package_manager, options=()):
+    """
+    Classify packages as installed and up to date, upgradable or missing, with one
+    query of the package database and one of the repository metadata. Options are
+    passed to the package manager, e.g. to use other repositories than the system's.
+
+    Returns:
+        dict: A PackageState per package name.
+    """
+    names = [package for package in dict.fromkeys(packages) if _is_plain_name(package)]
+    states = {package: PackageState(package, MISSING) for package in packages}
+    if not names:
+        return states
+
+    if package_manager == "apt-get":
+        installed = _installed_deb(names)
+        candidates = _candidates_deb(list(installed), options) if installed else {}
+    elif package_manager in ["yum", "dnf"]:
+        installed = _installed_rpm(names)
+        candidates = _upgrades_rpm(list(installed), package_manager, options) if installed else {}
+    else:
+        raise Exception(f"Unsupported package manager: {package_manager}")
+
+    # A pinned or locally built package may be newer than the repositories, it is not downgraded
+    upgrades = {
+        name: candidate for name, candidate in candidates.items()
+        if compare_versions(candidate, installed[name], package_manager) > 0
+    }
+
+    for name, version in installed.items():
+        if name in states:
+            status = UPGRADABLE if name in upgrades else INSTALLED
+            states[name] = PackageState(name, status, version, upgrades.get(name))
+    return states
+
+def packages_to_install(packages, package_manager, output_callback=print, options=()):
+    """
+    Return the packages that are missing or upgradable, in the given order. If the
+    package database cannot be queried, every package is returned.
+    """
+    try:
+        states = query_packages(packages, package_manager, options)
+    except Exception as e:
+        logger.warning(f"Unable to query installed packages, installing all of them: {str(e)}")
+        return list(packages)
+
+    up_to_date = [name for name, state in states.items() if state.status == INSTALLED]
+    upgradable = [state for state in states.values() if state.status == UPGRADABLE]
+    missing = [name for name, state in states.items() if state.status == MISSING]
+    if up_to_date:
+        output_callback(f"Already installed and up to date: {', '.join(up_to_date)}")
+    if upgradable:
+        output_callback("Upgradable: " + ", ".join(
+            f"{state.name} ({state.installed_version} -> {state.candidate_version})" for state in upgradable
+        ))
+    if missing:
+        output_callback(f"Not installed: {', '.join(missing)}")
+
+    return [package for package in packages if states[package].status != INSTALLED]
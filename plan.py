@@ -0,0 +1,199 @@
+import logging
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from logs import phase
+from tracing import current_span, span
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_WORKERS = 4
+
+# Resource held by steps that run the package manager: dpkg and rpm allow one at a time
+PACKAGE_MANAGER = "package_manager"
+
+class PlanError(Exception):
+    """Raised when a plan is invalid or one of its steps failed."""
+
+class Step:
+    """
+    A unit of work of a plan.
+
+    Attributes:
+        name (str): Unique name of the step, also the key of its result in the context.
+        func (callable): Called with the context dict, its return value is stored
+            in the context under the step name.
+        deps (list): Names of the steps that must finish before this one starts.
+        description (str): What the step does, shown by Plan.format().
+        resources (tuple): Resources the step holds exclusively while it runs, e.g.
+            PACKAGE_MANAGER. Steps sharing a resource never overlap.
+    """
+
+    def __init__(self, name, func, deps=(), description="", resources=()):
+        self.name = name
+        self.func = func
+        self.deps = list(deps)
+        self.description = description
+        self.resources = tuple(sorted(resources))
+        self.status = "pending"
+        self.duration = None
+        self.error = None
+
+class Plan:
+    """
+    A DAG of steps, executed with independent steps running concurrently.
+
+    Usage:
+        plan = Plan()
+        plan.add("download", download, description="Download the package")
+        plan.add("install", install, deps=["download"], resources=[PACKAGE_MANAGER])
+        print(plan.format())
+        plan.execute(print)
+    """
+
+    def __init__(self):
+        self.steps = {}
+
+    def add(self, name, func, deps=(), description="", resources=()):
+        """
+        Add a step and return it. Adding a step with the name of an existing one
+        returns the existing step, so shared prerequisites are only planned once.
+        """
+        if name in self.steps:
+            step = self.steps[name]
+            step.deps.extend(dep for dep in deps if dep not in step.deps)
+            return step
+        self.steps[name] = Step(name, func, deps, description, resources)
+        return self.steps[name]
+
+    def __contains__(self, name):
+        return name in self.steps
+
+    def order(self):
+        """
+        Return the steps in a valid execution order, in insertion order where free.
+
+        Raises:
+            PlanError: If a dependency is unknown or the steps have a cycle.
+        """
+        for step in self.steps.values():
+            for dep in step.deps:
+                if dep not in self.steps:
+                    raise PlanError(f"Step '{step.name}' depends on unknown step '{dep}'.")
+
+        ordered, done = [], set()
+        while len(ordered) < len(self.steps):
+            ready = [
+                step for step in self.steps.values()
+                if step.name not in done and all(dep in done for dep in step.deps)
+            ]
+            if not ready:
+                pending = [name for name in self.steps if name not in done]
+                raise PlanError(f"Steps have a dependency cycle: {', '.join(pending)}")
+            for step in ready:
+                ordered.append(step)
+                done.add(step.name)
+        return ordered
+
+    def format(self):
+        """Return the plan as text, one numbered line per step."""
+        lines = []
+        numbers = {}
+        for index, step in enumerate(self.order(), start=1):
+            numbers[step.name] = index
+            after = f" (after {', '.join(str(numbers[dep]) for dep in step.deps)})" if step.deps else ""
+            locks = f" [holds {', '.join(step.resources)}]" if step.resources else ""
+            lines.append(f"{index:>2}. {step.name}{after}{locks}")
+            if step.description:
+                lines.append(f"      {step.description}")
+        return "\n".join(lines)
+
+    def execute(self, output_callback=print, max_workers=DEFAULT_WORKERS, context=None, journal=None):
+        """
+        Run the steps, each as soon as its dependencies finished and its resources are free.
+
+        If a step fails, no new step is started; the running ones are waited for and
+        PlanError is raised with the first failure.
+
+        With a journal (see journal.Journal), every finished step is checkpointed with its
+        description as inputs, and steps an earlier run completed are not run again:
+        their recorded result is put in the context and their status is "resumed".
+
+        Returns:
+            dict: The context, with the result of every step under its name.
+        """
+        self.order()  # Validates the plan
+        context = {} if context is None else context
+        locks = {resource: threading.Lock() for step in self.steps.values() for resource in step.resources}
+        done, running, failed = set(), {}, []
+        parent_span = current_span()
+
+        def run_step(step):
+            # Resources are acquired in sorted order, so steps holding several cannot deadlock
+            for resource in step.resources:
+                locks[resource].acquire()
+            start = time.perf_counter()
+            try:
+                with span(f"step:{step.name}", parent_span), phase(step.name):
+                    return step.func(context)
+            finally:
+                step.duration = time.perf_counter() - start
+                for resource in reversed(step.resources):
+                    locks[resource].release()
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            while True:
+                # Resumed steps finish at once and can make further steps ready
+                resumed = not failed
+                while resumed:
+                    resumed = False
+                    for step in self.steps.values():
+                        if step.status == "pending" and all(dep in done for dep in step.deps):
+                            entry = journal.completed(step.name, step.description) if journal else None
+                            if entry is not None:
+                                context[step.name] = entry["result"]
+                                step.status = "resumed"
+                                done.add(step.name)
+                                resumed = True
+                                output_callback(f"Skipping step {step.name}, completed by an earlier run.")
+                                continue
+                            step.status = "running"
+                            logger.info(f"Starting step {step.name}")
+                            running[executor.submit(run_step, step)] = step
+                if not running:
+                    break
+
+                finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    step = running.pop(future)
+                    try:
+                        context[step.name] = future.result()
+                        step.status = "done"
+                        done.add(step.name)
+                        if journal:
+                            journal.record(step.name, context[step.name], step.description)
+                        logger.info(f"Step {step.name} finished in {step.duration:.2f}s")
+                    except Exception as e:
+                        step.status, step.error = "failed", e
+                        failed.append(step)
+                        logger.error(f"Step {step.name} failed: {str(e)}")
+                        output_callback(f"Step {step.name} failed: {str(e)}")
+
+        for step in self.steps.values():
+            if step.status == "pending":
+                step.status = "skipped"
+        if failed:
+            skipped = [step.name for step in self.steps.values() if step.status == "skipped"]
+            message = f"Step {failed[0].name} failed: {str(failed[0].error)}"
+            if skipped:
+                message += f" (skipped: {', '.join(skipped)})"
+            raise PlanError(message) from failed[0].error
+        return context
+
+    def summary(self):
+        """Return the duration and status of each step as text."""
+        return "\n".join(
+            f"  {step.duration if step.duration is not None else 0:7.2f} s  {step.status:<8} {step.name}"
+            for step in self.order()
+        )
@@ -0,0 +1,635 @@
+import bz2
+import concurrent.futures
+import configparser
+import glob
+import hashlib
+import logging
+import lzma
+import os
+import sqlite3
+import time
+import zlib
+from urllib.parse import urlsplit
+from xml.etree import ElementTree
+
+from shared import get_cache_dir
+from tracing import span
+
+logger = logging.getLogger(__name__)
+
+CATALOG_FILE = "repo_catalog.sqlite"
+
+# Bump when the schema changes, older catalogs are rebuilt
+CATALOG_FORMAT = 2
+
+# Sources checked for changes less than this long ago are used as they are
+CATALOG_TTL = int(os.environ.get("PERCONA_INSTALLER_INDEX_TTL", 3600))
+
+FETCH_CHUNK_SIZE = 64 * 1024
+FETCH_TIMEOUT = 30
+INSERT_BATCH = 500
+INDEX_WORKERS = 4
+
+# Package lists in order of preference, as listed in a Release file
+APT_LIST_NAMES = ("Packages.gz", "Packages.xz", "Packages.bz2", "Packages")
+
+REPOMD_NS = "{http://linux.duke.edu/metadata/repo}"
+COMMON_NS = "{http://linux.duke.edu/metadata/common}"
+RPM_NS = "{http://linux.duke.edu/metadata/rpm}"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sources (
+    id INTEGER PRIMARY KEY,
+    metadata_url TEXT NOT NULL,
+    -- The components of an apt suite share its Release file, each is a source of its own
+    list_path TEXT NOT NULL DEFAULT '',
+    repository TEXT NOT NULL,
+    repo_type TEXT,
+    list_url TEXT,
+    checksum TEXT,
+    packages INTEGER,
+    checked_at REAL,
+    indexed_at REAL,
+    UNIQUE (metadata_url, list_path)
+);
+CREATE TABLE IF NOT EXISTS packages (
+    source_id INTEGER NOT NULL,
+    name TEXT NOT NULL,
+    version TEXT,
+    arch TEXT,
+    size INTEGER,
+    installed_size INTEGER,
+    summary TEXT,
+    depends TEXT
+);
+CREATE INDEX IF NOT EXISTS packages_name ON packages(name);
+CREATE INDEX IF NOT EXISTS packages_source ON packages(source_id);
+"""
+
+class RepoCatalogError(Exception):
+    """Raised when the metadata of a repository cannot be read."""
+
+class RepoSource:
+    """
+    The package list of a repository: the Packages file of an apt component, found
+    through the Release file, or the primary.xml of a yum repository, found through
+    repomd.xml. Both name the checksum of the list, so unchanged lists are not fetched.
+
+    Attributes:
+        repository (str): The repository, e.g. "ppg-17.0".
+        repo_type (str): "release", "testing" or "experimental".
+        kind (str): "apt" or "yum".
+        metadata_url (str): The Release or repomd.xml file.
+        list_path (str): The Packages file relative to the Release file (apt only),
+            e.g. "main/binary-amd64".
+    """
+
+    def __init__(self, repository, repo_type, kind, metadata_url, list_path=None):
+        self.repository = repository
+        self.repo_type = repo_type
+        self.kind = kind
+        self.metadata_url = metadata_url
+        self.list_path = list_path
+
+    def __repr__(self):
+        return f"RepoSource({self.repository!r}, {self.repo_type!r}, {self.metadata_url!r})"
+
+class PackageInfo:
+    """A package of the catalog."""
+
+    def __init__(self, name, version, arch, size, installed_size, summary, depends, repository):
+        self.name = name
+        self.version = version
+        self.arch = arch
+        self.size = size
+        self.installed_size = installed_size
+        self.summary = summary
+        self.depends = depends.split(", ") if depends else []
+        self.repository = repository
+
+    def __repr__(self):
+        return f"PackageInfo({self.name!r}, {self.version!r}, {self.repository!r})"
+
+def _repository_name(url):
+    """The repository of a repo.percona.com URL, e.g. "ppg-17.0" for https://repo.percona.com/ppg-17.0/apt."""
+    parts = [part for part in urlsplit(url).path.split("/") if part]
+    return parts[0] if parts else url
+
+def _apt_source(base_url, suite, component, facts, repository=None):
+    from repo_probe import APT_ARCHITECTURES, APT_COMPONENTS
+
+    repo_types = {value: key for key, value in APT_COMPONENTS.items()}
+    architecture = APT_ARCHITECTURES.get(facts.arch, facts.arch)
+    return RepoSource(
+        repository or _repository_name(base_url),
+        repo_types.get(component, component),
+        "apt",
+        f"{base_url.rstrip('/')}/dists/{suite}/Release",
+        f"{component}/binary-{architecture}",
+    )
+
+def _yum_source(base_url, facts, repository=None, repo_type=None):
+    base_url = base_url.rstrip("/").replace("$releasever", facts.major_version).replace("$basearch", facts.arch)
+    if repo_type is None:
+        parts = urlsplit(base_url).path.split("/")
+        repo_type = parts[parts.index("yum") + 1] if "yum" in parts[:-1] else None
+    return RepoSource(repository or _repository_name(base_url), repo_type, "yum", f"{base_url}/repodata/repomd.xml")
+
+def product_sources(repository, repo_type, facts=None, base_url=None, yum_arch=None):
+    """
+    The sources of a repository for the host, whether it is enabled or not. Yum repositories
+    keep noarch packages apart, yum_arch="noarch" selects them.
+    """
+    from host_facts import get_host_facts
+    from repo_probe import APT_COMPONENTS, REPO_URL
+
+    facts = facts or get_host_facts()
+    base_url = (base_url or REPO_URL).rstrip("/")
+    if facts.package_manager == "apt-get":
+        return [_apt_source(f"{base_url}/{repository}/apt", facts.codename, APT_COMPONENTS.get(repo_type, repo_type), facts, repository)]
+    return [_yum_source(f"{base_url}/{repository}/yum/{repo_type}/$releasever/RPMS/{yum_arch or '$basearch'}", facts, repository, repo_type)]
+
+def enabled_sources(facts=None):
+    """The sources of the Percona repositories enabled on the host by percona-release."""
+    from host_facts import get_host_facts
+    from repo_metadata import APT_SOURCES_GLOB, YUM_REPOS_GLOB
+
+    facts = facts or get_host_facts()
+    sources = []
+    if facts.package_manager == "apt-get":
+        for path in sorted(glob.glob(APT_SOURCES_GLOB)):
+            with open(path, "r", encoding="utf-8") as file:
+                for line in file:
+                    words = [word for word in line.split("#", 1)[0].split() if not word.startswith("[")]
+                    if len(words) < 4 or words[0] != "deb":
+                        continue
+                    base_url, suite, components = words[1], words[2], words[3:]
+                    sources.extend(_apt_source(base_url, suite, component, facts) for component in components)
+    else:
+        for path in sorted(glob.glob(YUM_REPOS_GLOB)):
+            config = configparser.ConfigParser(interpolation=None)
+            try:
+                config.read(path, encoding="utf-8")
+            except configparser.Error as e:
+                logger.warning(f"Skipping {path}: {str(e)}")
+                continue
+            for section in config.sections():
+                if config[section].get("enabled", "1").strip() != "1" or not config[section].get("baseurl"):
+                    continue
+                sources.append(_yum_source(config[section]["baseurl"].split()[0], facts))
+    return sources
+
+def _decompressor(path):
+    """An incremental decompressor for a package list, None if it is not compressed."""
+    if path.endswith(".gz"):
+        return zlib.decompressobj(16 + zlib.MAX_WBITS)
+    if path.endswith(".xz"):
+        return lzma.LZMADecompressor()
+    if path.endswith(".bz2"):
+        return bz2.BZ2Decompressor()
+    if path.endswith((".zst", ".zck")):
+        raise RepoCatalogError(f"Unsupported compression of {path}")
+    return None
+
+def _digest(checksum):
+    """A hash object for a checksum of the metadata, "sha256:<hex>" (repomd.xml) or a SHA-256 (Release)."""
+    algorithm, _, _ = checksum.rpartition(":")
+    # createrepo names SHA-1 "sha"
+    algorithm = {"": "sha256", "sha": "sha1"}.get(algorithm, algorithm)
+    try:
+        return hashlib.new(algorithm)
+    except ValueError:
+        raise RepoCatalogError(f"Unsupported checksum type {algorithm}")
+
+def _stream(url, checksum=None):
+    """
+    Yield the content of a package list in chunks, decompressed on the fly, so that
+    no more than a chunk of it is held in memory.
+
+    The list is hashed as it is read and RepoCatalogError is raised after its last chunk
+    if it does not match the checksum named by the Release or repomd.xml file.
+    """
+    import requests
+    from downloads import get_http_session
+
+    decompressor = _decompressor(urlsplit(url).path)
+    digest = _digest(checksum) if checksum else None
+    try:
+        response = get_http_session().get(url, stream=True, timeout=FETCH_TIMEOUT)
+        response.raise_for_status()
+    except requests.exceptions.RequestException as e:
+        raise RepoCatalogError(f"Unable to download {url}: {str(e)}")
+    with response:
+        # Compressed lists are sometimes served with a Content-Encoding, read them as stored
+        for chunk in response.raw.stream(FETCH_CHUNK_SIZE, decode_content=False):
+            if digest is not None:
+                digest.update(chunk)
+            if decompressor is None:
+                yield chunk
+                continue
+            for data in _decompress(decompressor, chunk):
+                if data:
+                    yield data
+        if hasattr(decompressor, "flush"):
+            data = decompressor.flush()
+            if data:
+                yield data
+    if digest is not None and digest.hexdigest() != checksum.rpartition(":")[2]:
+        raise RepoCatalogError(f"{url} is truncated or corrupted: it does not match the checksum of its metadata.")
+
+def _decompress(decompressor, chunk):
+    """Decompress a chunk in pieces of at most FETCH_CHUNK_SIZE, lists compress up to 20 times."""
+    if hasattr(decompressor, "unconsumed_tail"):
+        while True:
+            yield decompressor.decompress(chunk, FETCH_CHUNK_SIZE)
+            chunk = decompressor.unconsumed_tail
+            if not chunk:
+                return
+    yield decompressor.decompress(chunk, FETCH_CHUNK_SIZE)
+    while not decompressor.needs_input and not decompressor.eof:
+        yield decompressor.decompress(b"", FETCH_CHUNK_SIZE)
+
+def _fetch_text(url):
+    import requests
+    from downloads import get_http_session
+
+    try:
+        response = get_http_session().get(url, timeout=FETCH_TIMEOUT)
+        response.raise_for_status()
+    except requests.exceptions.RequestException as e:
+        raise RepoCatalogError(f"Unable to download {url}: {str(e)}")
+    return response.text
+
+def _apt_list(source):
+    """Return the URL and SHA256 of the Packages file of an apt source from its Release file."""
+    checksums = {}
+    in_sha256 = False
+    for line in _fetch_text(source.metadata_url).splitlines():
+        if not line.startswith(" "):
+            in_sha256 = line.startswith("SHA256:")
+            continue
+        if in_sha256:
+            parts = line.split()
+            if len(parts) == 3:
+                checksums[parts[2]] = parts[0]
+    base_url = source.metadata_url.rsplit("/", 1)[0]
+    for name in APT_LIST_NAMES:
+        path = f"{source.list_path}/{name}"
+        if path in checksums:
+            return f"{base_url}/{path}", checksums[path]
+    raise RepoCatalogError(f"{source.metadata_url} does not list {source.list_path}/Packages")
+
+def _yum_list(source):
+    """Return the URL and checksum of the primary.xml of a yum source from its repomd.xml."""
+    root = ElementTree.fromstring(_fetch_text(source.metadata_url))
+    for data in root.iter(f"{REPOMD_NS}data"):
+        if data.get("type") != "primary":
+            continue
+        location = data.find(f"{REPOMD_NS}location")
+        checksum = data.find(f"{REPOMD_NS}checksum")
+        if location is None or checksum is None:
+            break
+        base_url = source.metadata_url.rsplit("/repodata/", 1)[0]
+        return f"{base_url}/{location.get('href')}", f"{checksum.get('type')}:{checksum.text.strip()}"
+    raise RepoCatalogError(f"{source.metadata_url} does not list the primary metadata")
+
+def _int(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+def parse_apt_packages(chunks):
+    """
+    Parse the stanzas of a Packages file from chunks of bytes.
+
+    Yields:
+        tuple: (name, version, arch, size, installed_size, summary, depends) per package,
+            sizes in bytes.
+    """
+    for fields in _apt_stanzas(chunks):
+        yield _apt_record(fields)
+
+def _apt_stanzas(chunks):
+    """Yield the fields of every stanza of a Packages file, as a dict."""
+    fields = {}
+    pending = b""
+    for chunk in chunks:
+        lines = (pending + chunk).split(b"\n")
+        pending = lines.pop()
+        for line in lines:
+            if not line.strip():
+                if "Package" in fields:
+                    yield fields
+                fields = {}
+            elif not line[:1].isspace() and b":" in line:
+                name, value = line.split(b":", 1)
+                fields[name.decode("ascii", "replace")] = value.strip().decode("utf-8", "replace")
+    if pending.strip() and b":" in pending:
+        name, value = pending.split(b":", 1)
+        fields[name.decode("ascii", "replace")] = value.strip().decode("utf-8", "replace")
+    if "Package" in fields:
+        yield fields
+
+def _apt_record(fields):
+    installed_size = _int(fields.get("Installed-Size"))
+    return (
+        fields["Package"],
+        fields.get("Version"),
+        fields.get("Architecture"),
+        _int(fields.get("Size")),
+        installed_size * 1024 if installed_size is not None else None,
+        fields.get("Description"),
+        fields.get("Depends"),
+    )
+
+def parse_primary_xml(chunks):
+    """
+    Parse the packages of a primary.xml from chunks with an incremental parser, each
+    package is dropped from the tree once read.
+
+    Yields:
+        tuple: (name, version, arch, size, installed_size, summary, depends) per package.
+    """
+    return _primary_packages(chunks, _rpm_record)
+
+def _primary_packages(chunks, read):
+    """Yield what read returns for every package element of a primary.xml, unless None."""
+    parser = ElementTree.XMLPullParser(events=("start", "end"))
+    root = None
+    for chunk in chunks:
+        parser.feed(chunk)
+        for event, element in parser.read_events():
+            if event == "start":
+                if root is None:
+                    root = element
+                continue
+            if element.tag != f"{COMMON_NS}package":
+                continue
+            record = read(element)
+            root.clear()
+            if record is not None:
+                yield record
+    parser.close()
+
+def _rpm_version(element):
+    version = element.find(f"{COMMON_NS}version")
+    if version is None:
+        return None
+    epoch = version.get("epoch")
+    text = f"{version.get('ver')}-{version.get('rel')}"
+    return f"{epoch}:{text}" if epoch and epoch != "0" else text
+
+def _rpm_record(element):
+    arch = element.findtext(f"{COMMON_NS}arch")
+    if arch == "src":
+        return None
+    version = _rpm_version(element)
+    size = element.find(f"{COMMON_NS}size")
+    requires = element.find(f"{COMMON_NS}format/{RPM_NS}requires")
+    depends = []
+    if requires is not None:
+        for entry in requires:
+            name = entry.get("name", "")
+            if not name.startswith(("/", "rpmlib(")) and name not in depends:
+                depends.append(name)
+    return (
+        element.findtext(f"{COMMON_NS}name"),
+        version,
+        arch,
+        _int(size.get("package")) if size is not None else None,
+        _int(size.get("installed")) if size is not None else None,
+        element.findtext(f"{COMMON_NS}summary"),
+        ", ".join(depends) or None,
+    )
+
+def _apt_download(fields):
+    return fields["Package"], fields.get("Version"), fields.get("Filename"), fields.get("SHA256")
+
+def _rpm_download(element):
+    checksum = element.find(f"{COMMON_NS}checksum")
+    location = element.find(f"{COMMON_NS}location")
+    if element.findtext(f"{COMMON_NS}arch") == "src" or checksum is None or location is None:
+        return None
+    sha256 = checksum.text.strip() if checksum.get("type") == "sha256" and checksum.text else None
+    return element.findtext(f"{COMMON_NS}name"), _rpm_version(element), location.get("href"), sha256
+
+def package_download(source, name):
+    """
+    Return the URL and SHA-256 of the newest version of a package in a source. The package
+    list is verified against the checksum of the Release or repomd.xml file it is listed in,
+    so the SHA-256 is the one the repository publishes for the package.
+
+    Returns:
+        tuple: (url, sha256, version).
+
+    Raises:
+        RepoCatalogError: If the lists cannot be read or verified, or do not have the package
+            with a SHA-256.
+    """
+    from packages import compare_versions
+
+    if source.kind == "apt":
+        list_url, checksum = _apt_list(source)
+        records = (_apt_download(fields) for fields in _apt_stanzas(_stream(list_url, checksum)))
+        base_url = source.metadata_url.rsplit("/dists/", 1)[0]
+        package_manager = "apt-get"
+    else:
+        list_url, checksum = _yum_list(source)
+        records = _primary_packages(_stream(list_url, checksum), _rpm_download)
+        base_url = source.metadata_url.rsplit("/repodata/", 1)[0]
+        package_manager = "dnf"
+
+    newest = None
+    # The whole list is read, _stream verifies it after its last chunk
+    for package, version, path, sha256 in records:
+        if package != name or not (version and path and sha256):
+            continue
+        if newest is None or compare_versions(version, newest[2], package_manager) > 0:
+            newest = (f"{base_url}/{path}", sha256, version)
+    if newest is None:
+        raise RepoCatalogError(f"{list_url} does not list {name} with a SHA-256")
+    return newest
+
+def _batches(records):
+    batch = []
+    for record in records:
+        batch.append(record)
+        if len(batch) == INSERT_BATCH:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+class RepoCatalog:
+    """
+    The packages the Percona repositories actually ship, indexed from their metadata
+    into SQLite. Every source is re-indexed only when the checksum of its package list
+    changed, and the lists are streamed, so memory does not grow with their size.
+    """
+
+    def __init__(self, path=None):
+        self.path = path or os.path.join(get_cache_dir(), CATALOG_FILE)
+        try:
+            with self._connect() as connection:
+                if connection.execute("PRAGMA user_version").fetchone()[0] != CATALOG_FORMAT:
+                    connection.executescript("DROP TABLE IF EXISTS sources; DROP TABLE IF EXISTS packages;")
+                    connection.execute(f"PRAGMA user_version = {CATALOG_FORMAT}")
+                connection.executescript(SCHEMA)
+        except sqlite3.Error as e:
+            raise RepoCatalogError(f"Unable to open the repository catalog {self.path}: {str(e)}")
+
+    def _connect(self):
+        connection = sqlite3.connect(self.path, timeout=30)
+        connection.execute("PRAGMA journal_mode=WAL")
+        return connection
+
+    def _source_row(self, connection, source):
+        row = connection.execute(
+            "SELECT id, list_url, checksum, checked_at FROM sources WHERE metadata_url = ? AND list_path = ?",
+            (source.metadata_url, source.list_path or ""),
+        ).fetchone()
+        if row is None:
+            cursor = connection.execute(
+                "INSERT INTO sources (metadata_url, list_path, repository, repo_type) VALUES (?, ?, ?, ?)",
+                (source.metadata_url, source.list_path or "", source.repository, source.repo_type),
+            )
+            return cursor.lastrowid, None, None, None
+        return row
+
+    def update_source(self, source, refresh=False):
+        """
+        Index a source unless it was checked within CATALOG_TTL or its package list is unchanged.
+
+        Returns:
+            int: The number of packages indexed, None if the indexed list was still current.
+
+        Raises:
+            RepoCatalogError: If the metadata cannot be downloaded or read, or the catalog cannot be written.
+        """
+        try:
+            connection = self._connect()
+        except sqlite3.Error as e:
+            raise RepoCatalogError(f"Unable to open the repository catalog {self.path}: {str(e)}")
+        try:
+            with connection:
+                source_id, list_url, checksum, checked_at = self._source_row(connection, source)
+            if not refresh and checked_at and time.time() - checked_at < CATALOG_TTL:
+                return None
+
+            new_list_url, new_checksum = _apt_list(source) if source.kind == "apt" else _yum_list(source)
+            if not refresh and new_list_url == list_url and new_checksum == checksum:
+                with connection:
+                    connection.execute("UPDATE sources SET checked_at = ? WHERE id = ?", (time.time(), source_id))
+                logger.info(f"{source.metadata_url} is unchanged, keeping {source.repository} in the catalog.")
+                return None
+
+            parse = parse_apt_packages if source.kind == "apt" else parse_primary_xml
+            count = 0
+            with span("repo_catalog:index", repository=source.repository) as current:
+                # One transaction: readers see the old list until the new one is complete
+                with connection:
+                    connection.execute("DELETE FROM packages WHERE source_id = ?", (source_id,))
+                    for batch in _batches(parse(_stream(new_list_url, new_checksum))):
+                        connection.executemany(
+                            "INSERT INTO packages (source_id, name, version, arch, size, installed_size, summary, depends) "
+                            "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                            [(source_id,) + record for record in batch],
+                        )
+                        count += len(batch)
+                    now = time.time()
+                    connection.execute(
+                        "UPDATE sources SET list_url = ?, checksum = ?, packages = ?, checked_at = ?, indexed_at = ? WHERE id = ?",
+                        (new_list_url, new_checksum, count, now, now, source_id),
+                    )
+                current.set(packages=count)
+            logger.info(f"Indexed {count} packages of {source.repository} from {new_list_url}.")
+            return count
+        except (ElementTree.ParseError, zlib.error, lzma.LZMAError, OSError, EOFError, sqlite3.Error) as e:
+            raise RepoCatalogError(f"Unable to index {source.metadata_url}: {str(e)}")
+        finally:
+            connection.close()
+
+    def update(self, sources, output_callback=None, refresh=False):
+        """
+        Index several sources concurrently. Sources that fail are reported and skipped,
+        their previous packages stay in the catalog.
+
+        Returns:
+            list: The sources that could not be indexed.
+        """
+        failed = []
+        if not sources:
+            return failed
+        with concurrent.futures.ThreadPoolExecutor(max_workers=min(INDEX_WORKERS, len(sources))) as executor:
+            futures = {executor.submit(self.update_source, source, refresh): source for source in sources}
+            for future in concurrent.futures.as_completed(futures):
+                source = futures[future]
+                try:
+                    count = future.result()
+                except RepoCatalogError as e:
+                    logger.warning(str(e))
+                    failed.append(source)
+                    if output_callback:
+                        output_callback(f"Warning: {str(e)}")
+                    continue
+                if count is not None and output_callback:
+                    output_callback(f"Indexed {count} packages of {source.repository} ({source.repo_type}).")
+        return failed
+
+    def search(self, query=None, repositories=None, limit=None, repo_types=None):
+        """
+        Return the packages whose name or summary contains query, ordered by name, as PackageInfo.
+
+        Raises:
+            RepoCatalogError: If the catalog cannot be read.
+        """
+        sql = (
+            "SELECT p.name, p.version, p.arch, p.size, p.installed_size, p.summary, p.depends, s.repository "
+            "FROM packages p JOIN sources s ON s.id = p.source_id WHERE 1 = 1"
+        )
+        parameters = []
+        if query:
+            pattern = "%" + query.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+            sql += " AND (p.name LIKE ? ESCAPE '\\' OR p.summary LIKE ? ESCAPE '\\')"
+            parameters += [pattern, pattern]
+        if repositories:
+            sql += f" AND s.repository IN ({', '.join('?' for _ in repositories)})"
+            parameters += list(repositories)
+        if repo_types:
+            sql += f" AND s.repo_type IN ({', '.join('?' for _ in repo_types)})"
+            parameters += list(repo_types)
+        sql += " ORDER BY p.name, s.repository"
+        if limit:
+            sql += " LIMIT ?"
+            parameters.append(limit)
+        try:
+            connection = self._connect()
+            try:
+                return [PackageInfo(*row) for row in connection.execute(sql, parameters)]
+            finally:
+                connection.close()
+        except sqlite3.Error as e:
+            raise RepoCatalogError(f"Unable to search the repository catalog {self.path}: {str(e)}")
+
+    def names(self, repositories=None, query=None, repo_types=None):
+        """Return the distinct package names, optionally of some repositories and types or matching a query."""
+        return list(dict.fromkeys(package.name for package in self.search(query, repositories, repo_types=repo_types)))
+
+_catalog = None
+
+def get_repo_catalog():
+    """Return the repository catalog of the cache directory."""
+    global _catalog
+    if _catalog is None:
+        _catalog = RepoCatalog()
+    return _catalog
+
+def repository_packages(repository, repo_type, query=None, output_callback=None):
+    """
+    Return the package names a repository ships for the host, indexing it first if its
+    metadata changed. If the repository cannot be reached, the names indexed earlier are used.
+    """
+    catalog = get_repo_catalog()
+    catalog.update(product_sources(repository, repo_type), output_callback)
+    return catalog.names([repository], query, [repo_type])
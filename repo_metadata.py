@@ -0,0 +1,190 @@
+import glob
+import hashlib
+import json
+import logging
+import os
+import shutil
+import tempfile
+import time
+
+from package_manager import run_package_manager
+from shared import get_cache_dir
+from tracing import traced
+
+logger = logging.getLogger(__name__)
+
+STATE_FILE = "repo_metadata.json"
+
+# Repository definitions written by percona-release
+APT_SOURCES_GLOB = "/etc/apt/sources.list.d/percona-*.list"
+YUM_REPOS_GLOB = "/etc/yum.repos.d/percona-*.repo"
+
+APT_LISTS_DIR = "/var/lib/apt/lists"
+
+# System package lists older than this are refreshed before bootstrap dependencies are installed
+SYSTEM_LISTS_MAX_AGE = 24 * 3600
+
+# Percona repository metadata older than this is refreshed, so new and superseded packages are seen
+REPO_METADATA_MAX_AGE = 6 * 3600
+
+class MetadataTracker:
+    """
+    Records when the metadata of each Percona repository was last refreshed and
+    which repository definitions changed since, so that a run refreshes only the
+    repositories it just enabled or whose metadata is older than max_age, at most once.
+    """
+
+    def __init__(self, package_manager, state_path=None, max_age=REPO_METADATA_MAX_AGE):
+        self.package_manager = package_manager
+        self.max_age = max_age
+        self.state_path = state_path or os.path.join(get_cache_dir(), STATE_FILE)
+        self.state = self._load_state()
+
+    def _load_state(self):
+        try:
+            with open(self.state_path, "r", encoding="utf-8") as file:
+                return json.load(file)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {"repos": {}}
+
+    def _save_state(self):
+        tmp_path = self.state_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as file:
+            json.dump(self.state, file, indent=2)
+        os.replace(tmp_path, self.state_path)
+
+    def _repo_files(self):
+        pattern = APT_SOURCES_GLOB if self.package_manager == "apt-get" else YUM_REPOS_GLOB
+        return sorted(glob.glob(pattern))
+
+    def repo_fingerprints(self):
+        """
+        Return a mapping of repository name (definition file name without extension)
+        to a hash of its definition.
+        """
+        fingerprints = {}
+        for path in self._repo_files():
+            name = os.path.splitext(os.path.basename(path))[0]
+            try:
+                with open(path, "rb") as file:
+                    fingerprints[name] = hashlib.sha256(file.read()).hexdigest()
+            except OSError as e:
+                logger.warning(f"Unable to read repository definition {path}: {str(e)}")
+        return fingerprints
+
+    def changed_repos(self):
+        """
+        Return the repositories that were added or modified since their last refresh,
+        or were last refreshed more than max_age ago.
+        """
+        known = self.state["repos"]
+        now = time.time()
+        return sorted(
+            name for name, fingerprint in self.repo_fingerprints().items()
+            if known.get(name, {}).get("fingerprint") != fingerprint
+            or now - known[name].get("refreshed_at", 0) > self.max_age
+        )
+
+    def system_lists_stale(self):
+        """
+        Return True if the distribution package lists are missing or too old to
+        resolve dependencies. Only meaningful for apt, yum/dnf expire metadata on their own.
+        """
+        if self.package_manager != "apt-get":
+            return False
+
+        lists = [
+            path for path in glob.glob(os.path.join(APT_LISTS_DIR, "*"))
+            if os.path.isfile(path) and not path.endswith("lock")
+        ]
+        if not lists:
+            return True
+        # Lists that did not change upstream keep their mtime, the last full refresh counts as well
+        refreshed_at = max(max(os.path.getmtime(path) for path in lists), self.state.get("system_refreshed_at", 0))
+        return time.time() - refreshed_at > SYSTEM_LISTS_MAX_AGE
+
+    @traced("refresh_metadata")
+    def refresh(self, output_callback, full=False, **command_options):
+        """
+        Refresh the metadata of the repositories that changed since their last refresh.
+
+        Args:
+            output_callback (callable): Receives progress messages.
+            full (bool): Refresh every configured repository, including the distribution ones.
+            **command_options: Arguments of run_command, e.g. the cancel_event of a GUI task.
+
+        Returns:
+            bool: True if a refresh was performed.
+        """
+        fingerprints = self.repo_fingerprints()
+        repos = sorted(fingerprints) if full else self.changed_repos()
+
+        if not full and not repos:
+            output_callback("Package metadata is up to date.\n")
+            logger.info("No repository changed or expired since the last refresh, skipping metadata refresh.")
+            return False
+
+        if full:
+            output_callback("Updating package lists...\n")
+            self._run(self.full_refresh_command(), output_callback, command_options)
+        else:
+            output_callback(f"Refreshing package metadata for {', '.join(repos)}...\n")
+            self._refresh_repos(repos, output_callback, command_options)
+
+        now = time.time()
+        for name in repos:
+            self.state["repos"][name] = {"fingerprint": fingerprints[name], "refreshed_at": now}
+        if full:
+            self.state["system_refreshed_at"] = now
+        self._save_state()
+        return True
+
+    def full_refresh_command(self):
+        if self.package_manager == "apt-get":
+            return ["sudo", "apt-get", "update"]
+        # makecache only downloads metadata, unlike `update` which upgrades the system
+        return ["sudo", self.package_manager, "makecache"]
+
+    def _refresh_repos(self, repos, output_callback, command_options):
+        if self.package_manager == "apt-get":
+            # Point apt at a directory holding only the changed source lists and keep the
+            # lists of every other repository in place.
+            with tempfile.TemporaryDirectory(prefix="percona-installer-sources-") as parts_dir:
+                for name in repos:
+                    shutil.copy(os.path.join(os.path.dirname(APT_SOURCES_GLOB), f"{name}.list"), parts_dir)
+                self._run([
+                    "sudo", "apt-get", "update",
+                    "-o", "Dir::Etc::sourcelist=/dev/null",
+                    "-o", f"Dir::Etc::sourceparts={parts_dir}",
+                    "-o", "APT::Get::List-Cleanup=0",
+                ], output_callback, command_options)
+        else:
+            repo_ids = []
+            for name in repos:
+                repo_ids.extend(self._yum_repo_ids(os.path.join(os.path.dirname(YUM_REPOS_GLOB), f"{name}.repo")))
+            if not repo_ids:
+                return
+            self._run([
+                "sudo", self.package_manager, "makecache",
+                "--disablerepo=*", f"--enablerepo={','.join(repo_ids)}",
+            ], output_callback, command_options)
+
+    @staticmethod
+    def _yum_repo_ids(path):
+        with open(path, "r", encoding="utf-8") as file:
+            return [
+                line.strip()[1:-1] for line in file
+                if line.strip().startswith("[") and line.strip().endswith("]")
+            ]
+
+    def _run(self, command, output_callback, command_options):
+        logger.info(f"Refreshing package metadata with command: {' '.join(command)}")
+        run_package_manager(command, output_callback, **command_options)
+
+_trackers = {}
+
+def get_tracker(package_manager):
+    """Return the metadata tracker shared by the whole run for the given package manager."""
+    if package_manager not in _trackers:
+        _trackers[package_manager] = MetadataTracker(package_manager)
+    return _trackers[package_manager]
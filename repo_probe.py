@@ -0,0 +1,237 @@
+import concurrent.futures
+import json
+import logging
+import os
+import threading
+import time
+
+from shared import get_cache_dir
+from tracing import span
+
+logger = logging.getLogger(__name__)
+
+REPO_URL = os.environ.get("PERCONA_INSTALLER_REPO_URL", "https://repo.percona.com")
+PROBE_TIMEOUT = 5
+PROBE_WORKERS = 8
+PROBE_CACHE_FILE = "repo_probe.json"
+
+# Published repositories stay, missing ones may be published any moment
+AVAILABLE_TTL = 6 * 3600
+MISSING_TTL = 600
+
+# Answers that are cached, anything else (5xx, network errors) is asked again next time
+CACHEABLE_STATUSES = (200, 403, 404, 410)
+
+# Component of the apt repositories and directory of the yum repositories per repository type
+APT_COMPONENTS = {"release": "main", "testing": "testing", "experimental": "experimental"}
+APT_ARCHITECTURES = {"x86_64": "amd64", "aarch64": "arm64"}
+
+class ProbeResult:
+    """
+    Availability of a repository for a platform.
+
+    Attributes:
+        repository (str): The repository, e.g. "ppg-17.0".
+        repo_type (str): "release", "testing" or "experimental".
+        url (str): The metadata that was probed, e.g. the Release file of the codename.
+        available (bool): Whether the repository has packages for the platform, None if
+            repo.percona.com could not be asked.
+        reason (str): Why it is not available, None if it is.
+    """
+
+    def __init__(self, repository, repo_type, url, available, reason=None):
+        self.repository = repository
+        self.repo_type = repo_type
+        self.url = url
+        self.available = available
+        self.reason = reason
+
+    def __repr__(self):
+        return f"ProbeResult({self.repository!r}, {self.repo_type!r}, available={self.available!r})"
+
+def _metadata_url(base_url, repository, repo_type, facts):
+    """The metadata file that exists when the repository has packages for the platform."""
+    if facts.package_manager == "apt-get":
+        return f"{base_url}/{repository}/apt/dists/{facts.codename}/Release"
+    return f"{base_url}/{repository}/yum/{repo_type}/{facts.major_version}/RPMS/{facts.arch}/repodata/repomd.xml"
+
+def _release_fields(text):
+    """The Components and Architectures fields of an apt Release file."""
+    fields = {}
+    for line in text.splitlines():
+        if line.startswith(("Components:", "Architectures:")):
+            name, value = line.split(":", 1)
+            fields[name.lower()] = value.split()
+    return fields
+
+def _fetch(url):
+    """
+    Ask for a metadata file over the shared HTTP session.
+
+    Returns:
+        dict: The status and, for apt Release files, their fields. None if the server
+            could not be reached.
+    """
+    import requests
+    from downloads import get_http_session
+
+    session = get_http_session()
+    try:
+        if url.endswith("/Release"):
+            response = session.get(url, timeout=PROBE_TIMEOUT)
+            answer = {"status": response.status_code}
+            if response.status_code == 200:
+                answer.update(_release_fields(response.text))
+        else:
+            response = session.head(url, timeout=PROBE_TIMEOUT, allow_redirects=True)
+            answer = {"status": response.status_code}
+    except requests.exceptions.RequestException as e:
+        logger.warning(f"Unable to probe {url}: {str(e)}")
+        return None
+    logger.debug(f"Probed {url}: {answer['status']}")
+    return answer
+
+class _ProbeCache:
+    """Answers per URL, kept on disk for AVAILABLE_TTL or MISSING_TTL."""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self.changed = False
+        try:
+            with open(path, "r", encoding="utf-8") as file:
+                self.answers = json.load(file)
+        except (FileNotFoundError, json.JSONDecodeError):
+            self.answers = {}
+
+    def get(self, url):
+        answer = self.answers.get(url)
+        if answer is None:
+            return None
+        ttl = AVAILABLE_TTL if answer["status"] == 200 else MISSING_TTL
+        return answer if time.time() - answer["checked_at"] < ttl else None
+
+    def put(self, url, answer):
+        if answer["status"] not in CACHEABLE_STATUSES:
+            return
+        with self._lock:
+            self.answers[url] = dict(answer, checked_at=time.time())
+            self.changed = True
+
+    def save(self):
+        if not self.changed:
+            return
+        tmp_path = self.path + ".tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as file:
+                json.dump(self.answers, file)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            logger.warning(f"Unable to cache the repository probes: {str(e)}")
+
+def _interpret(repository, repo_type, facts, url, metadata, root):
+    if metadata is None or metadata["status"] not in CACHEABLE_STATUSES:
+        return ProbeResult(repository, repo_type, url, None, f"unable to reach {url}")
+
+    platform = f"{facts.name or facts.distro_id} {facts.codename or facts.major_version} {facts.arch}"
+    if metadata["status"] == 200:
+        if facts.package_manager == "apt-get":
+            component = APT_COMPONENTS.get(repo_type, repo_type)
+            architecture = APT_ARCHITECTURES.get(facts.arch, facts.arch)
+            if "components" in metadata and component not in metadata["components"]:
+                return ProbeResult(repository, repo_type, url, False, f"{repository} has no {repo_type} packages for {platform}")
+            if "architectures" in metadata and architecture not in metadata["architectures"]:
+                return ProbeResult(repository, repo_type, url, False, f"{repository} has no packages for {architecture}")
+        return ProbeResult(repository, repo_type, url, True)
+
+    if root is not None and root["status"] in (403, 404, 410):
+        return ProbeResult(repository, repo_type, url, False, f"{repository} does not exist")
+    return ProbeResult(repository, repo_type, url, False, f"{repository} has no {repo_type} packages for {platform}")
+
+def probe_repositories(targets, facts=None, base_url=None, refresh=False):
+    """
+    Check concurrently whether repositories have packages for the host, before
+    percona-release and the package manager are run.
+
+    For every repository the metadata of the host's codename (apt) or release and
+    architecture (yum) is probed. If it is missing, the repository directory is probed
+    next to tell a missing platform from a missing repository. Answers are cached on disk.
+
+    Args:
+        targets (list): (repository, repo_type) tuples, e.g. [("ppg-17.0", "release")].
+        facts (HostFacts): The platform to probe for, the host's if None.
+        base_url (str): The repository server, REPO_URL if None, e.g. a package proxy.
+        refresh (bool): Ignore cached answers.
+
+    Returns:
+        list: A ProbeResult per target.
+    """
+    from host_facts import get_host_facts
+
+    facts = facts or get_host_facts()
+    base_url = (base_url or REPO_URL).rstrip("/")
+    if not facts.package_manager or (facts.package_manager == "apt-get" and not facts.codename):
+        return [ProbeResult(repository, repo_type, None, None, "unknown platform") for repository, repo_type in targets]
+    cache = _ProbeCache(os.path.join(get_cache_dir(), PROBE_CACHE_FILE))
+
+    probes = []
+    for repository, repo_type in targets:
+        probes.append((repository, repo_type, _metadata_url(base_url, repository, repo_type, facts), f"{base_url}/{repository}/"))
+
+    answers = {}
+    with span("probe_repositories", targets=len(probes)):
+        _probe_urls([probe[2] for probe in probes], answers, cache, refresh)
+        # The repository directory only tells a missing platform from a missing repository
+        _probe_urls([
+            root_url for _, _, metadata_url, root_url in probes
+            if answers[metadata_url] is not None and answers[metadata_url]["status"] != 200
+        ], answers, cache, refresh)
+    cache.save()
+
+    return [
+        _interpret(repository, repo_type, facts, metadata_url, answers[metadata_url], answers.get(root_url))
+        for repository, repo_type, metadata_url, root_url in probes
+    ]
+
+def _probe_urls(urls, answers, cache, refresh):
+    """Fill answers with the cached or fetched answer of every url, fetched concurrently."""
+    pending = []
+    for url in dict.fromkeys(urls):
+        answer = None if refresh else cache.get(url)
+        if answer is None:
+            pending.append(url)
+        else:
+            answers[url] = answer
+    if not pending:
+        return
+    with concurrent.futures.ThreadPoolExecutor(max_workers=min(PROBE_WORKERS, len(pending))) as executor:
+        for url, answer in zip(pending, executor.map(_fetch, pending)):
+            answers[url] = answer
+            if answer is not None:
+                cache.put(url, answer)
+
+def check_repositories(targets, base_url=None, output_callback=print):
+    """
+    Pre-flight check of the repositories of an install, probed concurrently.
+
+    Args:
+        targets (list): (repository, repo_type) tuples, e.g. [("ppg-17.0", "release")].
+
+    Raises:
+        ValueError: If a repository certainly has no packages for the host. An
+            unreachable server is only a warning, the install reports its own errors.
+    """
+    results = probe_repositories(targets, base_url=base_url)
+    missing = []
+    for result in results:
+        if result.available is None:
+            output_callback(f"Warning: Unable to check the {result.repository} repository: {result.reason}")
+        elif not result.available:
+            missing.append(f"The {result.repo_type} repository {result.repository} is not available: {result.reason}.")
+    if missing:
+        raise ValueError("Error: " + " ".join(missing))
+    return results
+
+def check_repository(repository, repo_type, base_url=None, output_callback=print):
+    """Pre-flight check of the repository of an install, see check_repositories."""
+    return check_repositories([(repository, repo_type)], base_url, output_callback)[0]
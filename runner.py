@@ -0,0 +1,372 @@
+import collections
+import logging
+import os
+import shlex
+import signal
+import subprocess
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+# Output lines of the commands, at DEBUG level
+output_logger = logging.getLogger(f"{__name__}.output")
+
+# How often a running command is checked for its timeout and for cancellation
+WATCH_INTERVAL = 0.1
+
+# Seconds a terminated command gets to exit before it is killed
+KILL_GRACE_PERIOD = 5
+
+# Seconds the output of a stopped command is still read, its children may keep it open
+OUTPUT_GRACE_PERIOD = 1
+
+# Commands kept in the history of a runner, the oldest are dropped
+HISTORY_SIZE = 1000
+
+def command_name(argv):
+    """
+    Short label of a command: the program without sudo and its options, followed by
+    its first argument if that is a subcommand, e.g. "apt-get install".
+    """
+    args = list(argv)
+    if os.path.basename(args[0]) == "sudo":
+        args = args[1:]
+        while args and args[0].startswith("-"):
+            option = args.pop(0)
+            if option in ("-u", "-g") and args:
+                args.pop(0)
+    if not args:
+        return os.path.basename(argv[0])
+
+    name = os.path.basename(args[0])
+    if len(args) > 1 and not args[1].startswith("-") and os.sep not in args[1]:
+        name = f"{name} {args[1]}"
+    return name
+
+class CommandError(subprocess.CalledProcessError):
+    """
+    Raised when a command fails. Subclasses CalledProcessError, so existing
+    `except subprocess.CalledProcessError` handlers keep working.
+    """
+
+    def __init__(self, result):
+        super().__init__(result.returncode, result.argv, result.stdout, result.stderr)
+        self.result = result
+
+    def __str__(self):
+        if self.result.timed_out:
+            return f"Command '{self.result.command_line}' timed out after {self.result.timeout} seconds"
+        if self.result.cancelled:
+            return f"Command '{self.result.command_line}' was cancelled"
+        return super().__str__()
+
+class CommandResult:
+    """
+    Record of one command execution.
+
+    Attributes:
+        argv (list): The command.
+        name (str): Label of the command in logs and reports, see command_name().
+        returncode (int): Exit status, negative if the command was killed by a signal.
+        stdout_lines (list): Lines of standard output, without line endings.
+        stderr_lines (list): Lines of standard error, without line endings.
+        wall_time (float): Elapsed seconds.
+        cpu_time (float): User and system CPU seconds of the command and its children.
+        timed_out (bool): The command was stopped because it exceeded its timeout.
+        cancelled (bool): The command was stopped through its cancel event.
+    """
+
+    def __init__(self, argv, name=None, timeout=None):
+        self.argv = list(argv)
+        self.name = name or command_name(self.argv)
+        self.timeout = timeout
+        self.returncode = None
+        self.stdout_lines = []
+        self.stderr_lines = []
+        self.started_at = None
+        self.wall_time = None
+        self.cpu_time = None
+        self.timed_out = False
+        self.cancelled = False
+
+    @property
+    def command_line(self):
+        return " ".join(shlex.quote(arg) for arg in self.argv)
+
+    def summary(self):
+        """Return a copy of the record without the captured output, as kept in the history."""
+        summary = CommandResult(self.argv, self.name, self.timeout)
+        for attribute in ("returncode", "started_at", "wall_time", "cpu_time", "timed_out", "cancelled"):
+            setattr(summary, attribute, getattr(self, attribute))
+        return summary
+
+    @property
+    def stdout(self):
+        return "\n".join(self.stdout_lines)
+
+    @property
+    def stderr(self):
+        return "\n".join(self.stderr_lines)
+
+    @property
+    def ok(self):
+        return self.returncode == 0
+
+    def to_dict(self):
+        return {
+            "name": self.name,
+            "argv": self.argv,
+            "returncode": self.returncode,
+            "started_at": self.started_at,
+            "wall_time": self.wall_time,
+            "cpu_time": self.cpu_time,
+            "timed_out": self.timed_out,
+            "cancelled": self.cancelled,
+        }
+
+    def __repr__(self):
+        return f"CommandResult({self.command_line!r}, returncode={self.returncode}, wall_time={self.wall_time})"
+
+class CommandObserver:
+    """
+    Receives a notification when a command starts and when it finishes,
+    e.g. to collect timings. Subclasses override the methods they need.
+    """
+
+    def command_started(self, result):
+        pass
+
+    def command_finished(self, result):
+        pass
+
+class SubprocessBackend:
+    """Runs commands as local processes."""
+
+    def execute(self, result, emit, timeout=None, env=None, stdin=None, new_session=False, cancel_event=None, cwd=None):
+        """
+        Run the command of result, passing each output line to emit(stream, line),
+        and fill in its returncode, cpu_time, timed_out and cancelled.
+        """
+        process = subprocess.Popen(
+            result.argv,
+            stdin=stdin,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            env=env,
+            cwd=cwd,
+            universal_newlines=True,
+            errors="replace",
+            bufsize=1,
+            start_new_session=new_session,
+        )
+
+        # Read both pipes in threads so neither can fill up and block the command
+        readers = [
+            threading.Thread(target=self._read, args=(pipe, stream, emit), daemon=True)
+            for pipe, stream in ((process.stdout, "stdout"), (process.stderr, "stderr"))
+        ]
+        for reader in readers:
+            reader.start()
+
+        finished = threading.Event()
+        watcher = threading.Thread(
+            target=self._watch, args=(process, result, finished, timeout, new_session, cancel_event), daemon=True
+        )
+        watcher.start()
+
+        try:
+            result.returncode, result.cpu_time = self._wait(process)
+            for reader in readers:
+                # A child of a stopped command, e.g. a sleep of a shell, may hold the pipes
+                reader.join(OUTPUT_GRACE_PERIOD if result.timed_out or result.cancelled else None)
+        finally:
+            finished.set()
+            if process.returncode is None:
+                self._stop(process, new_session)
+                process.wait()
+            watcher.join()
+
+    @staticmethod
+    def _read(pipe, stream, emit):
+        with pipe:
+            for line in pipe:
+                emit(stream, line.rstrip("\n"))
+
+    @staticmethod
+    def _wait(process):
+        """Reap the process with wait4 to get the CPU time of the command and its children."""
+        try:
+            _, status, usage = os.wait4(process.pid, 0)
+        except ChildProcessError:
+            # Already reaped, e.g. by Popen.poll() from another thread
+            return process.wait(), None
+
+        if os.WIFSIGNALED(status):
+            returncode = -os.WTERMSIG(status)
+        else:
+            returncode = os.WEXITSTATUS(status)
+        # Tell Popen the process is gone so it does not wait for it again
+        process.returncode = returncode
+        return returncode, usage.ru_utime + usage.ru_stime
+
+    @staticmethod
+    def _stop(process, new_session):
+        try:
+            if new_session:
+                # Stop the children of the command as well, they share its process group
+                os.killpg(process.pid, signal.SIGTERM)
+            else:
+                process.terminate()
+        except ProcessLookupError:
+            pass
+
+    def _watch(self, process, result, finished, timeout, new_session, cancel_event):
+        deadline = time.monotonic() + timeout if timeout else None
+        while not finished.wait(WATCH_INTERVAL):
+            if cancel_event is not None and cancel_event.is_set():
+                result.cancelled = True
+            elif deadline is not None and time.monotonic() >= deadline:
+                result.timed_out = True
+            else:
+                continue
+
+            logger.warning(f"Stopping command {result.command_line}: {'cancelled' if result.cancelled else 'timed out'}")
+            self._stop(process, new_session)
+            if not finished.wait(KILL_GRACE_PERIOD):
+                try:
+                    if new_session:
+                        os.killpg(process.pid, signal.SIGKILL)
+                    else:
+                        process.kill()
+                except ProcessLookupError:
+                    pass
+            return
+
+class DryRunBackend:
+    """Reports commands instead of running them, every command succeeds."""
+
+    def __init__(self, output_callback=print):
+        self.output_callback = output_callback
+
+    def execute(self, result, emit, **kwargs):
+        self.output_callback(f"[dry-run] {result.command_line}")
+        result.returncode = 0
+        result.cpu_time = 0.0
+
+class CommandRunner:
+    """
+    Executes the external commands of the installer.
+
+    Commands are argv lists, never shell strings. Their output is streamed line by
+    line to an output_callback while it is produced, and every execution is recorded
+    with its exit status, wall and CPU time in `history` and reported to the observers.
+    The history keeps the last HISTORY_SIZE commands without their output, so it does not
+    grow with long sessions or chatty commands.
+    The backend that actually runs the commands can be swapped, e.g. for a dry run.
+    """
+
+    def __init__(self, backend=None):
+        self.backend = backend or SubprocessBackend()
+        self.observers = []
+        self.history = collections.deque(maxlen=HISTORY_SIZE)
+        self._lock = threading.Lock()
+
+    def add_observer(self, observer):
+        self.observers.append(observer)
+
+    def remove_observer(self, observer):
+        self.observers.remove(observer)
+
+    def _notify(self, method, result):
+        for observer in list(self.observers):
+            try:
+                getattr(observer, method)(result)
+            except Exception as e:
+                logger.error(f"Command observer {type(observer).__name__} failed: {str(e)}")
+
+    def run(self, argv, output_callback=None, check=True, timeout=None, env=None, stdin=None,
+            new_session=False, cancel_event=None, name=None, cwd=None):
+        """
+        Run a command and wait for it to finish.
+
+        Args:
+            argv (list): The command and its arguments.
+            output_callback (callable): Receives each line of stdout and stderr, without
+                line ending, as soon as it is produced. Output is only recorded if None.
+            check (bool): Raise CommandError if the command fails.
+            timeout (float): Seconds after which the command is stopped and fails.
+            env (dict): Environment of the command, inherited if None.
+            stdin: Standard input of the command, inherited if None.
+            new_session (bool): Run the command in its own process group, so that stopping
+                it also stops its children. It then has no controlling terminal.
+            cancel_event (threading.Event): Stops the command when set.
+            name (str): Label of the command in logs and reports.
+            cwd (str): Working directory of the command, inherited if None.
+
+        Returns:
+            CommandResult: The record of the execution.
+        """
+        if isinstance(argv, str):
+            raise TypeError(f"Commands must be argument lists, not strings: {argv!r}")
+
+        result = CommandResult(argv, name, timeout)
+        callback_lock = threading.Lock()
+
+        log_output = output_logger.isEnabledFor(logging.DEBUG)
+
+        def emit(stream, line):
+            (result.stdout_lines if stream == "stdout" else result.stderr_lines).append(line)
+            if log_output:
+                output_logger.debug(line, extra={"command": result.name, "stream": stream})
+            if output_callback is not None:
+                # stdout and stderr are read by different threads
+                with callback_lock:
+                    output_callback(line)
+
+        logger.info(f"Running command: {result.command_line}")
+        result.started_at = time.time()
+        self._notify("command_started", result)
+        start = time.perf_counter()
+        try:
+            self.backend.execute(
+                result, emit, timeout=timeout, env=env, stdin=stdin,
+                new_session=new_session, cancel_event=cancel_event, cwd=cwd
+            )
+        except OSError as e:
+            # The command could not be started, e.g. it is not installed
+            result.returncode = 127
+            emit("stderr", str(e))
+            logger.error(f"Unable to run {result.command_line}: {str(e)}")
+        finally:
+            result.wall_time = time.perf_counter() - start
+            with self._lock:
+                self.history.append(result.summary())
+            self._notify("command_finished", result)
+
+        cpu_time = f"{result.cpu_time:.2f}s" if result.cpu_time is not None else "-"
+        logger.info(
+            f"Command {result.name} exited with {result.returncode} "
+            f"(wall {result.wall_time:.2f}s, cpu {cpu_time}): {result.command_line}"
+        )
+
+        if check and (result.returncode != 0 or result.timed_out or result.cancelled):
+            raise CommandError(result)
+        return result
+
+_runner = None
+
+def get_runner():
+    """Return the command runner shared by the process."""
+    global _runner
+    if _runner is None:
+        _runner = CommandRunner()
+    return _runner
+
+def set_runner(runner):
+    """Replace the shared command runner, e.g. with one using a different backend."""
+    global _runner
+    _runner = runner
+
+def run_command(argv, output_callback=None, **kwargs):
+    """Run a command with the shared runner. See CommandRunner.run for the arguments."""
+    return get_runner().run(argv, output_callback, **kwargs)
@@ -1,17 +1,9 @@
 import logging
 import os
-import platform
 import subprocess
-import json
-import importlib
-import sys
-
-# Configure logging
-logging.basicConfig(
-    filename="debug.log",
-    level=logging.DEBUG,
-    format="%(asctime)s [%(levelname)s] %(message)s"
-)
+
+from tracing import traced
+
 logger = logging.getLogger(__name__)
 
 # Shared constants
@@ -24,110 +16,139 @@ SUPPORTED_DISTROS = {
 
 REPO_TYPES = ["release", "testing", "experimental"]
 
+# The repository of repo.percona.com that publishes the percona-release package
+PERCONA_RELEASE_REPOSITORY = "prel"
+
 # Shared functions
+def get_cache_dir(*parts):
+    """
+    Return the per-user cache directory of the installer, creating it if needed.
+    The location can be overridden with PERCONA_INSTALLER_CACHE_DIR and
+    otherwise follows XDG_CACHE_HOME (~/.cache/percona_installer by default).
+    """
+    base = os.environ.get("PERCONA_INSTALLER_CACHE_DIR")
+    if not base:
+        xdg_cache = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+        base = os.path.join(xdg_cache, "percona_installer")
+
+    path = os.path.join(base, *parts)
+    os.makedirs(path, exist_ok=True)
+    return path
+
+@traced()
 def detect_os():
     """
     Detect the operating system and return the appropriate package manager.
     Supports popular Linux distributions like Ubuntu, Debian, CentOS, Rocky, AlmaLinux, Fedora, etc.
+    The host is probed once, see host_facts.get_host_facts.
     """
+    from host_facts import get_host_facts
+    facts = get_host_facts()
+    reason = facts.unsupported_reason()
+    if reason:
+        logger.error(f"Error detecting OS: {reason}")
+        raise Exception(f"Unsupported OS: {reason}")
+    return facts.package_manager
+
+def percona_release_installed():
+    """Check if the percona-release command exists."""
+    from host_facts import get_host_facts
+    return get_host_facts().has_tool("percona-release")
+
+def percona_release_url(package_manager):
+    """Return the URL of the percona-release package for this host."""
+    if package_manager == "apt-get":
+        # The package is built per OS codename
+        from host_facts import get_host_facts
+        codename = get_host_facts().codename
+        if not codename:
+            raise Exception("Unable to determine the codename of the distribution from os-release.")
+        return f"https://repo.percona.com/apt/percona-release_latest.{codename}_all.deb"
+    if package_manager in ["yum", "dnf"]:
+        return "https://repo.percona.com/yum/percona-release-latest.noarch.rpm"
+    raise Exception(f"Unsupported package manager: {package_manager}")
+
+@traced()
+def download_percona_release(package_manager, output_callback):
+    """
+    Download the percona-release package into the shared download cache and return its path.
+
+    The "latest" package is published without a checksum next to it, so the newest
+    version is looked up in the package lists of the Percona release repository instead
+    and downloaded with the SHA-256 they publish, the lists being verified against their
+    Release or repomd.xml file. Like the lists, these are fetched over HTTPS and their GPG
+    signature is not checked. PERCONA_INSTALLER_RELEASE_SHA256 pins the SHA-256 of the
+    "latest" package instead, e.g. for a mirrored or audited copy.
+
+    Raises:
+        Exception: If the package cannot be verified, it is not downloaded.
+    """
+    from downloads import download_file
+    sha256 = os.environ.get("PERCONA_INSTALLER_RELEASE_SHA256")
+    if sha256:
+        return download_file(percona_release_url(package_manager), sha256=sha256, output_callback=output_callback)
+
+    from repo_catalog import RepoCatalogError, package_download, product_sources
     try:
-        if os.path.exists("/etc/os-release"):
-            with open("/etc/os-release", "r") as file:
-                os_release = file.read().lower()
-
-            if "ubuntu" in os_release or "debian" in os_release:
-                return "apt-get"
-            elif "centos" in os_release or "red hat" in os_release or "rocky" in os_release or "alma" in os_release:
-                return "yum"
-            elif "fedora" in os_release:
-                return "dnf"
-            else:
-                raise Exception("Unsupported Linux distribution detected.")
-
-        os_id = platform.system().lower()
-        if os_id == "linux":
-            raise Exception("Minimal Linux distribution detected. Unable to determine package manager.")
-        elif os_id == "windows":
-            raise Exception("Windows is not supported.")
-        elif os_id == "darwin":
-            raise Exception("MacOS is not supported.")
-        else:
-            raise Exception("Unsupported operating system.")
+        source = product_sources(PERCONA_RELEASE_REPOSITORY, "release", yum_arch="noarch")[0]
+        url, sha256, version = package_download(source, "percona-release")
+    except RepoCatalogError as e:
+        raise Exception(
+            f"Unable to verify the percona-release package, it was not downloaded: {str(e)}. "
+            f"Set PERCONA_INSTALLER_RELEASE_SHA256 to the SHA-256 of a trusted copy to install it."
+        )
+    output_callback(f"Verified percona-release {version} against the repository metadata.\n")
+    return download_file(url, sha256=sha256, output_callback=output_callback)
 
-    except Exception as e:
-        logger.error(f"Error detecting OS: {str(e)}")
-        raise Exception(f"Unsupported OS: {str(e)}")
+@traced()
+def install_percona_release(package_manager, package_path, output_callback, **command_options):
+    """
+    Install a downloaded percona-release package together with its dependencies.
+    The repositories it adds are refreshed once, right before components are installed.
+    The command_options are passed to run_command, e.g. the cancel_event of a GUI task.
+    """
+    output_callback("Installing Percona Release package...\n")
+    from package_manager import run_package_manager
+    run_package_manager(["sudo", package_manager, "install", "-y", package_path], output_callback, **command_options)
 
-def ensure_percona_release(output_callback):
+    if package_manager in ["yum", "dnf"]:
+        output_callback("Enabling Percona repository...\n")
+        run_package_manager(["sudo", "percona-release", "enable", "original"], output_callback, **command_options)
+
+@traced()
+def ensure_percona_release(output_callback, **command_options):
     """
     Ensures the Percona Release package is downloaded and installed.
-    Provides real-time feedback via the provided callback.
+    Provides real-time feedback via the provided callback. The command_options are
+    passed to every command it runs, e.g. the cancel_event of a GUI task.
     """
     try:
         output_callback("Ensuring Percona Release package is installed...\n")
 
-        # Check if the percona-release command exists
-        result = subprocess.run(
-            ["which", "percona-release"],
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            universal_newlines=True
-        )
-        if result.returncode == 0:
+        if percona_release_installed():
             output_callback("percona-release is already installed.\n")
             logger.info("percona-release is already installed.")
             return
 
         # Detect the host OS
         package_manager = detect_os()
-
-        if package_manager == "apt-get":
-            # Update package list
-            output_callback("Updating package list...\n")
-            subprocess.run(["sudo", "apt-get", "update"], check=True)
-
-            # Install wget if not present
-            output_callback("Checking for wget...\n")
-            subprocess.run(["sudo", "apt-get", "install", "-y", "wget"], check=True)
-
-            # Get the codename of the OS
-            output_callback("Determining OS codename...\n")
-            codename = subprocess.check_output(["lsb_release", "-sc"], text=True).strip()
-
-            # Check if the Percona Release package is already downloaded
-            packagename = f"percona-release_latest.{codename}_all.deb"
-            if not os.path.exists(packagename):
-                output_callback("Downloading Percona Release package...\n")
-                url = f"https://repo.percona.com/apt/percona-release_latest.{codename}_all.deb"
-                subprocess.run(["wget", url], check=True)
-            else:
-                output_callback("Percona Release package already downloaded.\n")
-
-            # Install the downloaded package
-            output_callback("Installing Percona Release package...\n")
-            subprocess.run(["sudo", "dpkg", "-i", packagename], check=True)
-
-            # Update package list again
-            output_callback("Updating package list after installation...\n")
-            subprocess.run(["sudo", "apt-get", "update"], check=True)
-
-        elif package_manager in ["yum", "dnf"]:
-            # Install the percona-release package
-            output_callback("Installing Percona Release package...\n")
-            subprocess.run(["sudo", package_manager, "install", "-y", "https://repo.percona.com/yum/percona-release-latest.noarch.rpm"], check=True)
-
-            # Enable the Percona repository
-            output_callback("Enabling Percona repository...\n")
-            subprocess.run(["sudo", "percona-release", "enable", "original"], check=True)
-
-            # Update package list
-            output_callback("Updating package list...\n")
-            subprocess.run(["sudo", package_manager, "update"], check=True)
-
-        else:
+        if package_manager not in ["apt-get", "yum", "dnf"]:
             output_callback(f"Unsupported package manager: {package_manager}\n")
             return
 
+        # The refresh and the install run without another installer in between
+        from package_manager import installer_lock
+        with installer_lock(output_callback):
+            if package_manager == "apt-get":
+                # Refresh the distribution package lists only if they are too old to
+                # resolve the dependencies of percona-release
+                from repo_metadata import get_tracker
+                tracker = get_tracker(package_manager)
+                if tracker.system_lists_stale():
+                    tracker.refresh(output_callback, full=True, **command_options)
+
+            package_path = download_percona_release(package_manager, output_callback)
+            install_percona_release(package_manager, package_path, output_callback, **command_options)
         output_callback("Percona Release package successfully installed.\n")
     except subprocess.CalledProcessError as e:
         output_callback(f"Error during installation: {str(e)}\n")
@@ -153,57 +174,27 @@ def build_repo_command(distribution, version, repo_type):
 
 def get_available_solutions():
     """
-    Retrieves a list of available solutions (Python files) in the defined directory.
-    :param directory: The directory to search for Python solution files.
-    :return: A list of solution names (without the .py extension).
+    Retrieves a list of available solutions from the solution registry, without importing them.
+    :return: A list of solution names.
     """
-    directory = os.path.join(os.path.dirname(__file__), "solution")
+    from solution_registry import get_registry
+    return get_registry().names()
 
-    try:
-        # List all .py files in the directory, excluding __init__.py
-        files = [
-            f[:-3] for f in os.listdir(directory) 
-            if f.endswith('.py') and f != '__init__.py'
-        ]
-        return files
-    except Exception as e:
-        print(f"Error accessing directory {directory}: {e}")
-        sys.exit(1)
-
-def load_solutions_functions(directory, output_callback=print):
+def load_solutions_functions(directory=None, output_callback=print):
     """
-    Dynamically load all Python modules and functions from the given directory.
+    Return a mapping of solution name to entry point. Solutions are imported on first access.
     """
-    directory = 'solution'
-    solutions = {}
-    directory_path = os.path.join(os.path.dirname(__file__), directory)
-
-    # Ensure the directory exists
-    if not os.path.isdir(directory_path):
-        output_callback(f"Directory not found: {directory_path}")
-        return solutions
-
-    # Add directory to sys.path
-    sys.path.insert(0, directory_path)
-
-    # Import each .py file in the directory
-    for filename in os.listdir(directory_path):
-        if filename.endswith(".py") and filename != "__init__.py":
-            module_name = filename[:-3]  # Strip .py extension
-            try:
-                # Import the module dynamically
-                module = importlib.import_module(module_name)
+    from solution_registry import get_registry
 
-                # Collect all callable functions from the module
-                for attr_name in dir(module):
-                    attr = getattr(module, attr_name)
-                    if callable(attr) and not attr_name.startswith("_"):
-                        solutions[attr_name] = attr
+    class LazySolutions(dict):
+        def __missing__(self, name):
+            self[name] = get_registry().load(name)
+            return self[name]
 
-            except Exception as e:
-                output_callback(f"Error loading {module_name}: {e}")
+        def __contains__(self, name):
+            return get_registry().get(name) is not None
 
-    return solutions
+    return LazySolutions()
 
 # Platform Constants
 SUPPORTED_PLATFORMS = {
@@ -215,6 +206,7 @@ SUPPORTED_PLATFORMS = {
 }
 
 NORMALIZED_DISTROS = {
+    "ol": "Oracle Linux",
     "oracle linux server": "Oracle Linux",
     "oracle linux": "Oracle Linux",
     "ubuntu": "Ubuntu",
@@ -1,115 +1,114 @@
-import subprocess
+from journal import checkpoint
+from runner import CommandError, run_command
+from sql_executor import SqlExecutor, SqlError
+from tracing import span
+
+# Seconds PostgreSQL gets to restart
+RESTART_TIMEOUT = 120
 
 def pg_tde_demo(pkg_manager, output_callback=print):
     """
     Sets up the PostgreSQL database and table with pg_tde settings.
 
-    :param os_type: The operating system type ('deb' for Debian/Ubuntu, 'rpm' for RedHat-based systems).
-    :param database: The name of the database to create.
-    :param table: The name of the table to create.
+    :param pkg_manager: The package manager of the host ('apt-get' for Debian/Ubuntu, 'yum' or 'dnf' for RedHat-based systems).
     :param output_callback: A function to handle output (default is print).
+    :return: True if the setup completed, False if it failed.
     """
-    
     database = "supersecure"
     table = "albums"
+    if pkg_manager == "apt-get":
+        service = "postgresql"
+        key_location = "/var/lib/postgresql/pg_tde_test_keyring.per"
+    else:  # yum or dnf on RedHat-based systems
+        service = "postgresql-17"
+        key_location = "/var/lib/pgsql/pg_tde_test_keyring.per"
 
     try:
-        # Configure shared_preload_libraries
-        output_callback("Setting shared_preload_libraries to 'pg_tde'...\n")
-        subprocess.run(
-            ["sudo", "-u", "postgres", "psql", "-U", "postgres", "-c", 
-             "ALTER SYSTEM SET shared_preload_libraries ='pg_tde';"],
-            check=True
-        )
+        with SqlExecutor(output_callback) as sql:
+            # Every step but the verification is checkpointed in the install journal, so a
+            # resumed install does not run CREATE DATABASE or CREATE EXTENSION twice
 
-        # Enable WAL encryption
-        output_callback("Enabling WAL encryption...\n")
-        subprocess.run(
-            ["sudo", "-u", "postgres", "psql", "-U", "postgres", "-c", 
-             "ALTER SYSTEM SET pg_tde.wal_encrypt = on;"],
-            check=True
-        )
+            # Configure shared_preload_libraries and enable WAL encryption
+            def configure():
+                output_callback("Setting shared_preload_libraries to 'pg_tde' and enabling WAL encryption...\n")
+                sql.run([
+                    "ALTER SYSTEM SET shared_preload_libraries ='pg_tde';",
+                    "ALTER SYSTEM SET pg_tde.wal_encrypt = on;",
+                ])
 
-        # Restart PostgreSQL based on OS type
-        if pkg_manager == "apt-get":
-            output_callback("Restarting PostgreSQL service for Debian/Ubuntu...\n")
-            subprocess.run(["sudo", "systemctl", "restart", "postgresql"], check=True)
-            key_location = "/var/lib/postgresql/pg_tde_test_keyring.per"
-        else:  # Assume 'rpm' for RedHat-based systems
-            output_callback("Restarting PostgreSQL service for RedHat-based systems...\n")
-            subprocess.run(["sudo", "systemctl", "restart", "postgresql-17"], check=True)
-            key_location = "/var/lib/pgsql/pg_tde_test_keyring.per"
+            with span("pg_tde_demo:configure"):
+                checkpoint("pg_tde_demo:configure", configure, output_callback=output_callback)
 
-        # Create the database
-        output_callback(f"Creating database {database}...\n")
-        subprocess.run(
-            ["sudo", "-u", "postgres", "psql", "-U", "postgres", "-c", 
-             f"CREATE DATABASE {database} WITH OWNER=postgres;"],
-            check=True
-        )
+            # Restart PostgreSQL based on OS type
+            def restart():
+                if pkg_manager == "apt-get":
+                    output_callback("Restarting PostgreSQL service for Debian/Ubuntu...\n")
+                else:
+                    output_callback("Restarting PostgreSQL service for RedHat-based systems...\n")
+                run_command(["sudo", "systemctl", "restart", service], output_callback, timeout=RESTART_TIMEOUT)
 
-        # Enable pg_tde extension
-        output_callback(f"Enabling pg_tde extension in database {database}...\n")
-        subprocess.run(
-            ["sudo", "-u", "postgres", "psql", "-U", "postgres", "-d", database, "-c", 
-             "CREATE EXTENSION pg_tde;"],
-            check=True
-        )
+                # The restart terminated the open session
+                sql.reconnect()
 
-        # Add key provider file
-        output_callback("Adding key provider file for pg_tde...\n")
-        subprocess.run(
-            ["sudo", "-u", "postgres", "psql", "-U", "postgres", "-d", database, "-c", 
-             f"SELECT pg_tde_add_key_provider_file('file-vault', '{key_location}');"],
-            check=True
-        )
+            with span("pg_tde_demo:restart"):
+                checkpoint("pg_tde_demo:restart", restart, inputs=service, output_callback=output_callback)
 
-        # Set the principal key
-        output_callback("Setting the principal key for pg_tde...\n")
-        subprocess.run(
-            ["sudo", "-u", "postgres", "psql", "-U", "postgres", "-d", database, "-c", 
-             "SELECT pg_tde_set_principal_key('test-db-master-key', 'file-vault');"],
-            check=True
-        )
+            # Create the database
+            def create_database():
+                output_callback(f"Creating database {database}...\n")
+                sql.run([f"CREATE DATABASE {database} WITH OWNER=postgres;"])
 
-        # Set default table access method
-        output_callback(f"Setting default_table_access_method to 'tde_heap' for {database}...\n")
-        subprocess.run(
-            ["sudo", "-u", "postgres", "psql", "-U", "postgres", "-d", database, "-c", 
-             f"ALTER DATABASE {database} SET default_table_access_method='tde_heap';"],
-            check=True
-        )
+            with span("pg_tde_demo:create_database"):
+                checkpoint("pg_tde_demo:create_database", create_database, inputs=database, output_callback=output_callback)
 
-        # Reload configuration
-        output_callback("Reloading PostgreSQL configuration...\n")
-        subprocess.run(
-            ["sudo", "-u", "postgres", "psql", "-U", "postgres", "-c", 
-             "SELECT pg_reload_conf();"],
-            check=True
-        )
+            # Enable pg_tde, set up the key provider and principal key, make tde_heap the
+            # default access method and create the table. A statement fails when it is run
+            # again, so each one has its own checkpoint: a resumed install skips those of
+            # a batch that failed halfway
+            steps = [
+                ("create_extension", "Enabling pg_tde", "CREATE EXTENSION IF NOT EXISTS pg_tde;"),
+                (
+                    "add_key_provider", "Adding the file key provider",
+                    f"SELECT pg_tde_add_key_provider_file('file-vault', '{key_location}');",
+                ),
+                (
+                    "set_principal_key", "Setting the principal key",
+                    "SELECT pg_tde_set_principal_key('test-db-master-key', 'file-vault');",
+                ),
+                (
+                    "default_access_method", "Making tde_heap the default access method",
+                    f"ALTER DATABASE {database} SET default_table_access_method='tde_heap';",
+                ),
+                (
+                    # The access method is given explicitly, ALTER DATABASE only affects new sessions
+                    "create_table", f"Creating table {table}",
+                    f"CREATE TABLE IF NOT EXISTS {table} ("
+                    "album_id INTEGER GENERATED ALWAYS AS IDENTITY PRIMARY KEY, "
+                    "artist_id INTEGER, "
+                    "title TEXT NOT NULL, "
+                    "released DATE NOT NULL) USING tde_heap;",
+                ),
+            ]
+            for step, message, statement in steps:
+                def run_step(message=message, statement=statement):
+                    output_callback(f"{message} in database {database}...\n")
+                    sql.run([statement], database=database)
 
-        # Create the table
-        output_callback(f"Creating table {table} in database {database}...\n")
-        subprocess.run(
-            ["sudo", "-u", "postgres", "psql", "-U", "postgres", "-d", database, "-c", 
-             f"CREATE TABLE {table} ("
-             "album_id INTEGER GENERATED ALWAYS AS IDENTITY PRIMARY KEY, "
-             "artist_id INTEGER, "
-             "title TEXT NOT NULL, "
-             "released DATE NOT NULL);"],
-            check=True
-        )
+                with span(f"pg_tde_demo:{step}"):
+                    checkpoint(f"pg_tde_demo:{step}", run_step, inputs=[database, table, key_location], output_callback=output_callback)
 
-        # Verify encryption
-        output_callback(f"Verifying encryption status for table {table}...\n")
-        subprocess.run(
-            ["sudo", "-u", "postgres", "psql", "-U", "postgres", "-d", database, "-c", 
-             f"SELECT pg_tde_is_encrypted('{table}');"],
-            check=True
-        )
+            # Verify encryption
+            with span("pg_tde_demo:verify"):
+                output_callback(f"Verifying encryption status for table {table}...\n")
+                result = sql.run([f"SELECT pg_tde_is_encrypted('{table}');"], database=database)[0]
+                output_callback("\n".join(result.output) + "\n")
 
         output_callback("Database and table setup completed successfully.\n")
-    except subprocess.CalledProcessError as e:
+        return True
+    except CommandError as e:
+        output_callback(f"Error during database and table creation: {str(e)}\n")
+    except SqlError as e:
         output_callback(f"Error during database and table creation: {str(e)}\n")
     except Exception as e:
         output_callback(f"Unexpected error: {str(e)}\n")
+    return False
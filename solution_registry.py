@@ -0,0 +1,210 @@
+import ast
+import importlib.util
+import json
+import logging
+import os
+import sys
+import types
+
+from shared import get_cache_dir
+
+logger = logging.getLogger(__name__)
+
+SOLUTION_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "solution")
+MANIFEST_FILE = "manifest.json"
+CACHE_FILE = "solutions.json"
+# Solution modules are imported under this package, so they cannot shadow installer or stdlib modules
+SOLUTION_PACKAGE = "percona_solutions"
+
+class SolutionInfo:
+    """
+    Metadata of a solution, known without importing its module.
+
+    Attributes:
+        name (str): Name used with --solution.
+        description (str): One-line description.
+        distributions (list): Distributions the solution supports, empty if any.
+        entry_point (str): "<module>:<function>" called to run the solution.
+        path (str): File of the solution module.
+    """
+
+    def __init__(self, name, description="", distributions=None, entry_point=None, path=None):
+        self.name = name
+        self.description = description
+        self.distributions = distributions or []
+        self.entry_point = entry_point or f"{name}:{name}"
+        self.path = path or os.path.join(SOLUTION_DIR, f"{self.entry_point.split(':')[0]}.py")
+
+    def supports(self, distribution):
+        return not self.distributions or distribution in self.distributions
+
+    def to_dict(self):
+        return {
+            "name": self.name,
+            "description": self.description,
+            "distributions": self.distributions,
+            "entry_point": self.entry_point,
+            "path": self.path,
+        }
+
+def _describe_module(path, function_name):
+    """
+    Read the description of a solution from its source with `ast`, without executing it:
+    the module docstring, or else the first line of the entry point docstring.
+    """
+    with open(path, "r", encoding="utf-8") as file:
+        tree = ast.parse(file.read(), filename=path)
+
+    docstring = ast.get_docstring(tree)
+    if not docstring:
+        for node in tree.body:
+            if isinstance(node, ast.FunctionDef) and node.name == function_name:
+                docstring = ast.get_docstring(node)
+                break
+    return docstring.strip().splitlines()[0] if docstring else ""
+
+def _discovery_key(directory):
+    """Fingerprint of the solution directory: names and modification times of its files."""
+    entries = []
+    for filename in sorted(os.listdir(directory)):
+        if filename.endswith(".py") or filename == MANIFEST_FILE:
+            entries.append(f"{filename}:{os.stat(os.path.join(directory, filename)).st_mtime_ns}")
+    return "|".join(entries)
+
+def _discover(directory):
+    """
+    Build the solution metadata from the manifest. Solution files that are not listed
+    in the manifest are still discovered, following the naming convention that the
+    entry point has the same name as the file.
+    """
+    solutions = {}
+    manifest_path = os.path.join(directory, MANIFEST_FILE)
+    if os.path.exists(manifest_path):
+        with open(manifest_path, "r", encoding="utf-8") as file:
+            manifest = json.load(file)
+        for name, entry in manifest.items():
+            solutions[name] = SolutionInfo(
+                name,
+                entry.get("description", ""),
+                entry.get("distributions"),
+                entry.get("entry_point"),
+            )
+            if entry.get("entry_point"):
+                solutions[name].path = os.path.join(directory, f"{entry['entry_point'].split(':')[0]}.py")
+
+    listed_files = {os.path.basename(info.path) for info in solutions.values()}
+    for filename in sorted(os.listdir(directory)):
+        if not filename.endswith(".py") or filename == "__init__.py" or filename in listed_files:
+            continue
+        name = filename[:-3]
+        path = os.path.join(directory, filename)
+        try:
+            description = _describe_module(path, name)
+        except SyntaxError as e:
+            logger.error(f"Skipping solution {name}: {str(e)}")
+            continue
+        solutions[name] = SolutionInfo(name, description, path=path)
+
+    return solutions
+
+class SolutionRegistry:
+    """
+    Discovers solutions from lightweight metadata and imports a solution only when it is run.
+
+    The discovery result is cached in memory and on disk, keyed by the names and
+    modification times of the files in the solution directory.
+    """
+
+    def __init__(self, directory=SOLUTION_DIR, cache_path=None):
+        self.directory = directory
+        self.cache_path = cache_path or os.path.join(get_cache_dir(), CACHE_FILE)
+        self._solutions = None
+        self._loaded = {}
+
+    def _load_cache(self, key):
+        try:
+            with open(self.cache_path, "r", encoding="utf-8") as file:
+                cache = json.load(file)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+        if cache.get("directory") != self.directory or cache.get("key") != key:
+            return None
+        return {name: SolutionInfo(**info) for name, info in cache["solutions"].items()}
+
+    def _save_cache(self, key, solutions):
+        tmp_path = self.cache_path + ".tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as file:
+                json.dump({
+                    "directory": self.directory,
+                    "key": key,
+                    "solutions": {name: info.to_dict() for name, info in solutions.items()},
+                }, file)
+            os.replace(tmp_path, self.cache_path)
+        except OSError as e:
+            logger.warning(f"Unable to cache solution discovery: {str(e)}")
+
+    def solutions(self):
+        """Return the metadata of all solutions, keyed by name."""
+        if self._solutions is None:
+            if not os.path.isdir(self.directory):
+                logger.error(f"Solution directory not found: {self.directory}")
+                self._solutions = {}
+                return self._solutions
+
+            key = _discovery_key(self.directory)
+            self._solutions = self._load_cache(key)
+            if self._solutions is None:
+                self._solutions = _discover(self.directory)
+                self._save_cache(key, self._solutions)
+        return self._solutions
+
+    def names(self):
+        return sorted(self.solutions())
+
+    def get(self, name):
+        return self.solutions().get(name)
+
+    def load(self, name):
+        """
+        Import the module of a solution and return its entry point.
+
+        Raises:
+            ValueError: If the solution does not exist.
+            Exception: If the module cannot be imported or has no such entry point.
+        """
+        if name in self._loaded:
+            return self._loaded[name]
+
+        info = self.get(name)
+        if info is None:
+            raise ValueError(f"Solution '{name}' is not available. Available solutions are: {', '.join(self.names())}")
+
+        module_name, _, function_name = info.entry_point.partition(":")
+        module_name = f"{SOLUTION_PACKAGE}.{module_name}"
+        if SOLUTION_PACKAGE not in sys.modules:
+            package = types.ModuleType(SOLUTION_PACKAGE)
+            package.__path__ = []
+            sys.modules[SOLUTION_PACKAGE] = package
+        try:
+            spec = importlib.util.spec_from_file_location(module_name, info.path)
+            module = importlib.util.module_from_spec(spec)
+            sys.modules[module_name] = module
+            spec.loader.exec_module(module)
+            entry_point = getattr(module, function_name or name)
+        except Exception as e:
+            sys.modules.pop(module_name, None)
+            logger.error(f"Error loading solution {name}: {str(e)}")
+            raise Exception(f"Error loading solution {name}: {str(e)}")
+
+        self._loaded[name] = entry_point
+        return entry_point
+
+_registry = None
+
+def get_registry():
+    """Return the solution registry shared by the process."""
+    global _registry
+    if _registry is None:
+        _registry = SolutionRegistry()
+    return _registry
@@ -0,0 +1,335 @@
+import logging
+import queue
+import shutil
+import subprocess
+import threading
+import time
+import uuid
+
+from tracing import span
+
+logger = logging.getLogger(__name__)
+
+# How long to wait for the server to accept connections, e.g. after a restart
+CONNECT_TIMEOUT = 60
+CONNECT_RETRY_DELAY = 1.0
+
+# Statements are written in chunks of at most this many bytes, less than a pipe buffer, and
+# their results read before the next chunk, so psql never blocks on a full stdout while the
+# installer blocks on a full stdin
+BATCH_CHUNK_BYTES = 32 * 1024
+
+# Error of the statements psql did not finish because it exited, psql exits when the
+# connection drops as it does not read from a terminal
+CONNECTION_LOST = "connection to server was lost"
+
+# Messages psql prints when the server went away under an open session
+CONNECTION_LOST_MESSAGES = (
+    "server closed the connection unexpectedly",
+    CONNECTION_LOST,
+    "terminating connection due to administrator command",
+    "no connection to the server",
+)
+
+class SqlError(Exception):
+    """Raised when a statement fails and errors are not tolerated."""
+
+    def __init__(self, result):
+        super().__init__(f"{result.error} (statement: {result.sql})")
+        self.result = result
+
+class StatementResult:
+    """Outcome of a single statement: its output, server-side duration and error, if any."""
+
+    def __init__(self, sql, output=None, duration_ms=None, error=None):
+        self.sql = sql
+        self.output = output or []
+        self.duration_ms = duration_ms
+        self.error = error
+
+    @property
+    def ok(self):
+        return self.error is None
+
+    def __repr__(self):
+        return f"StatementResult({self.sql!r}, duration_ms={self.duration_ms}, error={self.error!r})"
+
+class PsqlSession:
+    """
+    A long-lived psql process connected to one database.
+
+    Statements are written to psql's stdin, each followed by an \\echo marker that
+    reports whether it failed, so many statements share one process, one sudo and
+    one connection, and can be sent as a single batch. Errors and notices are read
+    from stderr, up to the same marker written with \\warn, so the output of a query
+    is never taken for an error.
+    """
+
+    def __init__(self, database="postgres", user="postgres", os_user="postgres"):
+        self.database = database
+        self.user = user
+        self.os_user = os_user
+        self.process = None
+        self._marker = f"__percona_installer_{uuid.uuid4().hex}__"
+        self._stderr = None
+        self._warn_marker = False
+
+    def _command(self):
+        command = ["sudo", "-u", self.os_user]
+        # psql buffers stdout when it is a pipe, force line buffering so markers arrive immediately
+        if shutil.which("stdbuf"):
+            command += ["stdbuf", "-oL", "-eL"]
+        return command + [
+            "psql", "-X", "-q", "-U", self.user, "-d", self.database,
+            "-v", "ON_ERROR_STOP=0", "-P", "pager=off",
+        ]
+
+    def connect(self, timeout=CONNECT_TIMEOUT):
+        """Start psql and wait until the server accepts queries."""
+        deadline = time.monotonic() + timeout
+        while True:
+            self.process = subprocess.Popen(
+                self._command(),
+                stdin=subprocess.PIPE,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+                universal_newlines=True,
+                bufsize=1,
+            )
+            self._stderr = queue.Queue()
+            threading.Thread(target=self._read_stderr, args=(self.process.stderr, self._stderr), daemon=True).start()
+            try:
+                self._send("\\timing on")
+                # \\warn exists since psql 13, older ones have a shell write the marker
+                self._warn_marker = self._client_version() >= 130000
+                self.execute("SELECT 1;")
+                logger.info(f"Connected to database {self.database}.")
+                return
+            except (SqlError, BrokenPipeError, EOFError) as e:
+                self.close()
+                if time.monotonic() >= deadline:
+                    raise Exception(f"Unable to connect to database {self.database}: {str(e)}")
+                logger.debug(f"Database {self.database} not ready yet: {str(e)}")
+                time.sleep(CONNECT_RETRY_DELAY)
+
+    def close(self):
+        if self.process is None:
+            return
+        try:
+            self.process.stdin.write("\\q\n")
+            self.process.stdin.close()
+            self.process.wait(timeout=10)
+        except (OSError, subprocess.TimeoutExpired):
+            self.process.kill()
+            self.process.wait()
+        self.process = None
+
+    def reconnect(self, timeout=CONNECT_TIMEOUT):
+        """Drop the current session and open a new one, e.g. after a server restart."""
+        self.close()
+        self.connect(timeout)
+
+    @staticmethod
+    def _read_stderr(stream, lines):
+        for line in stream:
+            lines.put(line.rstrip("\n"))
+        lines.put(None)
+
+    def _client_version(self):
+        """The version of psql, e.g. 170005, 0 if it is too old to tell."""
+        self._send(f"\\echo {self._marker} :VERSION_NUM")
+        self.process.stdin.flush()
+        line = self.process.stdout.readline()
+        if not line:
+            raise EOFError("psql exited")
+        version = line.split()[-1]
+        return int(version) if version.isdigit() else 0
+
+    @property
+    def alive(self):
+        return self.process is not None and self.process.poll() is None
+
+    def _send(self, text):
+        self.process.stdin.write(text.rstrip() + "\n")
+
+    def _statement_text(self, sql, stop_on_error):
+        sql = sql.strip()
+        if not sql.endswith(";"):
+            sql += ";"
+        lines = []
+        if stop_on_error:
+            # Skip the statement if an earlier one of the batch failed
+            lines += ["\\if :percona_installer_failed", f"\\echo {self._marker} skipped", "\\else"]
+        lines += [sql, f"\\echo {self._marker} :ERROR"]
+        if stop_on_error:
+            lines += ["\\if :ERROR", "\\set percona_installer_failed true", "\\endif", "\\endif"]
+        lines.append(f"\\warn {self._marker}" if self._warn_marker else f"\\! echo {self._marker} 1>&2")
+        return "".join(line.rstrip() + "\n" for line in lines)
+
+    def _stderr_lines(self):
+        """The errors and notices psql wrote to stderr for the statement that just completed."""
+        lines = []
+        while True:
+            line = self._stderr.get()
+            if line is None:
+                raise EOFError("\n".join(lines) or "psql exited")
+            if line == self._marker:
+                return lines
+            lines.append(line)
+
+    def _read_result(self, sql):
+        output, duration_ms = [], None
+        while True:
+            line = self.process.stdout.readline()
+            if not line:
+                raise EOFError(f"psql exited while running: {sql}")
+            line = line.rstrip("\n")
+            if line.startswith(self._marker):
+                status = line.split()[-1]
+                break
+            if line.startswith("Time: "):
+                duration_ms = float(line.split()[1])
+            else:
+                output.append(line)
+
+        messages = self._stderr_lines()
+        if status == "skipped":
+            return StatementResult(sql, error="Skipped after an earlier statement failed")
+        # The error and its DETAIL, HINT and CONTEXT lines follow the notices
+        first_error = next((
+            index for index, message in enumerate(messages)
+            if "ERROR:" in message or "FATAL:" in message
+            or any(lost in message for lost in CONNECTION_LOST_MESSAGES)
+        ), len(messages))
+        output += messages[:first_error]
+        errors = messages[first_error:]
+        # psql before 11 has no ERROR variable and echoes its name, fall back to the error lines it printed
+        failed = status == "true" or (status == ":ERROR" and bool(errors))
+        error = ("\n".join(errors) or "Statement failed") if failed else None
+        return StatementResult(sql, output, duration_ms, error)
+
+    def execute_batch(self, statements, check=True, stop_on_error=True):
+        """
+        Send the statements in chunks of up to BATCH_CHUNK_BYTES and collect one result per
+        statement. If psql exits, e.g. because the connection dropped, the statement it was
+        running and the remaining ones fail with CONNECTION_LOST.
+
+        Args:
+            statements (list): SQL statements.
+            check (bool): Raise SqlError for the first failed statement.
+            stop_on_error (bool): Skip the remaining statements of the batch once one failed.
+
+        Returns:
+            list: A StatementResult per statement.
+        """
+        if not self.alive:
+            raise Exception(f"No open session to database {self.database}.")
+
+        results = []
+        try:
+            if stop_on_error:
+                self._send("\\set percona_installer_failed false")
+            for chunk in self._chunks(statements, stop_on_error):
+                self.process.stdin.write("".join(text for _, text in chunk))
+                self.process.stdin.flush()
+                for sql, _ in chunk:
+                    results.append(self._read_result(sql))
+        except (EOFError, BrokenPipeError) as e:
+            logger.warning(f"psql session to {self.database} ended: {str(e)}")
+            results += [
+                StatementResult(sql, error=f"{CONNECTION_LOST}: psql exited")
+                for sql in statements[len(results):]
+            ]
+        for result in results:
+            logger.info(f"[{self.database}] {result.sql} ({result.duration_ms} ms){' ERROR: ' + result.error if result.error else ''}")
+        if check:
+            for result in results:
+                if not result.ok:
+                    raise SqlError(result)
+        return results
+
+    def _chunks(self, statements, stop_on_error):
+        """Group the statements and their text into chunks of up to BATCH_CHUNK_BYTES, at least one statement each."""
+        chunk, size = [], 0
+        for sql in statements:
+            text = self._statement_text(sql, stop_on_error)
+            if chunk and size + len(text.encode("utf-8")) > BATCH_CHUNK_BYTES:
+                yield chunk
+                chunk, size = [], 0
+            chunk.append((sql, text))
+            size += len(text.encode("utf-8"))
+        if chunk:
+            yield chunk
+
+    def execute(self, sql, check=True):
+        return self.execute_batch([sql], check, stop_on_error=False)[0]
+
+class SqlExecutor:
+    """
+    Runs SQL for solutions through one psql session per database, opened on first use.
+
+    Usage:
+        with SqlExecutor(output_callback) as sql:
+            sql.run(["CREATE DATABASE demo;"])
+            sql.run(["CREATE EXTENSION pg_tde;", ...], database="demo")
+    """
+
+    def __init__(self, output_callback=print, user="postgres", os_user="postgres"):
+        self.output_callback = output_callback
+        self.user = user
+        self.os_user = os_user
+        self.sessions = {}
+        self.results = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def session(self, database="postgres"):
+        session = self.sessions.get(database)
+        if session is None or not session.alive:
+            session = PsqlSession(database, self.user, self.os_user)
+            session.connect()
+            self.sessions[database] = session
+        return session
+
+    def run(self, statements, database="postgres", check=True):
+        """
+        Run a batch of statements in the session of the database and report per-statement timings.
+        If the server connection was lost, or psql exited, the session is reopened and the
+        batch is resumed once from the first statement that did not complete.
+        """
+        with span("sql", database=database, statements=len(statements)) as current:
+            session = self.session(database)
+            results = session.execute_batch(statements, check=False)
+            for index, result in enumerate(results):
+                if result.error and any(message in result.error for message in CONNECTION_LOST_MESSAGES):
+                    self.output_callback(f"Connection to {database} lost, reconnecting...\n")
+                    session.reconnect()
+                    results = results[:index] + session.execute_batch(statements[index:], check=False)
+                    break
+            current.set(server_ms=round(sum(result.duration_ms or 0 for result in results), 3))
+
+        for result in results:
+            timing = f"{result.duration_ms:8.2f} ms" if result.duration_ms is not None else "       - ms"
+            status = "" if result.ok else f"  ERROR: {result.error}"
+            self.output_callback(f"  {timing}  {result.sql.splitlines()[0]}{status}\n")
+        self.results.extend(results)
+
+        if check:
+            for result in results:
+                if not result.ok:
+                    raise SqlError(result)
+        return results
+
+    def reconnect(self):
+        """Reopen every session, to be called after the server was restarted."""
+        for session in self.sessions.values():
+            session.reconnect()
+
+    def close(self):
+        for session in self.sessions.values():
+            session.close()
+        self.sessions = {}
@@ -1,6 +1,5 @@
 from shared import SUPPORTED_PLATFORMS, NORMALIZED_DISTROS
-
-import platform
+from host_facts import get_host_facts
 
 def normalize_distro_name(distro_name):
     """Normalize distro name to match supported platforms."""
@@ -12,24 +11,17 @@ def check_major_version(version):
 
 def check_platform():
     """Check if the current platform is supported."""
-    system = platform.system()
-    if system != "Linux":
+    facts = get_host_facts()
+    if facts.system != "Linux":
         return False, "This installer is supported only on Linux systems."
 
-    try:
-        # Try legacy method
-        distro, version, _ = platform.linux_distribution()
-    except AttributeError:
-        # Use 'distro' package for modern systems
-        import distro
-        distro, version = distro.id(), distro.version()
-
-    distro = normalize_distro_name(distro.strip())
-    major_version = check_major_version(version.strip())
+    distro = normalize_distro_name((facts.distro_id or facts.name or "").strip())
+    version = (facts.version_id or "").strip()
+    major_version = check_major_version(version)
 
     for supported_distro, versions in SUPPORTED_PLATFORMS.items():
-        if supported_distro == distro and major_version in versions:
+        # Ubuntu releases are listed with their minor version, e.g. 22.04
+        if supported_distro == distro and (version in versions or major_version in versions):
             return True, (distro, version)
 
     return False, f"Unsupported platform: {distro} {version}. Supported platforms: {SUPPORTED_PLATFORMS}"
-
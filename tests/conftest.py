@@ -0,0 +1,15 @@
+import os
+import sys
+
+# The installer modules live at the root of the repository
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest  # noqa: E402
+
+from benchmarks.fixtures import Workspace  # noqa: E402
+
+@pytest.fixture
+def workspace():
+    """A temporary installer cache, log and working directory, see benchmarks.fixtures.Workspace."""
+    with Workspace() as workspace:
+        yield workspace
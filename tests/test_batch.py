@@ -0,0 +1,86 @@
+import json
+import os
+
+import pytest
+
+from batch import load_manifest, product_entries
+
+def write_manifest(workspace, manifest):
+    path = os.path.join(workspace.path, "manifest.json")
+    with open(path, "w", encoding="utf-8") as file:
+        file.write(manifest if isinstance(manifest, str) else json.dumps(manifest))
+    return path
+
+def test_manifest_entries(workspace):
+    path = write_manifest(workspace, {
+        "repository": "testing",
+        "products": [
+            {"product": "ppg-17", "components": ["percona-postgresql-17", " percona-pg-stat-monitor17 "], "solution": "pg_tde_demo"},
+            {"product": "pdps-8.0", "repository": "experimental", "components": "percona-server-server, percona-xtrabackup-80,"},
+            "pdmdb-8.0",
+        ],
+    })
+    assert load_manifest(path) == [
+        {"product": "ppg-17", "repository": "testing", "components": ["percona-postgresql-17", "percona-pg-stat-monitor17"], "solution": "pg_tde_demo"},
+        {"product": "pdps-8.0", "repository": "experimental", "components": ["percona-server-server", "percona-xtrabackup-80"]},
+        {"product": "pdmdb-8.0", "repository": "testing", "components": []},
+    ]
+
+@pytest.mark.parametrize("manifest, message", [
+    ("{", "Error: Invalid manifest"),
+    ("[]", "expected a JSON object with a products list"),
+    ({"products": []}, "Error: No products found in manifest"),
+    ({"products": [{"components": ["x"]}]}, "Error: Manifest entry without a product"),
+    ({"products": [42]}, "Error: Manifest entry without a product: 42"),
+])
+def test_invalid_manifest(workspace, manifest, message):
+    with pytest.raises(ValueError, match=message):
+        load_manifest(write_manifest(workspace, manifest))
+
+def test_unreadable_manifest(workspace):
+    with pytest.raises(ValueError, match="Error: Unable to read manifest .*missing.json"):
+        load_manifest(os.path.join(workspace.path, "missing.json"))
+    with pytest.raises(ValueError, match="Error: Unable to read manifest"):
+        load_manifest(workspace.path)
+
+def test_single_product_with_components():
+    entries = product_entries({"product": "ppg-17", "components": "percona-postgresql-17,percona-pgbackrest", "repository": "release"})
+    assert entries == [{"product": "ppg-17", "components": ["percona-postgresql-17", "percona-pgbackrest"], "repository": "release"}]
+
+def test_products_with_their_components():
+    entries = product_entries({"product": ["ppg-17:percona-postgresql-17,percona-pgbackrest", " pdps-8.0 "], "repository": "testing"})
+    assert entries == [
+        {"product": "ppg-17", "components": ["percona-postgresql-17", "percona-pgbackrest"], "repository": "testing"},
+        {"product": "pdps-8.0", "components": [], "repository": "testing"},
+    ]
+
+def test_components_add_to_those_of_the_product():
+    entries = product_entries({"product": ["ppg-17:percona-postgresql-17"], "components": "percona-pgbackrest"})
+    assert entries[0]["components"] == ["percona-postgresql-17", "percona-pgbackrest"]
+
+def test_components_are_ambiguous_with_several_products(workspace):
+    with pytest.raises(ValueError, match="-c is ambiguous with several products"):
+        product_entries({"product": ["ppg-17", "pdps-8.0"], "components": "percona-pgbackrest"})
+
+    # A manifest product and a -p product
+    path = write_manifest(workspace, {"products": ["ppg-17"]})
+    with pytest.raises(ValueError, match="-c is ambiguous"):
+        product_entries({"manifest": path, "product": "pdps-8.0", "components": "percona-server-server"})
+
+def test_manifest_products_come_first(workspace):
+    path = write_manifest(workspace, {"repository": "testing", "products": [{"product": "ppg-17", "solution": "pg_tde_demo"}]})
+    entries = product_entries({"manifest": path, "product": ["pdps-8.0:percona-server-server"], "repository": "release"})
+    assert [(entry["product"], entry["repository"], entry["components"]) for entry in entries] == [
+        ("ppg-17", "testing", []),
+        ("pdps-8.0", "release", ["percona-server-server"]),
+    ]
+    assert entries[0]["solution"] == "pg_tde_demo" and "solution" not in entries[1]
+
+def test_components_of_a_single_manifest_product(workspace):
+    path = write_manifest(workspace, {"products": [{"product": "ppg-17", "components": ["percona-postgresql-17"]}]})
+    entries = product_entries({"manifest": path, "components": "percona-pgbackrest", "repository": "experimental"})
+    assert entries == [{"product": "ppg-17", "components": ["percona-postgresql-17", "percona-pgbackrest"], "repository": "experimental"}]
+
+def test_missing_manifest_is_reported(workspace):
+    with pytest.raises(ValueError, match="Error: Unable to read manifest"):
+        product_entries({"manifest": os.path.join(workspace.path, "missing.json")})
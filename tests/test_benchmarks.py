@@ -0,0 +1,29 @@
+import time
+
+from benchmarks import harness
+from benchmarks.harness import Benchmark, compare, confirm_regressions
+
+BASELINE = {"sleep": {"min": 0.001, "median": 0.001, "mean": 0.001, "max": 0.001, "runs": 5}}
+
+def stats(median, runs=5):
+    return {"min": median, "median": median, "mean": median, "max": median, "runs": runs}
+
+def test_slower_median_is_a_regression():
+    _, regressions = compare({"sleep": stats(0.01)}, BASELINE)
+    assert regressions == ["sleep"]
+
+def test_too_few_runs_are_not_compared():
+    lines, regressions = compare({"sleep": stats(0.01, runs=harness.MIN_RUNS - 1)}, BASELINE)
+    assert regressions == []
+    assert "too few runs" in lines[0]
+
+def test_noisy_regression_is_not_confirmed():
+    delays = iter([0.01] * 5 + [0] * 100)
+    bench = Benchmark("sleep", lambda: time.sleep(next(delays)), repeat=5)
+    _, suspected = compare({"sleep": bench.run()}, BASELINE)
+    assert suspected == ["sleep"]
+    assert confirm_regressions([bench], suspected, BASELINE, output_callback=lambda line: None) == []
+
+def test_lasting_regression_is_confirmed():
+    bench = Benchmark("sleep", lambda: time.sleep(0.01), repeat=3)
+    assert confirm_regressions([bench], ["sleep"], BASELINE, output_callback=lambda line: None) == ["sleep"]
@@ -0,0 +1,82 @@
+import io
+import json
+import os
+import tarfile
+
+import pytest
+
+import bundle
+from benchmarks.fixtures import make_bundle
+from bundle import BundleError, open_bundle
+
+@pytest.fixture
+def bundle_path(workspace):
+    path = os.path.join(workspace.path, "ppg.bundle")
+    make_bundle(path, package_count=3, package_size=4096)
+    return path
+
+def rewrite(path, output, change):
+    """Copy a bundle, letting change(name, data) replace (None drops) the data of each member."""
+    with tarfile.open(path, "r") as source, tarfile.open(output, "w") as target:
+        for member in source:
+            data = source.extractfile(member).read()
+            data = change(member.name, data)
+            if data is None:
+                continue
+            member.size = len(data)
+            target.addfile(member, io.BytesIO(data))
+    return output
+
+def test_valid_bundle_is_extracted(workspace, bundle_path):
+    manifest, directory = open_bundle(bundle_path, os.path.join(workspace.path, "extracted"))
+    assert manifest["product"] == "ppg-17.0"
+    for name, entry in manifest["files"].items():
+        assert os.path.getsize(os.path.join(directory, name)) == entry["size"]
+    assert os.path.exists(os.path.join(directory, bundle.MANIFEST_FILE))
+
+def test_corrupted_file_is_rejected(workspace, bundle_path):
+    package = f"{bundle.PACKAGES_DIR}/percona-fixture-1_1.0-1_all.deb"
+    corrupted = rewrite(bundle_path, bundle_path + ".bad", lambda name, data: data[::-1] if name == package else data)
+    with pytest.raises(BundleError, match="percona-fixture-1.*checksum mismatch"):
+        open_bundle(corrupted, os.path.join(workspace.path, "extracted"))
+
+def test_missing_file_is_rejected(workspace, bundle_path):
+    package = f"{bundle.PACKAGES_DIR}/percona-fixture-2_1.0-1_all.deb"
+    incomplete = rewrite(bundle_path, bundle_path + ".bad", lambda name, data: None if name == package else data)
+    with pytest.raises(BundleError, match="incomplete, missing: .*percona-fixture-2"):
+        open_bundle(incomplete, os.path.join(workspace.path, "extracted"))
+
+def test_unlisted_file_is_rejected(workspace, bundle_path):
+    def unlist(name, data):
+        if name != bundle.MANIFEST_FILE:
+            return data
+        manifest = json.loads(data)
+        del manifest["files"][bundle.INDEX_FILE]
+        return json.dumps(manifest).encode("utf-8")
+
+    unlisted = rewrite(bundle_path, bundle_path + ".bad", unlist)
+    with pytest.raises(BundleError, match="not listed in the manifest"):
+        open_bundle(unlisted, os.path.join(workspace.path, "extracted"))
+
+def test_other_format_is_rejected(workspace, bundle_path):
+    def upgrade(name, data):
+        if name != bundle.MANIFEST_FILE:
+            return data
+        return json.dumps(dict(json.loads(data), format=bundle.BUNDLE_FORMAT + 1)).encode("utf-8")
+
+    newer = rewrite(bundle_path, bundle_path + ".bad", upgrade)
+    with pytest.raises(BundleError, match="Unsupported bundle format"):
+        open_bundle(newer, os.path.join(workspace.path, "extracted"))
+
+def test_export_uses_repository_of_manifest(workspace, monkeypatch):
+    import cli
+
+    manifest = os.path.join(workspace.path, "manifest.json")
+    with open(manifest, "w", encoding="utf-8") as file:
+        json.dump({"repository": "testing", "products": [{"product": "ppg-17.0", "components": ["percona-postgresql-17"]}]}, file)
+
+    exported = []
+    monkeypatch.setattr(cli, "resolve_product", lambda product: ("Percona Distribution for PostgreSQL", "17.0"))
+    monkeypatch.setattr(bundle, "export_bundle", lambda *args: exported.append(args))
+    bundle.run_bundle({"bundle": "ppg.bundle", "manifest": manifest, "repository": None})
+    assert exported == [("ppg.bundle", "Percona Distribution for PostgreSQL", "17.0", "testing", ["percona-postgresql-17"])]
@@ -0,0 +1,97 @@
+import json
+import os
+
+import pytest
+
+import catalog
+from catalog import CatalogError, ComponentCatalog, DEFAULT_CATALOG_PATH, compile_catalog, load_catalog
+
+PPG = "Percona Distribution for PostgreSQL"
+
+def write_catalog(path, data):
+    with open(path, "w", encoding="utf-8") as file:
+        json.dump(data, file)
+    return path
+
+def test_shipped_catalog_is_valid():
+    with open(DEFAULT_CATALOG_PATH, encoding="utf-8") as file:
+        assert PPG in compile_catalog(json.load(file))
+
+def test_every_problem_is_reported():
+    data = {
+        "A": {"components": [
+            "plain",
+            {"name": "bad-{minor}", "deb": ""},
+            {"name": "typo", "rmp": "x", "depends": ["missing"]},
+            {"description": "no name"},
+            42,
+        ]},
+        "B": {"components": "not a list"},
+    }
+    with pytest.raises(CatalogError) as error:
+        compile_catalog(data, "test.json")
+    message = str(error.value)
+    assert "test.json: A: component 2 (bad-{minor}): unknown placeholder {minor}" in message
+    assert "component 2 (bad-{minor}): 'deb' must be a non-empty string" in message
+    assert "component 3: unknown keys rmp" in message
+    assert "A: typo depends on unknown component missing" in message
+    assert "component 4: 'name' must be a non-empty string" in message
+    assert "component 5: expected a package name or an object, got int" in message
+    assert "test.json: B: expected an object with a 'components' list" in message
+
+def test_top_level_must_be_an_object():
+    with pytest.raises(CatalogError, match="expected an object keyed by distribution"):
+        compile_catalog([])
+
+@pytest.fixture
+def ppg():
+    with open(DEFAULT_CATALOG_PATH, encoding="utf-8") as file:
+        return ComponentCatalog(compile_catalog(json.load(file)))
+
+@pytest.mark.parametrize("package_manager, expected", [
+    ("apt-get", ["percona-postgresql-17", "percona-pg-stat-monitor17", "percona-postgresql-17-repack"]),
+    ("dnf", ["percona-postgresql17-server", "percona-pg_stat_monitor17", "percona-pg_repack17"]),
+    ("yum", ["percona-postgresql17-server", "percona-pg_stat_monitor17", "percona-pg_repack17"]),
+])
+def test_package_names_per_platform(ppg, package_manager, expected):
+    packages, _ = ppg.resolve(PPG, "17.5", ["percona-postgresql-17", "pg_stat_monitor", "percona-pg_repack17"], package_manager)
+    assert packages == expected
+
+def test_names_expand_the_major_version(ppg):
+    names = ppg.names(PPG, "16.9")
+    assert "percona-postgresql-16" in names and "percona-pg_repack16" in names
+    assert not any("{major}" in name for name in names)
+
+def test_unknown_names_pass_through_and_dependencies_are_hinted(ppg):
+    packages, hints = ppg.resolve(PPG, "17", ["percona-patroni", "percona-ppg-server-17"], "apt-get")
+    assert packages == ["percona-patroni", "percona-ppg-server-17"]
+    assert hints == {"percona-patroni": ["etcd", "python-etcd"]}
+
+def test_compiled_catalog_is_cached_by_mtime_and_size(workspace, monkeypatch):
+    path = write_catalog(os.path.join(workspace.path, "components.json"), {PPG: {"components": ["percona-pgbackrest"]}})
+    compiled = []
+    compile = catalog.compile_catalog
+    monkeypatch.setattr(catalog, "compile_catalog", lambda data, source: compiled.append(source) or compile(data, source))
+
+    first = load_catalog(path)
+    assert load_catalog(path).names(PPG, "17") == first.names(PPG, "17") == ["percona-pgbackrest"]
+    assert compiled == [path]
+
+    # Same size, another modification time
+    write_catalog(path, {PPG: {"components": ["percona-pgbadger-2"]}})
+    assert os.path.getsize(path) == len(json.dumps({PPG: {"components": ["percona-pgbackrest"]}}))
+    os.utime(path, ns=(os.stat(path).st_atime_ns, os.stat(path).st_mtime_ns + 10 ** 9))
+    assert load_catalog(path).names(PPG, "17") == ["percona-pgbadger-2"]
+    assert compiled == [path, path]
+
+def test_invalid_json(workspace):
+    path = os.path.join(workspace.path, "components.json")
+    with open(path, "w", encoding="utf-8") as file:
+        file.write("{")
+    with pytest.raises(CatalogError, match="Error parsing"):
+        load_catalog(path)
+
+def test_working_directory_copy_takes_precedence(workspace):
+    assert catalog.get_catalog_path() == DEFAULT_CATALOG_PATH
+    write_catalog("components.json", {})
+    assert catalog.get_catalog_path() == os.path.join(workspace.path, "components.json")
@@ -0,0 +1,156 @@
+import gzip
+import hashlib
+import json
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+import downloads
+import host_facts
+import repo_probe
+from benchmarks.fixtures import installed_host_facts, serve_directory
+from downloads import download_file
+from shared import download_percona_release
+
+CONTENT = bytes(range(256)) * 4096
+ETAG = '"v2"'
+
+class FileHandler(BaseHTTPRequestHandler):
+    """Serves CONTENT with an ETag and Range requests, failing the first `failures` requests with a 503."""
+
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        self.server.requests.append(dict(self.headers))
+        if self.server.failures:
+            self.server.failures -= 1
+            self.send_response(503)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+
+        body, status = CONTENT, 200
+        range_header = self.headers.get("Range")
+        if range_header and self.headers.get("If-Range", ETAG) == ETAG:
+            offset = int(range_header.split("=")[1].rstrip("-"))
+            body, status = CONTENT[offset:], 206
+        self.send_response(status)
+        self.send_header("ETag", ETAG)
+        self.send_header("Content-Length", str(len(body)))
+        if status == 206:
+            self.send_header("Content-Range", f"bytes {len(CONTENT) - len(body)}-{len(CONTENT) - 1}/{len(CONTENT)}")
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+@pytest.fixture
+def server(workspace, monkeypatch):
+    monkeypatch.setenv("PERCONA_INSTALLER_DOWNLOAD_DIR", os.path.join(workspace.path, "downloads"))
+    sleeps = []
+    monkeypatch.setattr(downloads.time, "sleep", sleeps.append)
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FileHandler)
+    server.daemon_threads = True
+    server.requests, server.failures, server.sleeps = [], 0, sleeps
+    server.url = f"http://127.0.0.1:{server.server_address[1]}/file.bin"
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield server
+    server.shutdown()
+
+def leave_partial(url, partial_etag, size=1000):
+    """Leave an interrupted download of CONTENT in the download cache."""
+    path = os.path.join(downloads.get_download_dir(), "file.bin")
+    with open(path + ".part", "wb") as file:
+        file.write(CONTENT[:size])
+    with open(path + ".json", "w", encoding="utf-8") as file:
+        json.dump({"url": url, "partial_etag": partial_etag}, file)
+
+def read(path):
+    with open(path, "rb") as file:
+        return file.read()
+
+def test_interrupted_download_is_resumed(server):
+    leave_partial(server.url, ETAG)
+    messages = []
+
+    assert read(download_file(server.url, output_callback=messages.append)) == CONTENT
+    assert server.requests[0]["Range"] == "bytes=1000-"
+    assert server.requests[0]["If-Range"] == ETAG
+    assert "Resuming download at 1000 bytes...\n" in messages
+
+def test_changed_file_is_downloaded_again(server):
+    leave_partial(server.url, '"v1"')
+
+    # The server ignores the Range of an outdated partial file and sends all of it
+    assert read(download_file(server.url)) == CONTENT
+    assert server.requests[0]["If-Range"] == '"v1"'
+
+def test_server_errors_are_retried_with_backoff(server):
+    server.failures = 2
+    assert read(download_file(server.url, sha256=hashlib.sha256(CONTENT).hexdigest())) == CONTENT
+    assert server.sleeps == [1.0, 2.0]
+
+def test_retries_are_limited(server):
+    server.failures = downloads.DOWNLOAD_ATTEMPTS
+    with pytest.raises(Exception, match="Error downloading"):
+        download_file(server.url)
+    assert len(server.requests) == downloads.DOWNLOAD_ATTEMPTS
+
+def test_cached_copy_is_reused_and_checked(server):
+    path = download_file(server.url)
+    assert download_file(server.url) == path
+    assert len(server.requests) == 1
+
+    with pytest.raises(Exception, match="Checksum mismatch"):
+        download_file(server.url, sha256="0" * 64)
+    assert not os.path.exists(path + ".part")
+
+@pytest.fixture
+def release_repo(workspace, monkeypatch):
+    """A prel repository publishing percona-release 1.0-28 and 1.0-29, served like repo.percona.com."""
+    monkeypatch.setenv("PERCONA_INSTALLER_DOWNLOAD_DIR", os.path.join(workspace.path, "downloads"))
+    monkeypatch.delenv("PERCONA_INSTALLER_RELEASE_SHA256", raising=False)
+    monkeypatch.setattr(host_facts, "get_host_facts", installed_host_facts)
+    root = os.path.join(workspace.path, "repo", "prel", "apt")
+    stanzas = []
+    for version in ["1.0-29", "1.0-28"]:
+        package = f"percona-release {version}".encode("utf-8")
+        filename = f"pool/main/p/percona-release/percona-release_{version}.generic_all.deb"
+        os.makedirs(os.path.join(root, os.path.dirname(filename)), exist_ok=True)
+        with open(os.path.join(root, filename), "wb") as file:
+            file.write(package)
+        stanzas.append(
+            f"Package: percona-release\nVersion: {version}\nArchitecture: all\n"
+            f"Filename: {filename}\nSHA256: {hashlib.sha256(package).hexdigest()}\n"
+        )
+    packages = gzip.compress("\n".join(stanzas).encode("utf-8"))
+    os.makedirs(os.path.join(root, "dists", "jammy", "main", "binary-amd64"))
+    with open(os.path.join(root, "dists", "jammy", "main", "binary-amd64", "Packages.gz"), "wb") as file:
+        file.write(packages)
+    with open(os.path.join(root, "dists", "jammy", "Release"), "w", encoding="utf-8") as file:
+        file.write(f"Codename: jammy\nSHA256:\n {hashlib.sha256(packages).hexdigest()} {len(packages)} main/binary-amd64/Packages.gz\n")
+
+    server, url = serve_directory(os.path.join(workspace.path, "repo"))
+    monkeypatch.setattr(repo_probe, "REPO_URL", url)
+    yield root
+    server.shutdown()
+
+def test_percona_release_is_verified_against_the_repository(release_repo):
+    messages = []
+    path = download_percona_release("apt-get", messages.append)
+    assert read(path) == b"percona-release 1.0-29"
+    assert "Verified percona-release 1.0-29 against the repository metadata.\n" in messages
+
+def test_tampered_percona_release_is_refused(release_repo):
+    with open(os.path.join(release_repo, "pool/main/p/percona-release/percona-release_1.0-29.generic_all.deb"), "ab") as file:
+        file.write(b"tampered")
+    with pytest.raises(Exception, match="Checksum mismatch"):
+        download_percona_release("apt-get", print)
+
+def test_unverifiable_percona_release_is_not_downloaded(release_repo):
+    os.unlink(os.path.join(release_repo, "dists", "jammy", "Release"))
+    with pytest.raises(Exception, match="PERCONA_INSTALLER_RELEASE_SHA256"):
+        download_percona_release("apt-get", print)
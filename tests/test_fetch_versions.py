@@ -0,0 +1,46 @@
+import json
+import os
+import time
+
+import pytest
+
+import fetch_versions
+from benchmarks.fixtures import install_index, make_index_html
+from fetch_versions import configure_index_cache, ensure_repo_index, index_notice
+
+@pytest.fixture
+def cached_index(workspace):
+    """A cached index fetched `age` seconds ago."""
+    def install(age):
+        install_index(make_index_html(200))
+        meta_path = os.path.join(os.path.dirname(fetch_versions.get_index_path()), fetch_versions.INDEX_META_FILE)
+        with open(meta_path, "w", encoding="utf-8") as file:
+            json.dump({"fetched_at": time.time() - age}, file)
+
+    yield install
+    configure_index_cache()
+    fetch_versions.index_status.update(source=None, age=None)
+
+def test_offline_index_age_is_shown(cached_index):
+    cached_index(3 * 3600)
+    ensure_repo_index()
+    assert index_notice() == "offline mode, using a version list cached 3h ago."
+
+def test_old_offline_index_is_flagged(cached_index):
+    cached_index(fetch_versions.INDEX_MAX_STALE + 24 * 3600)
+    ensure_repo_index()
+    assert index_notice().endswith("ago, it may be outdated.")
+
+def test_stale_index_is_used_when_unreachable(cached_index, monkeypatch):
+    cached_index(2 * 3600)
+    monkeypatch.setattr(fetch_versions, "INDEX_URL", "http://127.0.0.1:9/")
+    configure_index_cache(refresh=True)
+    ensure_repo_index()
+    assert index_notice() == "repository is unreachable, using a version list cached 2h ago."
+
+def test_fresh_index_has_no_notice(cached_index):
+    cached_index(60)
+    configure_index_cache()
+    ensure_repo_index()
+    assert fetch_versions.index_status["source"] == "cache"
+    assert index_notice() is None
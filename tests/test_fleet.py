@@ -0,0 +1,29 @@
+import json
+import os
+
+import pytest
+
+from fleet import load_inventory
+
+def write_inventory(workspace, inventory):
+    path = os.path.join(workspace.path, "inventory.json")
+    with open(path, "w", encoding="utf-8") as file:
+        json.dump(inventory, file)
+    return path
+
+def test_host_settings_override_defaults(workspace):
+    path = write_inventory(workspace, {
+        "defaults": {"repository": "release", "product": "ppg-17.0", "components": ["percona-postgresql-17"]},
+        "hosts": ["db1", {"host": "db2", "product": "ppg-16.8"}],
+    })
+    db1, db2 = load_inventory(path)
+    assert (db1["product"], db1["components"]) == ("ppg-17.0", "percona-postgresql-17")
+    assert (db2["product"], db2["repository"]) == ("ppg-16.8", "release")
+
+def test_duplicate_hosts_are_rejected(workspace):
+    path = write_inventory(workspace, {
+        "defaults": {"repository": "release", "product": "ppg-17.0"},
+        "hosts": ["db1", {"host": "db1", "product": "ppg-16.8"}],
+    })
+    with pytest.raises(ValueError, match="listed more than once"):
+        load_inventory(path)
@@ -0,0 +1,112 @@
+import json
+import os
+
+import pytest
+
+import host_facts
+from host_facts import HostFacts, get_host_facts, parse_os_release, probe_host, set_host_facts
+
+ROCKY = """\
+# Rocky Linux 9
+NAME="Rocky Linux"
+VERSION="9.4 (Blue Onyx)"
+ID="rocky"
+ID_LIKE="rhel centos fedora"
+VERSION_ID="9.4"
+PRETTY_NAME='Rocky Linux 9.4 (Blue Onyx)'
+
+"""
+
+@pytest.fixture
+def os_release(workspace, monkeypatch):
+    """Point the probe at an os-release file of the workspace."""
+    path = os.path.join(workspace.path, "os-release")
+    monkeypatch.setattr(host_facts, "OS_RELEASE_PATHS", (path,))
+    monkeypatch.setattr(host_facts.platform, "system", lambda: "Linux")
+
+    def write(text):
+        with open(path, "w", encoding="utf-8") as file:
+            file.write(text)
+        return path
+
+    yield write
+    set_host_facts(None)
+
+def test_parse_os_release():
+    values = parse_os_release(ROCKY + 'HOME_URL="https://rockylinux.org/"\nQUOTED="say \\"hi\\""\nBROKEN="unterminated\nnot a key\n')
+    assert values["NAME"] == "Rocky Linux"
+    assert values["ID_LIKE"] == "rhel centos fedora"
+    assert values["PRETTY_NAME"] == "Rocky Linux 9.4 (Blue Onyx)"
+    assert values["HOME_URL"] == "https://rockylinux.org/"
+    assert values["QUOTED"] == 'say "hi"'
+    assert "BROKEN" not in values and "# Rocky Linux 9" not in values
+
+@pytest.mark.parametrize("values, expected", [
+    ({"VERSION_CODENAME": "jammy", "UBUNTU_CODENAME": "jammy"}, "jammy"),
+    ({"UBUNTU_CODENAME": "noble"}, "noble"),
+    ({"VERSION": "10 (buster)"}, "buster"),
+    ({"VERSION": "9.4"}, None),
+    ({}, None),
+])
+def test_codename(values, expected):
+    assert host_facts._codename(values) == expected
+
+@pytest.mark.parametrize("distro_id, id_like, expected", [
+    ("ubuntu", ["debian"], "apt-get"),
+    ("debian", [], "apt-get"),
+    ("linuxmint", ["ubuntu", "debian"], "apt-get"),
+    ("rhel", ["fedora"], "yum"),
+    ("centos", ["rhel", "fedora"], "yum"),
+    ("rocky", ["rhel", "centos", "fedora"], "yum"),
+    ("almalinux", ["rhel", "centos", "fedora"], "yum"),
+    ("fedora", [], "dnf"),
+    # Oracle Linux used yum in earlier versions of the installer
+    ("ol", ["fedora"], "dnf"),
+    ("ol", [], "dnf"),
+    # Unknown ids fall back to the first known ID_LIKE entry
+    ("eurolinux", ["rhel", "fedora"], "yum"),
+    ("arch", [], None),
+])
+def test_package_manager(distro_id, id_like, expected):
+    assert host_facts._package_manager(distro_id, id_like) == expected
+
+def test_probe_host(os_release):
+    os_release(ROCKY)
+    facts = probe_host()
+    assert (facts.distro_id, facts.id_like, facts.name) == ("rocky", ["rhel", "centos", "fedora"], "Rocky Linux")
+    assert (facts.version_id, facts.major_version) == ("9.4", "9")
+    assert facts.package_manager == "yum"
+    assert set(facts.tools) == set(host_facts.TOOLS)
+    assert facts.unsupported_reason() is None
+
+def test_probe_oracle_linux(os_release):
+    os_release('NAME="Oracle Linux Server"\nID="ol"\nID_LIKE="fedora"\nVERSION_ID="8.10"\n')
+    facts = probe_host()
+    assert (facts.distro_id, facts.package_manager, facts.codename) == ("ol", "dnf", None)
+
+def test_unsupported_distribution(os_release):
+    os_release('ID=Arch\n')
+    facts = probe_host()
+    assert facts.distro_id == "arch"
+    assert facts.unsupported_reason() == "Unsupported Linux distribution detected."
+
+def test_unsupported_systems():
+    assert HostFacts("Linux").unsupported_reason().startswith("Minimal Linux distribution detected")
+    assert HostFacts("Darwin").unsupported_reason() == "MacOS is not supported."
+    assert HostFacts("Windows").unsupported_reason() == "Windows is not supported."
+
+def test_facts_are_cached_until_os_release_changes(os_release, workspace):
+    path = os_release(ROCKY)
+    assert get_host_facts(refresh=True).distro_id == "rocky"
+    with open(os.path.join(workspace.cache_dir, host_facts.CACHE_FILE), encoding="utf-8") as file:
+        assert json.load(file)["facts"]["package_manager"] == "yum"
+
+    # Another process reads the cache
+    set_host_facts(None)
+    assert get_host_facts().version_id == "9.4"
+
+    # A distribution upgrade
+    os_release(ROCKY.replace("9.4", "10.0"))
+    os.utime(path, ns=(os.stat(path).st_atime_ns, os.stat(path).st_mtime_ns + 10 ** 9))
+    set_host_facts(None)
+    assert get_host_facts().version_id == "10.0"
@@ -0,0 +1,49 @@
+import json
+
+from journal import JOURNAL_FORMAT, Journal, checkpoint, set_journal
+
+INPUTS = {"product": "ppg-17.0", "repository": "release", "components": ["percona-postgresql-17"]}
+
+def test_interrupted_install_resumes(workspace):
+    journal = Journal.open(INPUTS)
+    journal.record("download", {"path": "package.deb"}, "download")
+
+    resumed = Journal.open(INPUTS)
+    assert resumed.completed("download", "download")["result"] == {"path": "package.deb"}
+    # A step is only resumed while the inputs that produced it are unchanged
+    assert resumed.completed("download", "download again") is None
+    assert resumed.completed("install") is None
+
+def test_restart_discards_completed_steps(workspace):
+    Journal.open(INPUTS).record("download", None, "download")
+    assert Journal.open(INPUTS, restart=True).completed("download", "download") is None
+
+def test_different_install_discards_journal(workspace):
+    Journal.open(INPUTS).record("download", None, "download")
+    assert Journal.open(dict(INPUTS, repository="testing")).completed("download", "download") is None
+
+def test_journal_of_another_format_is_ignored(workspace):
+    journal = Journal.open(INPUTS)
+    journal.record("download", None, "download")
+    with open(journal.path, "r", encoding="utf-8") as file:
+        data = json.load(file)
+    with open(journal.path, "w", encoding="utf-8") as file:
+        json.dump(dict(data, format=JOURNAL_FORMAT + 1), file)
+    assert Journal.open(INPUTS).completed("download", "download") is None
+
+def test_finished_install_removes_journal(workspace):
+    journal = Journal.open(INPUTS)
+    journal.record("download", None, "download")
+    journal.finish()
+    assert Journal.open(INPUTS).steps == {}
+
+def test_checkpoint_skips_completed_solution_steps(workspace):
+    calls = []
+    set_journal(Journal.open(INPUTS))
+    try:
+        assert checkpoint("demo:create_database", lambda: calls.append(1) or "created", inputs="demo") == "created"
+        set_journal(Journal.open(INPUTS))
+        assert checkpoint("demo:create_database", lambda: calls.append(1) or "again", inputs="demo") == "created"
+    finally:
+        set_journal(None)
+    assert calls == [1]
@@ -0,0 +1,107 @@
+import json
+import logging
+import os
+import subprocess
+import sys
+import threading
+
+import pytest
+
+import logs
+from logs import JsonFormatter, configure_logging, phase, stop_logging
+
+@pytest.fixture
+def logging_to(workspace):
+    """Configure logging into the workspace, restoring the handlers of pytest afterwards."""
+    root = logging.getLogger()
+    saved_handlers, saved_level = list(root.handlers), root.level
+
+    yield configure_logging
+    stop_logging()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    for handler in saved_handlers:
+        root.addHandler(handler)
+    root.setLevel(saved_level)
+
+def read_records(path):
+    with open(path, "r", encoding="utf-8") as file:
+        return [json.loads(line) for line in file]
+
+def make_record(message, *args, **extra):
+    record = logging.LogRecord("installer", logging.WARNING, __file__, 1, message, args, None)
+    record.__dict__.update(extra)
+    return record
+
+def test_json_formatter_fields():
+    entry = json.loads(JsonFormatter().format(make_record("Installing %s", "ppg", command="apt-get install", phase="install")))
+    assert entry["message"] == "Installing ppg"
+    assert entry["level"] == "WARNING"
+    assert entry["logger"] == "installer"
+    assert entry["run_id"] == logs.RUN_ID
+    assert entry["phase"] == "install"
+    assert entry["command"] == "apt-get install"
+    assert "stream" not in entry
+
+def test_json_formatter_exception():
+    try:
+        raise ValueError("broken")
+    except ValueError:
+        record = logging.LogRecord("installer", logging.ERROR, __file__, 1, "Failed", None, sys.exc_info())
+    entry = json.loads(JsonFormatter().format(record))
+    assert entry["exception"].endswith("ValueError: broken")
+
+def test_records_are_tagged_with_run_and_phase(logging_to):
+    path = logging_to("info")
+    log = logging.getLogger("installer")
+
+    with phase("enable:ppg-17.0"):
+        log.info("Enabling")
+        # The phase belongs to the thread that entered it
+        thread = threading.Thread(target=log.info, args=("Elsewhere",))
+        thread.start()
+        thread.join()
+    log.info("Done")
+    log.debug("Not written")
+    stop_logging()
+
+    records = {record["message"]: record for record in read_records(path)}
+    assert records["Enabling"]["phase"] == "enable:ppg-17.0"
+    assert records["Elsewhere"]["phase"] is None
+    assert records["Done"]["phase"] is None
+    assert "Not written" not in records
+    assert {record["run_id"] for record in records.values()} == {logs.RUN_ID}
+
+def test_invalid_level(logging_to):
+    with pytest.raises(ValueError, match="Invalid log level"):
+        logging_to("trace")
+
+def test_concurrent_runs_write_their_own_files(logging_to, workspace):
+    path = logging_to("info")
+    logging.getLogger("installer").info("First run")
+
+    # Another installer started at the same time
+    script = "import logging, logs; print(logs.configure_logging('info')); logging.getLogger('installer').info('Second run')"
+    other = subprocess.run(
+        [sys.executable, "-c", script], env=dict(os.environ, PYTHONPATH=os.path.dirname(os.path.abspath(logs.__file__))),
+        stdout=subprocess.PIPE, universal_newlines=True, check=True,
+    ).stdout.strip()
+    stop_logging()
+
+    assert other != path
+    assert os.path.dirname(other) == os.path.dirname(path) == workspace.log_dir
+    assert [record["message"] for record in read_records(path)][-1] == "First run"
+    assert [record["message"] for record in read_records(other)][-1] == "Second run"
+
+def test_logs_of_old_runs_are_pruned(logging_to, workspace, monkeypatch):
+    monkeypatch.setattr(logs, "LOG_KEEP_RUNS", 3)
+    os.makedirs(workspace.log_dir)
+    old_runs = [f"installer-20260101-00000{index}-run{index}.log" for index in range(4)]
+    for name in old_runs + [old_runs[0] + ".1", "other.log"]:
+        open(os.path.join(workspace.log_dir, name), "w").close()
+
+    path = logging_to("info")
+    assert sorted(os.listdir(workspace.log_dir)) == sorted(old_runs[2:] + ["other.log"])
+    logging.getLogger("installer").info("Logged")
+    stop_logging()
+    assert os.path.basename(path) in os.listdir(workspace.log_dir)
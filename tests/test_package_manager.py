@@ -0,0 +1,153 @@
+import os
+import subprocess
+import sys
+import threading
+
+import pytest
+
+import package_manager
+from package_manager import (
+    LOCKED, TRANSIENT, PackageManagerLockTimeout, classify_failure, installer_lock, lock_holder, run_package_manager,
+)
+from runner import CommandError, CommandResult, CommandRunner, get_runner, set_runner
+
+APT_LOCKED = [
+    "E: Could not get lock /var/lib/dpkg/lock-frontend. It is held by process 2817 (unattended-upgr)",
+    "N: Be aware that removing the lock file is not a solution and may break your system.",
+    "E: Unable to acquire the dpkg frontend lock (/var/lib/dpkg/lock-frontend), is another process using it?",
+]
+DNF_LOCKED = ["Waiting for process with pid 4312 to finish."]
+YUM_LOCKED = [
+    "Another app is currently holding the yum lock; waiting for it to exit...",
+    "  The other application is: PackageKit",
+]
+APT_OFFLINE = [
+    "Err:1 http://repo.percona.com/ppg-17.0/apt jammy InRelease",
+    "  Temporary failure resolving 'repo.percona.com'",
+    "E: Failed to fetch http://repo.percona.com/ppg-17.0/apt/pool/main/p/percona-postgresql-17.deb  "
+    "Temporary failure resolving 'repo.percona.com'",
+]
+DNF_MIRROR = [
+    "Errors during downloading metadata for repository 'ppg-17.0-release-x86_64':",
+    "  - Curl error (28): Timeout was reached for https://repo.percona.com/ppg-17.0/yum/release/9/RPMS/x86_64/repodata/repomd.xml",
+    "Error: Failed to download metadata for repo 'ppg-17.0-release-x86_64': Cannot download repomd.xml",
+]
+NOT_FOUND = ["E: Unable to locate package percona-postgresql-99"]
+
+class SequenceBackend:
+    """Answers the commands with the given (returncode, stderr lines), one after the other."""
+
+    def __init__(self, *responses):
+        self.responses = list(responses)
+        self.calls = 0
+
+    def execute(self, result, emit, **kwargs):
+        returncode, lines = self.responses[min(self.calls, len(self.responses) - 1)]
+        self.calls += 1
+        for line in lines:
+            emit("stderr", line)
+        result.returncode = returncode
+        result.cpu_time = 0.0
+
+@pytest.fixture
+def backend(workspace, monkeypatch):
+    sleeps = []
+    monkeypatch.setattr(package_manager.time, "sleep", sleeps.append)
+
+    def install(*responses):
+        backend = SequenceBackend(*responses)
+        backend.sleeps = sleeps
+        set_runner(CommandRunner(backend))
+        return backend
+
+    saved_runner = get_runner()
+    yield install
+    set_runner(saved_runner)
+
+def failed(lines):
+    result = CommandResult(["sudo", "apt-get", "install", "-y", "percona-postgresql-17"])
+    result.returncode = 100
+    result.stderr_lines = list(lines)
+    return result
+
+@pytest.mark.parametrize("lines, failure, holder", [
+    (APT_LOCKED, LOCKED, "unattended-upgr (pid 2817)"),
+    (DNF_LOCKED, LOCKED, "pid 4312"),
+    (YUM_LOCKED, LOCKED, "PackageKit"),
+    (APT_OFFLINE, TRANSIENT, None),
+    (DNF_MIRROR, TRANSIENT, None),
+    (NOT_FOUND, None, None),
+])
+def test_failures_are_classified(lines, failure, holder):
+    assert classify_failure(failed(lines)) == failure
+    assert lock_holder(failed(lines)) == holder
+
+def test_locked_package_manager_is_retried_with_backoff(backend):
+    stub = backend((100, APT_LOCKED), (100, APT_LOCKED), (100, APT_LOCKED), (0, []))
+    messages = []
+    result = run_package_manager(["sudo", "apt-get", "install", "-y", "percona-postgresql-17"], messages.append)
+    assert result.ok and stub.calls == 4
+    assert stub.sleeps == [2.0, 4.0, 8.0]
+    assert "The package manager is locked by unattended-upgr (pid 2817), retrying in 2s" in "\n".join(messages)
+
+def test_lock_timeout(backend):
+    backend((100, DNF_LOCKED))
+    with pytest.raises(PackageManagerLockTimeout, match="still held by pid 4312 after 0s"):
+        run_package_manager(["sudo", "dnf", "install", "-y", "percona-postgresql17"], lambda line: None, lock_timeout=0)
+
+def test_mirror_errors_are_retried_a_limited_number_of_times(backend):
+    stub = backend((1, DNF_MIRROR))
+    with pytest.raises(CommandError):
+        run_package_manager(["sudo", "dnf", "makecache"], lambda line: None, attempts=3)
+    assert stub.calls == 3
+    assert stub.sleeps == [2.0, 4.0]
+
+def test_mirror_error_recovers(backend):
+    stub = backend((100, APT_OFFLINE), (0, []))
+    assert run_package_manager(["sudo", "apt-get", "update"], lambda line: None).ok
+    assert stub.calls == 2
+
+def test_other_failures_are_not_retried(backend):
+    stub = backend((100, NOT_FOUND))
+    with pytest.raises(CommandError):
+        run_package_manager(["sudo", "apt-get", "install", "-y", "percona-postgresql-99"], lambda line: None)
+    assert stub.calls == 1 and stub.sleeps == []
+
+def test_cancel_ends_the_wait(backend):
+    backend((100, APT_LOCKED))
+    cancel_event = threading.Event()
+    cancel_event.set()
+    with pytest.raises(CommandError, match="was cancelled"):
+        run_package_manager(["sudo", "apt-get", "update"], lambda line: None, cancel_event=cancel_event)
+
+HOLD_LOCK = """
+import fcntl, os, sys, time
+file = open(sys.argv[1], "w")
+fcntl.flock(file, fcntl.LOCK_EX)
+file.write(str(os.getpid()))
+file.flush()
+print("locked", flush=True)
+sys.stdin.read()
+"""
+
+def test_installers_take_turns(workspace):
+    path = os.environ["PERCONA_INSTALLER_LOCK_FILE"]
+    holder = subprocess.Popen([sys.executable, "-c", HOLD_LOCK, path], stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True)
+    try:
+        assert holder.stdout.readline() == "locked\n"
+        messages = []
+        with pytest.raises(PackageManagerLockTimeout, match=f"pid {holder.pid}"):
+            run_package_manager(["sudo", "apt-get", "update"], messages.append, lock_timeout=1)
+        assert f"Waiting for another installer (pid {holder.pid}) to finish" in messages[0]
+    finally:
+        holder.communicate("")
+
+def test_installer_lock_is_reentrant(backend):
+    stub = backend((0, []))
+    with installer_lock(lambda line: None) as path:
+        run_package_manager(["sudo", "apt-get", "update"], lambda line: None)
+        with open(path, "r", encoding="utf-8") as file:
+            assert file.read() == str(os.getpid())
+    with open(path, "r", encoding="utf-8") as file:
+        assert file.read() == ""
+    assert stub.calls == 1
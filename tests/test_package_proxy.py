@@ -0,0 +1,108 @@
+import os
+import threading
+
+import pytest
+import requests
+
+from benchmarks.fixtures import serve_directory
+from package_proxy import STATS_PATH, PackageProxyServer, PackageStore
+
+PACKAGE_SIZE = 1024
+
+@pytest.fixture
+def upstream(workspace):
+    root = os.path.join(workspace.path, "upstream")
+    os.makedirs(os.path.join(root, "pool"))
+    for name in ("a", "b", "c"):
+        with open(os.path.join(root, "pool", f"{name}.deb"), "wb") as file:
+            file.write(name.encode() * PACKAGE_SIZE)
+    with open(os.path.join(root, "Release"), "w", encoding="utf-8") as file:
+        file.write("Codename: jammy\n")
+    server, url = serve_directory(root)
+    yield url
+    server.shutdown()
+
+@pytest.fixture
+def proxy(workspace, upstream):
+    # Room for two packages
+    store = PackageStore(os.path.join(workspace.path, "cache"), max_size=int(2.5 * PACKAGE_SIZE))
+    server = PackageProxyServer(("127.0.0.1", 0), store, upstream)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_port}", store
+    server.shutdown()
+    server.server_close()
+
+def get(url):
+    response = requests.get(url, timeout=5)
+    response.raise_for_status()
+    return response
+
+def test_miss_then_hit(proxy):
+    url, store = proxy
+    first = get(f"{url}/pool/a.deb")
+    second = get(f"{url}/pool/a.deb")
+    assert first.headers["X-Cache"] == "MISS" and second.headers["X-Cache"] == "HIT"
+    assert first.content == second.content == b"a" * PACKAGE_SIZE
+    stats = store.get_stats()
+    assert (stats["hits"], stats["misses"], stats["bytes_from_cache"]) == (1, 1, PACKAGE_SIZE)
+
+def test_metadata_is_passed_through(proxy):
+    url, store = proxy
+    response = get(f"{url}/Release")
+    assert response.headers["X-Cache"] == "PASS"
+    assert response.text == "Codename: jammy\n"
+    assert store.get_stats()["entries"] == 0
+
+def test_missing_upstream_file(proxy):
+    url, store = proxy
+    assert requests.get(f"{url}/pool/missing.deb", timeout=5).status_code == 404
+    assert store.get_stats()["entries"] == 0
+
+def test_least_recently_used_package_is_evicted(proxy):
+    url, store = proxy
+    get(f"{url}/pool/a.deb")
+    get(f"{url}/pool/b.deb")
+    get(f"{url}/pool/a.deb")
+    get(f"{url}/pool/c.deb")
+    assert list(store.entries) == ["/pool/a.deb", "/pool/c.deb"]
+    assert store.total_size() == 2 * PACKAGE_SIZE
+    assert get(f"{url}/pool/b.deb").headers["X-Cache"] == "MISS"
+    assert store.get_stats()["evictions"] == 2
+
+def test_stats_endpoint(proxy):
+    url, store = proxy
+    get(f"{url}/pool/a.deb")
+    get(f"{url}/pool/a.deb")
+    stats = get(f"{url}{STATS_PATH}").json()
+    assert stats["entries"] == 1
+    assert stats["size"] == PACKAGE_SIZE
+    assert stats["hit_ratio"] == 0.5
+
+def test_package_evicted_while_served_stays_readable(workspace):
+    store = PackageStore(os.path.join(workspace.path, "cache"), max_size=PACKAGE_SIZE)
+    for name in ("a", "b"):
+        tmp_file = os.path.join(store.directory, f"{name}.part")
+        with open(tmp_file, "wb") as file:
+            file.write(name.encode() * PACKAGE_SIZE)
+        file, _ = store.add(f"/{name}.deb", tmp_file, name * 64, PACKAGE_SIZE)
+        file.close()
+
+    # b is opened, then evicted by another download
+    file, size = store.open_object("/b.deb")
+    tmp_file = os.path.join(store.directory, "c.part")
+    with open(tmp_file, "wb") as part:
+        part.write(b"c" * PACKAGE_SIZE)
+    store.add("/c.deb", tmp_file, "c" * 64, PACKAGE_SIZE)[0].close()
+    with file:
+        assert store.open_object("/b.deb") is None
+        assert file.read() == b"b" * size
+
+def test_missing_object_is_dropped(workspace):
+    store = PackageStore(os.path.join(workspace.path, "cache"))
+    tmp_file = os.path.join(store.directory, "a.part")
+    with open(tmp_file, "wb") as file:
+        file.write(b"a")
+    store.add("/a.deb", tmp_file, "a" * 64, 1)[0].close()
+    os.unlink(store.object_path("a" * 64))
+    assert store.open_object("/a.deb") is None
+    assert store.total_size() == 0
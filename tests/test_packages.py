@@ -0,0 +1,132 @@
+import pytest
+
+from benchmarks.fixtures import StubBackend
+from packages import (
+    INSTALLED, MISSING, UPGRADABLE, compare_deb_versions, compare_rpm_versions, packages_to_install, query_packages,
+)
+from runner import CommandRunner, get_runner, set_runner
+
+DPKG_QUERY = [
+    "percona-postgresql-17\tinstall ok installed\t2:17.5-1.jammy",
+    "percona-pgbackrest\tinstall ok installed\t1:2.55.1-1.jammy",
+    "percona-pg-stat-monitor17\tinstall ok installed\t1:2.2.0-1.jammy",
+    "percona-patroni\tdeinstall ok config-files\t1:4.0.5-1.jammy",
+]
+APT_CACHE_POLICY = [
+    "percona-postgresql-17:",
+    "  Installed: 2:17.5-1.jammy",
+    "  Candidate: 2:17.5-1.jammy",
+    "  Version table:",
+    " *** 2:17.5-1.jammy 500",
+    "        500 http://repo.percona.com/ppg-17.5/apt jammy/main amd64 Packages",
+    "        100 /var/lib/dpkg/status",
+    "percona-pgbackrest:",
+    "  Installed: 1:2.55.1-1.jammy",
+    "  Candidate: 1:2.55.1-2.jammy",
+    "  Version table:",
+    "     1:2.55.1-2.jammy 500",
+    "        500 http://repo.percona.com/ppg-17.5/apt jammy/main amd64 Packages",
+    " *** 1:2.55.1-1.jammy 100",
+    "        100 /var/lib/dpkg/status",
+    # Installed from a newer repository that is no longer configured
+    "percona-pg-stat-monitor17:",
+    "  Installed: 1:2.2.0-1.jammy",
+    "  Candidate: 1:2.1.1-1.jammy",
+    "  Version table:",
+    " *** 1:2.2.0-1.jammy 100",
+    "        100 /var/lib/dpkg/status",
+    "     1:2.1.1-1.jammy 500",
+    "        500 http://repo.percona.com/ppg-17.5/apt jammy/main amd64 Packages",
+]
+RPM_QUERY = [
+    "percona-postgresql17-server\t0:17.5-1.el9",
+    "percona-pgbackrest\t0:2.55.1-1.el9",
+    "package percona-patroni is not installed",
+]
+# yum wraps the names that do not fit in the first column
+YUM_UPDATES = [
+    "Updated Packages",
+    "percona-postgresql17-server.x86_64",
+    "                          17.6-1.el9               ppg-17.6-release-x86_64",
+    "percona-pgbackrest.x86_64  2.55.1-2.el9             ppg-17.6-release-x86_64",
+]
+
+@pytest.fixture
+def stub(workspace):
+    def install(responses):
+        backend = StubBackend(responses)
+        set_runner(CommandRunner(backend))
+        return backend
+
+    saved_runner = get_runner()
+    yield install
+    set_runner(saved_runner)
+
+@pytest.mark.parametrize("a, b, expected", [
+    ("17.5-1.jammy", "17.5-1.jammy", 0),
+    ("17.6-1.jammy", "17.5-2.jammy", 1),
+    ("1:2.1-1", "2.2-1", 1),
+    ("2.10", "2.9", 1),
+    ("1.0~rc1-1", "1.0-1", -1),
+    ("1.0a", "1.0+", -1),
+    ("1.0-1", "1.0-1ubuntu1", -1),
+])
+def test_deb_versions(a, b, expected):
+    assert compare_deb_versions(a, b) == expected
+    assert compare_deb_versions(b, a) == -expected
+
+@pytest.mark.parametrize("a, b, expected", [
+    ("0:17.5-1.el9", "17.5-1.el9", 0),
+    ("17.6-1.el9", "0:17.5-1.el9", 1),
+    ("1:1.0-1", "2.0-1", 1),
+    ("2.10-1", "2.9-1", 1),
+    ("1.0~rc1-1", "1.0-1", -1),
+    ("1.0^git1-1", "1.0-1", 1),
+    ("1.0^git1-1", "1.0.1-1", -1),
+    ("1.0a-1", "1.0.1-1", -1),
+])
+def test_rpm_versions(a, b, expected):
+    assert compare_rpm_versions(a, b) == expected
+    assert compare_rpm_versions(b, a) == -expected
+
+def test_apt_states(stub):
+    stub({"dpkg-query": (1, DPKG_QUERY), "apt-cache policy": (0, APT_CACHE_POLICY)})
+    states = query_packages(
+        ["percona-postgresql-17", "percona-pgbackrest", "percona-pg-stat-monitor17", "percona-patroni"], "apt-get"
+    )
+
+    assert states["percona-postgresql-17"].status == INSTALLED
+    assert states["percona-pgbackrest"].status == UPGRADABLE
+    assert states["percona-pgbackrest"].candidate_version == "1:2.55.1-2.jammy"
+    # A newer installed version is not an upgrade to the older candidate
+    assert states["percona-pg-stat-monitor17"].status == INSTALLED
+    assert states["percona-pg-stat-monitor17"].candidate_version is None
+    assert states["percona-patroni"].status == MISSING
+
+def test_yum_states_with_wrapped_lines(stub):
+    stub({"rpm": (1, RPM_QUERY), "yum": (0, YUM_UPDATES)})
+    states = query_packages(["percona-postgresql17-server", "percona-pgbackrest", "percona-patroni"], "yum")
+
+    assert states["percona-postgresql17-server"].status == UPGRADABLE
+    assert states["percona-postgresql17-server"].candidate_version == "17.6-1.el9"
+    assert states["percona-pgbackrest"].status == UPGRADABLE
+    assert states["percona-patroni"].status == MISSING
+
+def test_dnf_older_candidate_is_not_an_upgrade(stub):
+    stub({
+        "rpm": (0, ["percona-pgbackrest\t0:2.56.0-1.el9"]),
+        "dnf": (0, ["Available Upgrades", "percona-pgbackrest.x86_64   2.55.1-2.el9   ppg-17.6-release-x86_64"]),
+    })
+    assert query_packages(["percona-pgbackrest"], "dnf")["percona-pgbackrest"].status == INSTALLED
+
+def test_packages_to_install(stub):
+    backend = stub({"dpkg-query": (1, DPKG_QUERY), "apt-cache policy": (0, APT_CACHE_POLICY)})
+    messages = []
+    packages = ["percona-postgresql-17", "percona-pgbackrest", "percona-patroni", "percona-ppg-server=17.5*"]
+
+    assert packages_to_install(packages, "apt-get", messages.append) == [
+        "percona-pgbackrest", "percona-patroni", "percona-ppg-server=17.5*",
+    ]
+    # Version pins are not queried, they are left to the package manager
+    assert "percona-ppg-server=17.5*" not in backend.calls[0]
+    assert "Upgradable: percona-pgbackrest (1:2.55.1-1.jammy -> 1:2.55.1-2.jammy)" in messages
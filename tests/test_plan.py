@@ -0,0 +1,93 @@
+import threading
+import time
+
+import pytest
+
+from journal import Journal
+from plan import PACKAGE_MANAGER, Plan, PlanError
+
+def test_steps_run_after_their_dependencies():
+    finished = []
+    plan = Plan()
+    plan.add("install", lambda context: finished.append("install"), deps=["download", "enable"])
+    plan.add("download", lambda context: finished.append("download") or "package.deb")
+    plan.add("enable", lambda context: finished.append("enable"), deps=["download"])
+
+    assert [step.name for step in plan.order()] == ["download", "enable", "install"]
+    context = plan.execute(lambda line: None)
+    assert finished == ["download", "enable", "install"]
+    assert context["download"] == "package.deb"
+
+def test_shared_prerequisites_are_planned_once():
+    plan = Plan()
+    first = plan.add("ensure_percona_release", lambda context: None)
+    plan.add("enable:a", lambda context: None, deps=["ensure_percona_release"])
+    assert plan.add("ensure_percona_release", lambda context: None, deps=["enable:a"]) is first
+    with pytest.raises(PlanError, match="cycle"):
+        plan.order()
+
+def test_unknown_dependency_is_rejected():
+    plan = Plan()
+    plan.add("install", lambda context: None, deps=["download"])
+    with pytest.raises(PlanError, match="unknown step 'download'"):
+        plan.execute(lambda line: None)
+
+def test_package_manager_steps_never_overlap():
+    lock = threading.Lock()
+    active = {"package_manager": 0, "max": 0}
+    # Independent steps without the lock run concurrently and meet at the barrier
+    barrier = threading.Barrier(2, timeout=5)
+
+    def package_manager_step(context):
+        with lock:
+            active["package_manager"] += 1
+            active["max"] = max(active["max"], active["package_manager"])
+        time.sleep(0.05)
+        with lock:
+            active["package_manager"] -= 1
+
+    plan = Plan()
+    for index in range(3):
+        plan.add(f"install:{index}", package_manager_step, resources=[PACKAGE_MANAGER])
+    plan.add("probe:a", lambda context: barrier.wait())
+    plan.add("probe:b", lambda context: barrier.wait())
+    plan.execute(lambda line: None, max_workers=5)
+    assert active["max"] == 1
+
+def test_failed_step_skips_its_dependents():
+    def fail(context):
+        raise RuntimeError("mirror unreachable")
+
+    plan = Plan()
+    plan.add("download", fail)
+    plan.add("install", lambda context: None, deps=["download"])
+    with pytest.raises(PlanError, match="mirror unreachable.*skipped: install"):
+        plan.execute(lambda line: None)
+    assert plan.steps["install"].status == "skipped"
+
+def _journaled_plan(calls, description="sudo apt-get install -y percona-postgresql-17"):
+    plan = Plan()
+    plan.add("download", lambda context: calls.append("download") or "package.deb")
+    plan.add("install", lambda context: calls.append("install") or context["download"], deps=["download"],
+             description=description)
+    return plan
+
+def test_resumed_steps_hand_on_their_results(workspace):
+    inputs = {"product": "ppg-17.0", "repository": "release"}
+    journal = Journal.open(inputs)
+    journal.record("download", "package.deb", "")
+
+    calls = []
+    context = _journaled_plan(calls).execute(lambda line: None, journal=Journal.open(inputs))
+    assert calls == ["install"]
+    assert context["install"] == "package.deb"
+
+def test_steps_rerun_when_their_inputs_changed(workspace):
+    inputs = {"product": "ppg-17.0", "repository": "release"}
+    _journaled_plan([]).execute(lambda line: None, journal=Journal.open(inputs))
+
+    calls = []
+    plan = _journaled_plan(calls, description="sudo apt-get install -y percona-pg-stat-monitor17")
+    plan.execute(lambda line: None, journal=Journal.open(inputs))
+    assert calls == ["install"]
+    assert plan.steps["download"].status == "resumed"
@@ -0,0 +1,130 @@
+import glob
+import gzip
+import os
+
+import pytest
+
+import repo_catalog
+from benchmarks.fixtures import installed_host_facts, make_packages_stanzas, make_repo_tree, make_yum_repo, serve_directory
+from repo_catalog import RepoCatalog, parse_apt_packages, parse_primary_xml, product_sources
+
+def chunked(data, size):
+    """Split data like a network stream, cutting lines and elements in the middle."""
+    return [data[offset:offset + size] for offset in range(0, len(data), size)]
+
+@pytest.fixture
+def repo_url(workspace):
+    root = make_repo_tree(os.path.join(workspace.path, "repo"), ["ppg-17.0"], packages=50)
+    server, url = serve_directory(root)
+    yield url
+    server.shutdown()
+
+def test_components_of_a_suite_are_separate_sources(workspace, repo_url, monkeypatch):
+    monkeypatch.setattr(repo_catalog, "CATALOG_TTL", 0)
+    catalog = RepoCatalog(os.path.join(workspace.cache_dir, "catalog.sqlite"))
+    facts = installed_host_facts()
+    release = product_sources("ppg-17.0", "release", facts, repo_url)
+    testing = product_sources("ppg-17.0", "testing", facts, repo_url)
+    assert release[0].metadata_url == testing[0].metadata_url
+
+    assert catalog.update(release + testing) == []
+    assert len(catalog.names(["ppg-17.0"], repo_types=["release"])) == 50
+    assert len(catalog.names(["ppg-17.0"], repo_types=["testing"])) == 50
+    # Unchanged lists are not indexed again, and one component does not drop the other
+    assert catalog.update_source(release[0]) is None
+    assert catalog.update_source(testing[0]) is None
+    assert len(catalog.search(repositories=["ppg-17.0"])) == 100
+
+def test_apt_packages_are_parsed_across_chunks():
+    data = make_packages_stanzas(50).encode("utf-8")
+    packages = list(parse_apt_packages(chunked(data, 7)))
+    assert packages == list(parse_apt_packages([data]))
+    assert len(packages) == 50
+
+    name, version, arch, size, installed_size, summary, depends = packages[0]
+    assert (name, arch, summary) == ("percona-synthetic-0", "amd64", "Synthetic package 0")
+    assert version.endswith("-1.jammy")
+    assert isinstance(size, int)
+    # Installed-Size is given in KiB
+    assert installed_size % 1024 == 0
+    assert depends.startswith("libc6 (>= 2.34), percona-synthetic-")
+
+def test_last_apt_stanza_without_blank_line():
+    data = b"Package: percona-release\nVersion: 1.0-29\nArchitecture: all\nInstalled-Size: bad\nSize: 12"
+    assert list(parse_apt_packages(chunked(data, 5))) == [
+        ("percona-release", "1.0-29", "all", 12, None, None, None)
+    ]
+
+def test_primary_xml_is_parsed_across_chunks(workspace):
+    root = make_yum_repo(os.path.join(workspace.path, "yum"), "ppg-17.0", packages=30)
+    [primary] = glob.glob(os.path.join(root, "ppg-17.0", "yum", "release", "9", "RPMS", "x86_64", "repodata", "*-primary.xml.gz"))
+    with open(primary, "rb") as file:
+        data = gzip.decompress(file.read())
+
+    packages = list(parse_primary_xml(chunked(data, 100)))
+    assert len(packages) == 30
+    name, version, arch, size, installed_size, summary, depends = packages[0]
+    assert (name, arch, summary) == ("percona-synthetic-0", "x86_64", "Synthetic package 0")
+    assert version.endswith("-1.el9")
+    assert isinstance(size, int) and isinstance(installed_size, int)
+    # File and rpmlib requirements are not packages
+    assert depends == "glibc"
+
+def test_primary_xml_epochs_and_source_packages():
+    data = (
+        '<metadata xmlns="http://linux.duke.edu/metadata/common" xmlns:rpm="http://linux.duke.edu/metadata/rpm">'
+        '<package type="rpm"><name>percona-server-server</name><arch>src</arch>'
+        '<version epoch="0" ver="8.0.41" rel="32.1.el9"/></package>'
+        '<package type="rpm"><name>percona-server-server</name><arch>x86_64</arch>'
+        '<version epoch="1" ver="8.0.41" rel="32.1.el9"/><summary>Percona Server</summary></package>'
+        '</metadata>'
+    ).encode("utf-8")
+    assert list(parse_primary_xml([data])) == [
+        ("percona-server-server", "1:8.0.41-32.1.el9", "x86_64", None, None, "Percona Server", None)
+    ]
+
+def test_corrupted_list_is_not_indexed(workspace, repo_url, monkeypatch):
+    monkeypatch.setattr(repo_catalog, "CATALOG_TTL", 0)
+    catalog = RepoCatalog(os.path.join(workspace.cache_dir, "catalog.sqlite"))
+    [source] = product_sources("ppg-17.0", "release", installed_host_facts(), repo_url)
+    assert catalog.update_source(source) == 50
+
+    # A list truncated on the mirror, while its Release file still names the original
+    list_path = os.path.join(workspace.path, "repo", "ppg-17.0", "apt", "dists", "jammy", "main", "binary-amd64", "Packages.gz")
+    with open(list_path, "rb") as file:
+        data = file.read()
+    with open(list_path, "wb") as file:
+        file.write(data[:len(data) // 2])
+    with pytest.raises(repo_catalog.RepoCatalogError, match="truncated or corrupted"):
+        catalog.update_source(source, refresh=True)
+    # The packages indexed earlier are kept
+    assert len(catalog.names(["ppg-17.0"])) == 50
+
+def test_yum_list_is_verified(workspace, monkeypatch):
+    from host_facts import HostFacts
+
+    root = make_yum_repo(os.path.join(workspace.path, "yum"), "ppg-17.0", packages=20)
+    server, url = serve_directory(root)
+    try:
+        facts = HostFacts("Linux", distro_id="rocky", name="Rocky Linux", version_id="9.4", package_manager="dnf", arch="x86_64")
+        [source] = product_sources("ppg-17.0", "release", facts, url)
+        catalog = RepoCatalog(os.path.join(workspace.cache_dir, "catalog.sqlite"))
+        assert catalog.update_source(source) == 20
+
+        [primary] = glob.glob(os.path.join(root, "ppg-17.0", "yum", "release", "9", "RPMS", "x86_64", "repodata", "*-primary.xml.gz"))
+        # A stale list left on the mirror under the name of the new one, valid but for its checksum
+        with open(primary, "rb") as file:
+            data = gzip.decompress(file.read())
+        with open(primary, "wb") as file:
+            file.write(gzip.compress(data.replace(b"percona-synthetic-1<", b"percona-synthetic-x<")))
+        with pytest.raises(repo_catalog.RepoCatalogError, match="truncated or corrupted"):
+            catalog.update_source(source, refresh=True)
+    finally:
+        server.shutdown()
+
+def test_unreadable_catalog(workspace):
+    path = os.path.join(workspace.cache_dir, "catalog.sqlite")
+    with open(path, "w", encoding="utf-8") as file:
+        file.write("not a database " * 100)
+    with pytest.raises(repo_catalog.RepoCatalogError, match="Unable to open the repository catalog"):
+        RepoCatalog(path)
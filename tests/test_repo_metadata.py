@@ -0,0 +1,155 @@
+import os
+import time
+
+import pytest
+
+import repo_metadata
+from benchmarks.fixtures import StubBackend
+from repo_metadata import MetadataTracker
+from runner import CommandRunner, get_runner, set_runner
+
+class SourcesBackend(StubBackend):
+    """Also records the source lists apt was pointed at, the directory is gone once refresh returns."""
+
+    def __init__(self):
+        super().__init__()
+        self.sources = []
+
+    def execute(self, result, emit, **kwargs):
+        for option in result.argv:
+            if option.startswith("Dir::Etc::sourceparts="):
+                self.sources.append(sorted(os.listdir(option.split("=", 1)[1])))
+        super().execute(result, emit, **kwargs)
+
+@pytest.fixture
+def repos(workspace, monkeypatch):
+    """Repository definitions in the workspace, instead of those of the host."""
+    for directory in ("sources.list.d", "yum.repos.d"):
+        os.makedirs(os.path.join(workspace.path, directory))
+    monkeypatch.setattr(repo_metadata, "APT_SOURCES_GLOB", os.path.join(workspace.path, "sources.list.d", "percona-*.list"))
+    monkeypatch.setattr(repo_metadata, "YUM_REPOS_GLOB", os.path.join(workspace.path, "yum.repos.d", "percona-*.repo"))
+
+    def write(name, content):
+        directory = "sources.list.d" if name.endswith(".list") else "yum.repos.d"
+        with open(os.path.join(workspace.path, directory, name), "w", encoding="utf-8") as file:
+            file.write(content)
+
+    return write
+
+@pytest.fixture
+def backend():
+    saved_runner = get_runner()
+    backend = SourcesBackend()
+    set_runner(CommandRunner(backend))
+    yield backend
+    set_runner(saved_runner)
+
+def apt_source(repository):
+    return f"deb http://repo.percona.com/{repository}/apt jammy main\n"
+
+def yum_repo(*repo_ids):
+    return "".join(f"[{repo_id}]\nbaseurl = http://repo.percona.com/ppg-17.5/yum/release/9/RPMS/x86_64\nenabled = 1\n\n" for repo_id in repo_ids)
+
+def test_fingerprints_per_repository(repos):
+    repos("percona-ppg-17.5-release.list", apt_source("ppg-17.5"))
+    repos("percona-prel-release.list", apt_source("prel"))
+    repos("other.list", apt_source("other"))
+    tracker = MetadataTracker("apt-get")
+    fingerprints = tracker.repo_fingerprints()
+    assert sorted(fingerprints) == ["percona-ppg-17.5-release", "percona-prel-release"]
+    assert fingerprints["percona-ppg-17.5-release"] != fingerprints["percona-prel-release"]
+
+    # Only the modified definition gets another fingerprint
+    repos("percona-ppg-17.5-release.list", apt_source("ppg-17.5").replace("main", "main contrib"))
+    changed = tracker.repo_fingerprints()
+    assert changed["percona-prel-release"] == fingerprints["percona-prel-release"]
+    assert changed["percona-ppg-17.5-release"] != fingerprints["percona-ppg-17.5-release"]
+
+def test_only_changed_repositories_are_refreshed(repos, backend):
+    repos("percona-prel-release.list", apt_source("prel"))
+    messages = []
+    tracker = MetadataTracker("apt-get")
+    assert tracker.refresh(messages.append)
+    assert backend.sources == [["percona-prel-release.list"]]
+
+    # Nothing changed, in this and in a later run
+    assert not tracker.refresh(messages.append)
+    assert not MetadataTracker("apt-get").refresh(messages.append)
+    assert messages[-1] == "Package metadata is up to date.\n"
+
+    # A repository enabled since, and a modified one
+    repos("percona-ppg-17.5-release.list", apt_source("ppg-17.5"))
+    assert MetadataTracker("apt-get").changed_repos() == ["percona-ppg-17.5-release"]
+    repos("percona-prel-release.list", apt_source("prel").replace("main", "testing"))
+    assert MetadataTracker("apt-get").refresh(messages.append)
+    assert backend.sources[-1] == ["percona-ppg-17.5-release.list", "percona-prel-release.list"]
+    assert messages[-1] == "Refreshing package metadata for percona-ppg-17.5-release, percona-prel-release...\n"
+    assert len(backend.calls) == 2
+
+def test_metadata_expires_after_max_age(repos, backend, monkeypatch):
+    repos("percona-prel-release.list", apt_source("prel"))
+    repos("percona-ppg-17.5-release.list", apt_source("ppg-17.5"))
+    tracker = MetadataTracker("apt-get")
+    tracker.refresh(lambda message: None)
+    refreshed_at = tracker.state["repos"]["percona-prel-release"]["refreshed_at"]
+
+    now = refreshed_at + repo_metadata.REPO_METADATA_MAX_AGE - 60
+    monkeypatch.setattr(repo_metadata.time, "time", lambda: now)
+    assert MetadataTracker("apt-get").changed_repos() == []
+
+    now = refreshed_at + repo_metadata.REPO_METADATA_MAX_AGE + 60
+    assert MetadataTracker("apt-get").changed_repos() == ["percona-ppg-17.5-release", "percona-prel-release"]
+    # A tracker with a longer max_age still considers them fresh
+    assert MetadataTracker("apt-get", max_age=2 * repo_metadata.REPO_METADATA_MAX_AGE).changed_repos() == []
+
+def test_apt_refresh_keeps_the_other_lists(repos, backend):
+    repos("percona-prel-release.list", apt_source("prel"))
+    MetadataTracker("apt-get").refresh(lambda message: None)
+    [argv] = backend.calls
+    assert argv[:3] == ["sudo", "apt-get", "update"]
+    assert argv[3:] == [
+        "-o", "Dir::Etc::sourcelist=/dev/null",
+        "-o", argv[6],
+        "-o", "APT::Get::List-Cleanup=0",
+    ]
+    assert argv[6].startswith("Dir::Etc::sourceparts=")
+    assert not os.path.exists(argv[6].split("=", 1)[1])
+
+@pytest.mark.parametrize("package_manager", ["yum", "dnf"])
+def test_yum_refresh_enables_only_the_changed_repositories(repos, backend, package_manager):
+    repos("percona-ppg-17.5-release.repo", yum_repo("ppg-17.5-release-x86_64", "ppg-17.5-release-noarch"))
+    repos("percona-prel-release.repo", yum_repo("prel-release-noarch"))
+    tracker = MetadataTracker(package_manager)
+    tracker.refresh(lambda message: None)
+
+    repos("percona-prel-release.repo", yum_repo("prel-release-noarch", "prel-release-x86_64"))
+    tracker.refresh(lambda message: None)
+    assert backend.calls == [
+        ["sudo", package_manager, "makecache", "--disablerepo=*",
+         "--enablerepo=ppg-17.5-release-x86_64,ppg-17.5-release-noarch,prel-release-noarch"],
+        ["sudo", package_manager, "makecache", "--disablerepo=*", "--enablerepo=prel-release-noarch,prel-release-x86_64"],
+    ]
+
+@pytest.mark.parametrize("package_manager, command", [
+    ("apt-get", ["sudo", "apt-get", "update"]),
+    ("dnf", ["sudo", "dnf", "makecache"]),
+])
+def test_full_refresh(repos, backend, package_manager, command):
+    repos("percona-prel-release.list", apt_source("prel"))
+    repos("percona-prel-release.repo", yum_repo("prel-release-noarch"))
+    tracker = MetadataTracker(package_manager)
+    before = time.time()
+    assert tracker.refresh(lambda message: None, full=True)
+    assert backend.calls == [command]
+    assert tracker.state["repos"]["percona-prel-release"]["refreshed_at"] >= before
+    assert tracker.state["system_refreshed_at"] >= before
+    # A full refresh counts for every repository
+    assert tracker.changed_repos() == []
+
+def test_corrupted_state_refreshes_again(repos, backend):
+    repos("percona-prel-release.list", apt_source("prel"))
+    tracker = MetadataTracker("apt-get")
+    tracker.refresh(lambda message: None)
+    with open(tracker.state_path, "w", encoding="utf-8") as file:
+        file.write("{")
+    assert MetadataTracker("apt-get").changed_repos() == ["percona-prel-release"]
@@ -0,0 +1,62 @@
+import os
+import socket
+
+import pytest
+
+import repo_probe
+from benchmarks.fixtures import installed_host_facts, make_repo_tree, serve_directory
+from repo_probe import probe_repositories
+
+@pytest.fixture
+def repo_url(workspace):
+    # ppg-17.0 is published for jammy with the release (main) and testing components
+    root = make_repo_tree(os.path.join(workspace.path, "repo"), ["ppg-17.0"])
+    server, url = serve_directory(root)
+    yield url
+    server.shutdown()
+
+def probe(url, *targets, facts=None):
+    results = probe_repositories(list(targets), facts=facts or installed_host_facts(), base_url=url, refresh=True)
+    return [(result.available, result.reason) for result in results]
+
+def test_published_repository_is_available(repo_url):
+    assert probe(repo_url, ("ppg-17.0", "release"), ("ppg-17.0", "testing")) == [(True, None), (True, None)]
+
+def test_missing_repository(repo_url):
+    assert probe(repo_url, ("ppg-99.0", "release")) == [(False, "ppg-99.0 does not exist")]
+
+def test_missing_component(repo_url):
+    assert probe(repo_url, ("ppg-17.0", "experimental")) == [
+        (False, "ppg-17.0 has no experimental packages for Ubuntu jammy x86_64")
+    ]
+
+def test_missing_codename(repo_url):
+    facts = installed_host_facts()
+    facts.codename = "noble"
+    assert probe(repo_url, ("ppg-17.0", "release"), facts=facts) == [
+        (False, "ppg-17.0 has no release packages for Ubuntu noble x86_64")
+    ]
+
+def test_missing_architecture(repo_url):
+    facts = installed_host_facts()
+    facts.arch = "aarch64"
+    assert probe(repo_url, ("ppg-17.0", "release"), facts=facts) == [(False, "ppg-17.0 has no packages for arm64")]
+
+def test_unreachable_server_is_unknown(workspace):
+    with socket.socket() as closed:
+        closed.bind(("127.0.0.1", 0))
+        url = f"http://127.0.0.1:{closed.getsockname()[1]}"
+    [(available, reason)] = probe(url, ("ppg-17.0", "release"))
+    assert available is None and reason.startswith("unable to reach")
+
+def test_directory_is_probed_only_when_metadata_is_missing(repo_url, monkeypatch):
+    fetched = []
+    fetch = repo_probe._fetch
+    monkeypatch.setattr(repo_probe, "_fetch", lambda url: fetched.append(url) or fetch(url))
+
+    probe(repo_url, ("ppg-17.0", "release"), ("ppg-17.0", "testing"))
+    assert fetched == [f"{repo_url}/ppg-17.0/apt/dists/jammy/Release"]
+
+    fetched.clear()
+    probe(repo_url, ("ppg-99.0", "release"))
+    assert fetched == [f"{repo_url}/ppg-99.0/apt/dists/jammy/Release", f"{repo_url}/ppg-99.0/"]
@@ -0,0 +1,117 @@
+import os
+import subprocess
+import threading
+import time
+
+import pytest
+
+import runner
+from runner import CommandError, CommandObserver, CommandRunner, DryRunBackend, command_name
+
+def sh(script):
+    return ["sh", "-c", script]
+
+@pytest.fixture
+def commands():
+    return CommandRunner()
+
+def test_output_is_streamed_and_recorded(commands):
+    lines = []
+    result = commands.run(sh("echo one; echo two >&2; echo three"), lines.append)
+    assert result.ok
+    assert result.stdout_lines == ["one", "three"]
+    assert result.stderr_lines == ["two"]
+    assert sorted(lines) == ["one", "three", "two"]
+    assert result.cpu_time is not None and result.wall_time > 0
+
+def test_failure_raises(commands):
+    with pytest.raises(CommandError) as error:
+        commands.run(sh("echo broken >&2; exit 3"))
+    assert isinstance(error.value, subprocess.CalledProcessError)
+    assert error.value.returncode == 3
+    assert error.value.stderr == "broken"
+    assert commands.run(sh("exit 3"), check=False).returncode == 3
+
+def test_chatty_stderr_does_not_block(commands):
+    # More than a pipe buffer on stderr before anything on stdout
+    result = commands.run(sh("i=0; while [ $i -lt 2000 ]; do echo line-$i-of-stderr-output-long-enough >&2; i=$((i+1)); done; echo done"), timeout=30)
+    assert len(result.stderr_lines) == 2000
+    assert result.stdout_lines == ["done"]
+
+def test_timeout_stops_the_command(commands):
+    start = time.monotonic()
+    with pytest.raises(CommandError, match="timed out after 0.3 seconds") as error:
+        commands.run(sh("echo started; sleep 30"), timeout=0.3)
+    assert error.value.result.timed_out
+    assert error.value.result.stdout_lines == ["started"]
+    assert time.monotonic() - start < 5
+
+def test_cancel_stops_the_command_and_its_children(commands):
+    cancel = threading.Event()
+    threading.Timer(0.3, cancel.set).start()
+    start = time.monotonic()
+    # The child sleep keeps stdout open unless its process group is stopped as well
+    result = commands.run(sh("sleep 30 & wait"), check=False, new_session=True, cancel_event=cancel)
+    assert result.cancelled and not result.timed_out
+    assert time.monotonic() - start < 5
+    with pytest.raises(CommandError, match="was cancelled"):
+        raise CommandError(result)
+
+def test_command_ignoring_sigterm_is_killed(commands, monkeypatch):
+    monkeypatch.setattr(runner, "KILL_GRACE_PERIOD", 0.3)
+    result = commands.run(sh("trap '' TERM; sleep 30"), check=False, timeout=0.3, new_session=True)
+    assert result.timed_out
+    assert result.returncode == -9
+
+def test_history_is_bounded_and_without_output(monkeypatch):
+    monkeypatch.setattr(runner, "HISTORY_SIZE", 3)
+    commands = CommandRunner()
+    for index in range(5):
+        commands.run(sh(f"echo {index}"))
+    assert [entry.argv[-1] for entry in commands.history] == ["echo 2", "echo 3", "echo 4"]
+    assert all(entry.stdout_lines == [] and entry.returncode == 0 for entry in commands.history)
+
+def test_observers_are_notified(commands):
+    events = []
+
+    class Recorder(CommandObserver):
+        def command_started(self, result):
+            events.append(("started", result.name, result.returncode))
+
+        def command_finished(self, result):
+            events.append(("finished", result.name, result.returncode))
+
+    class Broken(CommandObserver):
+        def command_finished(self, result):
+            raise RuntimeError("broken observer")
+
+    recorder = Recorder()
+    commands.add_observer(recorder)
+    commands.add_observer(Broken())
+    # A failing observer does not fail the command
+    commands.run(["true"])
+    commands.remove_observer(recorder)
+    commands.run(["true"])
+    assert events == [("started", "true", None), ("finished", "true", 0)]
+
+def test_missing_command(commands):
+    result = commands.run(["percona-no-such-command"], check=False)
+    assert result.returncode == 127
+    assert result.stderr_lines
+
+def test_commands_are_argument_lists(commands):
+    with pytest.raises(TypeError):
+        commands.run("echo unsafe")
+
+def test_dry_run_does_not_run_commands(workspace):
+    messages = []
+    commands = CommandRunner(DryRunBackend(messages.append))
+    result = commands.run(["sudo", "sh", "-c", "touch created"])
+    assert result.ok
+    assert not os.path.exists("created")
+    assert messages == ["[dry-run] sudo sh -c 'touch created'"]
+
+def test_command_name():
+    assert command_name(["sudo", "-u", "postgres", "apt-get", "install", "-y", "x"]) == "apt-get install"
+    assert command_name(["sudo", "percona-release", "enable", "ppg-17"]) == "percona-release enable"
+    assert command_name(["/usr/bin/rpm", "-q", "x"]) == "rpm"
@@ -0,0 +1,16 @@
+import os
+import sys
+
+from solution_registry import SOLUTION_PACKAGE, SolutionRegistry
+
+def test_solution_modules_do_not_shadow_installer_modules(workspace):
+    directory = os.path.join(workspace.path, "solution")
+    os.makedirs(directory)
+    with open(os.path.join(directory, "runner.py"), "w", encoding="utf-8") as file:
+        file.write('def runner():\n    """Demo solution named after an installer module."""\n    return "solution"\n')
+
+    import runner
+    registry = SolutionRegistry(directory, os.path.join(workspace.cache_dir, "solutions.json"))
+    assert registry.load("runner")() == "solution"
+    assert sys.modules["runner"] is runner
+    assert sys.modules[f"{SOLUTION_PACKAGE}.runner"].runner is registry.load("runner")
@@ -0,0 +1,121 @@
+import os
+import sys
+import textwrap
+
+import pytest
+
+import sql_executor
+from sql_executor import PsqlSession, SqlError, SqlExecutor
+
+# Implements what PsqlSession sends to psql: \timing, \set, \if/\else/\endif, \echo and
+# \warn with variables, \! echo to stderr, and statements that fail if they mention
+# "broken", disconnect if they mention "disconnect" and print a row otherwise.
+# STUB_PSQL_VERSION selects the version of psql, those before 13 have no \warn and those
+# before 11 no ERROR variable.
+STUB_PSQL = textwrap.dedent(r'''
+    import os
+    import re
+    import sys
+
+    version = int(os.environ.get("STUB_PSQL_VERSION", "170005"))
+    variables = {"VERSION_NUM": str(version)}
+    branches = []
+
+    def expand(text):
+        return re.sub(r":(\w+)", lambda match: variables.get(match.group(1), match.group(0)), text)
+
+    for number, line in enumerate(sys.stdin, 1):
+        line = line.rstrip("\n")
+        command, _, argument = line.partition(" ")
+        if command == "\\if":
+            branches.append(all(branches) and expand(argument) == "true")
+            continue
+        if command == "\\else":
+            branches[-1] = not branches[-1] and all(branches[:-1])
+            continue
+        if command == "\\endif":
+            branches.pop()
+            continue
+        if not all(branches):
+            continue
+        if command == "\\q":
+            break
+        if command == "\\set":
+            name, value = argument.split()
+            variables[name] = value
+        elif command == "\\echo":
+            print(expand(argument), flush=True)
+        elif command == "\\warn" and version >= 130000:
+            print(expand(argument), file=sys.stderr, flush=True)
+        elif command == "\\!" and argument.startswith("echo ") and argument.endswith(" 1>&2"):
+            print(argument[5:-5], file=sys.stderr, flush=True)
+        elif command.startswith("\\"):
+            continue
+        elif "disconnect" in line:
+            print(f"psql:<stdin>:{number}: FATAL:  terminating connection due to administrator command", file=sys.stderr, flush=True)
+            print("server closed the connection unexpectedly", file=sys.stderr, flush=True)
+            sys.exit(2)
+        else:
+            failed = "broken" in line
+            if failed:
+                print(f"psql:<stdin>:{number}: ERROR:  relation \"broken\" does not exist", file=sys.stderr)
+                print(f"LINE 1: {line}", file=sys.stderr, flush=True)
+            else:
+                if "notice" in line:
+                    print(f"psql:<stdin>:{number}: NOTICE:  extension \"pg_tde\" already exists, skipping", file=sys.stderr, flush=True)
+                # A row that looks like an error is still a row
+                print(" ERROR: not an error" if "'ERROR" in line else " 1", flush=True)
+                print("Time: 0.250 ms", flush=True)
+            if version >= 110000:
+                variables["ERROR"] = "true" if failed else "false"
+''')
+
+@pytest.fixture
+def psql(workspace, monkeypatch):
+    path = os.path.join(workspace.path, "psql.py")
+    with open(path, "w", encoding="utf-8") as file:
+        file.write(STUB_PSQL)
+    monkeypatch.setattr(PsqlSession, "_command", lambda self: [sys.executable, path])
+    monkeypatch.setattr(sql_executor, "CONNECT_TIMEOUT", 0)
+
+    def version(number):
+        monkeypatch.setenv("STUB_PSQL_VERSION", str(number))
+
+    return version
+
+@pytest.mark.parametrize("version", [170005, 120000, 100000])
+def test_errors_are_read_from_stderr(psql, version):
+    psql(version)
+    with SqlExecutor(lambda message: None) as sql:
+        results = sql.run(["SELECT 'ERROR: not an error';", "SELECT 1 FROM broken;", "SELECT 2;"], check=False)
+
+    assert results[0].ok
+    assert results[0].output == [" ERROR: not an error"]
+    assert results[0].duration_ms == 0.25
+    assert 'ERROR:  relation "broken" does not exist' in results[1].error
+    assert "LINE 1: SELECT 1 FROM broken;" in results[1].error
+    if version >= 110000:
+        assert results[2].error == "Skipped after an earlier statement failed"
+    else:
+        # \if :ERROR cannot skip the rest of the batch
+        assert results[2].ok
+
+def test_notices_are_output(psql):
+    with SqlExecutor(lambda message: None) as sql:
+        result = sql.run(["CREATE EXTENSION IF NOT EXISTS pg_tde; -- notice"])[0]
+    assert result.ok
+    assert result.output[0] == " 1"
+    assert result.output[1].endswith('NOTICE:  extension "pg_tde" already exists, skipping')
+
+def test_failed_statement_raises(psql):
+    with SqlExecutor(lambda message: None) as sql:
+        with pytest.raises(SqlError, match="broken"):
+            sql.run(["SELECT 1 FROM broken;"])
+        # The session is still usable
+        assert sql.run(["SELECT 1;"])[0].ok
+
+def test_lost_connection_fails_the_rest_of_the_batch(psql):
+    with SqlExecutor(lambda message: None) as sql:
+        results = sql.session().execute_batch(["SELECT 1;", "SELECT pg_terminate_backend(1); -- disconnect", "SELECT 2;"], check=False)
+    assert results[0].ok
+    assert all(sql_executor.CONNECTION_LOST in result.error for result in results[1:])
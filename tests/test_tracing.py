@@ -0,0 +1,124 @@
+import json
+import threading
+
+import pytest
+
+import tracing
+from benchmarks.fixtures import StubBackend
+from runner import CommandRunner
+from tracing import CommandTracer, Tracer, span, traced
+
+@pytest.fixture
+def tracer():
+    return Tracer()
+
+def names(spans):
+    return [(item.name, [child.name for child in item.children]) for item in spans]
+
+def test_spans_nest_within_a_thread(tracer):
+    with tracer.span("install", product="ppg-17.0") as install:
+        with tracer.span("enable"):
+            pass
+        with tracer.span("packages") as packages:
+            packages.set(count=3)
+    assert names(tracer.roots) == [("install", ["enable", "packages"])]
+    assert install.attrs == {"product": "ppg-17.0"}
+    assert packages.attrs == {"count": 3}
+    assert install.duration >= packages.duration >= 0
+    assert tracer.current_span() is None
+
+def test_worker_threads_use_an_explicit_parent(tracer):
+    def work(parent, index):
+        # The worker has no open span, without the parent its span would be a root
+        with tracer.span(f"probe:{index}", parent=parent):
+            with tracer.span("fetch"):
+                pass
+
+    with tracer.span("probe_repositories") as parent:
+        workers = [threading.Thread(target=work, args=(parent, index)) for index in range(3)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        with tracer.span("own"):
+            pass
+
+    [root] = tracer.roots
+    assert sorted(child.name for child in root.children) == ["own", "probe:0", "probe:1", "probe:2"]
+    assert all(names([child]) == [(child.name, ["fetch"])] for child in root.children if child.name != "own")
+    assert all((child.thread == root.thread) == (child.name == "own") for child in root.children)
+
+def test_ending_a_span_ends_the_spans_left_open(tracer):
+    outer = tracer.start_span("outer")
+    tracer.start_span("left_open")
+    tracer.end_span(outer, error="ValueError: broken")
+    assert tracer.current_span() is None
+    assert outer.error == "ValueError: broken"
+
+    # Left open: exported as unfinished, up to now
+    unfinished = tracer.summary()["spans"][0]["children"][0]
+    assert unfinished["name"] == "left_open" and unfinished["unfinished"]
+
+def test_exception_is_recorded(tracer):
+    with pytest.raises(KeyError):
+        with tracer.span("lookup"):
+            raise KeyError("ppg")
+    assert tracer.roots[0].error == "KeyError: 'ppg'"
+
+def test_chrome_trace(tracer, workspace):
+    with tracer.span("install", product="ppg-17.0"):
+        with tracer.span("enable"):
+            pass
+    path = workspace.path + "/trace.json"
+    tracer.write(path, "chrome")
+    with open(path, encoding="utf-8") as file:
+        trace = json.load(file)
+
+    metadata = [event for event in trace["traceEvents"] if event["ph"] == "M"]
+    events = [event for event in trace["traceEvents"] if event["ph"] == "X"]
+    assert [event["args"]["name"] for event in metadata] == [threading.current_thread().name]
+    assert [event["name"] for event in events] == ["install", "enable"]
+    install, enable = events
+    assert install["args"] == {"product": "ppg-17.0"}
+    assert install["ts"] <= enable["ts"]
+    assert enable["ts"] + enable["dur"] <= install["ts"] + install["dur"] + 1
+
+def test_summary_totals_per_phase(tracer):
+    for _ in range(3):
+        with tracer.span("sql"):
+            pass
+    phases = tracer.summary()["phases"]
+    assert phases["sql"]["count"] == 3
+    assert phases["sql"]["max"] <= phases["sql"]["total"]
+
+def test_unknown_format(tracer, workspace):
+    with pytest.raises(ValueError, match="Unknown trace format"):
+        tracer.write(workspace.path + "/trace.json", "flamegraph")
+
+def test_commands_are_spans(tracer):
+    commands = CommandRunner(StubBackend({"apt-get install": (100, [])}))
+    commands.add_observer(CommandTracer(tracer))
+    with tracer.span("install"):
+        commands.run(["sudo", "apt-get", "update"])
+        commands.run(["sudo", "apt-get", "install", "-y", "x"], check=False)
+
+    [install] = tracer.roots
+    update, failed = install.children
+    assert (update.name, update.error, update.attrs["returncode"]) == ("$ apt-get update", None, 0)
+    assert failed.error == "exit status 100"
+
+def test_disabled_tracing_records_nothing(monkeypatch):
+    monkeypatch.setattr(tracing, "_tracer", None)
+    with span("install") as current:
+        current.set(ignored=True)
+    assert tracing.current_span() is None
+
+def test_traced_functions(monkeypatch, tracer):
+    monkeypatch.setattr(tracing, "_tracer", tracer)
+
+    @traced()
+    def download():
+        return tracing.current_span().name
+
+    assert download() == "download"
+    assert names(tracer.roots) == [("download", [])]
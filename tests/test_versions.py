@@ -0,0 +1,62 @@
+import pytest
+
+from versions import VersionList, VersionSpec, VersionSpecError, release, version_key
+
+VERSIONS = ["8.0", "8.0.36", "8.0.42", "8.4.3", "16.8", "16.9", "17.0", "17.2", "17.5"]
+
+@pytest.fixture
+def versions():
+    return VersionList(VERSIONS)
+
+def test_release_ignores_empty_parts():
+    assert release("17.") == (17,)
+    assert release("8.0.36") == (8, 0, 36)
+
+def test_version_key_sorts_numerically():
+    assert sorted(["17.10", "17.2", "8.0"], key=version_key) == ["8.0", "17.2", "17.10"]
+
+def test_listed_literal_is_used_as_is(versions):
+    assert versions.resolve("8.0") == "8.0"
+    assert versions.resolve("17.2") == "17.2"
+
+def test_unlisted_major_is_widened(versions):
+    assert versions.resolve("17") == "17.5"
+    assert versions.resolve("8") == "8.4.3"
+
+def test_unlisted_literal_without_match(versions):
+    assert versions.resolve("18") is None
+    assert VersionSpec.parse("18").literal
+
+def test_tilde(versions):
+    assert versions.resolve("~8.0.36") == "8.0.42"
+    assert versions.resolve("~8.0.43") is None
+    assert versions.resolve("~16") == "16.9"
+
+def test_ranges(versions):
+    assert versions.resolve(">=16,<17") == "16.9"
+    assert versions.resolve(">16.8,<=17.2") == "17.2"
+    assert versions.resolve("==17.0") == "17.0"
+    assert versions.resolve(">17.5") is None
+
+def test_exclusions(versions):
+    assert versions.resolve(">=17,!=17.5") == "17.2"
+    assert versions.resolve(">=17,!=17.5,!=17.2,!=17.0") is None
+
+def test_latest(versions):
+    assert versions.resolve("latest") == "17.5"
+    assert VersionList([]).resolve("latest") is None
+
+def test_matches():
+    spec = VersionSpec.parse(">=16,<17,!=16.8")
+    assert spec.matches("16.9")
+    assert not spec.matches("16.8")
+    assert not spec.matches("17.0")
+
+@pytest.mark.parametrize("spec", ["", "abc", "~", ">=16,", "=>16", "16.x", "~8.0-1"])
+def test_malformed_specs(spec):
+    with pytest.raises(VersionSpecError):
+        VersionSpec.parse(spec)
+
+def test_newest(versions):
+    assert versions.newest(2) == ["17.5", "17.2"]
+    assert len(versions) == len(VERSIONS)
@@ -0,0 +1,259 @@
+import functools
+import json
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+TRACE_FORMATS = ("chrome", "summary")
+
+class Span:
+    """
+    A timed phase of the installer. Spans opened while another span is open in
+    the same thread become its children.
+
+    Attributes:
+        name (str): Name of the phase.
+        attrs (dict): Details of the phase, e.g. the distribution or the command.
+        start (float): Seconds since the tracer was started.
+        duration (float): Seconds the phase took, None while it is still open.
+        error (str): The exception that ended the phase, if any.
+    """
+
+    def __init__(self, name, parent, thread, start, attrs):
+        self.name = name
+        self.parent = parent
+        self.thread = thread
+        self.start = start
+        self.attrs = attrs
+        self.duration = None
+        self.error = None
+        self.children = []
+
+    def set(self, **attrs):
+        """Add details to the span once they are known."""
+        self.attrs.update(attrs)
+
+    def to_dict(self, now):
+        duration = self.duration if self.duration is not None else now - self.start
+        data = {"name": self.name, "start": round(self.start, 6), "duration": round(duration, 6)}
+        if self.attrs:
+            data["attrs"] = self.attrs
+        if self.error:
+            data["error"] = self.error
+        if self.duration is None:
+            data["unfinished"] = True
+        if self.children:
+            data["children"] = [child.to_dict(now) for child in self.children]
+        return data
+
+class _NoSpan:
+    """Stands in for a span while tracing is disabled, so instrumented code costs nothing."""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+    def set(self, **attrs):
+        pass
+
+_NO_SPAN = _NoSpan()
+
+class Tracer:
+    """
+    Records nested spans per thread and exports them as a Chrome trace
+    (chrome://tracing, https://ui.perfetto.dev) or as a JSON summary.
+    """
+
+    def __init__(self):
+        self.started_at = time.time()
+        self._start = time.perf_counter()
+        self.roots = []
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._threads = {}
+
+    def _now(self):
+        return time.perf_counter() - self._start
+
+    def _stack(self):
+        stack = getattr(self._local, "stack", None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    def current_span(self):
+        stack = self._stack()
+        return stack[-1] if stack else None
+
+    def start_span(self, name, parent=None, **attrs):
+        """
+        Open a span in the current thread. Its parent is the innermost open span of the
+        thread, or the given parent, e.g. the span that handed work to a thread pool.
+        """
+        stack = self._stack()
+        if parent is None and stack:
+            parent = stack[-1]
+        thread = threading.current_thread()
+        span = Span(name, parent, thread.ident, self._now(), attrs)
+        with self._lock:
+            self._threads.setdefault(thread.ident, thread.name)
+            (parent.children if parent else self.roots).append(span)
+        stack.append(span)
+        return span
+
+    def end_span(self, span, error=None):
+        span.duration = self._now() - span.start
+        span.error = error
+        stack = self._stack()
+        if span in stack:
+            # Spans left open by the phase are ended with it
+            while stack.pop() is not span:
+                pass
+
+    def span(self, name, parent=None, **attrs):
+        return _SpanContext(self, name, parent, attrs)
+
+    def spans(self):
+        """All spans, depth first."""
+        pending = list(reversed(self.roots))
+        while pending:
+            span = pending.pop()
+            yield span
+            pending.extend(reversed(span.children))
+
+    def chrome_trace(self):
+        """Return the spans in the Chrome trace event format."""
+        now = self._now()
+        pid = os.getpid()
+        events = [
+            {"name": "thread_name", "ph": "M", "pid": pid, "tid": tid, "args": {"name": name}}
+            for tid, name in self._threads.items()
+        ]
+        for span in self.spans():
+            duration = span.duration if span.duration is not None else now - span.start
+            args = dict(span.attrs)
+            if span.error:
+                args["error"] = span.error
+            events.append({
+                "name": span.name,
+                "ph": "X",
+                "ts": round(span.start * 1e6, 1),
+                "dur": round(duration * 1e6, 1),
+                "pid": pid,
+                "tid": span.thread,
+                "args": args,
+            })
+        return {"traceEvents": events, "displayTimeUnit": "ms", "otherData": {"started_at": self.started_at}}
+
+    def summary(self):
+        """Return the span tree with durations in seconds and the total time per phase name."""
+        now = self._now()
+        phases = {}
+        for span in self.spans():
+            duration = span.duration if span.duration is not None else now - span.start
+            phase = phases.setdefault(span.name, {"count": 0, "total": 0.0, "max": 0.0})
+            phase["count"] += 1
+            phase["total"] = round(phase["total"] + duration, 6)
+            phase["max"] = round(max(phase["max"], duration), 6)
+        return {
+            "started_at": self.started_at,
+            "duration": round(now, 6),
+            "phases": phases,
+            "spans": [span.to_dict(now) for span in self.roots],
+        }
+
+    def write(self, path, trace_format="chrome"):
+        """Write the trace to path in the given format, see TRACE_FORMATS."""
+        if trace_format not in TRACE_FORMATS:
+            raise ValueError(f"Unknown trace format '{trace_format}'. Available formats: {', '.join(TRACE_FORMATS)}")
+        data = self.chrome_trace() if trace_format == "chrome" else self.summary()
+        with open(path, "w", encoding="utf-8") as file:
+            json.dump(data, file, indent=1)
+        logger.info(f"Trace written to {path} ({trace_format} format).")
+
+class _SpanContext:
+    def __init__(self, tracer, name, parent, attrs):
+        self.tracer = tracer
+        self.name = name
+        self.parent = parent
+        self.attrs = attrs
+        self.span = None
+
+    def __enter__(self):
+        self.span = self.tracer.start_span(self.name, self.parent, **self.attrs)
+        return self.span
+
+    def __exit__(self, exc_type, exc, tb):
+        self.tracer.end_span(self.span, f"{exc_type.__name__}: {exc}" if exc_type else None)
+        return False
+
+class CommandTracer:
+    """Command observer that records every command run by the command runner as a span."""
+
+    def __init__(self, tracer):
+        self.tracer = tracer
+        self._spans = {}
+
+    def command_started(self, result):
+        self._spans[id(result)] = self.tracer.start_span(f"$ {result.name}", command=result.command_line)
+
+    def command_finished(self, result):
+        span = self._spans.pop(id(result), None)
+        if span is None:
+            return
+        span.set(returncode=result.returncode, cpu_time=result.cpu_time)
+        self.tracer.end_span(span, None if result.returncode == 0 else f"exit status {result.returncode}")
+
+_tracer = None
+
+def enable_tracing():
+    """Start recording spans for the rest of the process and return the tracer."""
+    global _tracer
+    if _tracer is None:
+        _tracer = Tracer()
+        from runner import get_runner
+        get_runner().add_observer(CommandTracer(_tracer))
+    return _tracer
+
+def get_tracer():
+    """Return the active tracer, or None if tracing is disabled."""
+    return _tracer
+
+def current_span():
+    """Return the innermost open span of the current thread, or None."""
+    if _tracer is None:
+        return None
+    return _tracer.current_span()
+
+def span(name, parent=None, **attrs):
+    """
+    Context manager timing a phase of the installer. Does nothing unless tracing is enabled.
+    Spans nest within a thread; work handed to another thread passes its parent explicitly.
+
+    Usage:
+        with span("enable_repository", repository=repo_name) as current:
+            ...
+            current.set(packages=len(packages))
+    """
+    if _tracer is None:
+        return _NO_SPAN
+    return _tracer.span(name, parent, **attrs)
+
+def traced(name=None):
+    """Decorator recording every call of the function as a span."""
+    def decorator(func):
+        span_name = name or func.__name__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if _tracer is None:
+                return func(*args, **kwargs)
+            with _tracer.span(span_name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
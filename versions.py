@@ -0,0 +1,174 @@
+import bisect
+import re
+
+# A clause of a range spec, e.g. ">=16" or "!=17.1"
+_CLAUSE_PATTERN = re.compile(r"^\s*(>=|<=|==|!=|>|<)\s*(\d+(?:\.\d+)*)\s*$")
+_RELEASE_PATTERN = re.compile(r"^\d+(?:\.\d+)*$")
+
+class VersionSpecError(ValueError):
+    """Raised for malformed version specs."""
+
+def release(version):
+    """
+    Return the numeric parts of a version, e.g. (8, 0, 36) for "8.0.36". Empty parts,
+    e.g. of "17." scraped from a link, are ignored.
+    """
+    return tuple(int(part) for part in version.split(".") if part.isdigit())
+
+def version_key(version):
+    """Sort key of a version: numerically by release, then by text, so "17.0" and "17.00" keep an order."""
+    return release(version), version
+
+def _parse_release(text, spec):
+    if not _RELEASE_PATTERN.match(text):
+        raise VersionSpecError(f"Invalid version '{text}' in version spec '{spec}'.")
+    return release(text)
+
+def _bump(parts, position):
+    """The first release after every release starting with parts[:position + 1]."""
+    return parts[:position] + (parts[position] + 1,)
+
+class VersionSpec:
+    """
+    The versions a spec selects, as one interval of releases and a set of exclusions.
+
+    Specs:
+        latest      The newest version.
+        17          17 itself when it is listed, otherwise the newest version starting with 17,
+                    e.g. 17.2 (likewise 8.0 for 8.0.x).
+        ~8.0.36     The newest 8.0.x that is at least 8.0.36 (~8 is the newest 8.x).
+        >=16,<17    The newest version matching every clause, of >=, >, <=, <, == and !=.
+    """
+
+    def __init__(self, text, lower=None, upper=None, excluded=(), literal=False):
+        self.text = text
+        # (release, inclusive) tuples, None for unbounded
+        self.lower = lower
+        self.upper = upper
+        self.excluded = set(excluded)
+        # The spec is a plain version, which names a repository: it is used as is when listed
+        # or not on the index, and only widened to the newest version starting with it otherwise
+        self.literal = literal
+
+    @classmethod
+    def parse(cls, text):
+        """
+        Parse a version spec.
+
+        Raises:
+            VersionSpecError: If the spec is malformed.
+        """
+        spec = text.strip()
+        if not spec:
+            raise VersionSpecError("Empty version spec.")
+        if spec == "latest":
+            return cls(spec)
+        if spec.startswith("~"):
+            parts = _parse_release(spec[1:].strip(), spec)
+            return cls(spec, lower=(parts, True), upper=(_bump(parts, min(1, len(parts) - 1)), False))
+        if _RELEASE_PATTERN.match(spec):
+            parts = release(spec)
+            return cls(spec, lower=(parts, True), upper=(_bump(parts, len(parts) - 1), False), literal=True)
+
+        result = cls(spec)
+        for clause in spec.split(","):
+            match = _CLAUSE_PATTERN.match(clause)
+            if not match:
+                raise VersionSpecError(
+                    f"Invalid version spec '{spec}'. Expected a version (17, 8.0.36), latest, "
+                    f"~version or comparisons such as >=16,<17."
+                )
+            operator, parts = match.group(1), release(match.group(2))
+            if operator == "!=":
+                result.excluded.add(parts)
+                continue
+            if operator in (">=", ">", "=="):
+                result._restrict_lower((parts, operator != ">"))
+            if operator in ("<=", "<", "=="):
+                result._restrict_upper((parts, operator != "<"))
+        return result
+
+    def _restrict_lower(self, bound):
+        # The higher bound wins, at the same release the exclusive one
+        if self.lower is None or bound[0] > self.lower[0] or (bound[0] == self.lower[0] and not bound[1]):
+            self.lower = bound
+
+    def _restrict_upper(self, bound):
+        if self.upper is None or bound[0] < self.upper[0] or (bound[0] == self.upper[0] and not bound[1]):
+            self.upper = bound
+
+    def matches(self, version):
+        parts = release(version)
+        if self.lower is not None and (parts < self.lower[0] or (parts == self.lower[0] and not self.lower[1])):
+            return False
+        if self.upper is not None and (parts > self.upper[0] or (parts == self.upper[0] and not self.upper[1])):
+            return False
+        return parts not in self.excluded
+
+    def __str__(self):
+        return self.text
+
+    def __repr__(self):
+        return f"VersionSpec({self.text!r})"
+
+class VersionList:
+    """
+    The versions of one distribution, sorted by release, resolving specs with a binary
+    search of the interval they select.
+    """
+
+    def __init__(self, versions):
+        self.versions = sorted(set(versions), key=version_key)
+        self.releases = [release(version) for version in self.versions]
+        self._listed = set(self.versions)
+
+    def resolve(self, spec):
+        """
+        Return the newest version a spec selects, or None.
+
+        Args:
+            spec (VersionSpec or str): The spec, parsed if it is a string.
+        """
+        if isinstance(spec, str):
+            spec = VersionSpec.parse(spec)
+        if spec.literal and spec.text in self._listed:
+            # pdps-8.0 is a repository of its own, even when 8.0.42 is listed as well
+            return spec.text
+
+        start, end = 0, len(self.releases)
+        if spec.lower is not None:
+            parts, inclusive = spec.lower
+            start = (bisect.bisect_left if inclusive else bisect.bisect_right)(self.releases, parts)
+        if spec.upper is not None:
+            parts, inclusive = spec.upper
+            end = (bisect.bisect_right if inclusive else bisect.bisect_left)(self.releases, parts)
+
+        for position in range(end - 1, start - 1, -1):
+            if self.releases[position] not in spec.excluded:
+                return self.versions[position]
+        return None
+
+    def newest(self, count=None):
+        """Return the newest versions first, all of them if count is None."""
+        newest = self.versions[::-1]
+        return newest if count is None else newest[:count]
+
+    def __len__(self):
+        return len(self.versions)
+
+def resolve_version(prefix, spec):
+    """
+    Resolve a version spec of a distribution against the repository index.
+
+    Args:
+        prefix (str): Directory prefix of the distribution, e.g. "ppg-".
+        spec (VersionSpec or str): The version spec, e.g. "17", "latest" or ">=16,<17".
+
+    Returns:
+        str: The newest matching version, None if none is listed.
+
+    Raises:
+        VersionSpecError: If the spec is malformed.
+    """
+    from fetch_versions import get_version_index
+    return get_version_index([prefix]).version_list(prefix).resolve(spec)